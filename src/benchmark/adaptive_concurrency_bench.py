@@ -0,0 +1,78 @@
+"""Benchmark of fixed thread counts against adaptive concurrency"""
+
+import argparse
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from models.url import URL
+from service.concurrency_limiter import ConcurrencyController
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Adaptive concurrency benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--latencies",
+        help="Server latencies per request in seconds, one site per latency",
+        type=float,
+        nargs="*",
+        default=[0.005, 0.05],
+    )
+    parser.add_argument(
+        "--capacity",
+        help="Requests served at once by the server without slowing down,"
+        " further requests slow down and beyond twice as many are rejected",
+        type=int,
+        default=16,
+    )
+    parser.add_argument(
+        "--retry_after",
+        help="Seconds sent in the Retry-After header of rejected requests",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument("--thread_counts", type=int, nargs="*", default=[4, 16, 64])
+    parser.add_argument("--max_thread_count", type=int, default=64)
+    args = parser.parse_args()
+
+    for latency in args.latencies:
+        site_options = SyntheticSiteOptions(
+            args.page_count,
+            args.fan_out,
+            latency,
+            capacity=args.capacity,
+            retry_after=args.retry_after,
+        )
+        with SyntheticSiteServer(site_options) as server:
+            runs = [
+                (str(thread_count), thread_count, False)
+                for thread_count in args.thread_counts
+            ] + [("adaptive", args.max_thread_count, True)]
+            for name, thread_count, adaptive_concurrency in runs:
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=True,
+                    thread_count=thread_count,
+                    adaptive_concurrency=adaptive_concurrency,
+                )
+                controllers = []
+                concurrency_controller = options.concurrency_controller
+
+                def record_controller(*controller_args):
+                    """Keep the controller of the crawl to report its final limit."""
+                    controller = concurrency_controller(*controller_args)
+                    controllers.append(controller)
+                    return controller
+
+                options.concurrency_controller = record_controller
+                crawled, seconds = run_engine(options)
+                controller: ConcurrencyController | None = controllers[0]
+                print(
+                    f"latency={latency * 1000:5.1f}ms threads={name:<9}"
+                    f" urls={crawled:<6} pages/sec={crawled / seconds:8.1f}"
+                    + (f" {controller}" if controller is not None else "")
+                )
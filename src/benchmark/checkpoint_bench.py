@@ -0,0 +1,95 @@
+"""Benchmark of the overhead of checkpointing crawl state"""
+
+import argparse
+import tempfile
+import time
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from models.url import URL
+from repository.state_store import CrawlStateStore
+
+
+def run_state_store(url_count: int, checkpoint_every: int) -> tuple[float, float]:
+    """
+    Record URLs as discovered then processed, checkpointing every `checkpoint_every`
+    URLs, which isolates the cost of the store from the crawl.
+
+    Args:
+        url_count (int): Number of URLs to record.
+        checkpoint_every (int): Number of URLs recorded between two checkpoints.
+
+    Returns:
+        tuple[float, float]: Microseconds per URL spent recording, and writing
+        checkpoints.
+    """
+    urls = [URL(f"https://website.com/page/{index}") for index in range(url_count)]
+    with tempfile.TemporaryDirectory() as state_dir:
+        state_store = CrawlStateStore(state_dir, checkpoint_interval=3600)
+        start = time.perf_counter()
+        for index, url in enumerate(urls, 1):
+            state_store.record_discovered(url)
+            state_store.record_processed(url)
+            if index % checkpoint_every == 0:
+                state_store.checkpoint()
+        state_store.close()
+        elapsed = time.perf_counter() - start
+    checkpoint_seconds = state_store.stats.seconds
+    return (
+        (elapsed - checkpoint_seconds) / url_count * 1e6,
+        checkpoint_seconds / url_count * 1e6,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl state checkpoint benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument(
+        "--checkpoint_intervals", type=float, nargs="*", default=[0.1, 1.0]
+    )
+    parser.add_argument("--url_count", type=int, default=200_000)
+    parser.add_argument(
+        "--batch_sizes", type=int, nargs="*", default=[1, 100, 1000, 10_000]
+    )
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        for checkpoint_interval in [None] + args.checkpoint_intervals:
+            with tempfile.TemporaryDirectory() as state_dir:
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=True,
+                    thread_count=args.thread_count,
+                    state_dir=state_dir if checkpoint_interval else None,
+                    checkpoint_interval=checkpoint_interval or 1.0,
+                )
+                crawled, seconds = run_engine(options)
+            print(
+                f"checkpoint_interval={str(checkpoint_interval):<5} "
+                f"urls={crawled:<6} seconds={seconds:7.2f} "
+                f"pages/sec={crawled / seconds:8.1f}"
+            )
+
+    for batch_size in args.batch_sizes:
+        record_micros, checkpoint_micros = run_state_store(
+            # A checkpoint per URL is slow, keep its run short.
+            min(args.url_count, 100 * batch_size),
+            batch_size,
+        )
+        print(
+            f"urls_per_checkpoint={batch_size:<6} record_us/url={record_micros:6.2f} "
+            f"checkpoint_us/url={checkpoint_micros:8.2f}"
+        )
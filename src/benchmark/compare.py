@@ -0,0 +1,65 @@
+"""Comparison of two benchmark suite results, failing on throughput regressions"""
+
+import argparse
+import json
+import sys
+
+
+def _load_runs(path: str) -> tuple[dict, dict[tuple[str, int], dict]]:
+    """
+    Args:
+        path (str): Path of the JSON results written by `benchmark.suite`.
+
+    Returns:
+        tuple[dict, dict[tuple[str, int], dict]]: Metadata of the results, and
+        every run keyed by its engine and concurrency.
+    """
+    with open(path, encoding="utf-8") as results:
+        report = json.load(results)
+    return report["meta"], {
+        (run["engine"], run["concurrency"]): run for run in report["runs"]
+    }
+
+
+def _change(base: float, new: float) -> float:
+    """Relative change from base to new, 0 if base is 0."""
+    return (new - base) / base if base else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark suite results",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("base", help="Results of the baseline commit")
+    parser.add_argument("new", help="Results of the commit under test")
+    parser.add_argument(
+        "--threshold",
+        help="Largest tolerated drop of pages/sec, as a share of the baseline",
+        type=float,
+        default=0.1,
+    )
+    args = parser.parse_args()
+
+    base_meta, base_runs = _load_runs(args.base)
+    new_meta, new_runs = _load_runs(args.new)
+    if base_meta["site"] != new_meta["site"]:
+        print("Warning: the results were measured against different sites")
+
+    regressions = []
+    for key in sorted(base_runs.keys() & new_runs.keys()):
+        base, new = base_runs[key], new_runs[key]
+        throughput_change = _change(base["pages_per_second"], new["pages_per_second"])
+        print(
+            f"engine={key[0]:<6} concurrency={key[1]:<5} "
+            f"pages/sec {base['pages_per_second']:8.1f} -> "
+            f"{new['pages_per_second']:8.1f} ({throughput_change:+7.1%}) "
+            f"p99 {_change(base['p99_page_seconds'], new['p99_page_seconds']):+7.1%} "
+            f"rss {_change(base['peak_rss_bytes'], new['peak_rss_bytes']):+7.1%}"
+        )
+        if throughput_change < -args.threshold:
+            regressions.append(key)
+
+    if regressions:
+        print(f"{len(regressions)} configuration(s) regressed beyond the threshold")
+        sys.exit(1)
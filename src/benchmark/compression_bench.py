@@ -0,0 +1,62 @@
+"""Benchmark of compressed against uncompressed transfers on a bandwidth-limited site"""
+
+import argparse
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compressed transfer benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=1000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--page_size", help="Size of every page in bytes", type=int, default=50_000
+    )
+    parser.add_argument(
+        "--bandwidth",
+        help="Bytes per second every response body is sent at",
+        type=float,
+        default=250_000,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument("--task_count", type=int, default=64)
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(
+        args.page_count,
+        args.fan_out,
+        page_size=args.page_size,
+        compress=True,
+        bandwidth=args.bandwidth,
+    )
+    with SyntheticSiteServer(site_options) as server:
+        for engine, concurrency in (
+            (CrawlerLauncherOptions.Engine.THREAD, args.thread_count),
+            (CrawlerLauncherOptions.Engine.ASYNC, args.task_count),
+        ):
+            for accept_encoding in ("identity", None):
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=True,
+                    engine=engine,
+                    thread_count=concurrency,
+                    task_count=concurrency,
+                    accept_encoding=accept_encoding,
+                    # Only logged once the crawl is done.
+                    metrics_interval=3600,
+                )
+                metrics = CrawlMetrics()
+                options.crawl_metrics = lambda metrics=metrics: metrics
+                crawled, seconds = run_engine(options)
+                print(
+                    f"engine={engine:<6} accept_encoding={accept_encoding or 'default':<8}"
+                    f" urls={crawled:<6} pages/sec={crawled / seconds:8.1f}"
+                    f" wire_bytes/page={metrics.wire_bytes.total / crawled:9.0f}"
+                    f" decoded_bytes/page={metrics.downloaded_bytes.total / crawled:9.0f}"
+                )
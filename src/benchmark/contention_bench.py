@@ -0,0 +1,137 @@
+"""Benchmark of frontier contention as the number of worker threads grows"""
+
+import argparse
+import time
+from threading import Thread
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.crawler import Crawler
+from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from models.url import URL
+
+# Ways the links of a page are added to the frontier.
+PER_LINK = "per_link"
+BATCHED = "batched"
+
+
+def run_frontier(
+    options: CrawlerLauncherOptions,
+    server: SyntheticSiteServer,
+    page_count: int,
+    insertion: str = BATCHED,
+) -> tuple[int, float]:
+    """
+    Drive the configured frontier with the site's link graph and no network,
+    so that workers only contend on the repository.
+
+    Args:
+        options (CrawlerLauncherOptions): Options selecting the frontier.
+        server (SyntheticSiteServer): Site whose link graph is crawled.
+        page_count (int): Number of pages of the site.
+        insertion (str): `BATCHED` to add the links of every page with a single
+            call to `add_urls_to_crawl`, as crawler workers do, or `PER_LINK` to
+            call `add_url_to_crawl` once per link.
+
+    Returns:
+        tuple[int, float]: Number of URLs crawled and elapsed wall-clock seconds.
+    """
+    # URLs are built upfront to keep URL parsing out of the measurement.
+    page_urls = [URL(f"{server.base_url}page/{page}") for page in range(page_count)]
+    page_numbers = {url: page for page, url in enumerate(page_urls)}
+    repository = CrawlerLauncher(options)._instantiate_repository(
+        options.visited_url_sets()
+    )
+
+    def worker() -> None:
+        while (url := repository.get_next_url()) != Crawler.TERMINATION_SIGNAL:
+            links = server.page_links(page_numbers[url])
+            if insertion == BATCHED:
+                repository.add_urls_to_crawl(page_urls[link] for link in links)
+            else:
+                for link in links:
+                    repository.add_url_to_crawl(page_urls[link])
+            repository.notify_url_processed(url)
+
+    start = time.perf_counter()
+    repository.add_url_to_crawl(page_urls[0])
+    workers = [Thread(target=worker) for _ in range(options.thread_count)]
+    for thread in workers:
+        thread.start()
+    repository.wait_until_all_urls_processed()
+    elapsed = time.perf_counter() - start
+    for _ in workers:
+        repository.queue_next_url(Crawler.TERMINATION_SIGNAL)
+    for thread in workers:
+        thread.join()
+    return len(repository.visited_urls), elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Frontier contention benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--thread_counts", type=int, nargs="*", default=[4, 16, 64, 256]
+    )
+    parser.add_argument(
+        "--frontiers",
+        nargs="*",
+        default=[
+            CrawlerLauncherOptions.Frontier.FIFO,
+            CrawlerLauncherOptions.Frontier.SHARDED,
+        ],
+    )
+    parser.add_argument("--page_count", type=int, default=3000)
+    parser.add_argument("--fan_out", type=int, default=20)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument("--shard_count", type=int, default=16)
+    parser.add_argument(
+        "--insertions",
+        help="Ways the links of a page are added to the frontier with --in_memory",
+        nargs="*",
+        choices=[PER_LINK, BATCHED],
+        default=[PER_LINK, BATCHED],
+    )
+    parser.add_argument(
+        "--in_memory",
+        help="Flag to crawl the site's link graph without fetching pages, which"
+        " measures the frontier alone",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        for thread_count in args.thread_counts:
+            for frontier in args.frontiers:
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=True,
+                    thread_count=thread_count,
+                    frontier=frontier,
+                    shard_count=args.shard_count,
+                )
+                if not args.in_memory:
+                    crawled, seconds = run_engine(options)
+                    print(
+                        f"threads={thread_count:<4} frontier={frontier:<8} "
+                        f"urls={crawled:<6} seconds={seconds:7.2f} "
+                        f"pages/sec={crawled / seconds:8.1f}"
+                    )
+                    continue
+                for insertion in args.insertions:
+                    crawled, seconds = run_frontier(
+                        options, server, args.page_count, insertion
+                    )
+                    print(
+                        f"threads={thread_count:<4} frontier={frontier:<8} "
+                        f"insertion={insertion:<8} urls={crawled:<6} "
+                        f"seconds={seconds:7.2f} pages/sec={crawled / seconds:8.1f}"
+                    )
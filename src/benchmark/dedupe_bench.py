@@ -0,0 +1,98 @@
+"""Benchmark of the memory used per URL by the dedupe backends"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from models.url import URL
+from repository.visited_url_set import (
+    BloomFilterVisitedURLSet,
+    ExactVisitedURLSet,
+    FingerprintVisitedURLSet,
+    VisitedURLLog,
+)
+
+
+def synthetic_address(index: int) -> str:
+    """
+    Args:
+        index (int): Index of the URL.
+
+    Returns:
+        str: Address of a realistic looking, distinct URL.
+    """
+    return f"https://www.website.com/blog/{index % 997}/posts/{index}?page={index % 13}"
+
+
+def fill(visited_url_set, url_count: int) -> None:
+    """
+    Add `url_count` distinct URLs to a dedupe backend, the way the repository does.
+    """
+    for index in range(url_count):
+        url = URL(synthetic_address(index))
+        if url not in visited_url_set:
+            visited_url_set.add(url)
+
+
+def measure(name: str, visited_url_set_factory, url_count: int) -> None:
+    """
+    Print the throughput of a dedupe backend, the memory it retains per URL,
+    and its false positive rate for probes of unseen URLs.
+    """
+    visited_url_set = visited_url_set_factory(f"{name}-timed")
+    start = time.perf_counter()
+    fill(visited_url_set, url_count)
+    elapsed = time.perf_counter() - start
+    probe_count = min(url_count, 100_000)
+    false_positives = sum(
+        URL(synthetic_address(url_count + index)) in visited_url_set
+        for index in range(probe_count)
+    )
+    visited_url_set.close()
+
+    # Memory is traced in a separate pass, as tracing skews the timings.
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    visited_url_set = visited_url_set_factory(f"{name}-traced")
+    fill(visited_url_set, url_count)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    visited_url_set.close()
+
+    print(
+        f"{name:<22} bytes/url={(retained - baseline) / url_count:7.1f} "
+        f"urls/sec={url_count / elapsed:9.0f} "
+        f"false_positive_rate={false_positives / probe_count:.5f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Dedupe backend memory benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--url_count", type=int, default=1_000_000)
+    parser.add_argument("--bloom_false_positive_rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+
+        def file_log(name: str) -> VisitedURLLog:
+            return VisitedURLLog(os.path.join(log_dir, f"{name}.log"))
+
+        backends = {
+            "exact": lambda _: ExactVisitedURLSet(),
+            "fingerprint64+filelog": lambda name: FingerprintVisitedURLSet(
+                64, file_log(name)
+            ),
+            "fingerprint128+filelog": lambda name: FingerprintVisitedURLSet(
+                128, file_log(name)
+            ),
+            "bloom+filelog": lambda name: BloomFilterVisitedURLSet(
+                args.url_count, args.bloom_false_positive_rate, file_log(name)
+            ),
+        }
+        for backend_name, backend_factory in backends.items():
+            measure(backend_name, backend_factory, args.url_count)
@@ -0,0 +1,106 @@
+"""Benchmark of a distributed crawl, with every node in its own local process"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import socket
+import time
+
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from models.url import URL
+
+
+def run_node(options: CrawlerLauncherOptions, results: multiprocessing.Queue) -> None:
+    """
+    Crawl the partition of one node, and report its number of URLs crawled along
+    with the per-node statistics it logged.
+
+    Args:
+        options (CrawlerLauncherOptions): Options of the node.
+        results (multiprocessing.Queue): Queue the results are put on.
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        urls_crawled = CrawlerLauncher(options).crawl()
+    node_stats = [
+        line.split("Distributed crawl, ", 1)[1]
+        for line in log.getvalue().splitlines()
+        if "Distributed crawl, " in line
+    ]
+    results.put((options.node_id, len(urls_crawled), node_stats))
+
+
+def free_peers(node_count: int) -> list[str]:
+    """
+    Args:
+        node_count (int): Number of nodes.
+
+    Returns:
+        list[str]: `host:port` loopback addresses on ports that are currently free.
+    """
+    sockets = [socket.socket() for _ in range(node_count)]
+    for node_socket in sockets:
+        node_socket.bind(("127.0.0.1", 0))
+    peers = [":".join(map(str, node_socket.getsockname())) for node_socket in sockets]
+    for node_socket in sockets:
+        node_socket.close()
+    return peers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Distributed crawl benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument("--thread_count", help="Threads per node", type=int, default=8)
+    parser.add_argument("--node_counts", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--forward_batch_size", type=int, default=256)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        for node_count in args.node_counts:
+            peers = free_peers(node_count)
+            results = context.Queue()
+            nodes = [
+                context.Process(
+                    target=run_node,
+                    args=(
+                        CrawlerLauncherOptions(
+                            base_url=URL(server.base_url),
+                            skip_links_found=True,
+                            thread_count=args.thread_count,
+                            node_id=node_id,
+                            peers=peers if node_count > 1 else None,
+                            forward_batch_size=args.forward_batch_size,
+                        ),
+                        results,
+                    ),
+                )
+                for node_id in range(node_count)
+            ]
+            start = time.perf_counter()
+            for node in nodes:
+                node.start()
+            node_results = sorted(results.get() for _ in nodes)
+            elapsed = time.perf_counter() - start
+            for node in nodes:
+                node.join()
+            crawled = sum(urls_crawled for _, urls_crawled, _ in node_results)
+            print(
+                f"nodes={node_count} urls={crawled:<6} seconds={elapsed:7.2f}"
+                f" pages/sec={crawled / elapsed:8.1f}"
+            )
+            for node_stats in node_results[0][2]:
+                print(f"  {node_stats}")
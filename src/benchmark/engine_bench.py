@@ -0,0 +1,83 @@
+"""Side by side benchmark of the threaded and asyncio crawl engines"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.async_launcher import AsyncCrawlerLauncher
+from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from models.url import URL
+
+
+def run_engine(options: CrawlerLauncherOptions) -> tuple[int, float]:
+    """
+    Run a single crawl with the engine selected in the options, discarding log output.
+
+    Args:
+        options (CrawlerLauncherOptions): Options for the crawl.
+
+    Returns:
+        tuple[int, float]: Number of URLs crawled and elapsed wall-clock seconds.
+    """
+    launcher_class = (
+        AsyncCrawlerLauncher
+        if options.engine == CrawlerLauncherOptions.Engine.ASYNC
+        else CrawlerLauncher
+    )
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            urls_crawled = launcher_class(options).crawl()
+            elapsed = time.perf_counter() - start
+    return len(urls_crawled), elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl engine benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=1000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument("--thread_counts", type=int, nargs="*", default=[4, 16, 32])
+    parser.add_argument("--task_counts", type=int, nargs="*", default=[32, 128, 512])
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        runs = [
+            CrawlerLauncherOptions(
+                base_url=URL(server.base_url),
+                skip_links_found=True,
+                thread_count=thread_count,
+            )
+            for thread_count in args.thread_counts
+        ] + [
+            CrawlerLauncherOptions(
+                base_url=URL(server.base_url),
+                skip_links_found=True,
+                engine=CrawlerLauncherOptions.Engine.ASYNC,
+                task_count=task_count,
+            )
+            for task_count in args.task_counts
+        ]
+        for run_options in runs:
+            crawled, seconds = run_engine(run_options)
+            concurrency = (
+                run_options.task_count
+                if run_options.engine == CrawlerLauncherOptions.Engine.ASYNC
+                else run_options.thread_count
+            )
+            print(
+                f"engine={run_options.engine:<6} concurrency={concurrency:<5} "
+                f"urls={crawled:<6} seconds={seconds:7.2f} "
+                f"pages/sec={crawled / seconds:8.1f}"
+            )
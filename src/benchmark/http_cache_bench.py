@@ -0,0 +1,67 @@
+"""Benchmark of an incremental re-crawl revalidating pages with the HTTP cache"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from models.url import URL
+from service.http_cache import HTTPCache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="HTTP cache re-crawl benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=50)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.005,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument(
+        "--engines",
+        nargs="*",
+        default=[
+            CrawlerLauncherOptions.Engine.THREAD,
+            CrawlerLauncherOptions.Engine.ASYNC,
+        ],
+    )
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        for engine in args.engines:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                # The first run fills the cache, the second one revalidates every page.
+                for run in ("cold", "warm"):
+                    options = CrawlerLauncherOptions(
+                        base_url=URL(server.base_url),
+                        skip_links_found=True,
+                        thread_count=args.thread_count,
+                        task_count=args.thread_count,
+                        engine=engine,
+                        http_cache_dir=cache_dir,
+                    )
+                    crawled, seconds = run_engine(options)
+                    print(
+                        f"engine={engine:<7} run={run} urls={crawled:<6} "
+                        f"seconds={seconds:7.2f} pages/sec={crawled / seconds:8.1f}"
+                    )
+                connection = sqlite3.connect(
+                    os.path.join(cache_dir, HTTPCache.DATABASE_NAME)
+                )
+                cached_pages, cached_bytes = connection.execute(
+                    "SELECT COUNT(*), SUM(body_bytes) FROM pages"
+                ).fetchone()
+                connection.close()
+                print(
+                    f"engine={engine:<7} cached_pages={cached_pages} "
+                    f"cached_body_bytes={cached_bytes}"
+                )
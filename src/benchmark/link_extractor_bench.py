@@ -0,0 +1,140 @@
+"""Benchmark of the streaming link extractor against a full BeautifulSoup tree build"""
+
+import argparse
+import pathlib
+import random
+import time
+import tracemalloc
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from models.url import URL
+from service.link_extractor import LinkExtractor
+
+BASE_URL = URL("https://website.com/index.html")
+
+
+def extract_links_with_soup(url: URL, html_page: str) -> set[URL]:
+    """
+    Reference implementation: build a complete BeautifulSoup tree and search it for anchors.
+
+    Args:
+        url (URL): Source URL of the HTML page.
+        html_page (str): HTML markup of the page.
+
+    Returns:
+        set[URL]: Set of URLs found in the page.
+    """
+    soup = BeautifulSoup(html_page, "html.parser")
+    return {
+        URL(urljoin(url.address, anchor.get("href"))) for anchor in soup.find_all("a")
+    }
+
+
+def extract_links_streaming(url: URL, html_page: str, chunk_size: int) -> set[URL]:
+    """
+    Feed the markup to the streaming extractor in network-sized chunks.
+
+    Args:
+        url (URL): Source URL of the HTML page.
+        html_page (str): HTML markup of the page.
+        chunk_size (int): Number of characters fed at a time.
+
+    Returns:
+        set[URL]: Set of URLs found in the page.
+    """
+    extractor = LinkExtractor(url)
+    for index in range(0, len(html_page), chunk_size):
+        extractor.feed(html_page[index : index + chunk_size])
+    extractor.close()
+    return extractor.linked_urls
+
+
+def generate_corpus(page_count: int, links_per_page: int) -> list[str]:
+    """
+    Generate pages mixing navigation links with paragraphs of text and nested markup.
+
+    Args:
+        page_count (int): Number of pages to generate.
+        links_per_page (int): Number of anchors on every page.
+
+    Returns:
+        list[str]: HTML markup of every page.
+    """
+    generator = random.Random(0)
+    corpus = []
+    for _ in range(page_count):
+        blocks = []
+        for link in range(links_per_page):
+            target = generator.randrange(100_000)
+            blocks.append(
+                f'<div class="item"><p>{"lorem ipsum dolor " * 20}</p>'
+                f'<span><a class="nav" href="/page/{target}?ref={link}#top">Page {target}</a>'
+                "</span></div>"
+            )
+        corpus.append(f"<!DOCTYPE html><html><body>{''.join(blocks)}</body></html>")
+    return corpus
+
+
+def measure(function, corpus: list[str]) -> tuple[float, int, list[set[URL]]]:
+    """
+    Run an extraction function over the corpus.
+
+    Returns:
+        tuple[float, int, list[set[URL]]]: Elapsed seconds, peak traced memory
+        in bytes and the links extracted from every page.
+    """
+    start = time.perf_counter()
+    results = [function(BASE_URL, html_page) for html_page in corpus]
+    elapsed = time.perf_counter() - start
+
+    # Memory is traced in a separate pass, as tracing skews the timings.
+    tracemalloc.start()
+    for html_page in corpus:
+        function(BASE_URL, html_page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Link extractor benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--corpus_dir",
+        help="Directory of saved *.html pages, a synthetic corpus is generated if omitted",
+        type=pathlib.Path,
+        default=None,
+    )
+    parser.add_argument("--page_count", type=int, default=50)
+    parser.add_argument("--links_per_page", type=int, default=500)
+    parser.add_argument("--chunk_size", type=int, default=16 * 1024)
+    args = parser.parse_args()
+
+    if args.corpus_dir is not None:
+        pages = [
+            path.read_text(encoding="utf-8", errors="replace")
+            for path in sorted(args.corpus_dir.glob("*.html"))
+        ]
+    else:
+        pages = generate_corpus(args.page_count, args.links_per_page)
+    corpus_bytes = sum(len(page) for page in pages)
+
+    soup_seconds, soup_peak, soup_links = measure(extract_links_with_soup, pages)
+    stream_seconds, stream_peak, stream_links = measure(
+        lambda url, html_page: extract_links_streaming(url, html_page, args.chunk_size),
+        pages,
+    )
+    assert soup_links == stream_links, "Streaming extractor output differs"
+
+    print(f"pages={len(pages)} corpus_mb={corpus_bytes / 1e6:.1f}")
+    for name, seconds, peak in (
+        ("beautifulsoup", soup_seconds, soup_peak),
+        ("streaming", stream_seconds, stream_peak),
+    ):
+        print(
+            f"{name:<14} seconds={seconds:7.3f} "
+            f"mb/sec={corpus_bytes / 1e6 / seconds:7.2f} peak_mb={peak / 1e6:7.2f}"
+        )
@@ -0,0 +1,85 @@
+"""Benchmark of the memory used per link by the link graph, and of its analyses"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from crawler.link_graph import LinkGraph
+from models.url import URL
+
+
+def synthetic_pages(page_count: int, fan_out: int, seed: int = 0):
+    """
+    Yield the pages of a synthetic site, each linking to `fan_out` pages: the
+    same navigation links on every page, and links to random pages.
+
+    Args:
+        page_count (int): Number of pages.
+        fan_out (int): Number of links of every page.
+        seed (int): Seed of the random links.
+    """
+    rng = random.Random(seed)
+    urls = [
+        URL(f"https://www.website.com/posts/{index}") for index in range(page_count)
+    ]
+    navigation = urls[: fan_out // 2]
+    for url in urls:
+        yield url, navigation + rng.sample(urls, fan_out - len(navigation))
+
+
+def dict_of_sets(pages) -> dict[str, set[str]]:
+    """Link graph as a dict of sets of addresses, the naive alternative"""
+    graph = {}
+    for url, linked_urls in pages:
+        graph[url.address] = {linked_url.address for linked_url in linked_urls}
+    return graph
+
+
+def link_graph(pages) -> LinkGraph:
+    """Link graph recorded the way the crawler workers do"""
+    graph = LinkGraph()
+    for url, linked_urls in pages:
+        graph.add_page(url, linked_urls)
+    return graph
+
+
+def measure(name: str, build, pages) -> object:
+    """
+    Print the memory a link graph retains per link on top of the URLs, and the
+    time taken to record the links.
+    """
+    link_count = sum(len(linked_urls) for _, linked_urls in pages)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started_at = time.perf_counter()
+    graph = build(pages)
+    seconds = time.perf_counter() - started_at
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<13} bytes/link={(retained - baseline) / link_count:6.1f}"
+        f" megabytes={(retained - baseline) / 2**20:7.1f}"
+        f" links/sec={link_count / seconds:10.0f}"
+    )
+    return graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Link graph benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=100_000)
+    parser.add_argument("--fan_out", type=int, default=50)
+    args = parser.parse_args()
+
+    site_pages = list(synthetic_pages(args.page_count, args.fan_out))
+    measure("dict_of_sets", dict_of_sets, site_pages)
+    recorded_graph = measure("link_graph", link_graph, site_pages)
+    del site_pages
+
+    for analysis in ("to_csr", "in_degree", "pagerank", "orphan_urls"):
+        analysis_started_at = time.perf_counter()
+        getattr(recorded_graph, analysis)()
+        print(f"{analysis:<13} seconds={time.perf_counter() - analysis_started_at:.2f}")
@@ -0,0 +1,59 @@
+"""Benchmark of crawl throughput with full link logging versus skipped links"""
+
+import argparse
+import os
+import tempfile
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from logger.logger import Logger
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Link logging benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=200)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.005,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(
+        site_options
+    ) as server, tempfile.TemporaryDirectory() as log_dir:
+        runs = [
+            ("skip_links_found", True, None, Logger.Format.TEXT),
+            ("links_text_stdout", False, None, Logger.Format.TEXT),
+            ("links_text_file", False, "crawl.log", Logger.Format.TEXT),
+            ("links_json_file", False, "crawl.jsonl", Logger.Format.JSON),
+        ]
+        for name, skip_links_found, log_file, log_format in runs:
+            best_pages_per_second = 0.0
+            for _ in range(args.repeat):
+                log_path = log_file and os.path.join(log_dir, log_file)
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=skip_links_found,
+                    thread_count=args.thread_count,
+                    log_file=log_path,
+                    log_format=log_format,
+                )
+                crawled, seconds = run_engine(options)
+                best_pages_per_second = max(best_pages_per_second, crawled / seconds)
+                log_bytes = os.path.getsize(log_path) if log_path else 0
+                if log_path:
+                    os.remove(log_path)
+            print(
+                f"run={name:<18} urls={crawled:<6} "
+                f"best pages/sec={best_pages_per_second:8.1f} log_bytes={log_bytes}"
+            )
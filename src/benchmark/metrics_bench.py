@@ -0,0 +1,64 @@
+"""Benchmark of the overhead of recording crawl metrics"""
+
+import argparse
+import timeit
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl metrics overhead benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=2000)
+    parser.add_argument("--fan_out", type=int, default=20)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.002,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    metrics = CrawlMetrics()
+    operation_count = 200_000
+    for name, operation in (
+        ("counter inc", metrics.pages_crawled.inc),
+        ("histogram observe", lambda: metrics.fetch_seconds.observe(0.02)),
+        ("url found", lambda: metrics.record_url_found(True, 0.0)),
+    ):
+        seconds = timeit.timeit(operation, number=operation_count)
+        print(f"{name:<18} {seconds / operation_count * 1e9:6.0f} ns")
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    with SyntheticSiteServer(site_options) as server:
+        for engine in (
+            CrawlerLauncherOptions.Engine.THREAD,
+            CrawlerLauncherOptions.Engine.ASYNC,
+        ):
+            for metrics_enabled in (False, True):
+                best_pages_per_second = 0.0
+                for _ in range(args.repeat):
+                    options = CrawlerLauncherOptions(
+                        base_url=URL(server.base_url),
+                        skip_links_found=True,
+                        thread_count=args.thread_count,
+                        task_count=args.thread_count,
+                        engine=engine,
+                        # Record metrics without logging summaries during the run.
+                        metrics_interval=3600.0 if metrics_enabled else 0.0,
+                    )
+                    crawled, seconds = run_engine(options)
+                    best_pages_per_second = max(
+                        best_pages_per_second, crawled / seconds
+                    )
+                print(
+                    f"engine={engine:<7} metrics={str(metrics_enabled):<5} "
+                    f"urls={crawled:<6} best pages/sec={best_pages_per_second:8.1f}"
+                )
@@ -0,0 +1,53 @@
+"""Benchmark of multi-host crawl throughput with the per-host frontier"""
+
+import argparse
+import contextlib
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Multi-host crawl benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--host_counts", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--page_count", type=int, default=200)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.02,
+    )
+    parser.add_argument("--per_host_concurrency", type=int, default=2)
+    parser.add_argument("--per_host_delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(args.page_count, args.fan_out, args.latency)
+    for host_count in args.host_counts:
+        with contextlib.ExitStack() as stack:
+            # Every site listens on its own loopback address, i.e. its own host.
+            servers = [
+                stack.enter_context(
+                    SyntheticSiteServer(site_options, host=f"127.0.0.{index + 1}")
+                )
+                for index in range(host_count)
+            ]
+            options = CrawlerLauncherOptions(
+                base_url=URL(servers[0].base_url),
+                seed_urls=[URL(server.base_url) for server in servers[1:]],
+                skip_links_found=True,
+                thread_count=host_count * args.per_host_concurrency,
+                frontier=CrawlerLauncherOptions.Frontier.PER_HOST,
+                per_host_concurrency=args.per_host_concurrency,
+                per_host_delay=args.per_host_delay,
+            )
+            crawled, seconds = run_engine(options)
+            print(
+                f"hosts={host_count:<3} threads={options.thread_count:<4} "
+                f"urls={crawled:<6} seconds={seconds:7.2f} "
+                f"pages/sec={crawled / seconds:8.1f}"
+            )
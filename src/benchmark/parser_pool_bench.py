@@ -0,0 +1,86 @@
+"""Benchmark of parse throughput with crawler threads versus a parser process pool"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from models.url import URL
+from service.link_extractor import extract_link_parts
+
+
+def run_parser(
+    executor: Executor, pages: list[tuple[str, bytes]], fetcher_count: int
+) -> float:
+    """
+    Parse pages on an executor, submitted by `fetcher_count` threads standing in for
+    crawler workers, as `HTMLParserService` does with a parser pool.
+
+    Args:
+        executor (Executor): Executor parsing the pages.
+        pages (list[tuple[str, bytes]]): Address and body of every page.
+        fetcher_count (int): Number of threads submitting pages.
+
+    Returns:
+        float: Elapsed wall-clock seconds.
+    """
+
+    def parse(page: tuple[str, bytes]) -> set[URL]:
+        address, body = page
+        link_parts = executor.submit(
+            extract_link_parts, address, body, "utf-8"
+        ).result()
+        return {URL.from_canonical_parts(*parts) for parts in link_parts}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(fetcher_count) as fetchers:
+        for _ in fetchers.map(parse, pages):
+            pass
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parser process pool benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=500)
+    parser.add_argument(
+        "--fan_out", help="Number of links on every page", type=int, default=500
+    )
+    parser.add_argument("--fetcher_count", type=int, default=16)
+    parser.add_argument("--process_counts", type=int, nargs="*", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with SyntheticSiteServer(
+        SyntheticSiteOptions(args.page_count, args.fan_out)
+    ) as server:
+        pages = [
+            (
+                f"{server.base_url}page/{page}",
+                server.render_page(f"/page/{page}").encode(),
+            )
+            for page in range(args.page_count)
+        ]
+    print(f"cpu_count={os.cpu_count()}")
+
+    # Baseline: every crawler thread parses its own pages, serialized by the GIL.
+    with ThreadPoolExecutor(args.fetcher_count) as in_thread_parser:
+        seconds = run_parser(in_thread_parser, pages, args.fetcher_count)
+    print(
+        f"parser=threads processes=0 seconds={seconds:7.2f} "
+        f"pages/sec={args.page_count / seconds:8.1f}"
+    )
+    for process_count in args.process_counts:
+        with ProcessPoolExecutor(
+            process_count, mp_context=multiprocessing.get_context("spawn")
+        ) as parser_pool:
+            # Start all worker processes before measuring.
+            list(parser_pool.map(abs, range(process_count)))
+            seconds = run_parser(parser_pool, pages, args.fetcher_count)
+        print(
+            f"parser=pool    processes={process_count} seconds={seconds:7.2f} "
+            f"pages/sec={args.page_count / seconds:8.1f}"
+        )
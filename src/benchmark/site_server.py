@@ -0,0 +1,449 @@
+"""Local HTTP server serving a synthetic website, used to benchmark crawl engines"""
+
+import contextlib
+import datetime
+import gzip
+import hashlib
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Iterator
+
+# Number of distinct words the text padding pages is made of, so that it compresses
+# about threefold like natural text, rather than a hundredfold like a repeated
+# sentence.
+FILLER_VOCABULARY_SIZE = 256
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+class SyntheticSiteOptions:
+    """
+    A class to control the shape of the generated website
+    """
+
+    def __init__(
+        self,
+        page_count: int = 1000,
+        fan_out: int = 10,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        page_size: int = 0,
+        error_rate: float = 0.0,
+        capacity: int = 0,
+        retry_after: float = 1.0,
+        compress: bool = False,
+        bandwidth: float = 0.0,
+        sitemap_size: int = 0,
+        calendar_trap: bool = False,
+    ) -> None:
+        """
+        Args:
+            page_count (int): Number of distinct pages on the site.
+            fan_out (int): Number of links on every page.
+            latency (float): Seconds to wait before answering each request.
+            latency_jitter (float): Maximum random seconds added to the latency
+                of each request.
+            page_size (int): Minimum size of every page in bytes, pages are padded
+                with text up to this size.
+            error_rate (float): Share of the pages answered with
+                `500 Internal Server Error`, the root page is always served.
+            capacity (int): Number of requests served at once without slowing down,
+                unlimited if 0. Beyond it the latency grows with the number of
+                requests in flight, and beyond twice the capacity requests are
+                answered with `429 Too Many Requests`.
+            retry_after (float): Seconds sent in the `Retry-After` header of
+                `429 Too Many Requests` responses.
+            compress (bool): Whether pages are gzip-compressed for clients
+                accepting it.
+            bandwidth (float): Bytes per second every response body is sent at,
+                unlimited if 0.
+            sitemap_size (int): Number of pages listed by every gzipped sitemap of
+                the sitemap index announced in `/robots.txt`, no sitemap is
+                served if 0.
+            calendar_trap (bool): Whether the root page links to an endless
+                calendar, whose pages `/calendar/<day>` link to the previous and
+                next days and to the first `fan_out` pages.
+        """
+        self.page_count = page_count
+        self.fan_out = fan_out
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.compress = compress
+        self.bandwidth = bandwidth
+        self.sitemap_size = sitemap_size
+        self.calendar_trap = calendar_trap
+
+    def as_dict(self) -> dict:
+        """JSON-serializable shape of the site, as recorded with benchmark results."""
+        return dict(vars(self))
+
+
+class _SiteHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once, avoid dropped SYNs
+    # (and their retransmission delays) on a full listen backlog.
+    request_queue_size = 1024
+
+
+class SyntheticSiteServer:
+    """
+    Threaded HTTP server on localhost serving pages `/page/<n>`.
+    Page 0 links to pages 1..fan_out so that every page is reachable, and every
+    other page links to `fan_out` pages picked with a seeded random generator,
+    which keeps the site graph identical across runs.
+    Pages carry an `ETag` derived from their markup, and conditional requests
+    for an unchanged page are answered with `304 Not Modified`.
+    The failing pages are picked with the same seeded generator, and the latency
+    jitter of each request from a generator seeded alike.
+    Compressed pages are cached, so that compressing them does not slow down
+    the server once every page was served.
+    With sitemaps, `/robots.txt` points to `/sitemap_index.xml`, which lists the
+    sitemaps `/sitemap-<n>.xml.gz` of all pages.
+    """
+
+    def __init__(
+        self, options: SyntheticSiteOptions, seed: int = 0, host: str = "127.0.0.1"
+    ) -> None:
+        """
+        Args:
+            options (SyntheticSiteOptions): Shape of the generated website.
+            seed (int): Seed of the generated site graph.
+            host (str): Loopback address to listen on, distinct addresses
+                (e.g. 127.0.0.2) appear to the crawler as distinct hosts.
+        """
+        self._options = options
+        self._links = self._generate_links(options, seed)
+        failing_page_count = int(options.error_rate * (options.page_count - 1))
+        self._failing_pages = set(
+            random.Random(seed).sample(range(1, options.page_count), failing_page_count)
+        )
+        self._jitter_mutex = Lock()
+        self._jitter_generator = random.Random(seed)
+        self._in_flight_mutex = Lock()
+        self._in_flight_requests = 0
+        self._compressed_pages_mutex = Lock()
+        self._compressed_pages: dict[str, bytes] = {}
+        vocabulary_generator = random.Random(seed)
+        self._filler_vocabulary = [
+            "".join(
+                vocabulary_generator.choices(
+                    "abcdefghijklmnopqrstuvwxyz", k=vocabulary_generator.randint(2, 10)
+                )
+            )
+            for _ in range(FILLER_VOCABULARY_SIZE)
+        ]
+        self._filler_mutex = Lock()
+        self._fillers: dict[int, str] = {}
+        self._server = _SiteHTTPServer((host, 0), self._handler_class())
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @staticmethod
+    def _generate_links(options: SyntheticSiteOptions, seed: int) -> list[list[int]]:
+        generator = random.Random(seed)
+        links = []
+        for page in range(options.page_count):
+            # Chain every page to its successor to guarantee full reachability.
+            page_links = [(page + 1) % options.page_count]
+            page_links += [
+                generator.randrange(options.page_count)
+                for _ in range(options.fan_out - 1)
+            ]
+            links.append(page_links)
+        return links
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        site = self
+        options = self._options
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, avoid delayed-ACK stalls
+            # on keep-alive connections.
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """Serve a page after the request latency, or 429 over capacity."""
+                with site.serve_request() as latency:
+                    if latency is None:
+                        self.send_response(429)
+                        self.send_header("Retry-After", f"{options.retry_after:g}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    time.sleep(latency)
+                self._send_page()
+
+            def _send_page(self) -> None:
+                """Serve a generated page, or 500/404 for failing and unknown pages."""
+                sitemap = site.render_sitemap(self.path)
+                if sitemap is not None:
+                    content, content_type = sitemap
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+                if site.is_failing(self.path):
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = site.render_page(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                encoded_body = body.encode()
+                etag = f'"{hashlib.blake2b(encoded_body, digest_size=8).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if options.compress and "gzip" in self.headers.get(
+                    "Accept-Encoding", ""
+                ):
+                    encoded_body = site.compress_page(etag, encoded_body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(encoded_body)))
+                self.end_headers()
+                if options.bandwidth:
+                    time.sleep(len(encoded_body) / options.bandwidth)
+                self.wfile.write(encoded_body)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        return _Handler
+
+    def page_links(self, page_number: int) -> list[int]:
+        """
+        Args:
+            page_number (int): Page of the site.
+
+        Returns:
+            list[int]: Pages linked from the page.
+        """
+        return self._links[page_number]
+
+    def request_latency(self) -> float:
+        """
+        Returns:
+            float: Seconds to wait before answering the next request.
+        """
+        if not self._options.latency_jitter:
+            return self._options.latency
+        with self._jitter_mutex:
+            jitter = self._jitter_generator.uniform(0, self._options.latency_jitter)
+        return self._options.latency + jitter
+
+    @contextlib.contextmanager
+    def serve_request(self) -> Iterator[float | None]:
+        """
+        Count a request in flight while it is being served.
+
+        Yields:
+            float | None: Seconds to wait before answering the request, or None if
+            it should be rejected as the server is over capacity.
+        """
+        capacity = self._options.capacity
+        with self._in_flight_mutex:
+            self._in_flight_requests += 1
+            in_flight_requests = self._in_flight_requests
+        try:
+            if not capacity:
+                yield self.request_latency()
+            elif in_flight_requests > 2 * capacity:
+                yield None
+            else:
+                yield self.request_latency() * max(in_flight_requests / capacity, 1)
+        finally:
+            with self._in_flight_mutex:
+                self._in_flight_requests -= 1
+
+    def compress_page(self, etag: str, body: bytes) -> bytes:
+        """
+        Args:
+            etag (str): ETag of the page, under which its compressed body is cached.
+            body (bytes): Body of the page.
+
+        Returns:
+            bytes: Body of the page, gzip-compressed.
+        """
+        with self._compressed_pages_mutex:
+            compressed_body = self._compressed_pages.get(etag)
+        if compressed_body is None:
+            compressed_body = gzip.compress(body)
+            with self._compressed_pages_mutex:
+                self._compressed_pages[etag] = compressed_body
+        return compressed_body
+
+    def render_sitemap(self, path: str) -> tuple[bytes, str] | None:
+        """
+        Render the robots.txt file, sitemap index or sitemap served under a path.
+
+        Args:
+            path (str): Request path.
+
+        Returns:
+            tuple[bytes, str] | None: Content and content type, or None if the path
+            is not a sitemap of the site.
+        """
+        sitemap_size = self._options.sitemap_size
+        if not sitemap_size:
+            return None
+        base_url = self.base_url
+        sitemap_count = -(-self._options.page_count // sitemap_size)
+        if path == "/robots.txt":
+            robots_txt = (
+                f"User-agent: *\nAllow: /\nSitemap: {base_url}sitemap_index.xml\n"
+            )
+            return robots_txt.encode(), "text/plain"
+        if path == "/sitemap_index.xml":
+            entries = "".join(
+                f"<sitemap><loc>{base_url}sitemap-{index}.xml.gz</loc></sitemap>\n"
+                for index in range(sitemap_count)
+            )
+            content = f'{SITEMAP_HEADER}<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+            return f"{content}{entries}</sitemapindex>".encode(), "application/xml"
+        prefix, _, suffix = path.partition("-")
+        index = suffix.removesuffix(".xml.gz")
+        if prefix != "/sitemap" or not index.isdigit() or int(index) >= sitemap_count:
+            return None
+        first_page = int(index) * sitemap_size
+        pages = range(
+            first_page, min(first_page + sitemap_size, self._options.page_count)
+        )
+        # Pages of higher numbers were modified more recently, a day apart.
+        entries = "".join(
+            f"<url><loc>{base_url}page/{page}</loc>"
+            f"<lastmod>{datetime.date.fromordinal(730_000 + page).isoformat()}"
+            "</lastmod></url>\n"
+            for page in pages
+        )
+        content = f'{SITEMAP_HEADER}<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+        content = f"{content}{entries}</urlset>".encode()
+        return gzip.compress(content), "application/gzip"
+
+    def is_failing(self, path: str) -> bool:
+        """
+        Args:
+            path (str): Request path.
+
+        Returns:
+            bool: Whether the request is answered with a server error.
+        """
+        prefix, _, page = path.rpartition("/")
+        return prefix == "/page" and page.isdigit() and int(page) in self._failing_pages
+
+    def render_page(self, path: str) -> str | None:
+        """
+        Render the HTML page served under a path.
+
+        Args:
+            path (str): Request path.
+
+        Returns:
+            str | None: HTML markup, or None if the path is not part of the site.
+        """
+        if path == "/":
+            path = "/page/0"
+        prefix, _, page = path.rpartition("/")
+        if prefix == "/calendar" and page.isdigit() and self._options.calendar_trap:
+            return self._render_calendar_page(int(page))
+        if prefix != "/page" or not page.isdigit():
+            return None
+        page_number = int(page)
+        if page_number >= self._options.page_count:
+            return None
+        anchors = "".join(
+            f'<a href="/page/{link}">Page {link}</a>\n'
+            for link in self.page_links(page_number)
+        )
+        if page_number == 0 and self._options.calendar_trap:
+            anchors += '<a href="/calendar/0">Calendar</a>\n'
+        page = f"<!DOCTYPE html><html><body>\n{anchors}</body></html>"
+        padding = self._options.page_size - len(page) - len("<p></p>\n")
+        if padding > 0:
+            filler = self._filler(page_number, padding)
+            page = page.replace("</body>", f"<p>{filler}</p>\n</body>")
+        return page
+
+    def _render_calendar_page(self, day: int) -> str:
+        """
+        Args:
+            day (int): Day of the calendar page.
+
+        Returns:
+            str: HTML markup of the page, linking to the neighbouring days and to the
+            same pages of the site as every other calendar page.
+        """
+        days = [day - 1, day + 1] if day else [day + 1]
+        anchors = "".join(
+            f'<a href="/calendar/{link}">Day {link}</a>\n' for link in days
+        )
+        anchors += "".join(
+            f'<a href="/page/{link}">Page {link}</a>\n'
+            for link in range(
+                1, min(self._options.fan_out, self._options.page_count - 1) + 1
+            )
+        )
+        return f"<!DOCTYPE html><html><body>\n{anchors}</body></html>"
+
+    def _filler(self, page_number: int, length: int) -> str:
+        """
+        Args:
+            page_number (int): Page of the site, seeding the words of its text.
+            length (int): Length of the text.
+
+        Returns:
+            str: Text of random words padding the page, cached across requests.
+        """
+        with self._filler_mutex:
+            filler = self._fillers.get(page_number)
+        if filler is None:
+            generator = random.Random(page_number)
+            words = []
+            filler_length = 0
+            while filler_length < length:
+                word = generator.choice(self._filler_vocabulary)
+                words.append(word)
+                filler_length += len(word) + 1
+            filler = " ".join(words)[:length]
+            with self._filler_mutex:
+                self._fillers[page_number] = filler
+        return filler
+
+    @property
+    def base_url(self) -> str:
+        """Address of the site's root page."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    def start(self) -> None:
+        """Start serving requests on a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving requests and release the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SyntheticSiteServer":
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
@@ -0,0 +1,62 @@
+"""Benchmark of a crawl seeded from sitemaps against one discovering its frontier"""
+
+import argparse
+
+from benchmark.engine_bench import run_engine
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncherOptions
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sitemap seeding benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=500)
+    parser.add_argument(
+        "--fan_out",
+        help="Number of links on every page, a site of a single link per page is"
+        " discovered one page at a time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.02,
+    )
+    parser.add_argument("--sitemap_size", type=int, default=100)
+    parser.add_argument("--thread_count", type=int, default=16)
+    parser.add_argument("--task_count", type=int, default=64)
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(
+        args.page_count,
+        args.fan_out,
+        args.latency,
+        sitemap_size=args.sitemap_size,
+    )
+    with SyntheticSiteServer(site_options) as server:
+        for engine, concurrency in (
+            (CrawlerLauncherOptions.Engine.THREAD, args.thread_count),
+            (CrawlerLauncherOptions.Engine.ASYNC, args.task_count),
+        ):
+            for sitemaps in (False, True):
+                options = CrawlerLauncherOptions(
+                    base_url=URL(server.base_url),
+                    skip_links_found=True,
+                    engine=engine,
+                    thread_count=concurrency,
+                    task_count=concurrency,
+                    sitemaps=sitemaps,
+                )
+                crawled, seconds = run_engine(options)
+                # Workers spend about the server latency per page, the rest of
+                # their time they wait for URLs to be discovered.
+                busy_workers = crawled * args.latency / seconds
+                print(
+                    f"engine={engine:<6} sitemaps={sitemaps!s:<5} urls={crawled:<6}"
+                    f" seconds={seconds:6.2f} pages/sec={crawled / seconds:8.1f}"
+                    f" busy_workers={busy_workers:5.1f}/{concurrency}"
+                )
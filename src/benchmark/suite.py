@@ -0,0 +1,222 @@
+"""
+Reproducible crawl benchmark suite against a synthetic local website, writing
+machine-readable JSON results that can be compared across commits
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.async_launcher import AsyncCrawlerLauncher
+from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from models.url import URL
+from service.async_parser_service import AsyncHTMLParserService
+from service.parser_service import HTMLParserService
+
+
+def _quantile(sorted_values: list[float], quantile: float) -> float:
+    """Nearest-rank quantile of sorted values, 0 if there are none."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(quantile * len(sorted_values) + 0.5) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _record_page_latencies(latencies: list[float]) -> None:
+    """Time every call to `get_links_under_url` of both parser services."""
+    crawl_page = HTMLParserService.get_links_under_url
+    async_crawl_page = AsyncHTMLParserService.get_links_under_url
+
+    @wraps(crawl_page)
+    def timed_crawl_page(self, url: URL, *args) -> set[URL]:
+        start = time.perf_counter()
+        try:
+            return crawl_page(self, url, *args)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    @wraps(async_crawl_page)
+    async def timed_async_crawl_page(self, url: URL, *args) -> set[URL]:
+        start = time.perf_counter()
+        try:
+            return await async_crawl_page(self, url, *args)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    HTMLParserService.get_links_under_url = timed_crawl_page
+    AsyncHTMLParserService.get_links_under_url = timed_async_crawl_page
+
+
+def _run_crawl(options: CrawlerLauncherOptions, results: multiprocessing.Queue) -> None:
+    """
+    Run a single crawl in a fresh process, so that its peak RSS and CPU time are
+    not skewed by previous runs, and put its measurements on the results queue.
+
+    Args:
+        options (CrawlerLauncherOptions): Options for the crawl.
+        results (multiprocessing.Queue): Queue the measurements are put on.
+    """
+    latencies: list[float] = []
+    _record_page_latencies(latencies)
+    launcher_class = (
+        AsyncCrawlerLauncher
+        if options.engine == CrawlerLauncherOptions.Engine.ASYNC
+        else CrawlerLauncher
+    )
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start_cpu = time.process_time()
+            start = time.perf_counter()
+            urls_crawled = launcher_class(options).crawl()
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - start_cpu
+    latencies.sort()
+    results.put(
+        {
+            "urls": len(urls_crawled),
+            "seconds": seconds,
+            "pages_per_second": len(urls_crawled) / seconds,
+            "p50_page_seconds": _quantile(latencies, 0.5),
+            "p99_page_seconds": _quantile(latencies, 0.99),
+            "cpu_seconds": cpu_seconds,
+            # Kilobytes on Linux.
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+    )
+
+
+def run_benchmark(options: CrawlerLauncherOptions, repeat: int) -> dict:
+    """
+    Run a crawl `repeat` times, each in its own process.
+
+    Args:
+        options (CrawlerLauncherOptions): Options for the crawl.
+        repeat (int): Number of runs.
+
+    Returns:
+        dict: Median of every measurement over the runs.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    runs = []
+    for _ in range(repeat):
+        process = context.Process(target=_run_crawl, args=(options, results))
+        process.start()
+        runs.append(results.get())
+        process.join()
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def _commit() -> str | None:
+    """Commit of the benchmarked tree, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl benchmark suite",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=1000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--page_size", help="Minimum page size in bytes", type=int, default=16384
+    )
+    parser.add_argument(
+        "--latency",
+        help="Server latency per request in seconds",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument(
+        "--latency_jitter",
+        help="Maximum random seconds added to the latency of each request",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument(
+        "--error_rate",
+        help="Share of the pages answered with a server error",
+        type=float,
+        default=0.01,
+    )
+    parser.add_argument("--thread_counts", type=int, nargs="*", default=[4, 16, 32])
+    parser.add_argument("--task_counts", type=int, nargs="*", default=[32, 128])
+    parser.add_argument(
+        "--repeat", help="Runs per configuration, medians are kept", type=int, default=3
+    )
+    parser.add_argument(
+        "--output", help="Path of the JSON results", default="benchmark_results.json"
+    )
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(
+        page_count=args.page_count,
+        fan_out=args.fan_out,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        page_size=args.page_size,
+        error_rate=args.error_rate,
+    )
+    configurations = [
+        (CrawlerLauncherOptions.Engine.THREAD, thread_count)
+        for thread_count in args.thread_counts
+    ] + [
+        (CrawlerLauncherOptions.Engine.ASYNC, task_count)
+        for task_count in args.task_counts
+    ]
+    runs = []
+    with SyntheticSiteServer(site_options) as server:
+        for engine, concurrency in configurations:
+            run_options = CrawlerLauncherOptions(
+                base_url=URL(server.base_url),
+                skip_links_found=True,
+                engine=engine,
+                thread_count=concurrency,
+                task_count=concurrency,
+            )
+            result = run_benchmark(run_options, args.repeat)
+            runs.append({"engine": engine, "concurrency": concurrency, **result})
+            print(
+                f"engine={engine:<6} concurrency={concurrency:<5} "
+                f"urls={result['urls']:<6g} "
+                f"pages/sec={result['pages_per_second']:8.1f} "
+                f"p50/p99={result['p50_page_seconds'] * 1000:6.1f}"
+                f"/{result['p99_page_seconds'] * 1000:6.1f}ms "
+                f"cpu={result['cpu_seconds']:6.2f}s "
+                f"rss={result['peak_rss_bytes'] / 2**20:6.1f}MiB"
+            )
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "site": site_options.as_dict(),
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,69 @@
+"""Benchmark of the crawler trap heuristics on a site linking to an endless calendar"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from benchmark.site_server import SyntheticSiteOptions, SyntheticSiteServer
+from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from models.url import URL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawler trap benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--page_count", type=int, default=1000)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument(
+        "--max_pages",
+        help="Budget of every crawl, which never ends on its own without trap"
+        " heuristics",
+        type=int,
+        default=3000,
+    )
+    parser.add_argument(
+        "--max_urls_per_pattern",
+        help="Cap of the pattern heuristic, all pages of the site share the pattern"
+        " `/page/N` and the calendar pages the pattern `/calendar/N`",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument("--thread_count", type=int, default=16)
+    args = parser.parse_args()
+
+    site_options = SyntheticSiteOptions(
+        args.page_count, args.fan_out, calendar_trap=True
+    )
+    runs = {
+        "none": {},
+        "near_duplicate_distance=6": {"near_duplicate_distance": 6},
+        f"max_urls_per_pattern={args.max_urls_per_pattern}": {
+            "max_urls_per_pattern": args.max_urls_per_pattern
+        },
+    }
+    with SyntheticSiteServer(site_options) as server:
+        for name, heuristics in runs.items():
+            options = CrawlerLauncherOptions(
+                base_url=URL(server.base_url),
+                skip_links_found=True,
+                thread_count=args.thread_count,
+                max_pages=args.max_pages,
+                **heuristics,
+            )
+            traps = options.trap_guard(None)
+            options.trap_guard = lambda metrics, traps=traps: traps
+            with open(os.devnull, "w", encoding="utf-8") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    started_at = time.perf_counter()
+                    crawled_urls = CrawlerLauncher(options).crawl()
+                    seconds = time.perf_counter() - started_at
+            calendar_pages = sum("/calendar/" in url.address for url in crawled_urls)
+            print(
+                f"heuristics={name:<26} urls={len(crawled_urls):<6}"
+                f" site_pages={len(crawled_urls) - calendar_pages:<6}"
+                f" calendar_pages={calendar_pages:<6} seconds={seconds:6.2f}"
+                f" near_duplicates={traps.near_duplicate_pages if traps else 0:<5}"
+                f" rejected={traps.rejected_url_count if traps else 0}"
+            )
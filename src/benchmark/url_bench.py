@@ -0,0 +1,76 @@
+"""Micro-benchmark of URL construction and hashing"""
+
+import argparse
+import time
+from urllib.parse import urldefrag, urlparse
+
+from models.url import URL, URLCanonicalizer
+
+
+class LegacyURL:
+    """The URL model before slots, cached hashes and single-pass parsing"""
+
+    def __init__(self, address: str) -> None:
+        defraged_url = urldefrag(address)
+        parsed_url = urlparse(defraged_url.url)
+        self._address = parsed_url.geturl()
+        self._subdomain = parsed_url.hostname
+        self._address_scheme = parsed_url.scheme
+
+    @property
+    def address(self) -> str:
+        """Address of the URL"""
+        return self._address
+
+    def __hash__(self) -> int:
+        return self.address.__hash__()
+
+    def __eq__(self, __o: object) -> bool:
+        return isinstance(__o, LegacyURL) and self.address == __o.address
+
+
+def run(name: str, url_factory, addresses: list[str], probes: int) -> None:
+    """
+    Construct a URL per address, then repeatedly probe a set holding all of them.
+    """
+    start = time.perf_counter()
+    urls = [url_factory(address) for address in addresses]
+    construction = time.perf_counter() - start
+
+    url_set = set(urls)
+    start = time.perf_counter()
+    for _ in range(probes):
+        for url in urls:
+            _ = url in url_set
+    hashing = time.perf_counter() - start
+
+    print(
+        f"{name:<22} construct_us/url={construction / len(urls) * 1e6:6.2f} "
+        f"lookup_ns/url={hashing / (len(urls) * probes) * 1e9:6.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="URL construction and hashing benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--url_count", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=3)
+    args = parser.parse_args()
+
+    url_addresses = [
+        f"https://Www.Website.com/blog/{index % 997}/posts/{index}?b={index % 7}&a=1#top"
+        for index in range(args.url_count)
+    ]
+    full_canonicalizer = URLCanonicalizer(
+        sort_query_params=True, strip_tracking_params=True
+    )
+    run("legacy", LegacyURL, url_addresses, args.probes)
+    run("slots", URL, url_addresses, args.probes)
+    run(
+        "slots+query_canonical",
+        lambda address: URL(address, full_canonicalizer),
+        url_addresses,
+        args.probes,
+    )
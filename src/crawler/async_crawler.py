@@ -0,0 +1,206 @@
+"""Functionality for the asyncio crawler worker tasks"""
+
+import asyncio
+import time
+
+from crawler.budget import CrawlBudget
+from crawler.link_graph import LinkGraph
+from crawler.crawler import Crawler, CrawlerOptions
+from crawler.output import PageCallback, PageRecord
+from crawler.traps import TrapGuard
+from logger.logger import Logger
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.async_repository import AsyncRepository
+from service.async_parser_service import AsyncHTMLParserService
+from service.fetch_policy import CircuitOpenError
+
+
+class AsyncCrawler:
+    """
+    asyncio counterpart of `Crawler`. Each instance is run as a task on the
+    crawler event loop, polling for new links to be processed from the repository
+    until it receives TERMINATION_SIGNAL.
+    """
+
+    def __init__(
+        self,
+        task_id: int,
+        repository: AsyncRepository,
+        html_parser: AsyncHTMLParserService,
+        options: CrawlerOptions,
+        logger: Logger,
+        metrics: CrawlMetrics | None = None,
+        budget: CrawlBudget | None = None,
+        traps: TrapGuard | None = None,
+        on_page: PageCallback | None = None,
+        link_graph: LinkGraph | None = None,
+        lease_timeout: float | None = None,
+        max_attempts: int = 1,
+        failed_attempts: dict[str, int] | None = None,
+    ) -> None:
+        """
+        Args:
+            task_id (int): Unique id to identify the crawler task.
+            repository (AsyncRepository): Repository that contains overall crawling context.
+            html_parser (AsyncHTMLParserService): Service that returns links under a given URL.
+            options (CrawlerOptions): Flags to control crawler behaviour.
+            logger (Logger): Thread-safe logger.
+            metrics (CrawlMetrics | None): Metrics the crawled pages are counted in.
+            budget (CrawlBudget | None): Limits of the crawl, if any.
+            traps (TrapGuard | None): Guard against crawler traps, if any.
+            on_page (PageCallback | None): Function called with the record of
+                every page crawled, before it is notified as processed, if any.
+                It is called on a thread of the default executor, so that a
+                blocking callback, e.g. writing to a file or to a full queue,
+                does not block the event loop.
+            link_graph (LinkGraph | None): Graph the in-scope links of every page
+                crawled are recorded to, if any.
+            lease_timeout (float | None): Seconds the crawl of a URL may take before
+                it is cancelled, unbounded if None.
+            max_attempts (int): Number of times the crawl of a URL may fail or time
+                out before the URL is given up on, and reported as processed.
+            failed_attempts (dict[str, int] | None): Number of failed crawls of every
+                URL queued again, shared by the crawler tasks.
+        """
+        self._task_id = task_id
+        self._repository = repository
+        self._html_parser = html_parser
+        self._options = options
+        self._logger = logger
+        self._metrics = metrics
+        self._budget = budget
+        self._traps = traps
+        self._on_page = on_page
+        self._link_graph = link_graph
+        self._lease_timeout = lease_timeout
+        self._max_attempts = max_attempts
+        self._failed_attempts = failed_attempts if failed_attempts is not None else {}
+
+    async def crawl_next_url(self) -> bool:
+        """
+        Main crawling logic executed by crawler tasks, identical to
+        `Crawler.crawl_next_url` apart from suspending instead of blocking
+        while waiting on the queue and the network. There is no supervisor: a crawl
+        failing on an unexpected exception, or cancelled past its lease, is handed
+        to `_reclaim_url` by the task itself, so that the task keeps running and the
+        URL is either queued again or reported as processed.
+        """
+        url_to_crawl = await self._repository.get_next_url()
+        if url_to_crawl == Crawler.TERMINATION_SIGNAL:
+            return False
+        # Stop once the budget is spent, putting the URL back in the frontier
+        # unprocessed, see `Crawler.crawl_next_url`.
+        if self._budget is not None and not self._budget.reserve_page():
+            self._repository.requeue_url(url_to_crawl)
+            return False
+        try:
+            await asyncio.wait_for(self._crawl_url(url_to_crawl), self._lease_timeout)
+        except Exception as exception:  # pylint: disable=broad-except
+            self._reclaim_url(url_to_crawl, exception)
+        return True
+
+    async def _crawl_url(self, url_to_crawl: URL) -> None:
+        """
+        Args:
+            url_to_crawl (URL): URL handed out to the task, with its page reserved.
+        """
+        try:
+            if self._on_page is None:
+                page_record = None
+                linked_urls = await self._html_parser.get_links_under_url(url_to_crawl)
+            else:
+                page_record = PageRecord(url_to_crawl)
+                linked_urls = await self._html_parser.get_links_under_url(
+                    url_to_crawl, page_record
+                )
+                page_record.links = list(linked_urls)
+        except CircuitOpenError as circuit_open:
+            if self._budget is not None:
+                self._budget.release_page()
+            self._logger.log(
+                f"{circuit_open}, deferring {url_to_crawl}",
+                severity=Logger.Severity.INFO,
+            )
+            asyncio.get_running_loop().call_later(
+                max(circuit_open.retry_at - time.monotonic(), 0.0),
+                self._repository.requeue_url,
+                url_to_crawl,
+            )
+            return
+        self._logger.log(
+            f"Task-{self._task_id} is currently crawling: {url_to_crawl}",
+            fields=None if self._options.skip_links_found else {"links": linked_urls},
+        )
+        linked_urls = [
+            linked_url
+            for linked_url in linked_urls
+            if self._options.is_url_in_scope(linked_url)
+        ]
+        is_near_duplicate = self._traps is not None and self._traps.is_near_duplicate(
+            linked_urls
+        )
+        if self._link_graph is not None and not is_near_duplicate:
+            self._link_graph.add_page(url_to_crawl, linked_urls)
+        depth = url_to_crawl.depth + 1
+        if self._budget is None or self._budget.is_within_depth(depth):
+            if self._traps is not None:
+                linked_urls = self._traps.filter_links(linked_urls)
+            for linked_url in linked_urls:
+                linked_url.depth = depth
+            self._repository.add_urls_to_crawl(linked_urls)
+        if page_record is not None:
+            # A failing callback, e.g. a full disk, must not kill the worker and
+            # leave the URL unprocessed.
+            try:
+                await asyncio.to_thread(self._on_page, page_record)
+            except Exception as exception:  # pylint: disable=broad-except
+                self._logger.log(
+                    f"Error while handing out the record of {url_to_crawl}:"
+                    f" [\n-----{exception}]",
+                    severity=Logger.Severity.ERROR,
+                )
+        self._failed_attempts.pop(url_to_crawl.address, None)
+        self._repository.notify_url_processed(url_to_crawl)
+        if self._metrics is not None:
+            self._metrics.pages_crawled.inc()
+        if self._budget is not None:
+            self._budget.record_page(url_to_crawl)
+
+    def _reclaim_url(self, url: URL, exception: Exception) -> None:
+        """
+        Queue again a URL whose crawl failed or timed out, giving its page
+        reservation back, until it failed `max_attempts` times, see
+        `WorkerSupervisor.supervise`.
+
+        Args:
+            url (URL): URL whose crawl failed.
+            exception (Exception): Exception the crawl failed on.
+        """
+        if self._budget is not None:
+            self._budget.release_page()
+        if isinstance(exception, asyncio.TimeoutError):
+            reason = f"its lease of {self._lease_timeout}s expired"
+        else:
+            reason = f"[\n-----{exception}]"
+        attempt = self._failed_attempts.pop(url.address, 0) + 1
+        self._logger.log(
+            f"Task-{self._task_id} failed to crawl {url} on attempt {attempt}: {reason}",
+            severity=Logger.Severity.ERROR,
+        )
+        if attempt >= self._max_attempts:
+            self._logger.log(
+                f"Giving up on {url} after {attempt} attempt(s)",
+                severity=Logger.Severity.ERROR,
+            )
+            self._repository.notify_url_processed(url)
+        else:
+            self._failed_attempts[url.address] = attempt
+            self._repository.requeue_url(url)
+
+    async def run(self) -> None:
+        """
+        Execute crawling logic indefinely until termination.
+        """
+        while await self.crawl_next_url():
+            pass
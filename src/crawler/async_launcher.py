@@ -0,0 +1,234 @@
+"""Logic to start asyncio crawling tasks and initialize storage layer"""
+import asyncio
+from typing import Iterator
+
+from crawler.async_crawler import AsyncCrawler
+from crawler.budget import CrawlBudget
+from crawler.crawler import Crawler
+from crawler.launcher import CrawlerLauncherOptions, seed_repository
+from crawler.output import PageCallback, PageRecord, stream_pages
+from crawler.sitemap_feeder import feed_sitemap_urls
+from models.url import URL
+from repository.async_repository import AsyncRepository
+from repository.priority_repository import AsyncPriorityRepository
+from service.async_parser_service import ACCEPT_ENCODING, AsyncHTMLParserService
+from service.concurrency_limiter import AsyncConcurrencyLimiter
+from service.fetch_guard import FetchGuard
+from service.http_client import HTTPClient
+
+
+class AsyncCrawlerLauncher:
+    """
+    asyncio counterpart of `CrawlerLauncher`. Instead of one OS thread per worker,
+    `task_count` crawler tasks share a single event loop, which allows hundreds
+    to thousands of fetches to be in flight at the same time.
+    """
+
+    def __init__(self, options: CrawlerLauncherOptions) -> None:
+        self._options = options
+
+    async def _crawl(
+        self,
+        budget: CrawlBudget | None,
+        on_page: PageCallback | None,
+        collect_urls: bool = True,
+    ) -> list[URL]:
+        """
+        Sets up the overall crawling logic on the running event loop, following
+        the same steps and termination semantics as `CrawlerLauncher.crawl`.
+        The page callback is called on threads of the default executor.
+
+        Args:
+            budget (CrawlBudget | None): Limits of the crawl, if any.
+            on_page (PageCallback | None): Callback of the crawled pages, if any.
+            collect_urls (bool): Whether the URLs crawled are returned.
+
+        Returns:
+            list[URL]: List of all valid URLs (Matching the seed URL hostnames) crawled,
+            only the pages crawled so far if a limit of the crawl budget was reached,
+            none if they are not collected.
+        """
+        # Terminate early in the case where the base url is invalid.
+        if not self._options.base_url.is_valid:
+            return []
+
+        visited_url_set = self._options.visited_url_set()
+        state_store = self._options.crawl_state_store()
+        metrics = self._options.crawl_metrics()
+        if self._options.frontier == CrawlerLauncherOptions.Frontier.PRIORITY:
+            repository = AsyncPriorityRepository(
+                self._options.url_scorer(), visited_url_set, state_store, metrics
+            )
+        else:
+            repository = AsyncRepository(visited_url_set, state_store, metrics)
+        logger = self._options.logger()
+        metrics_server = self._options.metrics_server(metrics)
+        metrics_reporter = self._options.metrics_reporter(metrics, logger)
+        task_count = self._options.task_count
+
+        crawler_options = self._options.crawler_options()
+
+        # Seed the web-crawler with the base url and any additional seed urls,
+        # or the state of the crawl being resumed. Crawler tasks fetch pages with
+        # aiohttp, the blocking client is only created to load sitemaps.
+        sitemap_http_client = sitemap_loader = None
+        if (
+            seed_repository(repository, self._options, state_store)
+            and self._options.sitemaps
+        ):
+            sitemap_http_client = HTTPClient()
+            sitemap_loader = self._options.sitemap_loader(sitemap_http_client, logger)
+        fetch_guard = FetchGuard(
+            self._options.max_page_bytes, self._options.max_compression_ratio
+        )
+        http_cache = self._options.http_cache()
+        parser_pool = self._options.parser_pool()
+        traps = self._options.trap_guard(metrics)
+        link_graph = self._options.link_graph()
+        concurrency_controller = self._options.concurrency_controller(logger, metrics)
+        fetch_policy = self._options.fetch_policy()
+
+        async with AsyncHTMLParserService(
+            logger,
+            connection_limit=task_count,
+            keepalive_timeout=self._options.pool_idle_timeout,
+            fetch_guard=fetch_guard,
+            canonicalizer=self._options.url_canonicalizer,
+            http_cache=http_cache,
+            parser_pool=parser_pool,
+            metrics=metrics,
+            budget=budget,
+            concurrency_limiter=concurrency_controller
+            and AsyncConcurrencyLimiter(concurrency_controller),
+            fetch_policy=fetch_policy,
+            accept_encoding=self._options.accept_encoding or ACCEPT_ENCODING,
+        ) as html_parser:
+            # Failed crawls of the URLs queued again, counted across crawler tasks.
+            failed_attempts: dict[str, int] = {}
+            crawler_tasks = [
+                asyncio.create_task(
+                    AsyncCrawler(
+                        task_id,
+                        repository,
+                        html_parser,
+                        crawler_options,
+                        logger,
+                        metrics,
+                        budget,
+                        traps,
+                        on_page,
+                        link_graph,
+                        self._options.lease_timeout,
+                        self._options.max_attempts,
+                        failed_attempts,
+                    ).run()
+                )
+                for task_id in range(task_count)
+            ]
+
+            # Add the URLs listed in the sitemaps of the seed hosts while the tasks
+            # crawl the seed URLs
+            sitemap_task = None
+            if sitemap_loader is not None:
+                sitemap_task = asyncio.create_task(
+                    feed_sitemap_urls(
+                        sitemap_loader,
+                        repository,
+                        self._options.valid_seed_urls,
+                        crawler_options,
+                    )
+                )
+
+            async def all_urls_processed() -> None:
+                if sitemap_task is not None:
+                    await sitemap_task
+                await repository.wait_until_all_urls_processed()
+
+            # Wait until all URLs have been crawled, or the crawl budget is spent,
+            # and terminate crawler tasks
+            if budget is None:
+                await all_urls_processed()
+            else:
+                await budget.wait_until_done_async(all_urls_processed())
+            if sitemap_task is not None:
+                sitemap_task.cancel()
+            for _ in range(task_count):
+                repository.queue_next_url(Crawler.TERMINATION_SIGNAL)
+            await asyncio.gather(*crawler_tasks)
+        if sitemap_loader is not None:
+            sitemap_http_client.close()
+            logger.log(f"Sitemaps: {sitemap_loader}")
+        logger.log(f"Fetch retries and timeouts: {fetch_policy.stats}")
+        logger.log(f"Skipped non-HTML or oversized pages: {fetch_guard}")
+        if parser_pool is not None:
+            parser_pool.shutdown()
+            logger.log(f"Parser pool: {parser_pool}")
+        if http_cache is not None:
+            http_cache.close()
+            logger.log(f"HTTP cache: {http_cache.stats}")
+        if state_store is not None:
+            state_store.close()
+            logger.log(f"Crawl state checkpoints: {state_store.stats}")
+        if metrics_reporter is not None:
+            metrics_reporter.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if metrics is not None:
+            logger.log(f"Crawl metrics: {metrics.summary()}")
+        if budget is not None:
+            logger.log(f"Crawl budget: {budget}")
+        if traps is not None:
+            logger.log(f"Crawler traps: {traps}")
+        if link_graph is not None:
+            link_graph.save(self._options.link_graph_path)
+            logger.log(
+                f"Link graph: {link_graph}, saved to {self._options.link_graph_path}"
+            )
+        if concurrency_controller is not None:
+            logger.log(f"Adaptive concurrency: {concurrency_controller}")
+        logger.close()
+        if not collect_urls:
+            visited_urls = []
+        elif budget is not None and budget.exhausted_limit is not None:
+            visited_urls = budget.crawled_urls
+        else:
+            visited_urls = repository.visited_urls
+        visited_url_set.close()
+        return visited_urls
+
+    def crawl(self, on_page: PageCallback | None = None) -> list[URL]:
+        """
+        Run the crawl to completion on a new event loop.
+
+        Args:
+            on_page (PageCallback | None): Function called with the record of every
+                page crawled, see `CrawlerLauncher.crawl`.
+
+        Returns:
+            list[URL]: List of all valid URLs (Matching the seed URL hostnames) crawled
+        """
+        return asyncio.run(self._crawl(self._options.crawl_budget(), on_page))
+
+    def crawl_stream(self, max_pending: int = 1024) -> Iterator[PageRecord]:
+        """
+        Run the crawl on a new event loop on a thread of its own, and yield the
+        record of every page as soon as it was crawled, see
+        `CrawlerLauncher.crawl_stream`. Crawler tasks wait for the consumer once
+        `max_pending` records are pending, without blocking the event loop.
+
+        Args:
+            max_pending (int): Maximum number of records waiting to be consumed.
+
+        Yields:
+            PageRecord: Records of the pages crawled, in the order they were crawled.
+        """
+        budget = self._options.crawl_budget(keep_crawled_urls=False) or CrawlBudget(
+            keep_crawled_urls=False
+        )
+        yield from stream_pages(
+            lambda on_page: asyncio.run(
+                self._crawl(budget, on_page, collect_urls=False)
+            ),
+            budget.stop,
+            max_pending,
+        )
@@ -0,0 +1,222 @@
+"""Limits on the pages, depth, time and bytes of a crawl"""
+
+import asyncio
+import time
+from threading import Event, Lock
+from typing import Awaitable, Callable
+
+from models.url import URL
+
+
+class CrawlBudget:
+    """
+    Limits of a crawl, shared by all crawler workers. Workers reserve every page
+    before crawling it, and stop once any limit is reached, leaving the URLs still
+    queued unprocessed (so that a checkpointed crawl can be resumed). Pages already
+    being crawled are completed, and the crawl returns the pages crawled so far.
+    The depth limit does not stop the crawl, links deeper than it are not followed.
+    """
+
+    # Seconds between two checks of whether all URLs were processed.
+    POLL_SECONDS = 0.05
+
+    class Limit:
+        """Limits that stop a crawl"""
+
+        PAGES = "pages"
+        TIME = "time"
+        BYTES = "bytes"
+        # The crawl was stopped by its caller, e.g. a consumer of its page stream.
+        STOPPED = "stopped"
+
+    def __init__(
+        self,
+        max_pages: int | None = None,
+        max_depth: int | None = None,
+        max_seconds: float | None = None,
+        max_bytes: int | None = None,
+        keep_crawled_urls: bool = True,
+    ) -> None:
+        """
+        Args:
+            max_pages (int | None): Maximum number of pages crawled.
+            max_depth (int | None): Maximum number of links followed from a seed URL.
+            max_seconds (float | None): Maximum wall-clock seconds, from now on.
+            max_bytes (int | None): Maximum number of page body bytes downloaded.
+            keep_crawled_urls (bool): Whether the URLs crawled are kept, to be
+                returned once a limit is reached. Streamed crawls hand every page
+                out as it is crawled instead.
+        """
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        # Pages reserved and not given back, crawled or being crawled.
+        self._reserved_page_count = 0
+        self._keep_crawled_urls = keep_crawled_urls
+        self._crawled_urls: list[URL] = []
+        self._crawled_page_count = 0
+        self._mutex = Lock()
+        self._downloaded_bytes = 0
+        self._exhausted_limit: str | None = None
+        # Set once a limit is reached, or all URLs were processed.
+        self._stopped = Event()
+
+    @property
+    def exhausted_limit(self) -> str | None:
+        """Limit that stopped the crawl, None if no limit was reached."""
+        return self._exhausted_limit
+
+    @property
+    def crawled_urls(self) -> list[URL]:
+        """URLs crawled so far."""
+        return list(self._crawled_urls)
+
+    @property
+    def crawled_page_count(self) -> int:
+        """Number of pages crawled so far."""
+        return self._crawled_page_count
+
+    @property
+    def downloaded_bytes(self) -> int:
+        """Number of page body bytes downloaded so far."""
+        return self._downloaded_bytes
+
+    def _exhaust(self, limit: str) -> None:
+        with self._mutex:
+            if self._exhausted_limit is None:
+                self._exhausted_limit = limit
+        self._stopped.set()
+
+    def _remaining_seconds(self) -> float | None:
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    def is_within_depth(self, depth: int) -> bool:
+        """
+        Args:
+            depth (int): Number of links followed from a seed URL to a URL.
+
+        Returns:
+            bool: Whether a URL at this depth should be crawled.
+        """
+        return self.max_depth is None or depth <= self.max_depth
+
+    def reserve_page(self) -> bool:
+        """
+        Reserve a page before crawling it.
+
+        Returns:
+            bool: Whether the page can be crawled, False once any limit is reached.
+        """
+        if self._exhausted_limit is not None:
+            return False
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self._exhaust(CrawlBudget.Limit.TIME)
+            return False
+        if self.max_pages is not None:
+            with self._mutex:
+                reserved = self._reserved_page_count < self.max_pages
+                self._reserved_page_count += reserved
+            if not reserved:
+                self._exhaust(CrawlBudget.Limit.PAGES)
+                return False
+        return True
+
+    def release_page(self) -> None:
+        """
+        Give back the reservation of a page that was not crawled, e.g. as it was
+        deferred or its lease was reclaimed, so that it can be reserved again.
+        A page given back once the page limit was reached does not resume the crawl.
+        """
+        if self.max_pages is not None:
+            with self._mutex:
+                self._reserved_page_count -= 1
+
+    def record_page(self, url: URL) -> None:
+        """
+        Record a crawled page.
+
+        Args:
+            url (URL): Crawled URL.
+        """
+        if self._keep_crawled_urls:
+            self._crawled_urls.append(url)
+        with self._mutex:
+            self._crawled_page_count += 1
+            crawled_page_count = self._crawled_page_count
+        if self.max_pages is not None and crawled_page_count >= self.max_pages:
+            self._exhaust(CrawlBudget.Limit.PAGES)
+
+    def record_bytes(self, byte_count: int) -> None:
+        """
+        Record the bytes of a page body downloaded.
+
+        Args:
+            byte_count (int): Number of bytes downloaded.
+        """
+        with self._mutex:
+            self._downloaded_bytes += byte_count
+            downloaded_bytes = self._downloaded_bytes
+        if self.max_bytes is not None and downloaded_bytes >= self.max_bytes:
+            self._exhaust(CrawlBudget.Limit.BYTES)
+
+    def stop(self) -> None:
+        """Stop the crawl, as if a limit was reached."""
+        self._exhaust(CrawlBudget.Limit.STOPPED)
+
+    def _wait_stopped(self) -> None:
+        """Block until the crawl stops, or the time limit is reached."""
+        if not self._stopped.wait(self._remaining_seconds()):
+            self._exhaust(CrawlBudget.Limit.TIME)
+
+    def wait_until_done(self, all_urls_processed: Callable[[], bool]) -> None:
+        """
+        Block until all URLs were processed, or a limit is reached. Whether all URLs
+        were processed is polled every `POLL_SECONDS`, rather than waited for on a
+        thread of its own that would be left blocked once a limit is reached.
+
+        Args:
+            all_urls_processed (Callable[[], bool]): Function of the repository
+                returning whether all URLs were processed, without blocking.
+        """
+        while not all_urls_processed():
+            remaining_seconds = self._remaining_seconds()
+            if remaining_seconds == 0.0:
+                self._exhaust(CrawlBudget.Limit.TIME)
+                return
+            if self._stopped.wait(
+                CrawlBudget.POLL_SECONDS
+                if remaining_seconds is None
+                else min(CrawlBudget.POLL_SECONDS, remaining_seconds)
+            ):
+                return
+        self._stopped.set()
+
+    async def wait_until_done_async(self, all_urls_processed: Awaitable[None]) -> None:
+        """
+        Suspend until all URLs were processed, or a limit is reached.
+
+        Args:
+            all_urls_processed (Awaitable[None]): Awaitable of the repository
+                completing once all URLs were processed, cancelled if a limit
+                is reached.
+        """
+        processed = asyncio.ensure_future(all_urls_processed)
+        processed.add_done_callback(lambda _: self._stopped.set())
+        await asyncio.to_thread(self._wait_stopped)
+        processed.cancel()
+
+    def __str__(self) -> str:
+        if self._exhausted_limit is None:
+            reason = "all URLs processed"
+        elif self._exhausted_limit == CrawlBudget.Limit.STOPPED:
+            reason = "stopped"
+        else:
+            reason = f"{self._exhausted_limit} limit reached"
+        return (
+            f"{self._crawled_page_count} page(s) crawled,"
+            f" {self._downloaded_bytes} byte(s) downloaded, {reason}"
+        )
@@ -1,9 +1,17 @@
 """Functionality for the cralwer worker threads"""
 
+import functools
 from threading import Thread
+from crawler.budget import CrawlBudget
+from crawler.link_graph import LinkGraph
+from crawler.leases import LeaseTable
+from crawler.output import PageCallback, PageRecord
+from crawler.traps import TrapGuard
 from logger.logger import Logger
+from metrics.crawl_metrics import CrawlMetrics
 from models.url import URL
 from repository.repository import Repository
+from service.fetch_policy import CircuitOpenError
 from service.parser_service import HTMLParserService
 
 
@@ -12,9 +20,46 @@ class CrawlerOptions:
     A class to control flags for the run of the crawler worker
     """
 
-    def __init__(self, base_url_hostname: str, skip_links_found) -> None:
+    def __init__(
+        self,
+        base_url_hostname: str,
+        skip_links_found,
+        allowed_hostnames: set[str] | None = None,
+        allow_subdomains: bool = False,
+    ) -> None:
+        """
+        Args:
+            base_url_hostname (str): Hostname of the base URL, always in scope.
+            skip_links_found (bool): Whether to skip logging links found under each page.
+            allowed_hostnames (set[str] | None): Further hostnames in scope, e.g. the hosts
+                of additional seed URLs.
+            allow_subdomains (bool): Whether subdomains of in-scope hostnames are in scope.
+        """
         self.skip_links_found = skip_links_found
         self.base_url_hostname = base_url_hostname
+        self.allowed_hostnames = {base_url_hostname} | (allowed_hostnames or set())
+        self.allow_subdomains = allow_subdomains
+
+    def is_url_in_scope(self, url: URL) -> bool:
+        """
+        Returns whether a URL should be crawled, i.e. it is valid and its hostname is
+        one of the allowed hostnames (or one of their subdomains, if allowed).
+
+        Args:
+            url (URL): URL to check.
+
+        Returns:
+            bool: Whether the URL is in scope.
+        """
+        if not url.is_valid:
+            return False
+        hostname = url.subdomain
+        if hostname in self.allowed_hostnames:
+            return True
+        return self.allow_subdomains and any(
+            hostname.endswith(f".{allowed_hostname}")
+            for allowed_hostname in self.allowed_hostnames
+        )
 
 
 class Crawler(Thread):
@@ -35,6 +80,12 @@ class Crawler(Thread):
         html_parser: HTMLParserService,
         options: CrawlerOptions,
         logger: Logger,
+        metrics: CrawlMetrics | None = None,
+        budget: CrawlBudget | None = None,
+        traps: TrapGuard | None = None,
+        on_page: PageCallback | None = None,
+        link_graph: LinkGraph | None = None,
+        leases: LeaseTable | None = None,
     ) -> None:
         """
         Initialize worker thread with connection to repository and the starting url
@@ -46,45 +97,193 @@ class Crawler(Thread):
             html_parser (HTMLParserService): Service that returns links under a given URL.
             options (CrawlerOptions): Flags to control crawler behaviour.
             logger (Logger): Thread-safe logger.
+            metrics (CrawlMetrics | None): Metrics the crawled pages are counted in.
+            budget (CrawlBudget | None): Limits of the crawl, if any.
+            traps (TrapGuard | None): Guard against crawler traps, if any.
+            on_page (PageCallback | None): Function called with the record of
+                every page crawled, before it is notified as processed, if any.
+            link_graph (LinkGraph | None): Graph the in-scope links of every page
+                crawled are recorded to, if any.
+            leases (LeaseTable | None): Leases every URL is crawled under, so that
+                it can be reclaimed if the worker crashes or hangs, if any.
         """
-        super().__init__()
+        # Daemon threads, so that a worker stuck on a request that never returns
+        # does not keep the process alive once it was replaced.
+        super().__init__(daemon=True)
         self._thread_id = thread_id
         self._repository = repository
         self._html_parser = html_parser
         self._options = options
         self._logger = logger
+        self._metrics = metrics
+        self._budget = budget
+        self._traps = traps
+        self._on_page = on_page
+        self._link_graph = link_graph
+        self._leases = leases
+        # Whether the worker stopped on an unexpected exception.
+        self.failed = False
+        # URL the worker was stuck on when it was replaced, see `abandon`.
+        self.abandoned_url: URL | None = None
 
     def crawl_next_url(self) -> bool:
         """
         Main crawling logic executed by worker threads.
         - Poll for next URL to be processed in the queue.
-        - Add all of its valid (i.e. not visited previously, and matches base subdomain)
-          to be crawled next.
-        - Notify repository that a the discovered URL has been processed.
+        - Stop if the crawl budget is spent, queueing the URL again unprocessed,
+          and lease the URL otherwise if leases are tracked.
+        - Defer the URL if the circuit of its host is open, giving its page
+          reservation back and queueing it again once the circuit is half-open.
+        - Add all of its valid (i.e. not visited previously, and matches an allowed
+          hostname) to be crawled next, unless they are deeper than the budget allows,
+          or look like crawler traps.
+        - Record its in-scope links in the link graph, if any, unless the page is a
+          near-duplicate of a page crawled before.
+        - Hand the record of the page to the page callback, if any.
+        - Notify repository that a the discovered URL has been processed, unless
+          its lease was reclaimed meanwhile, as it was queued again.
         - Terminate if received TERMINATION_SIGNAL.
         """
         url_to_crawl = self._repository.get_next_url()
         if url_to_crawl == Crawler.TERMINATION_SIGNAL:
+            # The signal is meant for the worker that replaced this one.
+            if self.abandoned_url is not None:
+                self._repository.queue_next_url(Crawler.TERMINATION_SIGNAL)
+            return False
+        # Stop once the budget is spent. Every URL handed out must either be notified
+        # as processed or queued again, so the URL is put back in the frontier
+        # unprocessed, e.g. to be crawled when a checkpointed crawl is resumed.
+        if self._budget is not None and not self._budget.reserve_page():
+            self._repository.requeue_url(url_to_crawl)
             return False
-        linked_urls = self._html_parser.get_links_under_url(url_to_crawl)
-        message = f"Thread-{self._thread_id} is currently crawling: {url_to_crawl}\n"
-        if not self._options.skip_links_found:
-            message += "------ Found following URLs in page: \n"
+        # The page is reserved before its URL is leased, the supervisor gives the
+        # reservation back if it reclaims the lease.
+        lease = None
+        if self._leases is not None:
+            lease = self._leases.acquire(url_to_crawl, self)
+        try:
+            if self._on_page is None:
+                page_record = None
+                linked_urls = self._html_parser.get_links_under_url(url_to_crawl)
+            else:
+                page_record = PageRecord(url_to_crawl)
+                linked_urls = self._html_parser.get_links_under_url(
+                    url_to_crawl, page_record
+                )
+                page_record.links = list(linked_urls)
+        except CircuitOpenError as circuit_open:
+            # The URL stays unprocessed while it is deferred, so the crawl does not
+            # end before it was crawled, or given up on.
+            if lease is not None and not self._leases.release(lease):
+                return True
+            if self._budget is not None:
+                self._budget.release_page()
+            self._logger.log(
+                f"{circuit_open}, deferring {url_to_crawl}",
+                severity=Logger.Severity.INFO,
+            )
+            self._html_parser.fetch_policy.watchdog.watch(
+                circuit_open.retry_at,
+                functools.partial(self._repository.requeue_url, url_to_crawl),
+            )
+            return True
+        # Links are handed to the logger as is, and only formatted by its writer thread.
+        self._logger.log(
+            f"Thread-{self._thread_id} is currently crawling: {url_to_crawl}",
+            fields=None if self._options.skip_links_found else {"links": linked_urls},
+        )
+        linked_urls = [
+            linked_url
+            for linked_url in linked_urls
+            if self._options.is_url_in_scope(linked_url)
+        ]
+        # The links of a near-duplicate page mostly repeat those of a page already
+        # recorded, e.g. with another session ID, so they are not recorded again,
+        # but are still filtered and followed, as the links it does not share may
+        # be new.
+        is_near_duplicate = self._traps is not None and self._traps.is_near_duplicate(
+            linked_urls
+        )
+        if self._link_graph is not None and not is_near_duplicate:
+            self._link_graph.add_page(url_to_crawl, linked_urls)
+        depth = url_to_crawl.depth + 1
+        if self._budget is None or self._budget.is_within_depth(depth):
+            if self._traps is not None:
+                linked_urls = self._traps.filter_links(linked_urls)
             for linked_url in linked_urls:
-                message += f"------ {linked_url}\n"
-        self._logger.log(message)
-        for linked_url in linked_urls:
-            if (
-                linked_url.is_valid
-                and linked_url.subdomain == self._options.base_url_hostname
-            ):
-                self._repository.add_url_to_crawl(linked_url)
-        self._repository.notify_url_processed()
+                linked_url.depth = depth
+            self._repository.add_urls_to_crawl(linked_urls)
+        if page_record is not None:
+            # A failing callback, e.g. a full disk, must not kill the worker and
+            # leave the URL unprocessed.
+            try:
+                self._on_page(page_record)
+            except Exception as exception:  # pylint: disable=broad-except
+                self._logger.log(
+                    f"Error while handing out the record of {url_to_crawl}:"
+                    f" [\n-----{exception}]",
+                    severity=Logger.Severity.ERROR,
+                )
+        if lease is not None and not self._leases.release(lease):
+            return True
+        self._repository.notify_url_processed(url_to_crawl)
+        if self._metrics is not None:
+            self._metrics.pages_crawled.inc()
+        if self._budget is not None:
+            self._budget.record_page(url_to_crawl)
         return True
 
+    def abandon(self, url: URL) -> None:
+        """
+        Give up on a worker stuck on a URL past its lease, once a worker replacing
+        it was started. The worker stops once its crawl of the URL is over, if it
+        ever is, and releases the concurrency slot held meanwhile for the URL, see
+        `Repository.hold_concurrency_slot`.
+
+        Args:
+            url (URL): URL the worker is stuck on.
+        """
+        self.abandoned_url = url
+
+    def restart(self) -> "Crawler":
+        """
+        Start a worker with the same ID and dependencies, e.g. in place of this one
+        once it crashed.
+
+        Returns:
+            Crawler: Started worker.
+        """
+        worker = Crawler(
+            self._thread_id,
+            self._repository,
+            self._html_parser,
+            self._options,
+            self._logger,
+            self._metrics,
+            self._budget,
+            self._traps,
+            self._on_page,
+            self._link_graph,
+            self._leases,
+        )
+        worker.start()
+        return worker
+
     def run(self) -> None:
         """
-        Execute crawling logic indefinely until termination.
+        Execute crawling logic indefinely until termination, the worker being
+        abandoned, or an unexpected exception, which is logged and flags the
+        worker as failed.
         """
-        while self.crawl_next_url():
-            pass
+        try:
+            while self.abandoned_url is None and self.crawl_next_url():
+                pass
+        except Exception as exception:  # pylint: disable=broad-except
+            self.failed = True
+            self._logger.log(
+                f"Thread-{self._thread_id} crashed: [\n-----{exception}]",
+                severity=Logger.Severity.ERROR,
+            )
+        finally:
+            if self.abandoned_url is not None:
+                self._repository.release_concurrency_slot(self.abandoned_url)
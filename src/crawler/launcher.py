@@ -1,9 +1,50 @@
 """Logic to start crawling threads and initialize storage layer"""
+import json
+from typing import Iterator
+
+from crawler.budget import CrawlBudget
 from crawler.crawler import Crawler, CrawlerOptions
+from crawler.leases import LeaseTable
+from crawler.link_graph import LinkGraph
+from crawler.output import PageCallback, PageRecord, stream_pages
+from crawler.supervisor import WorkerSupervisor
+from crawler.sitemap_feeder import SitemapFeeder
+from crawler.traps import TrapGuard
 from logger.logger import Logger
-from models.url import URL
+from metrics.crawl_metrics import CrawlMetrics
+from metrics.exporter import MetricsReporter, MetricsServer
+from models.url import URL, URLCanonicalizer
+from repository.async_repository import AsyncRepository
+from repository.host_repository import HostPartitionedRepository
+from repository.partitioned_repository import PartitionedRepository
+from repository.priority_repository import (
+    PriorityRepository,
+    URLScorer,
+    depth_score,
+    lastmod_score,
+    path_length_score,
+    query_param_score,
+)
 from repository.repository import Repository
+from repository.sharded_repository import ShardedRepository
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import (
+    BloomFilterVisitedURLSet,
+    ExactVisitedURLSet,
+    FingerprintVisitedURLSet,
+    NullVisitedURLLog,
+    VisitedURLLog,
+    VisitedURLSet,
+)
+from service.concurrency_limiter import ConcurrencyController, ConcurrencyLimiter
+from service.fetch_guard import FetchGuard
+from service.fetch_policy import FetchPolicy
+from service.parser_pool import ParserPool
+from service.http_cache import HTTPCache
+from service.http_client import ACCEPT_ENCODING, HTTPClient, HTTPClientOptions
+from service.node_transport import parse_node_address
 from service.parser_service import HTMLParserService
+from service.sitemap import SitemapLoader
 
 
 class CrawlerLauncherOptions:
@@ -14,13 +55,641 @@ class CrawlerLauncherOptions:
     THREAD_COUNT = "thread_count"
     SKIP_LINKS_FOUND = "skip_links_found"
     BASE_URL = "base_url"
+    ENGINE = "engine"
+    TASK_COUNT = "task_count"
+    POOL_SIZE = "pool_size"
+    MAX_CONNECTIONS_PER_HOST = "max_connections_per_host"
+    POOL_IDLE_TIMEOUT = "pool_idle_timeout"
+    MAX_PAGE_BYTES = "max_page_bytes"
+    MAX_COMPRESSION_RATIO = "max_compression_ratio"
+    ACCEPT_ENCODING = "accept_encoding"
+    SEED_URLS = "seed_url"
+    SITEMAPS = "sitemaps"
+    MAX_SITEMAP_URLS = "max_sitemap_urls"
+    ALLOW_SUBDOMAINS = "allow_subdomains"
+    FRONTIER = "frontier"
+    PER_HOST_CONCURRENCY = "per_host_concurrency"
+    PER_HOST_DELAY = "per_host_delay"
+    SHARD_COUNT = "shard_count"
+    DEDUPE = "dedupe"
+    BLOOM_CAPACITY = "bloom_capacity"
+    BLOOM_FALSE_POSITIVE_RATE = "bloom_false_positive_rate"
+    VISITED_LOG = "visited_log"
+    SORT_QUERY_PARAMS = "sort_query_params"
+    STRIP_TRACKING_PARAMS = "strip_tracking_params"
+    STATE_DIR = "state_dir"
+    RESUME = "resume"
+    CHECKPOINT_INTERVAL = "checkpoint_interval"
+    HTTP_CACHE_DIR = "http_cache_dir"
+    PARSER_PROCESS_COUNT = "parser_process_count"
+    NODE_ID = "node_id"
+    PEERS = "peer"
+    FORWARD_BATCH_SIZE = "forward_batch_size"
+    LOG_FILE = "log_file"
+    LOG_FORMAT = "log_format"
+    LOG_LEVEL = "log_level"
+    METRICS_INTERVAL = "metrics_interval"
+    METRICS_PORT = "metrics_port"
+    MAX_PAGES = "max_pages"
+    MAX_DEPTH = "max_depth"
+    MAX_SECONDS = "max_seconds"
+    MAX_BYTES = "max_bytes"
+    PRIORITY = "priority"
+    NEAR_DUPLICATE_DISTANCE = "near_duplicate_distance"
+    MAX_PATH_DEPTH = "max_path_depth"
+    MAX_REPEATED_SEGMENTS = "max_repeated_segments"
+    MAX_URLS_PER_PATTERN = "max_urls_per_pattern"
+    ADAPTIVE_CONCURRENCY = "adaptive_concurrency"
+    MIN_CONCURRENCY = "min_concurrency"
+    CONNECT_TIMEOUT = "connect_timeout"
+    READ_TIMEOUT = "read_timeout"
+    FETCH_DEADLINE = "fetch_deadline"
+    MAX_RETRIES = "max_retries"
+    RETRY_BACKOFF = "retry_backoff"
+    CIRCUIT_BREAKER_THRESHOLD = "circuit_breaker_threshold"
+    CIRCUIT_BREAKER_RESET = "circuit_breaker_reset"
+    HEDGE_PERCENTILE = "hedge_percentile"
+    LINK_GRAPH = "link_graph"
+    LEASE_TIMEOUT = "lease_timeout"
+    MAX_ATTEMPTS = "max_attempts"
+
+    class Engine:
+        """Available crawl engines"""
+
+        # One OS thread per crawler worker, blocking on each fetch.
+        THREAD = "thread"
+        # Crawler tasks multiplexed on a single asyncio event loop.
+        ASYNC = "async"
+
+    class Frontier:
+        """Available frontier implementations for the threaded engine"""
+
+        # A single FIFO queue shared by all workers.
+        FIFO = "fifo"
+        # One queue per host, with per-host concurrency limits and delays.
+        PER_HOST = "per_host"
+        # One deque per worker with work stealing, and a dedupe sharded by URL hash.
+        SHARDED = "sharded"
+        # A single queue handing out the URL with the lowest priority score first.
+        PRIORITY = "priority"
+
+    class Priority:
+        """Available scores of the priority frontier, lowest first"""
+
+        # Breadth-first, by number of links followed from a seed URL.
+        DEPTH = "depth"
+        # Fewest path segments first.
+        PATH_LENGTH = "path_length"
+        # Fewest query parameters first.
+        QUERY_PARAMS = "query_params"
+        # Sitemap URLs first, most recently modified first, then breadth-first.
+        LASTMOD = "lastmod"
+
+    class Dedupe:
+        """Available dedupe backends for discovered URLs"""
+
+        # Python set of URL objects, exact.
+        EXACT = "exact"
+        # Array-backed hash table of 64-bit / 128-bit URL fingerprints.
+        FINGERPRINT_64 = "fingerprint64"
+        FINGERPRINT_128 = "fingerprint128"
+        # Bloom filter with a configurable false positive rate.
+        BLOOM = "bloom"
 
     def __init__(
-        self, base_url: URL, skip_links_found: bool = False, thread_count: int = 1
+        self,
+        base_url: URL,
+        skip_links_found: bool = False,
+        thread_count: int = 1,
+        engine: str = Engine.THREAD,
+        task_count: int = 100,
+        pool_size: int = 10,
+        max_connections_per_host: int | None = None,
+        pool_idle_timeout: float = 30.0,
+        max_page_bytes: int = 5 * 1024 * 1024,
+        max_compression_ratio: float = 100.0,
+        accept_encoding: str | None = None,
+        seed_urls: list[URL] | None = None,
+        sitemaps: bool = False,
+        max_sitemap_urls: int | None = None,
+        allow_subdomains: bool = False,
+        frontier: str = Frontier.FIFO,
+        per_host_concurrency: int = 1,
+        per_host_delay: float = 0.0,
+        shard_count: int = 16,
+        dedupe: str = Dedupe.EXACT,
+        bloom_capacity: int = 10_000_000,
+        bloom_false_positive_rate: float = 0.001,
+        visited_log: str | None = None,
+        sort_query_params: bool = False,
+        strip_tracking_params: bool = False,
+        state_dir: str | None = None,
+        resume: bool = False,
+        checkpoint_interval: float = 1.0,
+        http_cache_dir: str | None = None,
+        parser_process_count: int = 0,
+        node_id: int = 0,
+        peers: list[str] | None = None,
+        forward_batch_size: int = 256,
+        log_file: str | None = None,
+        log_format: str = Logger.Format.TEXT,
+        log_level: str = Logger.Severity.INFO,
+        metrics_interval: float = 0.0,
+        metrics_port: int | None = None,
+        max_pages: int | None = None,
+        max_depth: int | None = None,
+        max_seconds: float | None = None,
+        max_bytes: int | None = None,
+        priority: str = Priority.DEPTH,
+        near_duplicate_distance: int | None = None,
+        max_path_depth: int | None = None,
+        max_repeated_segments: int | None = None,
+        max_urls_per_pattern: int | None = None,
+        adaptive_concurrency: bool = False,
+        min_concurrency: int = 1,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        fetch_deadline: float = 120.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.1,
+        circuit_breaker_threshold: int = 5,
+        circuit_breaker_reset: float = 30.0,
+        hedge_percentile: float | None = None,
+        link_graph_path: str | None = None,
+        lease_timeout: float = 300.0,
+        max_attempts: int = 3,
     ) -> None:
         self.skip_links_found = skip_links_found
         self.thread_count = thread_count
         self.base_url = base_url
+        self.engine = engine
+        self.task_count = task_count
+        self.pool_size = pool_size
+        # Keep one pooled connection per worker thread unless configured otherwise.
+        self.max_connections_per_host = max_connections_per_host or thread_count
+        self.pool_idle_timeout = pool_idle_timeout
+        self.max_page_bytes = max_page_bytes
+        self.max_compression_ratio = max_compression_ratio
+        # `Accept-Encoding` of every request, all the codings the HTTP client of
+        # the engine decompresses if None.
+        self.accept_encoding = accept_encoding
+        # Further URLs to start from, whose hosts are crawled alongside the base URL's.
+        self.seed_urls = seed_urls or []
+        # Whether the frontier is seeded with the URLs listed in the sitemaps of
+        # the seed hosts, at most `max_sitemap_urls` of them if not None.
+        self.sitemaps = sitemaps
+        self.max_sitemap_urls = max_sitemap_urls
+        self.allow_subdomains = allow_subdomains
+        self.frontier = frontier
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.shard_count = shard_count
+        self.dedupe = dedupe
+        self.bloom_capacity = bloom_capacity
+        self.bloom_false_positive_rate = bloom_false_positive_rate
+        # File the visited URLs are appended to by the compact dedupe backends.
+        self.visited_log = visited_log
+        self.url_canonicalizer = URLCanonicalizer(
+            sort_query_params=sort_query_params,
+            strip_tracking_params=strip_tracking_params,
+        )
+        # Directory the crawl state is checkpointed to, and whether to resume
+        # the crawl it holds rather than start from the seed URLs.
+        self.state_dir = state_dir
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        # Directory of the HTTP cache kept across runs, for incremental re-crawls.
+        self.http_cache_dir = http_cache_dir
+        # Number of processes parsing downloaded pages, pages are parsed by the
+        # crawler workers themselves if 0.
+        self.parser_process_count = parser_process_count
+        # Addresses (`host:port`) of all nodes of a distributed crawl, including this
+        # one at index `node_id`. The crawl runs on this node alone if empty.
+        self.node_id = node_id
+        self.peers = peers or []
+        self.forward_batch_size = forward_batch_size
+        # File the log is appended to, the standard output if None.
+        self.log_file = log_file
+        self.log_format = log_format
+        self.log_level = log_level
+        # Metrics are recorded if summaries are logged every `metrics_interval`
+        # seconds, or served on `metrics_port`.
+        self.metrics_interval = metrics_interval
+        self.metrics_port = metrics_port
+        # Limits of the crawl, unlimited if None, and the score the priority
+        # frontier crawls URLs by.
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.priority = priority
+        # Crawler trap heuristics, each off if None.
+        self.near_duplicate_distance = near_duplicate_distance
+        self.max_path_depth = max_path_depth
+        self.max_repeated_segments = max_repeated_segments
+        self.max_urls_per_pattern = max_urls_per_pattern
+        # Whether the number of pages fetched at once is adjusted at runtime,
+        # between `min_concurrency` and the number of workers.
+        self.adaptive_concurrency = adaptive_concurrency
+        self.min_concurrency = min_concurrency
+        # Timeouts of every request and deadline of every URL, retries of transient
+        # failures, per-host circuit breakers, and the latency percentile after
+        # which a request is hedged (never if None), in seconds.
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.fetch_deadline = fetch_deadline
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.circuit_breaker_threshold = circuit_breaker_threshold
+        self.circuit_breaker_reset = circuit_breaker_reset
+        self.hedge_percentile = hedge_percentile
+        # Archive the link graph of the crawl is exported to, not recorded if None.
+        self.link_graph_path = link_graph_path
+        # Seconds a worker may spend on a URL before it is handed out to another
+        # worker, and number of times a URL is handed out before it is given up on.
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+    @property
+    def valid_seed_urls(self) -> list[URL]:
+        """
+        Returns the base URL followed by all valid additional seed URLs.
+
+        Returns:
+            list[URL]: URLs the crawl starts from.
+        """
+        seed_urls = [self.base_url] + [url for url in self.seed_urls if url.is_valid]
+        # Seeds are canonicalized like discovered links, so that both dedupe together.
+        return [URL(url.address, self.url_canonicalizer) for url in seed_urls]
+
+    def visited_url_set(
+        self, visited_log: str | None = None, shard_count: int = 1
+    ) -> VisitedURLSet:
+        """
+        Build the configured dedupe backend, or one of `shard_count` shards of it.
+
+        Args:
+            visited_log (str | None): File the visited URLs are appended to,
+                `visited_log` if None.
+            shard_count (int): Number of shards the expected URLs are spread over.
+
+        Returns:
+            VisitedURLSet: Empty set of visited URLs.
+        """
+        if self.dedupe == CrawlerLauncherOptions.Dedupe.EXACT:
+            return ExactVisitedURLSet()
+        return self._compact_visited_url_set(
+            VisitedURLLog(visited_log or self.visited_log), shard_count
+        )
+
+    def forwarded_url_set(self) -> VisitedURLSet:
+        """
+        Build the configured dedupe backend of the URLs a node of a distributed
+        crawl forwarded to other nodes, without a log as they are never enumerated.
+
+        Returns:
+            VisitedURLSet: Empty set of forwarded URLs.
+        """
+        if self.dedupe == CrawlerLauncherOptions.Dedupe.EXACT:
+            return ExactVisitedURLSet()
+        return self._compact_visited_url_set(NullVisitedURLLog())
+
+    def _compact_visited_url_set(
+        self, log: VisitedURLLog, shard_count: int = 1
+    ) -> VisitedURLSet:
+        """
+        Args:
+            log (VisitedURLLog): Log of the added URLs.
+            shard_count (int): Number of shards the expected URLs are spread over.
+
+        Returns:
+            VisitedURLSet: Empty Bloom filter or fingerprint set, as configured.
+        """
+        if self.dedupe == CrawlerLauncherOptions.Dedupe.BLOOM:
+            return BloomFilterVisitedURLSet(
+                -(-self.bloom_capacity // shard_count),
+                self.bloom_false_positive_rate,
+                log,
+            )
+        fingerprint_bits = (
+            128 if self.dedupe == CrawlerLauncherOptions.Dedupe.FINGERPRINT_128 else 64
+        )
+        return FingerprintVisitedURLSet(fingerprint_bits, log)
+
+    def visited_url_sets(self) -> list[VisitedURLSet]:
+        """
+        Build the dedupe backend of every shard of the configured frontier.
+        Each shard appends its visited URLs to its own log, `<visited_log>.<shard>`.
+
+        Returns:
+            list[VisitedURLSet]: Empty sets of visited URLs.
+        """
+        # Nodes of a distributed crawl run a FIFO frontier over their partition.
+        if self.frontier != CrawlerLauncherOptions.Frontier.SHARDED or self.peers:
+            return [self.visited_url_set()]
+        return [
+            self.visited_url_set(
+                self.visited_log and f"{self.visited_log}.{shard}", self.shard_count
+            )
+            for shard in range(self.shard_count)
+        ]
+
+    def logger(self) -> Logger:
+        """
+        Start the logger of the crawl.
+
+        Returns:
+            Logger: Logger writing records of the configured level and above.
+        """
+        return Logger(self.log_file, self.log_format, self.log_level)
+
+    def crawl_metrics(self) -> CrawlMetrics | None:
+        """
+        Returns:
+            CrawlMetrics | None: Metrics of the crawl, None if they are not exported.
+        """
+        if not self.metrics_interval and self.metrics_port is None:
+            return None
+        return CrawlMetrics()
+
+    def metrics_server(self, metrics: CrawlMetrics | None) -> MetricsServer | None:
+        """
+        Start the endpoint serving the crawl metrics, if any.
+
+        Args:
+            metrics (CrawlMetrics | None): Metrics of the crawl.
+
+        Returns:
+            MetricsServer | None: Started metrics endpoint, None if not configured.
+        """
+        if metrics is None or self.metrics_port is None:
+            return None
+        metrics_server = MetricsServer(metrics, self.metrics_port)
+        metrics_server.start()
+        return metrics_server
+
+    def metrics_reporter(
+        self, metrics: CrawlMetrics | None, logger: Logger
+    ) -> MetricsReporter | None:
+        """
+        Start logging periodic summaries of the crawl metrics, if any.
+
+        Args:
+            metrics (CrawlMetrics | None): Metrics of the crawl.
+            logger (Logger): Logger of the crawl.
+
+        Returns:
+            MetricsReporter | None: Started reporter, None if not configured.
+        """
+        if metrics is None or not self.metrics_interval:
+            return None
+        metrics_reporter = MetricsReporter(metrics, logger, self.metrics_interval)
+        metrics_reporter.start()
+        return metrics_reporter
+
+    def crawl_budget(self, keep_crawled_urls: bool = True) -> CrawlBudget | None:
+        """
+        Start the budget of the crawl, if any. Its time limit runs from now on.
+
+        Args:
+            keep_crawled_urls (bool): Whether the budget keeps the URLs crawled.
+
+        Returns:
+            CrawlBudget | None: Limits of the crawl, None if it is unlimited.
+        """
+        limits = (self.max_pages, self.max_depth, self.max_seconds, self.max_bytes)
+        if all(limit is None for limit in limits):
+            return None
+        return CrawlBudget(*limits, keep_crawled_urls=keep_crawled_urls)
+
+    def trap_guard(self, metrics: CrawlMetrics | None) -> TrapGuard | None:
+        """
+        Args:
+            metrics (CrawlMetrics | None): Metrics of the crawl.
+
+        Returns:
+            TrapGuard | None: Guard against crawler traps, None if every in-scope
+            link is followed.
+        """
+        heuristics = (
+            self.near_duplicate_distance,
+            self.max_path_depth,
+            self.max_repeated_segments,
+            self.max_urls_per_pattern,
+        )
+        if all(heuristic is None for heuristic in heuristics):
+            return None
+        return TrapGuard(*heuristics, metrics=metrics)
+
+    def link_graph(self) -> LinkGraph | None:
+        """
+        Returns:
+            LinkGraph | None: Graph the links of the crawl are recorded to, None if
+            it is not exported.
+        """
+        if self.link_graph_path is None:
+            return None
+        return LinkGraph()
+
+    def lease_table(self) -> LeaseTable:
+        """
+        Returns:
+            LeaseTable: Leases of the URLs being crawled by the crawler workers.
+        """
+        return LeaseTable(self.lease_timeout)
+
+    def worker_supervisor(
+        self,
+        leases: LeaseTable,
+        repository: Repository,
+        workers: list[Crawler],
+        logger: Logger,
+        budget: CrawlBudget | None = None,
+    ) -> WorkerSupervisor:
+        """
+        Start supervising the crawler workers.
+
+        Args:
+            leases (LeaseTable): Leases of the URLs being crawled.
+            repository (Repository): Repository of the crawl.
+            workers (list[Crawler]): Crawler workers, replaced in place when restarted.
+            logger (Logger): Logger of the crawl.
+            budget (CrawlBudget | None): Limits of the crawl, if any.
+
+        Returns:
+            WorkerSupervisor: Started supervisor.
+        """
+        # Check often enough for a lease to be reclaimed soon after its deadline.
+        interval = min(1.0, self.lease_timeout / 4)
+        supervisor = WorkerSupervisor(
+            leases, repository, workers, logger, self.max_attempts, interval, budget
+        )
+        supervisor.start()
+        return supervisor
+
+    def concurrency_controller(
+        self, logger: Logger, metrics: CrawlMetrics | None
+    ) -> ConcurrencyController | None:
+        """
+        Args:
+            logger (Logger): Logger of the crawl.
+            metrics (CrawlMetrics | None): Metrics of the crawl.
+
+        Returns:
+            ConcurrencyController | None: Controller of the number of pages fetched
+            at once, None if it is fixed to the number of workers.
+        """
+        if not self.adaptive_concurrency:
+            return None
+        worker_count = (
+            self.task_count
+            if self.engine == CrawlerLauncherOptions.Engine.ASYNC
+            else self.thread_count
+        )
+        return ConcurrencyController(
+            self.min_concurrency, worker_count, logger=logger, metrics=metrics
+        )
+
+    def fetch_policy(self) -> FetchPolicy:
+        """
+        Returns:
+            FetchPolicy: Timeouts, retries, circuit breakers and hedging of the
+            page fetches.
+        """
+        return FetchPolicy(
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            deadline=self.fetch_deadline,
+            max_retries=self.max_retries,
+            backoff_base=self.retry_backoff,
+            circuit_failure_threshold=self.circuit_breaker_threshold,
+            circuit_reset_seconds=self.circuit_breaker_reset,
+            hedge_percentile=self.hedge_percentile,
+        )
+
+    def sitemap_loader(
+        self, http_client: HTTPClient, logger: Logger
+    ) -> SitemapLoader | None:
+        """
+        Args:
+            http_client (HTTPClient): Client the sitemaps are fetched with.
+            logger (Logger): Logger of the crawl.
+
+        Returns:
+            SitemapLoader | None: Loader of the URLs listed in the sitemaps of the
+            seed hosts, None if the crawl is only seeded with the seed URLs.
+        """
+        if not self.sitemaps:
+            return None
+        return SitemapLoader(
+            http_client,
+            logger,
+            self.url_canonicalizer,
+            (self.connect_timeout, self.read_timeout),
+            max_urls=self.max_sitemap_urls,
+        )
+
+    def url_scorer(self) -> URLScorer:
+        """
+        Returns:
+            URLScorer: Score of the URLs queued in the priority frontier.
+        """
+        if self.priority == CrawlerLauncherOptions.Priority.PATH_LENGTH:
+            return path_length_score
+        if self.priority == CrawlerLauncherOptions.Priority.QUERY_PARAMS:
+            return query_param_score
+        if self.priority == CrawlerLauncherOptions.Priority.LASTMOD:
+            return lastmod_score
+        return depth_score
+
+    def crawl_state_store(self) -> CrawlStateStore | None:
+        """
+        Open the store the crawl state is checkpointed to, if any, cleared of the
+        state of a previous crawl unless it is resumed.
+
+        Returns:
+            CrawlStateStore | None: Store of the crawl state, None if not configured.
+        """
+        if self.state_dir is None:
+            return None
+        return CrawlStateStore(
+            self.state_dir, self.checkpoint_interval, clear=not self.resume
+        )
+
+    def http_cache(self) -> HTTPCache | None:
+        """
+        Open the HTTP cache of previous runs, if any.
+
+        Returns:
+            HTTPCache | None: Cache of page validators and links, None if not configured.
+        """
+        if self.http_cache_dir is None:
+            return None
+        return HTTPCache(self.http_cache_dir)
+
+    def parser_pool(self) -> ParserPool | None:
+        """
+        Start the pool of processes parsing downloaded pages, if any.
+
+        Returns:
+            ParserPool | None: Parser pool, None if pages are parsed by the crawler
+            workers.
+        """
+        if not self.parser_process_count:
+            return None
+        return ParserPool(self.parser_process_count)
+
+    def crawler_options(self) -> CrawlerOptions:
+        """
+        Build the options of the crawler workers, scoped to the hosts of the seed URLs.
+
+        Returns:
+            CrawlerOptions: Options to control crawler functionality
+        """
+        return CrawlerOptions(
+            skip_links_found=self.skip_links_found,
+            base_url_hostname=self.base_url.subdomain,
+            allowed_hostnames={url.subdomain for url in self.valid_seed_urls},
+            allow_subdomains=self.allow_subdomains,
+        )
+
+
+def seed_repository(
+    repository: Repository | AsyncRepository,
+    options: CrawlerLauncherOptions,
+    state_store: CrawlStateStore | None,
+) -> bool:
+    """
+    Seed the repository with the base url and any additional seed urls, or with the
+    URLs of a previous run when resuming a crawl with a non-empty state.
+
+    Args:
+        repository (Repository | AsyncRepository): Repository of the crawl.
+        options (CrawlerLauncherOptions): Options of the crawl.
+        state_store (CrawlStateStore | None): Store of the crawl state, if any.
+
+    Returns:
+        bool: Whether the repository was seeded with the seed urls, whose sitemaps
+        are then to be loaded, rather than restored.
+    """
+    if state_store is not None and options.resume:
+        restored_url_count = 0
+        for url, processed in state_store.load():
+            repository.restore_url(url, processed)
+            restored_url_count += 1
+        if restored_url_count:
+            return False
+    if state_store is not None:
+        state_store.set_metadata(
+            CrawlStateStore.Metadata.BASE_URL, options.base_url.address
+        )
+        state_store.set_metadata(
+            CrawlStateStore.Metadata.SEED_URLS,
+            json.dumps([url.address for url in options.seed_urls]),
+        )
+    for seed_url in options.valid_seed_urls:
+        repository.add_url_to_crawl(seed_url)
+    return True
 
 
 class CrawlerLauncher:
@@ -32,6 +701,54 @@ class CrawlerLauncher:
     def __init__(self, options: CrawlerLauncherOptions) -> None:
         self._options = options
 
+    def _instantiate_repository(
+        self,
+        visited_url_sets: list[VisitedURLSet],
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> Repository:
+        """
+        Instantiate the repository implementing the configured frontier, or the
+        repository of this node's partition in a distributed crawl.
+
+        Args:
+            visited_url_sets (list[VisitedURLSet]): Dedupe backend of the repository,
+                one per shard for the sharded frontier.
+            state_store (CrawlStateStore | None): Store the crawl state is
+                checkpointed to, if any.
+            metrics (CrawlMetrics | None): Metrics of the crawl, if recorded.
+
+        Returns:
+            Repository: Repository to state web-crawler context
+        """
+        if self._options.peers:
+            return PartitionedRepository(
+                self._options.node_id,
+                [parse_node_address(peer) for peer in self._options.peers],
+                visited_url_sets[0],
+                state_store,
+                self._options.forward_batch_size,
+                metrics=metrics,
+                forwarded_urls=self._options.forwarded_url_set(),
+            )
+        if self._options.frontier == CrawlerLauncherOptions.Frontier.SHARDED:
+            return ShardedRepository(
+                self._options.thread_count, visited_url_sets, state_store, metrics
+            )
+        if self._options.frontier == CrawlerLauncherOptions.Frontier.PER_HOST:
+            return HostPartitionedRepository(
+                per_host_concurrency=self._options.per_host_concurrency,
+                per_host_delay=self._options.per_host_delay,
+                visited_urls=visited_url_sets[0],
+                state_store=state_store,
+                metrics=metrics,
+            )
+        if self._options.frontier == CrawlerLauncherOptions.Frontier.PRIORITY:
+            return PriorityRepository(
+                self._options.url_scorer(), visited_url_sets[0], state_store, metrics
+            )
+        return Repository(visited_url_sets[0], state_store, metrics)
+
     def _instantiate_crawler_workers(
         self,
         thread_count: int,
@@ -39,6 +756,12 @@ class CrawlerLauncher:
         html_parser: HTMLParserService,
         crawler_options: CrawlerOptions,
         logger: Logger,
+        metrics: CrawlMetrics | None = None,
+        budget: CrawlBudget | None = None,
+        traps: TrapGuard | None = None,
+        on_page: PageCallback | None = None,
+        link_graph: LinkGraph | None = None,
+        leases: LeaseTable | None = None,
     ) -> list[Crawler]:
         """
         Sequentially instantiate crawler worker threads with their required dependencies to kick-off
@@ -50,6 +773,12 @@ class CrawlerLauncher:
             html_parser (HTMLParserService): Service to parse HTML pages of a URL
             crawler_options (CrawlerOptions): Options to control crawler functionality
             logger (Logger): Thread-safe logger
+            metrics (CrawlMetrics | None): Metrics of the crawl, if recorded
+            budget (CrawlBudget | None): Limits of the crawl, if any
+            traps (TrapGuard | None): Guard against crawler traps, if any
+            on_page (PageCallback | None): Callback of the crawled pages, if any
+            link_graph (LinkGraph | None): Graph the links are recorded to, if any
+            leases (LeaseTable | None): Leases the URLs are crawled under, if any
 
         Returns:
             list[Crawler]: List of crawler threads.
@@ -57,7 +786,17 @@ class CrawlerLauncher:
         threads = []
         for thread_id in range(thread_count):
             thread = Crawler(
-                thread_id, repository, html_parser, crawler_options, logger
+                thread_id,
+                repository,
+                html_parser,
+                crawler_options,
+                logger,
+                metrics,
+                budget,
+                traps,
+                on_page,
+                link_graph,
+                leases,
             )
             thread.start()
             threads.append(thread)
@@ -79,45 +818,222 @@ class CrawlerLauncher:
         for thread_id in range(thread_count):
             threads[thread_id].join()
 
-    def crawl(self) -> list[URL]:
+    def crawl(self, on_page: PageCallback | None = None) -> list[URL]:
+        """
+        Run the crawl to completion, see `_crawl`.
+
+        Args:
+            on_page (PageCallback | None): Function called by the crawler workers
+                with the record of every page crawled, e.g. `PageSink.write`.
+
+        Returns:
+            list[URL]: List of all valid URLs (Matching the seed URL hostnames) crawled,
+            only the pages crawled so far if a limit of the crawl budget was reached.
+        """
+        return self._crawl(self._options.crawl_budget(), on_page)
+
+    def crawl_stream(self, max_pending: int = 1024) -> Iterator[PageRecord]:
+        """
+        Run the crawl on a thread of its own, and yield the record of every page
+        as soon as it was crawled, rather than all URLs once the crawl is over.
+        The URLs crawled are not accumulated, and crawler workers wait for the
+        consumer once `max_pending` records are pending, so memory use does not
+        grow with the crawl. Closing the generator early stops the crawl as if a
+        limit of its budget was reached.
+
+        Args:
+            max_pending (int): Maximum number of records waiting to be consumed.
+
+        Yields:
+            PageRecord: Records of the pages crawled, in the order they were crawled.
+        """
+        budget = self._options.crawl_budget(keep_crawled_urls=False) or CrawlBudget(
+            keep_crawled_urls=False
+        )
+        yield from stream_pages(
+            lambda on_page: self._crawl(budget, on_page, collect_urls=False),
+            budget.stop,
+            max_pending,
+        )
+
+    def _crawl(
+        self,
+        budget: CrawlBudget | None,
+        on_page: PageCallback | None,
+        collect_urls: bool = True,
+    ) -> list[URL]:
         """
         Sets up the overall crawling logic, mainly split into:
          - Initializing the crawler repository, responsible for storing explored URLs
            and URLs to be crawled next.
-         - Starting worker threads to pick up URLs to crawl from the queue.
+         - Starting worker threads to pick up URLs to crawl from the queue, each
+           leased until a deadline, and a supervisor queueing again the URLs whose
+           lease was reclaimed and restarting crashed workers.
          - Await a signal from the queue which notifies that all previously
-           queued URLs have been crawled.
+           queued URLs have been crawled, or that a limit of the crawl budget
+           was reached.
          - Terminate crawler threads by sending a TERMINATION_SIGNAL, indicating that all threads
            are idle.
 
+        Args:
+            budget (CrawlBudget | None): Limits of the crawl, if any.
+            on_page (PageCallback | None): Callback of the crawled pages, if any.
+            collect_urls (bool): Whether the URLs crawled are returned.
+
         Returns:
-            list[URL]: List of all valid URLs (Matching the base URL subdomain) crawled
+            list[URL]: List of all valid URLs (Matching the seed URL hostnames) crawled,
+            only the pages crawled so far if a limit of the crawl budget was reached,
+            none if they are not collected.
         """
-        repository = Repository()
-        logger = Logger()
-        html_parser = HTMLParserService(logger)
-        thread_count = self._options.thread_count
-
         # Terminate early in the case where the base url is invalid.
         if not self._options.base_url.is_valid:
             return []
 
-        base_url_hostname = self._options.base_url.subdomain
-        crawler_options = CrawlerOptions(
-            skip_links_found=self._options.skip_links_found,
-            base_url_hostname=base_url_hostname,
+        visited_url_sets = self._options.visited_url_sets()
+        state_store = self._options.crawl_state_store()
+        metrics = self._options.crawl_metrics()
+        repository = self._instantiate_repository(
+            visited_url_sets, state_store, metrics
+        )
+        logger = self._options.logger()
+        metrics_server = self._options.metrics_server(metrics)
+        metrics_reporter = self._options.metrics_reporter(metrics, logger)
+        http_client = HTTPClient(
+            HTTPClientOptions(
+                pool_size=self._options.pool_size,
+                max_connections_per_host=self._options.max_connections_per_host,
+                idle_timeout=self._options.pool_idle_timeout,
+                accept_encoding=self._options.accept_encoding or ACCEPT_ENCODING,
+            )
         )
+        fetch_guard = FetchGuard(
+            self._options.max_page_bytes, self._options.max_compression_ratio
+        )
+        http_cache = self._options.http_cache()
+        parser_pool = self._options.parser_pool()
+        traps = self._options.trap_guard(metrics)
+        link_graph = self._options.link_graph()
+        concurrency_controller = self._options.concurrency_controller(logger, metrics)
+        fetch_policy = self._options.fetch_policy()
+        html_parser = HTMLParserService(
+            logger,
+            http_client,
+            fetch_guard,
+            self._options.url_canonicalizer,
+            http_cache,
+            parser_pool,
+            metrics,
+            budget,
+            concurrency_controller and ConcurrencyLimiter(concurrency_controller),
+            fetch_policy,
+        )
+        thread_count = self._options.thread_count
 
-        # Seed the web-crawler with the base url
-        repository.add_url_to_crawl(self._options.base_url)
+        crawler_options = self._options.crawler_options()
 
-        # Initialize the crawler worker threads
+        # Seed the web-crawler with the base url and any additional seed urls,
+        # or the state of the crawl being resumed
+        sitemap_loader = self._options.sitemap_loader(http_client, logger)
+        if not seed_repository(repository, self._options, state_store):
+            sitemap_loader = None
+
+        # Initialize the crawler worker threads, and their supervisor
+        leases = self._options.lease_table()
         crawler_threads = self._instantiate_crawler_workers(
-            thread_count, repository, html_parser, crawler_options, logger
+            thread_count,
+            repository,
+            html_parser,
+            crawler_options,
+            logger,
+            metrics,
+            budget,
+            traps,
+            on_page,
+            link_graph,
+            leases,
+        )
+        supervisor = self._options.worker_supervisor(
+            leases, repository, crawler_threads, logger, budget
         )
 
-        # Block until receiving a signal that all URLs have been crawled
-        # and terminate worker threads
-        repository.wait_until_all_urls_processed()
+        # Add the URLs listed in the sitemaps of the seed hosts while the workers
+        # crawl the seed URLs
+        sitemap_feeder = None
+        if sitemap_loader is not None:
+            sitemap_feeder = SitemapFeeder(
+                sitemap_loader,
+                repository,
+                self._options.valid_seed_urls,
+                crawler_options,
+            )
+            sitemap_feeder.start()
+
+        # Block until receiving a signal that all URLs have been crawled,
+        # or the crawl budget is spent, and terminate worker threads
+        if budget is None:
+            if sitemap_feeder is not None:
+                sitemap_feeder.join()
+            repository.wait_until_all_urls_processed()
+        else:
+            budget.wait_until_done(
+                lambda: (sitemap_feeder is None or sitemap_feeder.is_done())
+                and repository.all_urls_processed()
+            )
+            if isinstance(repository, PartitionedRepository):
+                repository.close()
+        if sitemap_feeder is not None:
+            sitemap_feeder.stop()
+        supervisor.stop()
         self._terminate_crawler_workers(crawler_threads, thread_count, repository)
-        return repository.visited_urls
+        if sitemap_loader is not None:
+            logger.log(f"Sitemaps: {sitemap_loader}")
+        logger.log(f"HTTP connection reuse: {http_client.stats}")
+        logger.log(f"Fetch retries and timeouts: {fetch_policy.stats}")
+        logger.log(f"Worker supervision: {supervisor}")
+        logger.log(f"Skipped non-HTML or oversized pages: {fetch_guard}")
+        http_client.close()
+        if parser_pool is not None:
+            parser_pool.shutdown()
+            logger.log(f"Parser pool: {parser_pool}")
+        if http_cache is not None:
+            http_cache.close()
+            logger.log(f"HTTP cache: {http_cache.stats}")
+        if state_store is not None:
+            state_store.close()
+            logger.log(f"Crawl state checkpoints: {state_store.stats}")
+        if isinstance(repository, PartitionedRepository):
+            if repository.coordinator_lost:
+                logger.log(
+                    "Distributed crawl stopped, the coordinator stopped polling"
+                    " this node",
+                    severity=Logger.Severity.ERROR,
+                )
+            for node_stats in repository.node_stats:
+                logger.log(f"Distributed crawl, {node_stats}")
+        if metrics_reporter is not None:
+            metrics_reporter.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if metrics is not None:
+            logger.log(f"Crawl metrics: {metrics.summary()}")
+        if budget is not None:
+            logger.log(f"Crawl budget: {budget}")
+        if traps is not None:
+            logger.log(f"Crawler traps: {traps}")
+        if link_graph is not None:
+            link_graph.save(self._options.link_graph_path)
+            logger.log(
+                f"Link graph: {link_graph}, saved to {self._options.link_graph_path}"
+            )
+        if concurrency_controller is not None:
+            logger.log(f"Adaptive concurrency: {concurrency_controller}")
+        logger.close()
+        if not collect_urls:
+            visited_urls = []
+        elif budget is not None and budget.exhausted_limit is not None:
+            visited_urls = budget.crawled_urls
+        else:
+            visited_urls = repository.visited_urls
+        for visited_url_set in visited_url_sets:
+            visited_url_set.close()
+        return visited_urls
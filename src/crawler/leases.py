@@ -0,0 +1,99 @@
+"""Leases of the URLs being crawled by the crawler workers"""
+
+import time
+from threading import Lock, Thread
+
+from models.url import URL
+
+
+class Lease:
+    """A URL handed out to a crawler worker, until a deadline"""
+
+    __slots__ = ("url", "worker", "attempt", "deadline")
+
+    def __init__(self, url: URL, worker: Thread, attempt: int, deadline: float):
+        """
+        Args:
+            url (URL): URL being crawled.
+            worker (Thread): Worker crawling the URL.
+            attempt (int): Number of times the URL was handed out, this one included.
+            deadline (float): Monotonic time after which the lease may be reclaimed.
+        """
+        self.url = url
+        self.worker = worker
+        self.attempt = attempt
+        self.deadline = deadline
+
+    def __repr__(self) -> str:
+        return f"Lease({self.url.address}, attempt={self.attempt})"
+
+
+class LeaseTable:
+    """
+    URLs being crawled, each leased to a worker until a deadline. A worker only
+    reports its URL as processed if its lease was still held, so that a URL whose
+    lease was reclaimed and handed out again is not reported twice.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        """
+        Args:
+            timeout (float): Seconds a URL is leased for.
+        """
+        self._timeout = timeout
+        self._mutex = Lock()
+        self._leases: dict[str, Lease] = {}
+        # Number of times the URLs whose leases were reclaimed were handed out.
+        self._attempts: dict[str, int] = {}
+
+    def acquire(self, url: URL, worker: Thread) -> Lease:
+        """
+        Args:
+            url (URL): URL handed out to the worker.
+            worker (Thread): Worker crawling the URL.
+
+        Returns:
+            Lease: Lease of the URL.
+        """
+        with self._mutex:
+            attempt = self._attempts.get(url.address, 0) + 1
+            lease = Lease(url, worker, attempt, time.monotonic() + self._timeout)
+            self._leases[url.address] = lease
+        return lease
+
+    def release(self, lease: Lease) -> bool:
+        """
+        Args:
+            lease (Lease): Lease of a URL whose crawl is over.
+
+        Returns:
+            bool: Whether the lease was still held, i.e. it was not reclaimed.
+        """
+        with self._mutex:
+            if self._leases.get(lease.url.address) is not lease:
+                return False
+            del self._leases[lease.url.address]
+            self._attempts.pop(lease.url.address, None)
+        return True
+
+    def reclaim(self) -> list[Lease]:
+        """
+        Reclaim the leases past their deadline, or held by workers no longer running.
+
+        Returns:
+            list[Lease]: Reclaimed leases.
+        """
+        now = time.monotonic()
+        with self._mutex:
+            reclaimed = [
+                lease
+                for lease in self._leases.values()
+                if lease.deadline <= now or not lease.worker.is_alive()
+            ]
+            for lease in reclaimed:
+                del self._leases[lease.url.address]
+                self._attempts[lease.url.address] = lease.attempt
+        return reclaimed
+
+    def __len__(self) -> int:
+        return len(self._leases)
@@ -0,0 +1,257 @@
+"""Compact capture of the link graph of a crawl, and analyses of its structure"""
+
+from array import array
+from threading import Lock
+
+import numpy as np
+
+from models.url import URL
+
+
+def _to_array(typecode: str, values: np.ndarray) -> array:
+    """Copy a NumPy array to an array of the matching item type."""
+    copied = array(typecode)
+    copied.frombytes(values.tobytes())
+    return copied
+
+
+class LinkGraph:
+    """
+    Link graph of a crawl, shared by all crawler workers. Every URL gets a dense
+    integer ID on first sight, and the links of every crawled page are appended to
+    flat arrays of IDs: one row per page, in crawl order, like the rows of a CSR
+    matrix. A link takes 4 bytes, rather than the hundred or so bytes of an entry in
+    a dict of sets of addresses. Analyses convert the rows to a CSR matrix ordered
+    by ID, and are vectorized with NumPy.
+    """
+
+    def __init__(self) -> None:
+        self._mutex = Lock()
+        # Address of every node, by ID, and ID of every address.
+        self._addresses: list[str] = []
+        self._ids: dict[str, int] = {}
+        # Whether every node was crawled, rather than only linked to.
+        self._crawled = bytearray()
+        # Source node of every row, offset of its first link in `_targets`, and
+        # target nodes of all rows.
+        self._sources = array("i")
+        self._offsets = array("q", [0])
+        self._targets = array("i")
+
+    def _node_id(self, address: str) -> int:
+        """ID of an address, assigned on first sight. Called with the graph locked."""
+        node_id = self._ids.get(address)
+        if node_id is None:
+            node_id = len(self._addresses)
+            self._ids[address] = node_id
+            self._addresses.append(address)
+            self._crawled.append(0)
+        return node_id
+
+    def add_page(self, url: URL, linked_urls: list[URL]) -> None:
+        """
+        Record a crawled page and its links, links to itself apart.
+
+        Args:
+            url (URL): Crawled URL.
+            linked_urls (list[URL]): URLs linked from the page.
+        """
+        with self._mutex:
+            source = self._node_id(url.address)
+            self._crawled[source] = 1
+            targets = [self._node_id(linked_url.address) for linked_url in linked_urls]
+            self._targets.extend(target for target in targets if target != source)
+            self._sources.append(source)
+            self._offsets.append(len(self._targets))
+
+    @property
+    def node_count(self) -> int:
+        """Number of URLs crawled or linked to."""
+        return len(self._addresses)
+
+    @property
+    def page_count(self) -> int:
+        """Number of URLs crawled."""
+        return self._crawled.count(1)
+
+    @property
+    def link_count(self) -> int:
+        """Number of links recorded, duplicates included."""
+        return len(self._targets)
+
+    def url(self, node_id: int) -> URL:
+        """
+        Args:
+            node_id (int): ID of a node.
+
+        Returns:
+            URL: URL of the node.
+        """
+        return URL(self._addresses[node_id])
+
+    def node_id(self, url: URL) -> int | None:
+        """
+        Args:
+            url (URL): URL of a node.
+
+        Returns:
+            int | None: ID of the node, None if the URL is not in the graph.
+        """
+        return self._ids.get(url.address)
+
+    def to_csr(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Offsets of the links of every node,
+            `node_count + 1` of them, and the targets of the links ordered by
+            source node, as the `indptr` and `indices` of a CSR adjacency matrix.
+            Links recorded several times, e.g. by a recrawl, are only kept once.
+        """
+        with self._mutex:
+            node_count = len(self._addresses)
+            sources = np.frombuffer(self._sources, dtype=np.int32).copy()
+            offsets = np.frombuffer(self._offsets, dtype=np.int64).copy()
+            targets = np.frombuffer(self._targets, dtype=np.int32).copy()
+        row_sources = np.repeat(sources.astype(np.int64), np.diff(offsets))
+        # Sorting the links by source and target both orders the rows by ID and
+        # brings duplicates together. `np.unique` is an order of magnitude slower.
+        links = row_sources * node_count + targets
+        links.sort()
+        is_distinct = np.empty(len(links), dtype=bool)
+        is_distinct[:1] = True
+        np.not_equal(links[1:], links[:-1], out=is_distinct[1:])
+        links = links[is_distinct]
+        indices = (links % max(node_count, 1)).astype(np.int32)
+        out_degree = np.bincount(links // max(node_count, 1), minlength=node_count)
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(out_degree, out=indptr[1:])
+        return indptr, indices
+
+    def in_degree(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Number of distinct pages linking to every node, by ID.
+        """
+        indptr, indices = self.to_csr()
+        return np.bincount(indices, minlength=len(indptr) - 1)
+
+    def pagerank(
+        self,
+        damping: float = 0.85,
+        tolerance: float = 1e-6,
+        max_iterations: int = 100,
+    ) -> np.ndarray:
+        """
+        Compute PageRank by power iteration. The rank of nodes without links, e.g.
+        pages not crawled, is spread over all nodes.
+
+        Args:
+            damping (float): Probability of following a link rather than jumping
+                to a random node.
+            tolerance (float): L1 change of the ranks under which iteration stops.
+            max_iterations (int): Maximum number of iterations.
+
+        Returns:
+            np.ndarray: PageRank of every node, by ID, summing to 1.
+        """
+        indptr, indices = self.to_csr()
+        node_count = len(indptr) - 1
+        if node_count == 0:
+            return np.zeros(0)
+        out_degree = np.diff(indptr)
+        has_links = out_degree > 0
+        ranks = np.full(node_count, 1 / node_count)
+        for _ in range(max_iterations):
+            shares = np.divide(
+                ranks, out_degree, out=np.zeros(node_count), where=has_links
+            )
+            linked_ranks = np.bincount(
+                indices, weights=np.repeat(shares, out_degree), minlength=node_count
+            )
+            dangling_rank = ranks[~has_links].sum()
+            next_ranks = (1 - damping) / node_count + damping * (
+                linked_ranks + dangling_rank / node_count
+            )
+            converged = np.abs(next_ranks - ranks).sum() < tolerance
+            ranks = next_ranks
+            if converged:
+                break
+        return ranks
+
+    def orphan_urls(self) -> list[URL]:
+        """
+        Returns:
+            list[URL]: Crawled URLs no other crawled page links to, e.g. pages only
+            reached from a seed URL or a sitemap.
+        """
+        in_degree = self.in_degree()
+        crawled = np.frombuffer(
+            bytes(self._crawled[: len(in_degree)]), dtype=np.uint8
+        ).astype(bool)
+        return [
+            self.url(node_id) for node_id in np.flatnonzero(crawled & (in_degree == 0))
+        ]
+
+    def save(self, path: str) -> None:
+        """
+        Export the graph to a compressed NumPy `.npz` archive holding the CSR
+        matrix (`indptr` and `indices`), whether every node was crawled
+        (`crawled`), and the UTF-8 addresses of the nodes concatenated
+        (`addresses`) along with their offsets (`address_offsets`).
+
+        Args:
+            path (str): Path of the archive.
+        """
+        indptr, indices = self.to_csr()
+        with self._mutex:
+            encoded_addresses = [address.encode() for address in self._addresses]
+            crawled = np.frombuffer(bytes(self._crawled), dtype=np.uint8)
+        address_offsets = np.zeros(len(encoded_addresses) + 1, dtype=np.int64)
+        np.cumsum(
+            [len(address) for address in encoded_addresses], out=address_offsets[1:]
+        )
+        with open(path, "wb") as file:
+            np.savez_compressed(
+                file,
+                indptr=indptr,
+                indices=indices,
+                crawled=crawled,
+                addresses=np.frombuffer(b"".join(encoded_addresses), dtype=np.uint8),
+                address_offsets=address_offsets,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "LinkGraph":
+        """
+        Args:
+            path (str): Path of an archive written by `save`.
+
+        Returns:
+            LinkGraph: Graph of the archive, links recorded once each.
+        """
+        graph = cls()
+        with np.load(path) as archive:
+            indptr = archive["indptr"]
+            encoded_addresses = archive["addresses"].tobytes()
+            address_offsets = archive["address_offsets"].tolist()
+            graph._addresses = [
+                encoded_addresses[start:end].decode()
+                for start, end in zip(address_offsets, address_offsets[1:])
+            ]
+            graph._ids = {
+                address: node_id for node_id, address in enumerate(graph._addresses)
+            }
+            graph._crawled = bytearray(archive["crawled"].tobytes())
+            rows = np.flatnonzero(np.diff(indptr))
+            graph._sources = _to_array("i", rows.astype(np.int32))
+            graph._offsets = _to_array(
+                "q", np.append(indptr[rows], indptr[-1]).astype(np.int64)
+            )
+            graph._targets = _to_array("i", archive["indices"].astype(np.int32))
+        return graph
+
+    def __str__(self) -> str:
+        return (
+            f"{self.page_count} page(s) crawled, {self.node_count} URL(s),"
+            f" {self.link_count} link(s)"
+        )
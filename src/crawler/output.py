@@ -0,0 +1,252 @@
+"""Page records of a crawl, streamed as pages are crawled, and their output files"""
+
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import time
+from abc import ABC, abstractmethod
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Iterator, TextIO
+
+from models.url import URL
+
+
+class PageRecord:
+    """A crawled page, handed out as soon as its links were queued"""
+
+    __slots__ = (
+        "url",
+        "status",
+        "links",
+        "crawled_at",
+        "fetch_seconds",
+        "parse_seconds",
+        "size",
+    )
+
+    # Fields of a record, in the order of the columns of CSV output.
+    FIELDS = (
+        "url",
+        "depth",
+        "status",
+        "crawled_at",
+        "fetch_seconds",
+        "parse_seconds",
+        "size",
+        "links",
+    )
+
+    def __init__(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): Crawled URL.
+        """
+        self.url = url
+        # HTTP status code of the final response, None if no response was received.
+        self.status: int | None = None
+        # Links found on the page, in or out of scope.
+        self.links: list[URL] = []
+        # Unix time the page was crawled at.
+        self.crawled_at = time.time()
+        # Seconds spent downloading and parsing the page, None if it was not read.
+        self.fetch_seconds: float | None = None
+        self.parse_seconds: float | None = None
+        # Decompressed bytes of the body, None if it was not read.
+        self.size: int | None = None
+
+    @property
+    def depth(self) -> int:
+        """Number of links followed from a seed URL to the page."""
+        return self.url.depth
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Returns:
+            dict[str, Any]: Fields of the record, with URLs as their address.
+        """
+        return {
+            "url": self.url.address,
+            "depth": self.url.depth,
+            "status": self.status,
+            "crawled_at": self.crawled_at,
+            "fetch_seconds": self.fetch_seconds,
+            "parse_seconds": self.parse_seconds,
+            "size": self.size,
+            "links": [link.address for link in self.links],
+        }
+
+    def __repr__(self) -> str:
+        return f"PageRecord({self.url.address}, status={self.status})"
+
+
+PageCallback = Callable[[PageRecord], None]
+
+
+class PageSink(ABC):
+    """
+    Incremental writer of page records to a text stream. Every record is written
+    as it is received, so memory use does not grow with the crawl. Sinks are
+    thread-safe, `write` can be used as the page callback of a crawl.
+    """
+
+    class Format:
+        """Available output formats"""
+
+        # One JSON object per line.
+        JSONL = "jsonl"
+        # One row per page, links separated by spaces.
+        CSV = "csv"
+
+    def __init__(self, stream: TextIO) -> None:
+        """
+        Args:
+            stream (TextIO): Stream the records are written to, closed with the sink.
+        """
+        self._stream = stream
+        self._mutex = Lock()
+        self.record_count = 0
+
+    @abstractmethod
+    def _write_record(self, record: PageRecord) -> None:
+        """
+        Write a record, called with the sink locked.
+
+        Args:
+            record (PageRecord): Record to write.
+        """
+
+    def write(self, record: PageRecord) -> None:
+        """
+        Args:
+            record (PageRecord): Record to write.
+        """
+        with self._mutex:
+            self._write_record(record)
+            self.record_count += 1
+
+    def close(self) -> None:
+        """Flush the records written and close the stream."""
+        with self._mutex:
+            self._stream.close()
+
+    def __enter__(self) -> "PageSink":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class JSONLinesPageSink(PageSink):
+    """Sink writing every record as a JSON object on a line of its own"""
+
+    def _write_record(self, record: PageRecord) -> None:
+        self._stream.write(json.dumps(record.as_dict(), ensure_ascii=False) + "\n")
+
+
+class CSVPageSink(PageSink):
+    """Sink writing every record as a CSV row, after a header row"""
+
+    def __init__(self, stream: TextIO) -> None:
+        super().__init__(stream)
+        self._writer = csv.writer(stream)
+        self._writer.writerow(PageRecord.FIELDS)
+
+    def _write_record(self, record: PageRecord) -> None:
+        row = record.as_dict()
+        row["links"] = " ".join(row["links"])
+        self._writer.writerow(row[field] for field in PageRecord.FIELDS)
+
+
+# Compressed file openers by file extension.
+_COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+def open_page_sink(path: str, output_format: str | None = None) -> PageSink:
+    """
+    Open a file page records are written to, compressed if its name ends with
+    `.gz`, `.bz2` or `.xz`.
+
+    Args:
+        path (str): Path of the file, truncated if it exists.
+        output_format (str | None): One of `PageSink.Format`, CSV if the name of
+            the file without its compression extension ends with `.csv` and
+            JSON lines otherwise if None.
+
+    Returns:
+        PageSink: Sink writing to the file.
+    """
+    opener = open
+    name = path
+    for extension, compressed_opener in _COMPRESSED_OPENERS.items():
+        if path.endswith(extension):
+            opener = compressed_opener
+            name = path[: -len(extension)]
+    if output_format is None:
+        output_format = (
+            PageSink.Format.CSV if name.endswith(".csv") else PageSink.Format.JSONL
+        )
+    stream = opener(path, "wt", encoding="utf-8", newline="")
+    if output_format == PageSink.Format.CSV:
+        return CSVPageSink(stream)
+    return JSONLinesPageSink(stream)
+
+
+def stream_pages(
+    crawl: Callable[[PageCallback], Any], stop: Callable[[], None], max_pending: int
+) -> Iterator[PageRecord]:
+    """
+    Run a crawl on a thread of its own, and yield the record of every page it
+    crawls. At most `max_pending` records wait to be consumed, crawler workers
+    block until the consumer catches up beyond that, so memory use is bounded.
+    Closing the generator before the crawl ends stops it.
+
+    Args:
+        crawl (Callable[[PageCallback], Any]): Function running the crawl to
+            completion, calling the page callback it is given for every page.
+        stop (Callable[[], None]): Function stopping the crawl early.
+        max_pending (int): Maximum number of records waiting to be consumed.
+
+    Raises:
+        Exception: Any exception raised by the crawl, once all pages crawled
+            before it were yielded.
+
+    Yields:
+        PageRecord: Records of the pages crawled, in the order they were crawled.
+    """
+    records: Queue = Queue(max_pending)
+    crawl_ended = object()
+    errors = []
+    stopped = Event()
+
+    def on_page(record: PageRecord) -> None:
+        if not stopped.is_set():
+            records.put(record)
+
+    def run() -> None:
+        try:
+            crawl(on_page)
+        except Exception as exception:  # pylint: disable=broad-except
+            errors.append(exception)
+        finally:
+            records.put(crawl_ended)
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    consumed = False
+    try:
+        while (record := records.get()) is not crawl_ended:
+            yield record
+        consumed = True
+    finally:
+        if not consumed:
+            stopped.set()
+            stop()
+            # Unblock the workers waiting on a full queue until the crawl ended.
+            while records.get() is not crawl_ended:
+                pass
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,101 @@
+"""Background loading of the URLs listed in sitemaps, while the crawl is running"""
+
+import asyncio
+import itertools
+from threading import Event, Thread
+from typing import Iterator
+
+from crawler.crawler import CrawlerOptions
+from models.url import URL
+from repository.async_repository import AsyncRepository
+from repository.repository import Repository
+from service.sitemap import SitemapLoader
+
+# Number of sitemap URLs added to the frontier at once.
+FEED_BATCH_SIZE = 256
+
+
+def _in_scope_batches(
+    urls: Iterator[URL], crawler_options: CrawlerOptions
+) -> Iterator[list[URL]]:
+    """
+    Args:
+        urls (Iterator[URL]): URLs listed in sitemaps.
+        crawler_options (CrawlerOptions): Options deciding which URLs are in scope.
+
+    Yields:
+        list[URL]: In-scope URLs, `FEED_BATCH_SIZE` of them at most per batch.
+    """
+    while batch := list(itertools.islice(urls, FEED_BATCH_SIZE)):
+        yield [url for url in batch if crawler_options.is_url_in_scope(url)]
+
+
+class SitemapFeeder(Thread):
+    """
+    Background thread adding the in-scope URLs listed in the sitemaps of the seed
+    hosts to the frontier, in batches as they are loaded, so that the workers start
+    crawling the seed URLs rather than waiting until every sitemap was fetched.
+    The crawl cannot be over before the feeder is, see `is_done`.
+    """
+
+    def __init__(
+        self,
+        sitemap_loader: SitemapLoader,
+        repository: Repository,
+        seed_urls: list[URL],
+        crawler_options: CrawlerOptions,
+    ) -> None:
+        """
+        Args:
+            sitemap_loader (SitemapLoader): Loader of the sitemap URLs.
+            repository (Repository): Repository the URLs are added to.
+            seed_urls (list[URL]): URLs whose hosts' sitemaps are loaded.
+            crawler_options (CrawlerOptions): Options deciding which URLs are in scope.
+        """
+        super().__init__(daemon=True)
+        self._sitemap_loader = sitemap_loader
+        self._repository = repository
+        self._seed_urls = seed_urls
+        self._crawler_options = crawler_options
+        self._stopped = Event()
+
+    def run(self) -> None:
+        urls = self._sitemap_loader.load(self._seed_urls)
+        for batch in _in_scope_batches(urls, self._crawler_options):
+            if self._stopped.is_set():
+                return
+            self._repository.add_urls_to_crawl(batch)
+
+    def is_done(self) -> bool:
+        """Whether every sitemap URL was added to the frontier, or loading stopped."""
+        return not self.is_alive()
+
+    def stop(self) -> None:
+        """
+        Stop adding URLs, e.g. once the crawl budget is spent, and wait for the
+        sitemap being read to reach the next batch, or its timeout.
+        """
+        self._stopped.set()
+        self.join()
+
+
+async def feed_sitemap_urls(
+    sitemap_loader: SitemapLoader,
+    repository: AsyncRepository,
+    seed_urls: list[URL],
+    crawler_options: CrawlerOptions,
+) -> None:
+    """
+    asyncio counterpart of `SitemapFeeder`, meant to run as a task alongside the
+    crawler tasks. Sitemaps are fetched on threads of the default executor, one
+    batch at a time, so that the event loop is never blocked.
+
+    Args:
+        sitemap_loader (SitemapLoader): Loader of the sitemap URLs.
+        repository (AsyncRepository): Repository the URLs are added to.
+        seed_urls (list[URL]): URLs whose hosts' sitemaps are loaded.
+        crawler_options (CrawlerOptions): Options deciding which URLs are in scope.
+    """
+    batches = _in_scope_batches(sitemap_loader.load(seed_urls), crawler_options)
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        repository.add_urls_to_crawl(batch)
@@ -0,0 +1,130 @@
+"""Supervisor reclaiming the URLs of crashed or stuck crawler workers"""
+
+from threading import Event, Thread
+
+from crawler.budget import CrawlBudget
+from crawler.crawler import Crawler
+from crawler.leases import LeaseTable
+from logger.logger import Logger
+from models.url import URL
+from repository.repository import Repository
+
+
+class WorkerSupervisor(Thread):
+    """
+    Background thread reclaiming the leases of URLs whose worker crashed or is stuck,
+    queueing them again until they were handed out `max_attempts` times, and
+    restarting the workers that crashed. Without it, a URL whose worker died would
+    never be reported as processed, and the crawl would never end.
+
+    A worker still running past its lease is abandoned and replaced, so that a
+    request that never returns does not shrink the worker pool for good. The
+    concurrency slot of its URL is held until its crawl is over, if ever. A URL
+    whose lease expired may be crawled twice if its first worker eventually
+    completes, only its second crawl is reported as processed.
+    """
+
+    def __init__(
+        self,
+        leases: LeaseTable,
+        repository: Repository,
+        workers: list[Crawler],
+        logger: Logger,
+        max_attempts: int,
+        interval: float,
+        budget: CrawlBudget | None = None,
+    ) -> None:
+        """
+        Args:
+            leases (LeaseTable): Leases of the URLs being crawled.
+            repository (Repository): Repository the URLs were handed out by.
+            workers (list[Crawler]): Worker threads, replaced in place when restarted.
+            logger (Logger): Logger of the crawl.
+            max_attempts (int): Number of times a URL is handed out before it is
+                given up on, and reported as processed.
+            interval (float): Seconds between checks of the leases and workers.
+            budget (CrawlBudget | None): Limits of the crawl, if any. Workers reserve
+                a page before leasing its URL, and the reservation of every
+                reclaimed lease is given back, as the URL was not crawled.
+        """
+        super().__init__(daemon=True)
+        self._leases = leases
+        self._repository = repository
+        self._workers = workers
+        self._logger = logger
+        self._max_attempts = max_attempts
+        self._interval = interval
+        self._budget = budget
+        self._stopped = Event()
+        self.restarted_worker_count = 0
+        self.replaced_worker_count = 0
+        self.requeued_url_count = 0
+        self.abandoned_urls: list[URL] = []
+
+    def supervise(self) -> None:
+        """
+        Reclaim the expired leases, replace the workers stuck past their lease,
+        and restart the crashed workers.
+        """
+        for lease in self._leases.reclaim():
+            if self._budget is not None:
+                self._budget.release_page()
+            if lease.worker.is_alive():
+                self._replace_stuck_worker(lease.worker, lease.url)
+            if lease.attempt >= self._max_attempts:
+                self._logger.log(
+                    f"Giving up on {lease.url} after {lease.attempt} attempt(s)",
+                    severity=Logger.Severity.ERROR,
+                )
+                self.abandoned_urls.append(lease.url)
+                self._repository.notify_url_processed(lease.url)
+            else:
+                self._logger.log(
+                    f"Reclaimed the lease of {lease.url} after attempt {lease.attempt},"
+                    " queueing it again",
+                    severity=Logger.Severity.INFO,
+                )
+                self.requeued_url_count += 1
+                self._repository.requeue_url(lease.url)
+        for index, worker in enumerate(self._workers):
+            if worker.failed and not worker.is_alive():
+                self._logger.log(
+                    f"Restarting crashed worker {worker.name}",
+                    severity=Logger.Severity.INFO,
+                )
+                self._workers[index] = worker.restart()
+                self.restarted_worker_count += 1
+
+    def _replace_stuck_worker(self, worker: Crawler, url: URL) -> None:
+        """
+        Args:
+            worker (Crawler): Worker still running past the lease of its URL.
+            url (URL): URL of the lease.
+        """
+        if worker.abandoned_url is not None or worker not in self._workers:
+            return
+        self._repository.hold_concurrency_slot(url)
+        worker.abandon(url)
+        self._logger.log(
+            f"Replacing worker {worker.name}, stuck on {url}",
+            severity=Logger.Severity.ERROR,
+        )
+        self._workers[self._workers.index(worker)] = worker.restart()
+        self.replaced_worker_count += 1
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.supervise()
+
+    def stop(self) -> None:
+        """Stop supervising the workers."""
+        self._stopped.set()
+        self.join()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.restarted_worker_count} worker(s) restarted,"
+            f" {self.replaced_worker_count} stuck worker(s) replaced,"
+            f" {self.requeued_url_count} URL(s) queued again,"
+            f" {len(self.abandoned_urls)} URL(s) given up on"
+        )
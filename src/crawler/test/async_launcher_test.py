@@ -0,0 +1,208 @@
+"""asyncio crawler launcher tests"""
+
+import asyncio
+
+from crawler.async_launcher import AsyncCrawlerLauncher
+from crawler.launcher import CrawlerLauncherOptions
+from crawler.test.launcher_test import mock_links_under_url
+from models.url import URL
+
+
+async def mock_async_links_under_url(url, record=None):
+    """
+    Async wrapper around the mocked web used by the threaded launcher tests.
+
+    Args:
+        url (URL): url to use to get linked urls
+        record (PageRecord | None): Record of the page, if streamed
+    """
+    return mock_links_under_url(url, record)
+
+
+def test_async_crawler_launcher(mocker):
+    """
+    Test that the asyncio engine crawls the same mock web as the threaded engine,
+    without a blocking HTTP client as sitemaps are not loaded.
+    """
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=mock_async_links_under_url,
+    )
+    http_client = mocker.patch("crawler.async_launcher.HTTPClient")
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        skip_links_found=False,
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+        task_count=16,
+    )
+
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    http_client.assert_not_called()
+    assert set(visited_urls) == {
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+        URL("https://website.com"),
+    }
+
+
+def test_async_crawler_launcher_seeded_from_sitemaps(mocker):
+    """
+    Test that the asyncio engine crawls the in-scope URLs listed in sitemaps,
+    loaded while the crawler tasks run with a blocking HTTP client closed at the
+    end of the crawl.
+    """
+    http_client = mocker.patch("crawler.async_launcher.HTTPClient")
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=mock_async_links_under_url,
+    )
+    mocker.patch(
+        "crawler.launcher.SitemapLoader.load",
+        return_value=iter(
+            [URL("https://website.com/listed"), URL("https://other.com/page")]
+        ),
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+        sitemaps=True,
+    )
+
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 8
+    assert URL("https://website.com/listed") in visited_urls
+    http_client.return_value.close.assert_called_once()
+
+
+def test_async_crawler_launcher_wth_invalid_url(mocker):
+    """
+    Test that the asyncio engine returns an empty list of URLs in case it is
+    seeded with an invalid URL.
+    """
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=mock_async_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("htx://invalid.com"),
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+    )
+
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    assert not visited_urls
+
+
+def test_async_crawler_launcher_with_budget(mocker):
+    """
+    Test that the asyncio engine stops at the maximum number of pages, and follows
+    links up to the maximum depth.
+    """
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=mock_async_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+        task_count=1,
+        frontier=CrawlerLauncherOptions.Frontier.PRIORITY,
+        max_pages=2,
+    )
+
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 2
+    assert URL("https://website.com") in visited_urls
+
+    options.max_pages = None
+    options.max_depth = 1
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    assert set(visited_urls) == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+    }
+
+
+def test_async_crawler_launcher_streams_page_records(mocker):
+    """
+    Test that the asyncio engine streams the record of every page, crawler tasks
+    waiting for a slow consumer without blocking the event loop.
+    """
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=mock_async_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+        task_count=4,
+    )
+
+    records = list(AsyncCrawlerLauncher(options).crawl_stream(max_pending=1))
+
+    assert {record.url for record in records} == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+    }
+    assert [record.status for record in records].count(200) == 3
+
+
+def test_async_crawler_launcher_recovers_failed_and_stuck_crawls(mocker):
+    """
+    Test that a crawl failing on an unexpected exception, or never returning, is
+    queued again until it failed `max_attempts` times, so that the crawl still ends
+    and the crawler tasks keep running.
+    """
+    failed_addresses = []
+
+    async def fail_once_or_hang(url, record=None):
+        if (
+            url.address == "https://website.com/a"
+            and url.address not in failed_addresses
+        ):
+            failed_addresses.append(url.address)
+            raise RuntimeError("Unexpected parser error")
+        if url.address == "https://website.com/xyz":
+            await asyncio.Event().wait()
+        return mock_links_under_url(url, record)
+
+    mocker.patch(
+        "crawler.async_launcher.AsyncHTMLParserService.get_links_under_url",
+        side_effect=fail_once_or_hang,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        engine=CrawlerLauncherOptions.Engine.ASYNC,
+        task_count=2,
+        lease_timeout=0.1,
+        max_attempts=2,
+    )
+
+    visited_urls = AsyncCrawlerLauncher(options).crawl()
+
+    # /xyz is given up on after timing out twice, it is still reported as visited.
+    assert failed_addresses == ["https://website.com/a"]
+    assert set(visited_urls) == {
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+        URL("https://website.com"),
+    }
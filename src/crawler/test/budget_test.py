@@ -0,0 +1,80 @@
+"""Crawl budget tests"""
+
+import threading
+import time
+
+from crawler.budget import CrawlBudget
+from models.url import URL
+
+
+def test_budget_stops_after_max_pages():
+    """Test that no more than the maximum number of pages are reserved"""
+    budget = CrawlBudget(max_pages=2)
+
+    reservations = [budget.reserve_page() for _ in range(3)]
+
+    assert reservations == [True, True, False]
+    assert budget.exhausted_limit == CrawlBudget.Limit.PAGES
+
+
+def test_budget_page_released_can_be_reserved_again():
+    """Test that a reservation given back, e.g. by a deferred page, is not lost"""
+    budget = CrawlBudget(max_pages=2)
+
+    assert budget.reserve_page()
+    budget.release_page()
+    reservations = [budget.reserve_page() for _ in range(3)]
+
+    assert reservations == [True, True, False]
+
+
+def test_budget_stops_after_max_bytes():
+    """Test that the byte limit stops the crawl once reached"""
+    budget = CrawlBudget(max_bytes=1000)
+
+    budget.record_bytes(600)
+    assert budget.reserve_page()
+    budget.record_bytes(600)
+
+    assert not budget.reserve_page()
+    assert budget.exhausted_limit == CrawlBudget.Limit.BYTES
+
+
+def test_budget_depth_limit():
+    """Test that the depth limit does not stop the crawl"""
+    budget = CrawlBudget(max_depth=1)
+
+    assert budget.is_within_depth(1)
+    assert not budget.is_within_depth(2)
+    assert budget.reserve_page()
+
+
+def test_budget_wait_until_done():
+    """
+    Test that waiting returns once all URLs are processed without reaching a limit,
+    and at the time limit otherwise.
+    """
+    budget = CrawlBudget(max_seconds=10)
+    budget.wait_until_done(lambda: True)
+    assert budget.exhausted_limit is None
+
+    budget = CrawlBudget(max_seconds=0.1)
+    thread_count = threading.active_count()
+    started_at = time.monotonic()
+    budget.wait_until_done(lambda: False)
+    assert time.monotonic() - started_at < 5
+    assert budget.exhausted_limit == CrawlBudget.Limit.TIME
+    assert not budget.reserve_page()
+    # No thread is left waiting for the URLs to be processed.
+    assert threading.active_count() == thread_count
+
+
+def test_budget_str():
+    """Test the summary of a budget"""
+    budget = CrawlBudget(max_pages=1)
+    budget.record_bytes(10)
+    budget.record_page(URL("https://a.com"))
+
+    assert (
+        str(budget) == "1 page(s) crawled, 10 byte(s) downloaded, pages limit reached"
+    )
@@ -1,8 +1,11 @@
 """Test for the crawler worker functionality"""
 
 from unittest.mock import Mock
+import pytest
+from crawler.budget import CrawlBudget
 from crawler.crawler import Crawler, CrawlerOptions
 from models.url import URL
+from service.fetch_policy import CircuitOpenError
 
 
 def test_crawler_run_with_next_url(mocker):
@@ -34,7 +37,9 @@ def test_crawler_run_with_next_url(mocker):
     assert next_url_status is True
     assert mock_repo.get_next_url.call_count == 1
     assert mock_repo.notify_url_processed.call_count == 1
-    assert mock_repo.add_url_to_crawl.call_count == 2
+    mock_repo.add_urls_to_crawl.assert_called_once_with(
+        [URL("https://website.com/b"), URL("https://website.com/c")]
+    )
 
 
 def test_crawler_run_with_termination_signal(mocker):
@@ -66,4 +71,74 @@ def test_crawler_run_with_termination_signal(mocker):
     assert next_url_status is False
     assert mock_repo.get_next_url.call_count == 1
     assert mock_repo.notify_url_processed.call_count == 0
-    assert mock_repo.add_url_to_crawl.call_count == 0
+    assert mock_repo.add_urls_to_crawl.call_count == 0
+
+
+def test_crawler_run_with_spent_budget(mocker):
+    """
+    Test that a crawler worker stops once the crawl budget is spent, putting the URL
+    it was handed back in the queue rather than leaving it unaccounted for.
+    """
+    mock_html_service = mocker.patch("crawler.crawler.HTMLParserService")
+    mock_repo = mocker.patch("crawler.crawler.Repository")
+    mock_repo.get_next_url.return_value = URL("https://website.com/a")
+    options = CrawlerOptions(base_url_hostname="website.com", skip_links_found=False)
+    budget = CrawlBudget(max_pages=0)
+    crawler_worker = Crawler(
+        0, mock_repo, mock_html_service, options, Mock(), budget=budget
+    )
+
+    assert crawler_worker.crawl_next_url() is False
+    mock_repo.requeue_url.assert_called_once_with(URL("https://website.com/a"))
+    assert mock_repo.notify_url_processed.call_count == 0
+    assert mock_html_service.get_links_under_url.call_count == 0
+
+
+def test_crawler_defers_url_of_open_circuit(mocker):
+    """
+    Test that a URL whose host has an open circuit is queued again once the circuit
+    is half-open, rather than reported as processed without links.
+    """
+    mock_html_service = mocker.patch("crawler.crawler.HTMLParserService")
+    mock_repo = mocker.patch("crawler.crawler.Repository")
+    mock_repo.get_next_url.return_value = URL("https://website.com/a")
+    mock_html_service.get_links_under_url.side_effect = CircuitOpenError(
+        "website.com", 12.5
+    )
+    options = CrawlerOptions(base_url_hostname="website.com", skip_links_found=False)
+    crawler_worker = Crawler(0, mock_repo, mock_html_service, options, Mock())
+
+    assert crawler_worker.crawl_next_url() is True
+    assert mock_repo.notify_url_processed.call_count == 0
+    assert mock_repo.requeue_url.call_count == 0
+    watch = mock_html_service.fetch_policy.watchdog.watch
+    retry_at, requeue = watch.call_args.args
+    assert retry_at == 12.5
+    requeue()
+    mock_repo.requeue_url.assert_called_once_with(URL("https://website.com/a"))
+
+
+@pytest.mark.parametrize(
+    "test_address,allow_subdomains,expected_in_scope",
+    [
+        ("https://website.com/a", False, True),
+        ("https://other.com/a", False, True),
+        ("https://blog.other.com/a", False, False),
+        ("https://blog.other.com/a", True, True),
+        ("https://notother.com/a", True, False),
+        ("https://xyz.com/a", True, False),
+        ("htx://website.com/a", True, False),
+    ],
+)
+def test_crawler_options_scope(test_address, allow_subdomains, expected_in_scope):
+    """
+    Test that only valid URLs of the allowed hostnames (and optionally
+    their subdomains) are considered in scope for crawling.
+    """
+    options = CrawlerOptions(
+        base_url_hostname="website.com",
+        skip_links_found=False,
+        allowed_hostnames={"other.com"},
+        allow_subdomains=allow_subdomains,
+    )
+    assert options.is_url_in_scope(URL(test_address)) == expected_in_scope
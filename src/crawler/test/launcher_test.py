@@ -1,10 +1,19 @@
 """Crawler launcher tests"""
 
+import socket
+import time
+from threading import Event, Thread
+
+import pytest
 from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from crawler.link_graph import LinkGraph
 from models.url import URL
+from repository.host_repository import HostPartitionedRepository
+from repository.state_store import CrawlStateStore
+from service.fetch_policy import CircuitOpenError
 
 
-def mock_links_under_url(url):
+def mock_links_under_url(url, record=None):
     """
     Mimics a web page and the links it redirects to.
     In this simple example, the explored pages are
@@ -12,6 +21,7 @@ def mock_links_under_url(url):
     website.com/a/c -> website.com/a/d -> website.com/a/w]
     Args:
         url (URL): url to use to get linked urls
+        record (PageRecord | None): Record of the page, if streamed
     """
     mock_pages = {
         URL("https://website.com"): {
@@ -43,6 +53,8 @@ def mock_links_under_url(url):
 
     # return an empty list if we the page is empty for a URL for any reason.
     # e.g. when crawling `website.a.w`, return an empty set.
+    if record is not None:
+        record.status = 200 if url in mock_pages else 404
     return mock_pages.get(url, set())
 
 
@@ -100,3 +112,733 @@ def test_crawler_launcher_wth_invalid_url(mocker):
 
     # Assert that the crawled URLs are as expected
     assert not visited_urls
+
+
+def test_crawler_launcher_with_several_seed_hosts(mocker):
+    """
+    Test that a crawl seeded with several hosts explores all of them
+    through the per-host frontier, without leaving their hostnames.
+    """
+    mock_pages = {
+        URL("https://website.com"): {
+            URL("https://website.com/a"),
+            URL("https://other.com/b"),
+            URL("https://third.com/c"),
+        },
+        URL("https://other.com"): {
+            URL("https://other.com/b"),
+            URL("https://blog.other.com/d"),
+        },
+    }
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=lambda url: mock_pages.get(url, set()),
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        seed_urls=[URL("https://other.com")],
+        thread_count=4,
+        frontier=CrawlerLauncherOptions.Frontier.PER_HOST,
+        per_host_concurrency=2,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert set(visited_urls) == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://other.com"),
+        URL("https://other.com/b"),
+    }
+
+
+@pytest.mark.parametrize(
+    "dedupe",
+    [
+        CrawlerLauncherOptions.Dedupe.FINGERPRINT_64,
+        CrawlerLauncherOptions.Dedupe.FINGERPRINT_128,
+        CrawlerLauncherOptions.Dedupe.BLOOM,
+    ],
+)
+def test_crawler_launcher_with_compact_dedupe(mocker, dedupe):
+    """
+    Test that the compact dedupe backends crawl the mock web exactly like
+    the default exact backend.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        dedupe=dedupe,
+        bloom_capacity=1000,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert set(visited_urls) == {
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+        URL("https://website.com"),
+    }
+
+
+@pytest.mark.parametrize(
+    "dedupe",
+    [CrawlerLauncherOptions.Dedupe.EXACT, CrawlerLauncherOptions.Dedupe.FINGERPRINT_64],
+)
+def test_crawler_launcher_with_sharded_frontier(mocker, dedupe):
+    """
+    Test that the sharded work-stealing frontier crawls the mock web exactly
+    like the default FIFO frontier.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        frontier=CrawlerLauncherOptions.Frontier.SHARDED,
+        shard_count=4,
+        dedupe=dedupe,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 7
+    assert set(visited_urls) == {
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+        URL("https://website.com"),
+    }
+
+
+@pytest.mark.parametrize(
+    "frontier",
+    [CrawlerLauncherOptions.Frontier.FIFO, CrawlerLauncherOptions.Frontier.SHARDED],
+)
+def test_crawler_launcher_resumes_checkpointed_crawl(mocker, tmp_path, frontier):
+    """
+    Test that resuming a crawl from its checkpointed state only crawls the URLs
+    that were not processed, and ends with the same visited URLs.
+    """
+    get_links_under_url = mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    # State of a crawl interrupted after processing the first two pages.
+    state_store = CrawlStateStore(str(tmp_path))
+    for url in mock_links_under_url(URL("https://website.com")) | {
+        URL("https://website.com"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/d"),
+    }:
+        if url.is_valid and url.subdomain == "website.com":
+            state_store.record_discovered(url)
+    state_store.record_processed(URL("https://website.com"))
+    state_store.record_processed(URL("https://website.com/a"))
+    state_store.close()
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        frontier=frontier,
+        state_dir=str(tmp_path),
+        resume=True,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    crawled_urls = {call.args[0] for call in get_links_under_url.call_args_list}
+    assert crawled_urls == {
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+    }
+    assert set(visited_urls) == crawled_urls | {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+    }
+    resumed_state_store = CrawlStateStore(str(tmp_path))
+    assert all(processed for _, processed in resumed_state_store.load())
+    resumed_state_store.close()
+
+
+def test_distributed_crawler_launcher(mocker):
+    """
+    Test that nodes of a distributed crawl, each in its own thread, together crawl
+    the mock web exactly like a single launcher, each URL on a single node.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    sockets = [socket.socket() for _ in range(3)]
+    for node_socket in sockets:
+        node_socket.bind(("127.0.0.1", 0))
+    peers = [":".join(map(str, node_socket.getsockname())) for node_socket in sockets]
+    for node_socket in sockets:
+        node_socket.close()
+    visited_urls = [[] for _ in peers]
+
+    def run_node(node_id):
+        options = CrawlerLauncherOptions(
+            base_url=URL("https://website.com"),
+            thread_count=2,
+            node_id=node_id,
+            peers=peers,
+        )
+        visited_urls[node_id] = CrawlerLauncher(options).crawl()
+
+    nodes = [Thread(target=run_node, args=(node_id,)) for node_id in range(3)]
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.join()
+
+    assert sum(len(urls) for urls in visited_urls) == 7
+    assert set().union(*visited_urls) == {
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+        URL("https://website.com/a/c"),
+        URL("https://website.com/a/w"),
+        URL("https://website.com/a/d"),
+        URL("https://website.com"),
+    }
+
+
+def test_distributed_crawler_launcher_streams_pages(mocker):
+    """
+    Test that nodes of a distributed crawl can stream their pages, which waits
+    for the end of the crawl through a crawl budget without limits.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    sockets = [socket.socket() for _ in range(2)]
+    for node_socket in sockets:
+        node_socket.bind(("127.0.0.1", 0))
+    peers = [":".join(map(str, node_socket.getsockname())) for node_socket in sockets]
+    for node_socket in sockets:
+        node_socket.close()
+    streamed_urls = [[] for _ in peers]
+
+    def run_node(node_id):
+        options = CrawlerLauncherOptions(
+            base_url=URL("https://website.com"),
+            thread_count=2,
+            node_id=node_id,
+            peers=peers,
+        )
+        streamed_urls[node_id] = [
+            record.url for record in CrawlerLauncher(options).crawl_stream()
+        ]
+
+    nodes = [Thread(target=run_node, args=(node_id,)) for node_id in range(2)]
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.join(timeout=30)
+
+    assert not any(node.is_alive() for node in nodes)
+    assert sum(len(urls) for urls in streamed_urls) == 7
+    assert len(set().union(*streamed_urls)) == 7
+
+
+@pytest.mark.parametrize(
+    "frontier",
+    [CrawlerLauncherOptions.Frontier.FIFO, CrawlerLauncherOptions.Frontier.SHARDED],
+)
+def test_crawler_launcher_records_metrics(mocker, frontier):
+    """
+    Test that the metrics of a crawl count every page crawled, and every link
+    found either as a new URL or as a dedupe hit.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    crawl_metrics = mocker.spy(CrawlerLauncherOptions, "crawl_metrics")
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        frontier=frontier,
+        metrics_interval=60.0,
+    )
+
+    CrawlerLauncher(options).crawl()
+
+    metrics = crawl_metrics.spy_return
+    assert metrics.pages_crawled.total == 7
+    assert metrics.urls_discovered.total == 7
+    # In-scope links found on the three pages with links, and the seed URL.
+    assert metrics.urls_discovered.total + metrics.urls_duplicate.total == 10
+    assert metrics.frontier_size == 0
+
+
+@pytest.mark.parametrize(
+    "frontier",
+    [CrawlerLauncherOptions.Frontier.FIFO, CrawlerLauncherOptions.Frontier.PRIORITY],
+)
+def test_crawler_launcher_with_max_depth(mocker, frontier):
+    """Test that links further than the maximum depth from the seed are not crawled"""
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        frontier=frontier,
+        max_depth=1,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert set(visited_urls) == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+    }
+
+
+def test_crawler_launcher_with_max_pages_crawls_by_priority(mocker):
+    """
+    Test that a crawl stops at the maximum number of pages, returning the pages
+    crawled, and that the priority frontier crawls the shortest paths first.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=1,
+        frontier=CrawlerLauncherOptions.Frontier.PRIORITY,
+        priority=CrawlerLauncherOptions.Priority.PATH_LENGTH,
+        max_pages=4,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert set(visited_urls) == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://website.com/b"),
+        URL("https://website.com/xyz"),
+    }
+
+
+def test_crawler_launcher_stops_at_max_seconds(mocker):
+    """Test that a crawl of an endless site stops promptly at the time limit"""
+
+    def endless_links_under_url(url):
+        time.sleep(0.01)
+        return {URL(f"{url.address}/{index}") for index in range(2)}
+
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=endless_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=4, max_seconds=0.5
+    )
+
+    started_at = time.monotonic()
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert time.monotonic() - started_at < 2
+    assert URL("https://website.com") in visited_urls
+    assert 0 < len(visited_urls) < 1000
+
+
+def test_crawler_launcher_with_adaptive_concurrency(mocker):
+    """Test that a crawl with an adaptive concurrency limit crawls the whole site"""
+    mocker.patch(
+        "crawler.launcher.HTMLParserService._fetch_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=4,
+        adaptive_concurrency=True,
+        min_concurrency=2,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 7
+    assert URL("https://website.com/a/d") in visited_urls
+
+
+def test_crawler_launcher_seeded_from_sitemaps(mocker):
+    """
+    Test that the in-scope URLs listed in sitemaps are crawled alongside the pages
+    linked from the base URL, that they are loaded while the base URL is crawled,
+    and that the lastmod priority crawls the most recently modified ones first.
+    """
+    sitemap_urls = [
+        URL("https://website.com/old"),
+        URL("https://website.com/new"),
+        URL("https://other.com/page"),  # Not explored, different host
+        URL("https://website.com/a"),
+    ]
+    for day, url in enumerate(sitemap_urls):
+        url.lastmod = 1_700_000_000 + day * 86400
+    crawl_started = Event()
+    sitemaps_loaded = Event()
+    loaded_after_crawl_started = []
+
+    def load_sitemaps(_):
+        loaded_after_crawl_started.append(crawl_started.wait(5))
+        yield from sitemap_urls
+        sitemaps_loaded.set()
+
+    def links_under_url(url):
+        if url == URL("https://website.com"):
+            crawl_started.set()
+            sitemaps_loaded.wait(5)
+        return mock_links_under_url(url)
+
+    mocker.patch("crawler.launcher.SitemapLoader.load", side_effect=load_sitemaps)
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=1,
+        sitemaps=True,
+        frontier=CrawlerLauncherOptions.Frontier.PRIORITY,
+        priority=CrawlerLauncherOptions.Priority.LASTMOD,
+        max_pages=4,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert loaded_after_crawl_started == [True]
+    assert set(visited_urls) == {
+        URL("https://website.com"),
+        URL("https://website.com/a"),
+        URL("https://website.com/new"),
+        URL("https://website.com/old"),
+    }
+
+    options.max_pages = None
+    crawl_started.clear()
+    sitemaps_loaded.clear()
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 9
+    assert URL("https://other.com/page") not in visited_urls
+
+
+def test_crawler_launcher_contains_crawler_traps(mocker):
+    """
+    Test that a crawl of an endless site ends by itself once its links are deeper
+    than the maximum path depth, and that the links of near-duplicate pages are
+    still filtered and followed.
+    """
+
+    def endless_links_under_url(url):
+        return {URL(f"{url.address.rstrip('/')}/{index}") for index in range(2)}
+
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=endless_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=4, max_path_depth=3
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 1 + 2 + 4 + 8
+
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=lambda url: mock_links_under_url(url)
+        or {
+            URL(f"https://website.com/nav/{index}?sid={url.address}")
+            for index in range(10)
+        },
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=1,
+        near_duplicate_distance=3,
+        max_urls_per_pattern=25,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    # Every page without links of its own links to the same navigation, with a
+    # session ID of its own. The links of near-duplicates are still followed,
+    # until the pattern cap cuts the navigation off.
+    assert len(visited_urls) == 7 + 25
+
+
+def test_crawler_launcher_streams_page_records(mocker):
+    """
+    Test that the record of every page is streamed with its status, depth and
+    links, and that closing the stream early stops the crawl.
+    """
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=4
+    )
+
+    records = {record.url: record for record in CrawlerLauncher(options).crawl_stream()}
+
+    assert len(records) == 7
+    assert records[URL("https://website.com")].status == 200
+    assert records[URL("https://website.com")].depth == 0
+    assert set(records[URL("https://website.com/a")].links) == mock_links_under_url(
+        URL("https://website.com/a")
+    )
+    assert records[URL("https://website.com/a/c")].status == 404
+    assert records[URL("https://website.com/a/c")].depth == 2
+
+    stream = CrawlerLauncher(options).crawl_stream(max_pending=1)
+    assert next(stream).url == URL("https://website.com")
+    stream.close()
+
+
+def test_crawler_launcher_survives_failing_page_callback(mocker):
+    """Test that a page callback raising does not stop the crawl"""
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=4
+    )
+
+    def on_page(record):
+        raise OSError(f"No space left on device for {record.url}")
+
+    assert len(CrawlerLauncher(options).crawl(on_page)) == 7
+
+
+def test_crawler_launcher_exports_link_graph(mocker, tmp_path):
+    """Test that the in-scope links of every page crawled are exported"""
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=mock_links_under_url,
+    )
+    path = str(tmp_path / "graph.npz")
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=4, link_graph_path=path
+    )
+
+    CrawlerLauncher(options).crawl()
+    graph = LinkGraph.load(path)
+
+    assert graph.page_count == graph.node_count == 7
+    assert graph.link_count == 3 + 3 + 3
+    assert graph.orphan_urls() == [URL("https://website.com")]
+    assert graph.in_degree()[graph.node_id(URL("https://website.com/xyz"))] == 3
+
+
+def mock_failing_links_under_url(failing_url, failure_count, failure):
+    """
+    Mimics the web of `mock_links_under_url`, where fetching a URL fails a number
+    of times before succeeding.
+
+    Args:
+        failing_url (URL): URL failing to be fetched.
+        failure_count (int): Number of times it fails.
+        failure (Callable[[], None]): Function called instead of fetching it,
+            raising or blocking.
+
+    Returns:
+        tuple[Callable, list[URL]]: Mocked fetch, and every URL it was called with.
+    """
+    fetched_urls = []
+
+    def links_under_url(url, record=None):
+        fetched_urls.append(url)
+        if url == failing_url and fetched_urls.count(url) <= failure_count:
+            failure()
+        return mock_links_under_url(url, record)
+
+    return links_under_url, fetched_urls
+
+
+def crash():
+    """Kill the crawler worker fetching the page."""
+    raise RuntimeError("Worker crashed")
+
+
+@pytest.mark.parametrize(
+    "frontier",
+    [
+        CrawlerLauncherOptions.Frontier.FIFO,
+        CrawlerLauncherOptions.Frontier.PER_HOST,
+        CrawlerLauncherOptions.Frontier.SHARDED,
+    ],
+)
+def test_crawler_launcher_restarts_crashed_worker(mocker, frontier):
+    """
+    Test that a URL whose worker crashed is leased again to another worker,
+    the crashed worker is restarted, and the crawl ends.
+    """
+    links_under_url, fetched_urls = mock_failing_links_under_url(
+        URL("https://website.com/a"), 1, crash
+    )
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=links_under_url,
+    )
+    supervisors = []
+    worker_supervisor = CrawlerLauncherOptions.worker_supervisor
+
+    def spy_worker_supervisor(*args):
+        supervisors.append(worker_supervisor(*args))
+        return supervisors[-1]
+
+    mocker.patch.object(
+        CrawlerLauncherOptions, "worker_supervisor", spy_worker_supervisor
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=2,
+        frontier=frontier,
+        lease_timeout=1.0,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert len(visited_urls) == 7
+    assert fetched_urls.count(URL("https://website.com/a")) == 2
+    assert fetched_urls.count(URL("https://website.com/a/d")) == 1
+    assert supervisors[0].restarted_worker_count == 1
+    assert supervisors[0].requeued_url_count == 1
+
+
+@pytest.mark.parametrize(
+    "frontier",
+    [
+        CrawlerLauncherOptions.Frontier.FIFO,
+        CrawlerLauncherOptions.Frontier.PER_HOST,
+        CrawlerLauncherOptions.Frontier.SHARDED,
+    ],
+)
+def test_crawler_launcher_replaces_worker_stuck_forever(mocker, frontier):
+    """
+    Test that a worker whose fetch never returns is replaced once its lease
+    expired, so that its URL is crawled by another worker and the crawl ends with
+    the stuck worker still blocked, and that the per-host frontier keeps counting
+    the stuck request against the concurrency of its host.
+    """
+    stuck = Event()
+    links_under_url, fetched_urls = mock_failing_links_under_url(
+        URL("https://website.com/b"), 1, stuck.wait
+    )
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=links_under_url,
+    )
+    supervisors = []
+    worker_supervisor = CrawlerLauncherOptions.worker_supervisor
+
+    def spy_worker_supervisor(*args):
+        supervisors.append(worker_supervisor(*args))
+        return supervisors[-1]
+
+    mocker.patch.object(
+        CrawlerLauncherOptions, "worker_supervisor", spy_worker_supervisor
+    )
+    hold_concurrency_slot = mocker.spy(
+        HostPartitionedRepository, "hold_concurrency_slot"
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=2,
+        frontier=frontier,
+        per_host_concurrency=2,
+        lease_timeout=0.2,
+    )
+
+    visited_urls = []
+    crawl = Thread(target=lambda: visited_urls.extend(CrawlerLauncher(options).crawl()))
+    crawl.start()
+    crawl.join(timeout=10)
+    stuck.set()
+
+    assert not crawl.is_alive()
+    assert len(visited_urls) == 7
+    assert fetched_urls.count(URL("https://website.com/b")) == 2
+    assert fetched_urls.count(URL("https://website.com/a/w")) == 1
+    assert supervisors[0].replaced_worker_count == 1
+    assert hold_concurrency_slot.call_count == (
+        frontier == CrawlerLauncherOptions.Frontier.PER_HOST
+    )
+
+
+def test_crawler_launcher_page_limit_counts_deferred_page_once(mocker):
+    """
+    Test that a page deferred as the circuit of its host is open gives its page
+    reservation back, so that a crawl limited to as many pages as the web has
+    still crawls all of them.
+    """
+
+    def circuit_open():
+        raise CircuitOpenError("website.com", time.monotonic() + 0.05)
+
+    links_under_url, fetched_urls = mock_failing_links_under_url(
+        URL("https://website.com/a"), 1, circuit_open
+    )
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"), thread_count=2, max_pages=7
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert fetched_urls.count(URL("https://website.com/a")) == 2
+    assert len(visited_urls) == 7
+
+
+def test_crawler_launcher_gives_up_after_max_attempts(mocker):
+    """Test that a URL crashing every worker is given up on, and the crawl ends"""
+    links_under_url, fetched_urls = mock_failing_links_under_url(
+        URL("https://website.com/a"), 10, crash
+    )
+    mocker.patch(
+        "crawler.launcher.HTMLParserService.get_links_under_url",
+        side_effect=links_under_url,
+    )
+    options = CrawlerLauncherOptions(
+        base_url=URL("https://website.com"),
+        thread_count=2,
+        lease_timeout=1.0,
+        max_attempts=2,
+    )
+
+    visited_urls = CrawlerLauncher(options).crawl()
+
+    assert fetched_urls.count(URL("https://website.com/a")) == 2
+    assert URL("https://website.com/a/d") not in visited_urls
+    assert URL("https://website.com/a/w") in visited_urls
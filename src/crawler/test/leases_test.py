@@ -0,0 +1,47 @@
+"""Lease table tests"""
+
+import time
+from threading import Thread, current_thread
+
+from crawler.leases import LeaseTable
+from models.url import URL
+
+
+def test_lease_table_releases_held_leases():
+    """Test that a lease is released once, and no longer reclaimed"""
+    leases = LeaseTable(timeout=60.0)
+    lease = leases.acquire(URL("https://website.com"), current_thread())
+
+    assert lease.attempt == 1
+    assert len(leases) == 1
+    assert leases.release(lease)
+    assert not leases.release(lease)
+    assert not leases.reclaim()
+
+
+def test_lease_table_reclaims_expired_leases():
+    """
+    Test that an expired lease is reclaimed, counted as an attempt when the URL is
+    leased again, and no longer released by its worker.
+    """
+    leases = LeaseTable(timeout=0.01)
+    url = URL("https://website.com")
+    lease = leases.acquire(url, current_thread())
+    time.sleep(0.02)
+
+    assert leases.reclaim() == [lease]
+    assert not leases.release(lease)
+    assert leases.acquire(url, current_thread()).attempt == 2
+
+
+def test_lease_table_reclaims_leases_of_dead_workers():
+    """Test that the lease of a worker no longer running is reclaimed before expiry"""
+    leases = LeaseTable(timeout=60.0)
+    worker = Thread(target=lambda: None)
+    worker.start()
+    worker.join()
+    lease = leases.acquire(URL("https://website.com"), worker)
+    leases.acquire(URL("https://website.com/a"), current_thread())
+
+    assert leases.reclaim() == [lease]
+    assert len(leases) == 1
@@ -0,0 +1,88 @@
+"""Link graph tests"""
+
+import numpy as np
+from crawler.link_graph import LinkGraph
+from models.url import URL
+
+
+def site_graph() -> LinkGraph:
+    """
+    Graph of a site whose pages all link back to its home page, a page only
+    reached from a sitemap, and a page linked to but not crawled.
+    """
+    graph = LinkGraph()
+    home = URL("https://website.com")
+    pages = [URL(f"https://website.com/{name}") for name in ("a", "b", "c")]
+    graph.add_page(home, pages[:2] + [home])
+    graph.add_page(pages[0], [home, pages[1], pages[2]])
+    graph.add_page(pages[1], [home])
+    graph.add_page(URL("https://website.com/sitemap-only"), [home])
+    # Recrawled page, whose links are only kept once.
+    graph.add_page(pages[1], [home])
+    return graph
+
+
+def dense_pagerank(adjacency: np.ndarray, damping: float = 0.85) -> np.ndarray:
+    """Reference PageRank computed with a dense transition matrix"""
+    node_count = len(adjacency)
+    out_degree = adjacency.sum(axis=1)
+    transitions = np.where(
+        out_degree[:, None] > 0,
+        adjacency / np.maximum(out_degree, 1)[:, None],
+        1 / node_count,
+    )
+    ranks = np.full(node_count, 1 / node_count)
+    for _ in range(200):
+        ranks = (1 - damping) / node_count + damping * ranks @ transitions
+    return ranks
+
+
+def test_link_graph_csr():
+    """Test that links are deduped, ordered by source, and links to self dropped"""
+    graph = site_graph()
+
+    indptr, indices = graph.to_csr()
+
+    assert graph.node_count == 5
+    assert graph.page_count == 4
+    assert graph.link_count == 8
+    assert indptr.tolist() == [0, 2, 5, 6, 6, 7]
+    assert [graph.url(node_id).address for node_id in indices[:2]] == [
+        "https://website.com/a",
+        "https://website.com/b",
+    ]
+    assert graph.in_degree().tolist() == [3, 1, 2, 1, 0]
+    assert graph.orphan_urls() == [URL("https://website.com/sitemap-only")]
+
+
+def test_link_graph_pagerank():
+    """Test PageRank against a dense computation, pages not crawled included"""
+    graph = site_graph()
+    indptr, indices = graph.to_csr()
+    adjacency = np.zeros((graph.node_count, graph.node_count))
+    for source in range(graph.node_count):
+        adjacency[source, indices[indptr[source] : indptr[source + 1]]] = 1
+
+    ranks = graph.pagerank(tolerance=1e-12)
+
+    assert np.allclose(ranks, dense_pagerank(adjacency))
+    assert np.isclose(ranks.sum(), 1)
+    assert ranks.argmax() == graph.node_id(URL("https://website.com"))
+    assert not LinkGraph().pagerank().size
+
+
+def test_link_graph_saved_and_loaded(tmp_path):
+    """Test that a graph is restored from its archive, and can be grown further"""
+    graph = site_graph()
+    path = str(tmp_path / "graph.npz")
+
+    graph.save(path)
+    loaded_graph = LinkGraph.load(path)
+
+    for array, loaded_array in zip(graph.to_csr(), loaded_graph.to_csr()):
+        assert array.tolist() == loaded_array.tolist()
+    assert loaded_graph.orphan_urls() == graph.orphan_urls()
+    assert loaded_graph.page_count == 4
+    loaded_graph.add_page(URL("https://website.com/c"), [URL("https://website.com")])
+    assert loaded_graph.node_count == 5
+    assert loaded_graph.in_degree()[0] == 4
@@ -0,0 +1,132 @@
+"""Page record output tests"""
+
+import bz2
+import csv
+import gzip
+import json
+import lzma
+from threading import Event
+
+import pytest
+from crawler.output import PageRecord, PageSink, open_page_sink, stream_pages
+from models.url import URL
+
+
+def page_record(address: str, status: int | None = 200) -> PageRecord:
+    """A record of a page linking to two others"""
+    record = PageRecord(URL(address))
+    record.status = status
+    record.links = [URL(f"{address}/a"), URL(f"{address}/b")]
+    record.fetch_seconds = 0.25
+    record.parse_seconds = 0.01
+    record.size = 1024
+    return record
+
+
+@pytest.mark.parametrize(
+    "file_name,opener",
+    [
+        ("pages.jsonl", open),
+        ("pages.jsonl.gz", gzip.open),
+        ("pages.json.bz2", bz2.open),
+        ("pages.jsonl.xz", lzma.open),
+    ],
+)
+def test_json_lines_page_sink(tmp_path, file_name, opener):
+    """Test that JSON lines are written, compressed according to the file name"""
+    path = str(tmp_path / file_name)
+    records = [page_record("https://website.com"), page_record("https://a.com", None)]
+
+    with open_page_sink(path) as sink:
+        for record in records:
+            sink.write(record)
+
+    with opener(path, "rt", encoding="utf-8") as stream:
+        rows = [json.loads(line) for line in stream]
+    assert rows == [record.as_dict() for record in records]
+    assert rows[1]["status"] is None
+    assert rows[0]["links"] == ["https://website.com/a", "https://website.com/b"]
+    assert sink.record_count == 2
+
+
+@pytest.mark.parametrize(
+    "file_name,opener",
+    [
+        ("pages.csv", open),
+        ("pages.csv.gz", gzip.open),
+        ("pages.csv.bz2", bz2.open),
+        ("pages.csv.xz", lzma.open),
+    ],
+)
+def test_csv_page_sink(tmp_path, file_name, opener):
+    """Test that CSV rows are written after a header, links separated by spaces"""
+    path = str(tmp_path / file_name)
+
+    with open_page_sink(path) as sink:
+        sink.write(page_record("https://website.com/a,b"))
+        sink.write(page_record("https://website.com", None))
+
+    with opener(path, "rt", encoding="utf-8", newline="") as stream:
+        rows = list(csv.DictReader(stream))
+    assert list(rows[0]) == list(PageRecord.FIELDS)
+    assert rows[0]["url"] == "https://website.com/a,b"
+    assert rows[0]["links"].split(" ") == [
+        "https://website.com/a,b/a",
+        "https://website.com/a,b/b",
+    ]
+    assert rows[0]["status"] == "200"
+    assert rows[1]["status"] == ""
+
+
+def test_page_sink_format_overrides_file_name(tmp_path):
+    """Test that the format given is used whatever the name of the file"""
+    path = str(tmp_path / "pages.txt")
+
+    with open_page_sink(path, PageSink.Format.CSV) as sink:
+        sink.write(page_record("https://website.com"))
+
+    with open(path, encoding="utf-8") as stream:
+        assert stream.readline().startswith("url,depth,status")
+
+
+def test_stream_pages():
+    """Test that every record is yielded, and errors of the crawl raised after"""
+
+    def crawl(on_page):
+        for index in range(10):
+            on_page(page_record(f"https://website.com/{index}"))
+        raise RuntimeError("Crawl failed")
+
+    stream = stream_pages(crawl, lambda: None, max_pending=2)
+
+    with pytest.raises(RuntimeError):
+        for index, record in enumerate(stream):
+            assert record.url == URL(f"https://website.com/{index}")
+    assert index == 9
+
+
+def test_stream_pages_closed_early():
+    """
+    Test that closing the stream stops the crawl, and unblocks the workers
+    waiting on the full queue of records until it ended.
+    """
+    stopped = Event()
+    crawl_ended = Event()
+    records_handed_out = []
+
+    def crawl(on_page):
+        while not stopped.is_set():
+            record = page_record(f"https://website.com/{len(records_handed_out)}")
+            records_handed_out.append(record)
+            on_page(record)
+        crawl_ended.set()
+
+    stream = stream_pages(crawl, stopped.set, max_pending=2)
+    assert next(stream).url == URL("https://website.com/0")
+
+    stream.close()
+
+    assert stopped.is_set()
+    assert crawl_ended.is_set()
+    # The crawl was held back by the full queue while the consumer was slow.
+    assert len(records_handed_out) <= 5
@@ -0,0 +1,129 @@
+"""Crawler trap guard tests"""
+
+import tracemalloc
+
+from crawler.traps import SimHashIndex, TrapGuard, link_feature, simhash, url_pattern
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+
+
+def nav_links(count: int) -> list[URL]:
+    """Links shared by every page of a site, e.g. its navigation"""
+    return [URL(f"https://website.com/section/{index}") for index in range(count)]
+
+
+def test_simhash_of_similar_link_sets():
+    """Test that similar link sets get close fingerprints, and others distant ones"""
+    links = [link_feature(url) for url in nav_links(40)]
+    fingerprint = simhash(links)
+
+    assert simhash(reversed(links)) == fingerprint
+    assert (simhash(links[:-1]) ^ fingerprint).bit_count() <= 10
+    unrelated_links = [f"https://other.com/{index}" for index in range(40)]
+    assert (simhash(unrelated_links) ^ fingerprint).bit_count() > 10
+
+
+def test_simhash_index_finds_near_duplicates():
+    """Test that fingerprints within the distance are found, whatever bits differ"""
+    index = SimHashIndex(max_distance=3)
+    fingerprint = 0x0123456789ABCDEF
+    index.add(fingerprint)
+
+    assert index.find(fingerprint ^ (1 << 63 | 1 << 31 | 1)) == fingerprint
+    assert index.find(fingerprint ^ 0b1111) is None
+    assert index.find(~fingerprint & (1 << 64) - 1) is None
+
+
+def test_url_pattern_and_link_feature():
+    """Test that variable path segments and query values are masked"""
+    assert url_pattern(URL("https://website.com/cal/2024/05?view=day&b=1&b=2")) == (
+        "website.com/cal/N/N?b&view"
+    )
+    assert url_pattern(URL("https://website.com/s/ab12cd/page")) == (
+        "website.com/s/N/page"
+    )
+    assert link_feature(URL("https://website.com/a?sid=123&page=2")) == (
+        "https://website.com/a?page&sid"
+    )
+
+
+def test_trap_guard_rejects_deep_and_repetitive_paths():
+    """Test the path depth and repeated segment heuristics"""
+    traps = TrapGuard(max_path_depth=4, max_repeated_segments=2)
+
+    assert traps.admit(URL("https://website.com/a/b/a/b"))
+    assert not traps.admit(URL("https://website.com/a/b/c/d/e"))
+    assert not traps.admit(URL("https://website.com/a/b/a/a"))
+    assert not traps.admit(URL("https://website.com/a/b/a/a"))
+
+    assert traps.rejections == {
+        TrapGuard.Reason.PATH_DEPTH: 1,
+        TrapGuard.Reason.REPEATED_SEGMENTS: 1,
+        TrapGuard.Reason.PATTERN_CAP: 0,
+    }
+    assert traps.rejected_url_count == 2
+
+
+def test_trap_guard_caps_distinct_urls_per_pattern():
+    """Test that the pattern cap counts distinct URLs, and keeps admitting them"""
+    metrics = CrawlMetrics()
+    traps = TrapGuard(max_urls_per_pattern=2, metrics=metrics)
+    days = [URL(f"https://website.com/calendar/{day}") for day in range(4)]
+
+    assert [traps.admit(url) for url in days[:2] + days] == [
+        True,
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert traps.admit(URL("https://website.com/calendar/0?view=week"))
+    assert traps.rejected_url_count == 2
+    assert "pattern_cap: 2" in str(traps)
+    assert 'crawler_trap_rejections_total{reason="pattern_cap"} 2' in (
+        metrics.registry.render_prometheus()
+    )
+
+
+def test_trap_guard_detects_near_duplicate_pages():
+    """
+    Test that a page is a near-duplicate when its links are near-duplicates of the
+    links of a page crawled before, e.g. pages only differing by session ID, and
+    that the links of near-duplicates are still filtered like any other.
+    """
+    traps = TrapGuard(near_duplicate_distance=6, max_path_depth=2)
+    page_links = nav_links(20) + [URL("https://website.com/calendar/1?sid=abc")]
+    copy_links = nav_links(20) + [URL("https://website.com/calendar/1?sid=xyz")]
+    other_links = [URL(f"https://website.com/blog/{index}") for index in range(20)]
+
+    assert not traps.is_near_duplicate(page_links)
+    assert traps.is_near_duplicate(copy_links)
+    assert traps.filter_links(copy_links) == copy_links
+    assert traps.filter_links(copy_links + [URL("https://website.com/a/b/c")]) == (
+        copy_links
+    )
+    assert not traps.is_near_duplicate(other_links)
+    # Pages with few links are never near-duplicates.
+    assert not traps.is_near_duplicate(nav_links(2))
+    assert not traps.is_near_duplicate(nav_links(2))
+
+    assert traps.near_duplicate_pages == 1
+    assert traps.near_duplicate_links == 21
+
+
+def test_trap_guard_memory_is_bounded():
+    """
+    Test that the rejected URLs of an endless trap are counted in a fixed amount of
+    memory, without keeping their addresses.
+    """
+    traps = TrapGuard(max_path_depth=1)
+
+    tracemalloc.start()
+    for day in range(5_000):
+        traps.admit(URL(f"https://website.com/calendar/{day}/view"))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert traps.rejected_url_count >= 4_990
+    assert memory < 100_000
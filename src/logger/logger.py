@@ -1,26 +1,262 @@
 """Module for logging"""
-from threading import Lock
+
+import json
+import sys
+import time
+from queue import Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Iterable, TextIO
+
+from models.url import URL
+
+
+class LogRecord:
+    """A message logged along with its structured fields"""
+
+    __slots__ = ("created", "severity", "message", "fields")
+
+    def __init__(
+        self, created: float, severity: str, message: str, fields: dict[str, Any]
+    ) -> None:
+        """
+        Args:
+            created (float): Unix time the record was logged at.
+            severity (str): One of `Logger.Severity`.
+            message (str): Message logged.
+            fields (dict[str, Any]): Structured fields of the record.
+        """
+        self.created = created
+        self.severity = severity
+        self.message = message
+        self.fields = fields
+
+
+def _json_value(value: Any) -> Any:
+    """
+    Convert a field value to one `json` encodes natively, so that it is encoded in C
+    rather than through a Python `default` callback per URL.
+
+    Args:
+        value (Any): Value of a field, e.g. a set of URLs.
+
+    Returns:
+        Any: Value with collections as lists and URLs as their address.
+    """
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return [item.address if isinstance(item, URL) else item for item in value]
+    if isinstance(value, URL):
+        return value.address
+    return value
 
 
 class Logger:
-    """Simple thread-safe logger"""
+    """
+    Thread-safe logger that never blocks its callers on output.
+    Records are put on a queue and formatted and written by a background thread,
+    which writes all records queued meanwhile at once, so that workers do not
+    serialize on the output stream and pay neither formatting nor write costs.
+
+    The queue holds at most `max_pending` records, so that a writer falling behind,
+    e.g. on a slow disk, does not buffer records without limit. Once it is full,
+    debug and info records are dropped and counted in `dropped_record_count`, and
+    error records block their caller until there is room, so that none is lost.
+    """
 
     class Severity:
         """Logger severities to distinguish different types of logs"""
 
+        DEBUG = "DEBUG"
         INFO = "INFO"
         ERROR = "ERROR"
 
-    def __init__(self) -> None:
-        self.mutex = Lock()
+    class Format:
+        """Available output formats"""
+
+        # `[SEVERITY]: message`, followed by one line per item of each field.
+        TEXT = "text"
+        # One JSON object per record, with the time, severity, message and fields.
+        JSON = "json"
+
+    # Severities in increasing order of importance.
+    SEVERITY_LEVELS = {Severity.DEBUG: 0, Severity.INFO: 1, Severity.ERROR: 2}
+
+    # Maximum number of records written at once.
+    MAX_BATCH_SIZE = 1024
+    # Default maximum number of records waiting to be written.
+    MAX_PENDING_RECORDS = 65536
+    # Seconds between two checks that the writer thread is alive, while waiting on it.
+    WRITER_CHECK_SECONDS = 0.1
+
+    def __init__(
+        self,
+        log_file: str | None = None,
+        output_format: str = Format.TEXT,
+        min_severity: str = Severity.INFO,
+        filters: Iterable[Callable[[LogRecord], bool]] = (),
+        max_pending: int = MAX_PENDING_RECORDS,
+    ) -> None:
+        """
+        Args:
+            log_file (str | None): File the records are appended to, the standard
+                output (as of the creation of the logger) is written to if None.
+            output_format (str): One of `Logger.Format`.
+            min_severity (str): Records of a lower severity are dropped.
+            filters (Iterable[Callable[[LogRecord], bool]]): Records for which any
+                filter returns False are dropped. Run by the writer thread.
+            max_pending (int): Maximum number of records waiting to be written.
+        """
+        self._log_file = log_file
+        self._output: TextIO = (
+            open(log_file, "a", encoding="utf-8") if log_file else sys.stdout
+        )
+        self._output_format = output_format
+        self._min_level = Logger.SEVERITY_LEVELS[min_severity]
+        self._filters = list(filters)
+        self._records: Queue[LogRecord | Event | None] = Queue(max_pending)
+        self._dropped_mutex = Lock()
+        self.dropped_record_count = 0
+        self._writer = Thread(target=self._write_records, daemon=True)
+        self._writer.start()
 
-    def log(self, message: str, severity: Severity = Severity.INFO) -> None:
+    def log(
+        self,
+        message: str,
+        severity: Severity = Severity.INFO,
+        fields: dict[str, Any] | None = None,
+    ) -> None:
         """
-        Log a message by a single thread,
-        to avoid having multiple messages being sent to std out at the same time.
+        Queue a message to be logged by the writer thread, dropping it if the queue
+        is full unless it is an error.
 
         Args:
             message (message): message to be logged
+            severity (Severity): Severity of the message.
+            fields (dict[str, Any] | None): Structured fields of the record, formatted
+                by the writer thread. Values must not be mutated once logged.
+        """
+        if Logger.SEVERITY_LEVELS[severity] < self._min_level:
+            return
+        record = LogRecord(time.time(), severity, message, fields or {})
+        if severity == Logger.Severity.ERROR:
+            self._put(record)
+            return
+        try:
+            self._records.put_nowait(record)
+        except Full:
+            with self._dropped_mutex:
+                self.dropped_record_count += 1
+
+    def _put(self, item: LogRecord | Event | None) -> bool:
+        """
+        Block until an item is queued, unless the writer thread stopped, e.g. on an
+        error writing the output, as the queue would then never have room again.
+
+        Args:
+            item (LogRecord | Event | None): Record, flush event, or None to close.
+
+        Returns:
+            bool: Whether the item was queued.
+        """
+        while self._writer.is_alive():
+            try:
+                self._records.put(item, timeout=Logger.WRITER_CHECK_SECONDS)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _format_record(self, record: LogRecord) -> str:
+        """
+        Args:
+            record (LogRecord): Record to format.
+
+        Returns:
+            str: Formatted record, ending with a new line.
+        """
+        if self._output_format == Logger.Format.JSON:
+            return (
+                json.dumps(
+                    {
+                        "time": record.created,
+                        "severity": record.severity,
+                        "message": record.message,
+                        **{
+                            name: _json_value(value)
+                            for name, value in record.fields.items()
+                        },
+                    },
+                    default=str,
+                )
+                + "\n"
+            )
+        lines = [f"[{record.severity}]: {record.message}\n"]
+        for name, value in record.fields.items():
+            if isinstance(value, (list, set, frozenset, tuple)):
+                lines.append(f"------ {name}:\n")
+                lines.extend(f"------ {item}\n" for item in value)
+            else:
+                lines.append(f"------ {name}: {value}\n")
+        return "".join(lines)
+
+    def _write_records(self) -> None:
+        """
+        Write queued records until the logger is closed. Every record queued while
+        a batch is written is part of the next batch.
+        """
+        while True:
+            records = [self._records.get()]
+            while len(records) < Logger.MAX_BATCH_SIZE and not self._records.empty():
+                records.append(self._records.get())
+            chunks = []
+            flushed_events = []
+            closed = False
+            for record in records:
+                if record is None:
+                    closed = True
+                elif isinstance(record, Event):
+                    flushed_events.append(record)
+                elif all(record_filter(record) for record_filter in self._filters):
+                    chunks.append(self._format_record(record))
+            if chunks:
+                self._output.write("".join(chunks))
+            self._output.flush()
+            for flushed_event in flushed_events:
+                flushed_event.set()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """
+        Block until every record logged so far is written.
+
+        Raises:
+            RuntimeError: If the writer thread stopped, e.g. on an error writing the
+                output, before writing them.
+        """
+        flushed_event = Event()
+        if self._put(flushed_event):
+            while not flushed_event.wait(Logger.WRITER_CHECK_SECONDS):
+                if not self._writer.is_alive():
+                    break
+        if not flushed_event.is_set():
+            raise RuntimeError("The writer thread of the logger stopped")
+
+    def close(self) -> None:
+        """
+        Write every record logged so far, along with the number of records dropped
+        if any, stop the writer thread and close the file.
         """
-        with self.mutex:
-            print(f"[{severity}]: {message}")
+        if self.dropped_record_count:
+            self._put(
+                LogRecord(
+                    time.time(),
+                    Logger.Severity.ERROR,
+                    f"Dropped {self.dropped_record_count} log record(s), the log"
+                    " output could not keep up",
+                    {},
+                )
+            )
+        self._put(None)
+        self._writer.join()
+        if self._log_file:
+            self._output.close()
@@ -0,0 +1,111 @@
+"""Logger tests"""
+
+import json
+from threading import Event
+
+import pytest
+
+from logger.logger import Logger
+from models.url import URL
+
+
+def test_logger_writes_text_records_with_fields(tmp_path):
+    """
+    Test that records are written in order once flushed, with one line per
+    item of a list field.
+    """
+    log_file = tmp_path / "crawl.log"
+    logger = Logger(str(log_file))
+    logger.log("Crawling page", fields={"links": [URL("https://a.com/x")]})
+    logger.log("Failed", severity=Logger.Severity.ERROR)
+    logger.flush()
+
+    assert log_file.read_text(encoding="utf-8") == (
+        "[INFO]: Crawling page\n"
+        "------ links:\n"
+        "------ URL[https://a.com/x]\n"
+        "[ERROR]: Failed\n"
+    )
+    logger.close()
+
+
+def test_logger_writes_json_lines(tmp_path):
+    """
+    Test that JSON records carry their fields, with sets of URLs as lists
+    of addresses.
+    """
+    log_file = tmp_path / "crawl.jsonl"
+    logger = Logger(str(log_file), output_format=Logger.Format.JSON)
+    logger.log("Crawling page", fields={"links": {URL("https://a.com/x")}})
+    logger.close()
+
+    record = json.loads(log_file.read_text(encoding="utf-8"))
+    assert record["severity"] == Logger.Severity.INFO
+    assert record["message"] == "Crawling page"
+    assert record["links"] == ["https://a.com/x"]
+
+
+def test_logger_drops_filtered_records(tmp_path):
+    """
+    Test that records below the minimum severity, or rejected by a filter,
+    are not written.
+    """
+    log_file = tmp_path / "crawl.log"
+    logger = Logger(
+        str(log_file),
+        min_severity=Logger.Severity.INFO,
+        filters=[lambda record: "skip" not in record.message],
+    )
+    logger.log("Debugging", severity=Logger.Severity.DEBUG)
+    logger.log("Please skip this")
+    logger.log("Kept")
+    logger.close()
+
+    assert log_file.read_text(encoding="utf-8") == "[INFO]: Kept\n"
+
+
+def test_logger_drops_records_once_full(tmp_path):
+    """
+    Test that info records are dropped and counted once the queue is full while
+    the writer is busy, and that errors wait for room instead.
+    """
+    log_file = tmp_path / "crawl.log"
+    writing = Event()
+    resume_writing = Event()
+
+    def stall_writer(_):
+        writing.set()
+        return resume_writing.wait(5)
+
+    logger = Logger(str(log_file), filters=[stall_writer], max_pending=1)
+    logger.log("Written")
+    assert writing.wait(5)
+    logger.log("Queued")
+    logger.log("Dropped")
+    logger.log("Dropped")
+    resume_writing.set()
+    logger.log("Failed", severity=Logger.Severity.ERROR)
+    logger.close()
+
+    assert logger.dropped_record_count == 2
+    assert log_file.read_text(encoding="utf-8").splitlines() == [
+        "[INFO]: Written",
+        "[INFO]: Queued",
+        "[ERROR]: Failed",
+        "[ERROR]: Dropped 2 log record(s), the log output could not keep up",
+    ]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_logger_flush_fails_once_writer_stopped(tmp_path):
+    """Test that flushing does not block forever once the writer thread died"""
+
+    def failing_filter(_):
+        raise ValueError("Broken filter")
+
+    logger = Logger(str(tmp_path / "crawl.log"), filters=[failing_filter])
+    logger.log("Lost")
+
+    with pytest.raises(RuntimeError):
+        logger.flush()
+    logger.close()
@@ -1,9 +1,16 @@
 """Main module to trigger crawler and parse input arguments"""
 import argparse
+import json
+from crawler.async_launcher import AsyncCrawlerLauncher
 from crawler.launcher import CrawlerLauncher, CrawlerLauncherOptions
+from crawler.output import PageSink, open_page_sink
+from logger.logger import Logger
 from models.url import URL
+from repository.state_store import CrawlStateStore
 
 BASE_URL = "https://www.lindushealth.com/"
+OUTPUT = "output"
+OUTPUT_FORMAT = "output_format"
 
 
 if __name__ == "__main__":
@@ -30,12 +37,576 @@ if __name__ == "__main__":
         help="Flag to skip logging links found under each page",
         action="store_true",
     )
+    parser.add_argument(
+        "--engine",
+        help="Crawl engine: one OS thread per worker, or tasks on an asyncio event loop",
+        choices=[
+            CrawlerLauncherOptions.Engine.THREAD,
+            CrawlerLauncherOptions.Engine.ASYNC,
+        ],
+        default=CrawlerLauncherOptions.Engine.THREAD,
+    )
+    parser.add_argument(
+        "--task_count",
+        help="Number of concurrent crawler tasks when using the async engine",
+        nargs="?",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "--pool_size",
+        help="Number of per-host HTTP connection pools to keep cached",
+        nargs="?",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--max_connections_per_host",
+        help="Maximum keep-alive connections per host (defaults to thread_count)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--pool_idle_timeout",
+        help="Seconds after which an idle pooled connection is closed",
+        nargs="?",
+        type=float,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--max_page_bytes",
+        help="Maximum page size in bytes, larger pages are dropped without being parsed",
+        nargs="?",
+        type=int,
+        default=5 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--max_compression_ratio",
+        help="Maximum ratio of the decompressed size of a page to its size on the"
+        " wire, pages decompressing further are dropped as decompression bombs",
+        nargs="?",
+        type=float,
+        default=100.0,
+    )
+    parser.add_argument(
+        "--accept_encoding",
+        help="Accept-Encoding header of every request, e.g. identity to disable"
+        " compression (defaults to every coding the engine decompresses)",
+        nargs="?",
+        default=None,
+    )
+    parser.add_argument(
+        "--seed_url",
+        help="Additional URL to start from, whose host is crawled alongside the base URL's"
+        " (may be repeated)",
+        action="append",
+        type=str,
+        default=[],
+    )
+    parser.add_argument(
+        "--sitemaps",
+        help="Flag to seed the crawl with the URLs listed in the sitemaps of the seed"
+        " URL hosts, as listed in their robots.txt (or at /sitemap.xml)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--max_sitemap_urls",
+        help="Maximum number of URLs loaded from sitemaps (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--allow_subdomains",
+        help="Flag to also crawl subdomains of the seed URL hosts",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--frontier",
+        help="Frontier of the threaded engine: a single FIFO queue, one queue per host"
+        " with per-host concurrency limits and delays, or one queue per worker with"
+        " work stealing. The priority frontier, a single queue crawling the URLs with"
+        " the lowest --priority score first, is supported by both engines",
+        choices=[
+            CrawlerLauncherOptions.Frontier.FIFO,
+            CrawlerLauncherOptions.Frontier.PER_HOST,
+            CrawlerLauncherOptions.Frontier.SHARDED,
+            CrawlerLauncherOptions.Frontier.PRIORITY,
+        ],
+        default=CrawlerLauncherOptions.Frontier.FIFO,
+    )
+    parser.add_argument(
+        "--per_host_concurrency",
+        help="Maximum number of pages of a host crawled at once (per_host frontier)",
+        nargs="?",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--per_host_delay",
+        help="Minimum seconds between two requests to the same host (per_host frontier)",
+        nargs="?",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--shard_count",
+        help="Number of shards of the visited set (sharded frontier)",
+        nargs="?",
+        type=int,
+        default=16,
+    )
+    parser.add_argument(
+        "--dedupe",
+        help="Dedupe backend for discovered URLs: exact URL set, fixed-width URL"
+        " fingerprints, or a Bloom filter",
+        choices=[
+            CrawlerLauncherOptions.Dedupe.EXACT,
+            CrawlerLauncherOptions.Dedupe.FINGERPRINT_64,
+            CrawlerLauncherOptions.Dedupe.FINGERPRINT_128,
+            CrawlerLauncherOptions.Dedupe.BLOOM,
+        ],
+        default=CrawlerLauncherOptions.Dedupe.EXACT,
+    )
+    parser.add_argument(
+        "--bloom_capacity",
+        help="Expected number of URLs the Bloom filter is sized for",
+        nargs="?",
+        type=int,
+        default=10_000_000,
+    )
+    parser.add_argument(
+        "--bloom_false_positive_rate",
+        help="Target false positive rate of the Bloom filter at capacity",
+        nargs="?",
+        type=float,
+        default=0.001,
+    )
+    parser.add_argument(
+        "--visited_log",
+        help="File the visited URLs are written to when using a compact dedupe backend,"
+        " truncated first (a temporary file if omitted, one file per shard with the"
+        " sharded frontier)",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--sort_query_params",
+        help="Flag to sort query parameters, so that reordered queries dedupe together",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--strip_tracking_params",
+        help="Flag to drop tracking query parameters (utm_*, gclid, fbclid, ...)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--state_dir",
+        help="Directory the crawl state is checkpointed to, so that it can be resumed",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Directory of a checkpointed crawl to resume, from the base and seed URLs"
+        " it was started with",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--checkpoint_interval",
+        help="Seconds between two checkpoints of the crawl state",
+        nargs="?",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--http_cache_dir",
+        help="Directory of the HTTP cache kept across runs: pages unchanged since the"
+        " previous run are revalidated instead of downloaded and parsed",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--parser_process_count",
+        help="Number of processes parsing downloaded pages, so that parsing scales"
+        " beyond one core (pages are parsed by the crawler workers if 0)",
+        nargs="?",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--node_id",
+        help="Index of this node among the --peer addresses of a distributed crawl",
+        nargs="?",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--peer",
+        help="Address (host:port) of a node of a distributed crawl, in the same order"
+        " on every node and including this one (may be repeated). Each node crawls"
+        " the URLs hashed to it with a FIFO frontier, and node 0 detects termination",
+        action="append",
+        type=str,
+        default=[],
+    )
+    parser.add_argument(
+        "--forward_batch_size",
+        help="Number of URLs owned by another node sent to it in one batch",
+        nargs="?",
+        type=int,
+        default=256,
+    )
+    parser.add_argument(
+        "--log_file",
+        help="File the log is appended to (standard output if omitted)",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--log_format",
+        help="Log format: plain text, or one JSON object per line with links as a list",
+        choices=[Logger.Format.TEXT, Logger.Format.JSON],
+        default=Logger.Format.TEXT,
+    )
+    parser.add_argument(
+        "--log_level",
+        help="Minimum severity of the logged messages",
+        choices=[Logger.Severity.DEBUG, Logger.Severity.INFO, Logger.Severity.ERROR],
+        default=Logger.Severity.INFO,
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        help="Seconds between two logged summaries of the crawl metrics (fetch and"
+        " parse times, bytes, status codes, frontier size, dedupe hit ratio, mutex"
+        " waits), none if 0",
+        nargs="?",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--metrics_port",
+        help="Local port serving the crawl metrics at /metrics in Prometheus text"
+        " format (not served if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--priority",
+        help="Score of the priority frontier, lowest first: number of links followed"
+        " from a seed URL (breadth-first), number of path segments, number of"
+        " query parameters, or sitemap URLs most recently modified first",
+        choices=[
+            CrawlerLauncherOptions.Priority.DEPTH,
+            CrawlerLauncherOptions.Priority.PATH_LENGTH,
+            CrawlerLauncherOptions.Priority.QUERY_PARAMS,
+            CrawlerLauncherOptions.Priority.LASTMOD,
+        ],
+        default=CrawlerLauncherOptions.Priority.DEPTH,
+    )
+    parser.add_argument(
+        "--max_pages",
+        help="Stop the crawl once this many pages were crawled (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_depth",
+        help="Do not follow links more than this many links away from a seed URL"
+        " (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--near_duplicate_distance",
+        help="Do not record the links of a page whose link set is within this many"
+        " bits (SimHash, out of 64) of a page crawled before in the link graph,"
+        " e.g. 6 (never if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_path_depth",
+        help="Do not follow links with more path segments (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_repeated_segments",
+        help="Do not follow links repeating a path segment more often, e.g. 2"
+        " (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_urls_per_pattern",
+        help="Do not follow more distinct links of the same host, path with digits"
+        " masked and query parameter names (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_seconds",
+        help="Stop the crawl after this many seconds (unlimited if omitted)",
+        nargs="?",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_bytes",
+        help="Stop the crawl once this many bytes of pages were downloaded"
+        " (unlimited if omitted)",
+        nargs="?",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--adaptive_concurrency",
+        help="Adjust the number of pages fetched at once to the observed latency,"
+        " errors and Retry-After headers, between --min_concurrency and the number"
+        " of threads (or tasks)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--min_concurrency",
+        help="Minimum number of pages fetched at once with --adaptive_concurrency",
+        nargs="?",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--connect_timeout",
+        help="Seconds to wait for a connection to a server",
+        nargs="?",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--read_timeout",
+        help="Seconds to wait for a server to send any data",
+        nargs="?",
+        type=float,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--fetch_deadline",
+        help="Seconds after which a page is given up on, including its retries"
+        " and the download of its body",
+        nargs="?",
+        type=float,
+        default=120.0,
+    )
+    parser.add_argument(
+        "--max_retries",
+        help="Number of times a connection error, timeout, 408, 429 or 5xx"
+        " response is retried",
+        nargs="?",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--retry_backoff",
+        help="Upper bound in seconds of the first retry backoff, doubling with"
+        " every retry, each backoff being drawn uniformly below it",
+        nargs="?",
+        type=float,
+        default=0.1,
+    )
+    parser.add_argument(
+        "--circuit_breaker_threshold",
+        help="Consecutive failures of a host after which its pages are skipped for"
+        " --circuit_breaker_reset seconds (never if 0)",
+        nargs="?",
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--circuit_breaker_reset",
+        help="Seconds the pages of a failing host are skipped for",
+        nargs="?",
+        type=float,
+        default=30.0,
+    )
+    parser.add_argument(
+        "--hedge_percentile",
+        help="Send a duplicate request once a request waited longer than this"
+        " percentile of the recent fetch latencies, e.g. 0.95 (never if omitted)",
+        nargs="?",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--link_graph",
+        help="File the link graph of the crawl is exported to, as a NumPy .npz"
+        " archive of its CSR adjacency matrix and the addresses of its nodes",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--lease_timeout",
+        help="Seconds a worker thread may spend on a URL before it is handed out to"
+        " another worker, longer than --fetch_deadline so that slow pages are not"
+        " crawled twice",
+        nargs="?",
+        type=float,
+        default=300.0,
+    )
+    parser.add_argument(
+        "--max_attempts",
+        help="Number of times a URL is handed out to a worker thread that crashed"
+        " or exceeded --lease_timeout before it is given up on",
+        nargs="?",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--output",
+        help="File the record of every page is written to as soon as it was crawled,"
+        " instead of collecting all URLs until the end of the crawl. Compressed if"
+        " it ends with .gz, .bz2 or .xz",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--output_format",
+        help="Format of --output, CSV if its name ends with .csv (before any"
+        " compression extension) and JSON lines otherwise if omitted",
+        choices=[PageSink.Format.JSONL, PageSink.Format.CSV],
+        default=None,
+    )
     args = parser.parse_args()
     config = vars(args)
+    if (
+        config[CrawlerLauncherOptions.PEERS]
+        and config[CrawlerLauncherOptions.ENGINE] == CrawlerLauncherOptions.Engine.ASYNC
+    ):
+        parser.error("Distributed crawls are only supported by the thread engine")
+    if (
+        config[CrawlerLauncherOptions.PEERS]
+        and config[CrawlerLauncherOptions.FRONTIER]
+        != CrawlerLauncherOptions.Frontier.FIFO
+    ):
+        parser.error("Distributed crawls only support the fifo frontier")
+    if config[CrawlerLauncherOptions.PEERS] and any(
+        config[limit] is not None
+        for limit in (
+            CrawlerLauncherOptions.MAX_PAGES,
+            CrawlerLauncherOptions.MAX_DEPTH,
+            CrawlerLauncherOptions.MAX_SECONDS,
+            CrawlerLauncherOptions.MAX_BYTES,
+        )
+    ):
+        parser.error("Crawl budgets are not supported by distributed crawls")
+    resume_dir = config[CrawlerLauncherOptions.RESUME]
+    if resume_dir is not None:
+        metadata = CrawlStateStore.read_metadata(resume_dir)
+        if CrawlStateStore.Metadata.BASE_URL not in metadata:
+            parser.error(f"No crawl state to resume in {resume_dir}")
+        config[CrawlerLauncherOptions.BASE_URL] = metadata[
+            CrawlStateStore.Metadata.BASE_URL
+        ]
+        config[CrawlerLauncherOptions.SEED_URLS] = json.loads(
+            metadata.get(CrawlStateStore.Metadata.SEED_URLS, "[]")
+        )
+        config[CrawlerLauncherOptions.STATE_DIR] = resume_dir
     crawler_launcher_options = CrawlerLauncherOptions(
         base_url=URL(config[CrawlerLauncherOptions.BASE_URL]),
         thread_count=config[CrawlerLauncherOptions.THREAD_COUNT],
         skip_links_found=config[CrawlerLauncherOptions.SKIP_LINKS_FOUND],
+        engine=config[CrawlerLauncherOptions.ENGINE],
+        task_count=config[CrawlerLauncherOptions.TASK_COUNT],
+        pool_size=config[CrawlerLauncherOptions.POOL_SIZE],
+        max_connections_per_host=config[
+            CrawlerLauncherOptions.MAX_CONNECTIONS_PER_HOST
+        ],
+        pool_idle_timeout=config[CrawlerLauncherOptions.POOL_IDLE_TIMEOUT],
+        max_page_bytes=config[CrawlerLauncherOptions.MAX_PAGE_BYTES],
+        max_compression_ratio=config[CrawlerLauncherOptions.MAX_COMPRESSION_RATIO],
+        accept_encoding=config[CrawlerLauncherOptions.ACCEPT_ENCODING],
+        seed_urls=[
+            URL(address) for address in config[CrawlerLauncherOptions.SEED_URLS]
+        ],
+        sitemaps=config[CrawlerLauncherOptions.SITEMAPS],
+        max_sitemap_urls=config[CrawlerLauncherOptions.MAX_SITEMAP_URLS],
+        allow_subdomains=config[CrawlerLauncherOptions.ALLOW_SUBDOMAINS],
+        frontier=config[CrawlerLauncherOptions.FRONTIER],
+        per_host_concurrency=config[CrawlerLauncherOptions.PER_HOST_CONCURRENCY],
+        per_host_delay=config[CrawlerLauncherOptions.PER_HOST_DELAY],
+        shard_count=config[CrawlerLauncherOptions.SHARD_COUNT],
+        dedupe=config[CrawlerLauncherOptions.DEDUPE],
+        bloom_capacity=config[CrawlerLauncherOptions.BLOOM_CAPACITY],
+        bloom_false_positive_rate=config[
+            CrawlerLauncherOptions.BLOOM_FALSE_POSITIVE_RATE
+        ],
+        visited_log=config[CrawlerLauncherOptions.VISITED_LOG],
+        sort_query_params=config[CrawlerLauncherOptions.SORT_QUERY_PARAMS],
+        strip_tracking_params=config[CrawlerLauncherOptions.STRIP_TRACKING_PARAMS],
+        state_dir=config[CrawlerLauncherOptions.STATE_DIR],
+        resume=resume_dir is not None,
+        checkpoint_interval=config[CrawlerLauncherOptions.CHECKPOINT_INTERVAL],
+        http_cache_dir=config[CrawlerLauncherOptions.HTTP_CACHE_DIR],
+        parser_process_count=config[CrawlerLauncherOptions.PARSER_PROCESS_COUNT],
+        node_id=config[CrawlerLauncherOptions.NODE_ID],
+        peers=config[CrawlerLauncherOptions.PEERS],
+        forward_batch_size=config[CrawlerLauncherOptions.FORWARD_BATCH_SIZE],
+        log_file=config[CrawlerLauncherOptions.LOG_FILE],
+        log_format=config[CrawlerLauncherOptions.LOG_FORMAT],
+        log_level=config[CrawlerLauncherOptions.LOG_LEVEL],
+        metrics_interval=config[CrawlerLauncherOptions.METRICS_INTERVAL],
+        metrics_port=config[CrawlerLauncherOptions.METRICS_PORT],
+        max_pages=config[CrawlerLauncherOptions.MAX_PAGES],
+        max_depth=config[CrawlerLauncherOptions.MAX_DEPTH],
+        max_seconds=config[CrawlerLauncherOptions.MAX_SECONDS],
+        max_bytes=config[CrawlerLauncherOptions.MAX_BYTES],
+        priority=config[CrawlerLauncherOptions.PRIORITY],
+        near_duplicate_distance=config[CrawlerLauncherOptions.NEAR_DUPLICATE_DISTANCE],
+        max_path_depth=config[CrawlerLauncherOptions.MAX_PATH_DEPTH],
+        max_repeated_segments=config[CrawlerLauncherOptions.MAX_REPEATED_SEGMENTS],
+        max_urls_per_pattern=config[CrawlerLauncherOptions.MAX_URLS_PER_PATTERN],
+        adaptive_concurrency=config[CrawlerLauncherOptions.ADAPTIVE_CONCURRENCY],
+        min_concurrency=config[CrawlerLauncherOptions.MIN_CONCURRENCY],
+        connect_timeout=config[CrawlerLauncherOptions.CONNECT_TIMEOUT],
+        read_timeout=config[CrawlerLauncherOptions.READ_TIMEOUT],
+        fetch_deadline=config[CrawlerLauncherOptions.FETCH_DEADLINE],
+        max_retries=config[CrawlerLauncherOptions.MAX_RETRIES],
+        retry_backoff=config[CrawlerLauncherOptions.RETRY_BACKOFF],
+        circuit_breaker_threshold=config[
+            CrawlerLauncherOptions.CIRCUIT_BREAKER_THRESHOLD
+        ],
+        circuit_breaker_reset=config[CrawlerLauncherOptions.CIRCUIT_BREAKER_RESET],
+        hedge_percentile=config[CrawlerLauncherOptions.HEDGE_PERCENTILE],
+        link_graph_path=config[CrawlerLauncherOptions.LINK_GRAPH],
+        lease_timeout=config[CrawlerLauncherOptions.LEASE_TIMEOUT],
+        max_attempts=config[CrawlerLauncherOptions.MAX_ATTEMPTS],
+    )
+    launcher_class = (
+        AsyncCrawlerLauncher
+        if crawler_launcher_options.engine == CrawlerLauncherOptions.Engine.ASYNC
+        else CrawlerLauncher
     )
-    urls_crawled = CrawlerLauncher(crawler_launcher_options).crawl()
-    print(f"Crawled {len(urls_crawled)} URL(s)")
+    crawler_launcher = launcher_class(crawler_launcher_options)
+    output = config[OUTPUT]
+    if output is None:
+        urls_crawled = crawler_launcher.crawl()
+        print(f"Crawled {len(urls_crawled)} URL(s)")
+    else:
+        with open_page_sink(output, config[OUTPUT_FORMAT]) as page_sink:
+            for page_record in crawler_launcher.crawl_stream():
+                page_sink.write(page_record)
+        print(f"Crawled {page_sink.record_count} URL(s), written to {output}")
@@ -0,0 +1,171 @@
+"""Metrics recorded across the stages of a crawl"""
+
+from metrics.metrics import MetricsRegistry
+
+# Upper bounds in bytes of the page size buckets, from 1KiB to 8MiB.
+PAGE_SIZE_BUCKETS = tuple(float(1024 * 4**exponent) for exponent in range(8))
+
+
+class CrawlMetrics:
+    """
+    Metrics of a crawl, recorded by the crawler workers, the HTML parser services and
+    the repositories. Updates take no lock as every thread updates its own cells of a
+    metric, and the frontier size is derived from the counters when exported, so that
+    recording metrics can be left on for production crawls.
+    """
+
+    def __init__(self) -> None:
+        self.registry = MetricsRegistry()
+        self.pages_crawled = self.registry.counter(
+            "crawler_pages_crawled_total", "Pages crawled by the crawler workers."
+        )
+        self.fetch_seconds = self.registry.histogram(
+            "crawler_fetch_seconds",
+            "Seconds spent requesting and downloading a page, excluding parsing.",
+        )
+        self.parse_seconds = self.registry.histogram(
+            "crawler_parse_seconds", "Seconds spent extracting the links of a page."
+        )
+        self.downloaded_bytes = self.registry.counter(
+            "crawler_downloaded_bytes_total",
+            "Bytes of page bodies downloaded, once decompressed.",
+        )
+        self.wire_bytes = self.registry.counter(
+            "crawler_wire_bytes_total",
+            "Bytes of page bodies received over the wire, before decompression.",
+        )
+        self.page_bytes = self.registry.histogram(
+            "crawler_page_bytes",
+            "Size in bytes of the page bodies downloaded, once decompressed.",
+            PAGE_SIZE_BUCKETS,
+        )
+        self.page_wire_bytes = self.registry.histogram(
+            "crawler_page_wire_bytes",
+            "Size in bytes of the page bodies received over the wire.",
+            PAGE_SIZE_BUCKETS,
+        )
+        self.responses = self.registry.counter(
+            "crawler_responses_total", "HTTP responses by status code.", "status"
+        )
+        self.fetch_errors = self.registry.counter(
+            "crawler_fetch_errors_total", "Requests that failed without a response."
+        )
+        self.urls_discovered = self.registry.counter(
+            "crawler_urls_discovered_total", "New URLs added to the frontier."
+        )
+        self.urls_duplicate = self.registry.counter(
+            "crawler_urls_duplicate_total", "URLs found again, dropped by the dedupe."
+        )
+        self.mutex_wait_seconds = self.registry.histogram(
+            "crawler_repository_mutex_wait_seconds",
+            "Seconds spent waiting for the repository mutex to add a new URL.",
+        )
+        self.registry.gauge(
+            "crawler_frontier_urls",
+            "URLs discovered and not processed yet, queued or being crawled.",
+            lambda: self.frontier_size,
+        )
+        self.registry.gauge(
+            "crawler_dedupe_hit_ratio",
+            "Share of the URLs found that were already discovered.",
+            lambda: self.dedupe_hit_ratio,
+        )
+
+    def record_page(
+        self,
+        fetch_seconds: float,
+        parse_seconds: float,
+        body_bytes: int,
+        wire_bytes: int | None = None,
+    ) -> None:
+        """
+        Record a page downloaded and parsed.
+
+        Args:
+            fetch_seconds (float): Seconds spent requesting and downloading the page.
+            parse_seconds (float): Seconds spent extracting its links.
+            body_bytes (int): Size of its body, once decompressed.
+            wire_bytes (int | None): Size of its body on the wire, `body_bytes`
+                if None (i.e. the body was not compressed).
+        """
+        if wire_bytes is None:
+            wire_bytes = body_bytes
+        self.fetch_seconds.observe(fetch_seconds)
+        self.parse_seconds.observe(parse_seconds)
+        self.downloaded_bytes.inc(body_bytes)
+        self.page_bytes.observe(body_bytes)
+        self.wire_bytes.inc(wire_bytes)
+        self.page_wire_bytes.observe(wire_bytes)
+
+    def record_url_found(
+        self, is_new_url: bool, mutex_wait: float | None = None
+    ) -> None:
+        """
+        Record a URL found by a crawler worker and checked against the dedupe.
+
+        Args:
+            is_new_url (bool): Whether the URL was not discovered before.
+            mutex_wait (float | None): Seconds waited for the repository mutex,
+                if it was taken.
+        """
+        if mutex_wait is not None:
+            self.mutex_wait_seconds.observe(mutex_wait)
+        (self.urls_discovered if is_new_url else self.urls_duplicate).inc()
+
+    def record_urls_found(
+        self,
+        new_url_count: int,
+        duplicate_url_count: int,
+        mutex_wait: float | None = None,
+    ) -> None:
+        """
+        Record the URLs found on a page by a crawler worker and checked against
+        the dedupe at once.
+
+        Args:
+            new_url_count (int): Number of URLs not discovered before.
+            duplicate_url_count (int): Number of URLs already discovered.
+            mutex_wait (float | None): Seconds waited for the repository mutex,
+                if it was taken.
+        """
+        if mutex_wait is not None:
+            self.mutex_wait_seconds.observe(mutex_wait)
+        if new_url_count:
+            self.urls_discovered.inc(new_url_count)
+        if duplicate_url_count:
+            self.urls_duplicate.inc(duplicate_url_count)
+
+    @property
+    def frontier_size(self) -> float:
+        """Number of URLs discovered and not processed yet."""
+        return max(self.urls_discovered.total - self.pages_crawled.total, 0)
+
+    @property
+    def dedupe_hit_ratio(self) -> float:
+        """Share of the URLs found that were already discovered."""
+        duplicate = self.urls_duplicate.total
+        found = duplicate + self.urls_discovered.total
+        return duplicate / found if found else 0.0
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: One-line summary of the metrics, for periodic logging.
+        """
+        responses = ", ".join(
+            f"{status}: {int(count)}"
+            for status, count in sorted(self.responses.values().items())
+        )
+        return (
+            f"{int(self.pages_crawled.total)} page(s) crawled,"
+            f" {int(self.frontier_size)} in frontier,"
+            f" fetch p50/p99 {self.fetch_seconds.quantile(0.5) * 1000:g}"
+            f"/{self.fetch_seconds.quantile(0.99) * 1000:g}ms,"
+            f" parse p50/p99 {self.parse_seconds.quantile(0.5) * 1000:g}"
+            f"/{self.parse_seconds.quantile(0.99) * 1000:g}ms,"
+            f" {int(self.downloaded_bytes.total)} byte(s) downloaded"
+            f" ({int(self.wire_bytes.total)} on the wire),"
+            f" responses [{responses}], {int(self.fetch_errors.total)} error(s),"
+            f" dedupe hit ratio {self.dedupe_hit_ratio:.3f},"
+            f" mutex wait {self.mutex_wait_seconds.sum:.3f}s"
+        )
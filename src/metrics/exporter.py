@@ -0,0 +1,94 @@
+"""Live exports of the crawl metrics: an HTTP endpoint and periodic log summaries"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Thread
+
+from logger.logger import Logger
+from metrics.crawl_metrics import CrawlMetrics
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """
+    HTTP server on localhost answering `GET /metrics` with the crawl metrics
+    in Prometheus text format, so that a running crawl can be scraped.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(
+        self, metrics: CrawlMetrics, port: int = 0, host: str = "127.0.0.1"
+    ) -> None:
+        """
+        Args:
+            metrics (CrawlMetrics): Metrics to serve.
+            port (int): Port to listen on, any free port if 0.
+            host (str): Address to listen on.
+        """
+        registry = metrics.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsServer.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_) -> None:
+                pass
+
+        self._server = _MetricsHTTPServer((host, port), _Handler)
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Address of the metrics endpoint."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> None:
+        """Start serving requests on a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving requests and release the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsReporter:
+    """Background thread logging a summary of the crawl metrics at a fixed interval"""
+
+    def __init__(self, metrics: CrawlMetrics, logger: Logger, interval: float) -> None:
+        """
+        Args:
+            metrics (CrawlMetrics): Metrics to summarize.
+            logger (Logger): Logger the summaries are written to.
+            interval (float): Seconds between two summaries.
+        """
+        self._metrics = metrics
+        self._logger = logger
+        self._interval = interval
+        self._stopped = Event()
+        self._thread = Thread(target=self._report, daemon=True)
+
+    def _report(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self._logger.log(f"Crawl metrics: {self._metrics.summary()}")
+
+    def start(self) -> None:
+        """Start logging summaries."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop logging summaries."""
+        self._stopped.set()
+        self._thread.join()
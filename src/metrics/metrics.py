@@ -0,0 +1,315 @@
+"""Thread-safe counters, gauges and histograms, exported in Prometheus text format"""
+
+from bisect import bisect_left
+from threading import Lock, local
+from typing import Any, Callable, Iterator
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, e.g. `3` rather than `3.0` for whole numbers."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _ThreadCells:
+    """
+    One cell per thread, created on the thread's first update. Each cell is only
+    written by its own thread, so that updates take no lock, and readers merge all
+    cells. Copying a cell is a single C call, which the GIL makes atomic.
+    """
+
+    def __init__(self, new_cell: Callable[[], Any]) -> None:
+        """
+        Args:
+            new_cell (Callable[[], Any]): Factory of an empty cell.
+        """
+        self._new_cell = new_cell
+        self._local = local()
+        self._mutex = Lock()
+        self._cells: list[Any] = []
+
+    def get(self) -> Any:
+        """Cell of the calling thread."""
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._new_cell()
+            with self._mutex:
+                self._cells.append(cell)
+            return cell
+
+    def all(self) -> list[Any]:
+        """Cells of all threads that updated the metric."""
+        with self._mutex:
+            return list(self._cells)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by the value of one label"""
+
+    def __init__(self, name: str, description: str, label: str | None = None) -> None:
+        """
+        Args:
+            name (str): Prometheus name of the counter.
+            description (str): Help text of the counter.
+            label (str | None): Name of the label the count is split by, if any.
+        """
+        self.name = name
+        self.description = description
+        self._label = label
+        # Count of every label value, per thread.
+        self._cells = _ThreadCells(dict)
+
+    def inc(self, amount: float = 1, label_value: str | None = None) -> None:
+        """
+        Args:
+            amount (float): Amount to add to the count.
+            label_value (str | None): Value of the counter's label, if it has one.
+        """
+        cell = self._cells.get()
+        cell[label_value] = cell.get(label_value, 0) + amount
+
+    def values(self) -> dict[str | None, float]:
+        """
+        Returns:
+            dict[str | None, float]: Current count of every label value.
+        """
+        values = {}
+        for cell in self._cells.all():
+            for label_value, value in dict(cell).items():
+                values[label_value] = values.get(label_value, 0) + value
+        return values
+
+    def value(self, label_value: str | None = None) -> float:
+        """
+        Args:
+            label_value (str | None): Value of the counter's label, if it has one.
+
+        Returns:
+            float: Current count.
+        """
+        return self.values().get(label_value, 0)
+
+    @property
+    def total(self) -> float:
+        """Current count summed over all label values."""
+        return sum(self.values().values())
+
+    def samples(self) -> Iterator[str]:
+        """Prometheus samples of the counter."""
+        values = sorted(self.values().items(), key=lambda item: str(item[0]))
+        if not values:
+            values = [] if self._label else [(None, 0)]
+        for label_value, value in values:
+            labels = "" if self._label is None else f'{{{self._label}="{label_value}"}}'
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge:
+    """Current value of a quantity, read from a function whenever it is exported"""
+
+    def __init__(
+        self, name: str, description: str, function: Callable[[], float]
+    ) -> None:
+        """
+        Args:
+            name (str): Prometheus name of the gauge.
+            description (str): Help text of the gauge.
+            function (Callable[[], float]): Function returning the current value.
+        """
+        self.name = name
+        self.description = description
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        """Current value of the gauge."""
+        return self._function()
+
+    def samples(self) -> Iterator[str]:
+        """Prometheus samples of the gauge."""
+        yield f"{self.name} {_format_value(self.value)}"
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, along with their sum"""
+
+    # Upper bounds in seconds, from sub-millisecond waits to slow page fetches.
+    DEFAULT_BUCKETS = (
+        0.0001,
+        0.0005,
+        0.001,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """
+        Args:
+            name (str): Prometheus name of the histogram.
+            description (str): Help text of the histogram.
+            buckets (tuple[float, ...]): Increasing upper bounds of the buckets,
+                values above the last one fall in an implicit `+Inf` bucket.
+        """
+        self.name = name
+        self.description = description
+        self._upper_bounds = buckets
+        # Bucket counts followed by the sum of the observed values, per thread.
+        self._cells = _ThreadCells(lambda: [0] * (len(buckets) + 2))
+
+    def observe(self, value: float) -> None:
+        """
+        Args:
+            value (float): Observed value.
+        """
+        cell = self._cells.get()
+        cell[bisect_left(self._upper_bounds, value)] += 1
+        cell[-1] += value
+
+    def _merged_cells(self) -> tuple[list[int], float]:
+        """
+        Returns:
+            tuple[list[int], float]: Count of every bucket, and sum of the values.
+        """
+        bucket_counts = [0] * (len(self._upper_bounds) + 1)
+        total = 0.0
+        for cell in self._cells.all():
+            cell = list(cell)
+            for bucket, bucket_count in enumerate(cell[:-1]):
+                bucket_counts[bucket] += bucket_count
+            total += cell[-1]
+        return bucket_counts, total
+
+    @property
+    def count(self) -> int:
+        """Number of observed values."""
+        return sum(self._merged_cells()[0])
+
+    @property
+    def sum(self) -> float:
+        """Sum of the observed values."""
+        return self._merged_cells()[1]
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            quantile (float): Quantile between 0 and 1, e.g. 0.99.
+
+        Returns:
+            float: Estimated quantile, 0 if nothing was observed and `inf` if it
+            falls above the last bucket.
+        """
+        bucket_counts, _ = self._merged_cells()
+        count = sum(bucket_counts)
+        if not count:
+            return 0.0
+        rank = quantile * count
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(
+            self._upper_bounds + (float("inf"),), bucket_counts
+        ):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return upper_bound
+        return float("inf")
+
+    def samples(self) -> Iterator[str]:
+        """Prometheus samples of the histogram, with cumulative bucket counts."""
+        bucket_counts, total = self._merged_cells()
+        count = sum(bucket_counts)
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(self._upper_bounds, bucket_counts):
+            cumulative_count += bucket_count
+            yield f'{self.name}_bucket{{le="{upper_bound}"}} {cumulative_count}'
+        yield f'{self.name}_bucket{{le="+Inf"}} {count}'
+        yield f"{self.name}_sum {_format_value(total)}"
+        yield f"{self.name}_count {count}"
+
+
+class MetricsRegistry:
+    """Set of metrics exported together"""
+
+    def __init__(self) -> None:
+        self._metrics: list[tuple[str, Counter | Gauge | Histogram]] = []
+
+    def counter(self, name: str, description: str, label: str | None = None) -> Counter:
+        """
+        Register a new counter.
+
+        Args:
+            name (str): Prometheus name of the counter.
+            description (str): Help text of the counter.
+            label (str | None): Name of the label the count is split by, if any.
+
+        Returns:
+            Counter: Registered counter.
+        """
+        counter = Counter(name, description, label)
+        self._metrics.append(("counter", counter))
+        return counter
+
+    def gauge(
+        self, name: str, description: str, function: Callable[[], float]
+    ) -> Gauge:
+        """
+        Register a new gauge.
+
+        Args:
+            name (str): Prometheus name of the gauge.
+            description (str): Help text of the gauge.
+            function (Callable[[], float]): Function returning the current value.
+
+        Returns:
+            Gauge: Registered gauge.
+        """
+        gauge = Gauge(name, description, function)
+        self._metrics.append(("gauge", gauge))
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = Histogram.DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """
+        Register a new histogram.
+
+        Args:
+            name (str): Prometheus name of the histogram.
+            description (str): Help text of the histogram.
+            buckets (tuple[float, ...]): Increasing upper bounds of the buckets.
+
+        Returns:
+            Histogram: Registered histogram.
+        """
+        histogram = Histogram(name, description, buckets)
+        self._metrics.append(("histogram", histogram))
+        return histogram
+
+    def render_prometheus(self) -> str:
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric_type, metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric_type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,80 @@
+"""Crawl metrics tests"""
+
+import requests
+
+from metrics.crawl_metrics import CrawlMetrics
+from metrics.exporter import MetricsServer
+from metrics.metrics import Histogram, MetricsRegistry
+
+
+def test_metrics_rendered_in_prometheus_format():
+    """
+    Test that counters, gauges and histograms are rendered with their help, type,
+    labels and cumulative bucket counts.
+    """
+    registry = MetricsRegistry()
+    responses = registry.counter("responses_total", "Responses.", "status")
+    registry.gauge("queue_depth", "Queued URLs.", lambda: 7)
+    fetch_seconds = registry.histogram("fetch_seconds", "Fetch times.", (0.1, 1.0))
+    responses.inc(label_value="200")
+    responses.inc(2, label_value="404")
+    fetch_seconds.observe(0.05)
+    fetch_seconds.observe(0.5)
+    fetch_seconds.observe(2.0)
+
+    assert registry.render_prometheus() == (
+        "# HELP responses_total Responses.\n"
+        "# TYPE responses_total counter\n"
+        'responses_total{status="200"} 1\n'
+        'responses_total{status="404"} 2\n'
+        "# HELP queue_depth Queued URLs.\n"
+        "# TYPE queue_depth gauge\n"
+        "queue_depth 7\n"
+        "# HELP fetch_seconds Fetch times.\n"
+        "# TYPE fetch_seconds histogram\n"
+        'fetch_seconds_bucket{le="0.1"} 1\n'
+        'fetch_seconds_bucket{le="1.0"} 2\n'
+        'fetch_seconds_bucket{le="+Inf"} 3\n'
+        "fetch_seconds_sum 2.55\n"
+        "fetch_seconds_count 3\n"
+    )
+
+
+def test_histogram_quantiles_estimated_from_buckets():
+    """
+    Test that quantiles are estimated as the upper bound of their bucket.
+    """
+    histogram = Histogram("fetch_seconds", "Fetch times.", (0.01, 0.1, 1.0))
+    for _ in range(98):
+        histogram.observe(0.005)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+
+def test_crawl_metrics_served_over_http():
+    """
+    Test that the metrics endpoint serves the crawl metrics, including
+    the gauges derived from the counters.
+    """
+    metrics = CrawlMetrics()
+    metrics.record_url_found(is_new_url=True, mutex_wait=0.001)
+    metrics.record_url_found(is_new_url=True, mutex_wait=0.001)
+    metrics.record_url_found(is_new_url=False)
+    metrics.pages_crawled.inc()
+    metrics_server = MetricsServer(metrics)
+    metrics_server.start()
+    try:
+        response = requests.get(metrics_server.url, timeout=5)
+    finally:
+        metrics_server.stop()
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == MetricsServer.CONTENT_TYPE
+    assert "crawler_urls_discovered_total 2\n" in response.text
+    assert "crawler_frontier_urls 1\n" in response.text
+    assert "crawler_dedupe_hit_ratio 0.3333333333333333\n" in response.text
+    assert "crawler_repository_mutex_wait_seconds_count 2\n" in response.text
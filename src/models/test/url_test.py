@@ -1,7 +1,8 @@
 """URL model tests"""
+
 import pytest
 
-from models.url import URL
+from models.url import URL, URLCanonicalizer
 
 
 @pytest.mark.parametrize(
@@ -97,3 +98,68 @@ def test_url_valid(test_address, is_valid_expected):
         test_address (str): test address for URL
     """
     assert URL(test_address).is_valid == is_valid_expected
+
+
+@pytest.mark.parametrize(
+    "first_address, second_address",
+    [
+        ("http://Site.com:80", "http://site.com/"),
+        ("HTTPS://WWW.Site.com:443/a", "https://www.site.com/a"),
+        ("https://site.com:8443", "https://site.com:8443/"),
+        ("http://user@Site.com:80/a", "http://user@site.com/a"),
+        ("http://[::1]:80/a", "http://[::1]/a"),
+    ],
+)
+def test_url_canonicalization(first_address, second_address):
+    """
+    Verify that equivalent addresses are canonicalized to the same address,
+    and therefore dedupe to a single URL.
+
+    Args:
+        first_address (str): first equivalent address
+        second_address (str): second equivalent address
+    """
+    assert URL(first_address).address == second_address
+    assert URL(first_address) == URL(second_address)
+
+
+@pytest.mark.parametrize(
+    "test_address, sort_query_params, strip_tracking_params, expected_address",
+    [
+        ("https://site.com/?b=2&a=1", False, False, "https://site.com/?b=2&a=1"),
+        ("https://site.com/?b=2&a=1", True, False, "https://site.com/?a=1&b=2"),
+        (
+            "https://site.com/?utm_source=x&q=a%20b&gclid=1",
+            False,
+            True,
+            "https://site.com/?q=a%20b",
+        ),
+        ("https://site.com/?UTM_Medium=x&fbclid=y", True, True, "https://site.com/"),
+    ],
+)
+def test_url_query_canonicalization(
+    test_address, sort_query_params, strip_tracking_params, expected_address
+):
+    """
+    Verify that query parameters are only sorted and stripped when enabled,
+    keeping the original encoding of the remaining parameters.
+
+    Args:
+        test_address (str): test address for URL
+        sort_query_params (bool): whether to sort query parameters
+        strip_tracking_params (bool): whether to strip tracking parameters
+        expected_address (str): expected canonical address
+    """
+    canonicalizer = URLCanonicalizer(sort_query_params, strip_tracking_params)
+    assert URL(test_address, canonicalizer).address == expected_address
+
+
+def test_url_from_canonical_parts():
+    """
+    Verify that a URL rebuilt from its canonical parts is equal to the original URL.
+    """
+    url = URL("HTTPS://Site.com:443?b=2#frag")
+    rebuilt_url = URL.from_canonical_parts(url.address, url.subdomain, url.scheme)
+    assert rebuilt_url == url
+    assert hash(rebuilt_url) == hash(url)
+    assert rebuilt_url.is_valid
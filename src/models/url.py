@@ -1,5 +1,110 @@
 """URL Model"""
-from urllib.parse import urlparse, urldefrag
+from urllib.parse import SplitResult, unquote_plus, urlsplit, urlunsplit
+
+
+class URLCanonicalizer:
+    """
+    Rewrites equivalent addresses to a single canonical form, so that they are only
+    crawled once. The scheme and host are lowercased, default ports are dropped and
+    an empty path becomes `/`. Sorting query parameters and stripping tracking
+    parameters can change the page served by some sites, and are therefore optional.
+    """
+
+    # Ports implied by each scheme, dropped from canonical addresses.
+    DEFAULT_PORTS = {"http": 80, "https": 443}
+
+    # Query parameters used for analytics only, which do not change the page served.
+    TRACKING_PARAMS = frozenset(
+        {"gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga"}
+    )
+    TRACKING_PARAM_PREFIXES = ("utm_",)
+
+    def __init__(
+        self, sort_query_params: bool = False, strip_tracking_params: bool = False
+    ) -> None:
+        """
+        Args:
+            sort_query_params (bool): Whether to sort query parameters.
+            strip_tracking_params (bool): Whether to drop tracking query parameters.
+        """
+        self.sort_query_params = sort_query_params
+        self.strip_tracking_params = strip_tracking_params
+
+    @staticmethod
+    def _canonicalize_netloc(parsed_url: SplitResult, hostname: str) -> str:
+        """
+        Lowercase the host of a network location and drop the default port.
+
+        Args:
+            parsed_url (SplitResult): Parsed address.
+            hostname (str): Lowercased hostname of the address.
+
+        Returns:
+            str: Canonical network location.
+        """
+        try:
+            port = parsed_url.port
+        except ValueError:
+            # Leave malformed ports untouched.
+            return parsed_url.netloc
+        userinfo, _, _ = parsed_url.netloc.rpartition("@")
+        netloc = f"[{hostname}]" if ":" in hostname else hostname
+        if userinfo:
+            netloc = f"{userinfo}@{netloc}"
+        if port is not None and port != URLCanonicalizer.DEFAULT_PORTS.get(
+            parsed_url.scheme
+        ):
+            netloc = f"{netloc}:{port}"
+        return netloc
+
+    def _is_tracking_param(self, param: str) -> bool:
+        name = unquote_plus(param.partition("=")[0]).lower()
+        return name in URLCanonicalizer.TRACKING_PARAMS or name.startswith(
+            URLCanonicalizer.TRACKING_PARAM_PREFIXES
+        )
+
+    def _canonicalize_query(self, query: str) -> str:
+        """
+        Sort and strip query parameters, keeping their original encoding.
+
+        Args:
+            query (str): Query of the address.
+
+        Returns:
+            str: Canonical query.
+        """
+        params = query.split("&")
+        if self.strip_tracking_params:
+            params = [param for param in params if not self._is_tracking_param(param)]
+        if self.sort_query_params:
+            params.sort()
+        return "&".join(params)
+
+    def canonicalize(self, address: str) -> tuple[str, str | None, str]:
+        """
+        Parse an address in a single pass, dropping its fragment, and build its
+        canonical form.
+
+        Args:
+            address (str): Address to canonicalize.
+
+        Returns:
+            tuple[str, str | None, str]: Canonical address, hostname and scheme.
+        """
+        parsed_url = urlsplit(address)
+        scheme, netloc, path, query, _ = parsed_url
+        hostname = parsed_url.hostname
+        if hostname is not None and netloc != hostname:
+            netloc = self._canonicalize_netloc(parsed_url, hostname)
+        if netloc and not path:
+            path = "/"
+        if query and (self.sort_query_params or self.strip_tracking_params):
+            query = self._canonicalize_query(query)
+        return urlunsplit((scheme, netloc, path, query, "")), hostname, scheme
+
+
+# Canonicalizer applying only the rewrites that never change the page served.
+DEFAULT_CANONICALIZER = URLCanonicalizer()
 
 
 class URL:
@@ -7,26 +112,69 @@ class URL:
     Utility class to process different parts of an http address.
     """
 
+    # URLs are created for every link of every page, avoid a per-instance __dict__.
+    __slots__ = (
+        "_address",
+        "_subdomain",
+        "_address_scheme",
+        "_hash",
+        "depth",
+        "lastmod",
+    )
+
     class URLScheme:
         """Types of assumed URL schemes"""
 
         HTTP = "http"
         HTTPS = "https"
 
-    def __init__(self, address: str) -> None:
+    @classmethod
+    def from_canonical_parts(
+        cls, address: str, subdomain: str | None, scheme: str
+    ) -> "URL":
+        """
+        Build a URL from the output of `URLCanonicalizer.canonicalize`, e.g. computed
+        in another process, without parsing the address again.
+
+        Args:
+            address (str): Canonical address.
+            subdomain (str | None): Hostname of the address.
+            scheme (str): Scheme of the address.
+
+        Returns:
+            URL: URL of the address.
+        """
+        url = cls.__new__(cls)
+        url._address = address
+        url._subdomain = subdomain
+        url._address_scheme = scheme
+        url._hash = hash(address)
+        url.depth = 0
+        url.lastmod = None
+        return url
+
+    def __init__(
+        self, address: str, canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER
+    ) -> None:
         """
         Initialize the URL with a given address.
         When initializing a URL, any fragment is ignored, as it points
-        to the same web-page.
+        to the same web-page, and the address is canonicalized.
 
         Args:
             address (address): address for the URL
+            canonicalizer (URLCanonicalizer): Rewrites applied to the address.
         """
-        defraged_url = urldefrag(address)
-        parsed_url = urlparse(defraged_url.url)
-        self._address = parsed_url.geturl()
-        self._subdomain = parsed_url.hostname
-        self._address_scheme = parsed_url.scheme
+        (
+            self._address,
+            self._subdomain,
+            self._address_scheme,
+        ) = canonicalizer.canonicalize(address)
+        self._hash = hash(self._address)
+        # Number of links followed from a seed URL to this URL, set by the crawler.
+        self.depth = 0
+        # POSIX timestamp of the last modification of the page listed by a sitemap.
+        self.lastmod = None
 
     @property
     def subdomain(self) -> str | None:
@@ -47,6 +195,16 @@ class URL:
         """
         return self._address
 
+    @property
+    def scheme(self) -> str:
+        """
+        Returns scheme of URL.
+
+        Returns:
+            string: scheme
+        """
+        return self._address_scheme
+
     @property
     def is_valid(self) -> str:
         """
@@ -67,7 +225,7 @@ class URL:
         return f"URL[{self.address}]"
 
     def __hash__(self) -> int:
-        return self.address.__hash__()
+        return self._hash
 
     def __eq__(self, __o: object) -> bool:
-        return isinstance(__o, URL) and self.address == __o.address
+        return isinstance(__o, URL) and self._address == __o._address
@@ -0,0 +1,144 @@
+"""Persistence layer to keep track of crawled URLs for the asyncio engine"""
+
+import asyncio
+from typing import Iterable
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import ExactVisitedURLSet, VisitedURLSet
+
+
+class AsyncRepository:
+    """
+    Class that persists status of the asyncio web-crawler.
+    Mirrors `Repository`, but all crawler tasks run on a single event loop,
+    so the dedupe check and enqueue never interleave and no lock is required.
+    """
+
+    def __init__(
+        self,
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            visited_urls (VisitedURLSet | None): Dedupe backend, an exact set of URLs
+                is used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits are recorded to,
+                if any.
+        """
+        # asyncio queue that is used to store urls to be explored next.
+        self._urls_to_visit = asyncio.Queue()
+
+        # A set to keep track of all URLs visited historically by the crawler.
+        # Also used to prevent visiting the same URL multiple times.
+        self._visited_urls = (
+            visited_urls if visited_urls is not None else ExactVisitedURLSet()
+        )
+
+        self._state_store = state_store
+        self._metrics = metrics
+
+    def queue_next_url(self, url: URL) -> None:
+        """
+        Add URL to the `_urls_to_visit` queue
+        Args:
+            url (URL): URL to be visited
+        """
+        self._urls_to_visit.put_nowait(url)
+
+    def add_url_to_crawl(self, url: URL) -> None:
+        """
+        Add a newly discovered URL to the queue to be explored,
+        once we ensure that the URL had not been discovered previously.
+
+        Args:
+            url (URL): Discovered URL.
+        """
+        is_new_url = url not in self._visited_urls
+        if self._metrics is not None:
+            self._metrics.record_url_found(is_new_url)
+        if is_new_url:
+            self._visited_urls.add(url)
+            if self._state_store is not None:
+                self._state_store.record_discovered(url)
+            self.queue_next_url(url)
+
+    def add_urls_to_crawl(self, urls: Iterable[URL]) -> None:
+        """
+        Add the URLs discovered on a page to be explored, see `add_url_to_crawl`.
+
+        Args:
+            urls (Iterable[URL]): Discovered URLs, duplicates allowed.
+        """
+        for url in urls:
+            self.add_url_to_crawl(url)
+
+    def restore_url(self, url: URL, processed: bool) -> None:
+        """
+        Restore a URL discovered by a previous run of the crawl, without recording it
+        again. URLs that were not processed are queued to be crawled.
+
+        Args:
+            url (URL): Previously discovered URL.
+            processed (bool): Whether the URL was processed.
+        """
+        self._visited_urls.add(url)
+        if not processed:
+            if self._metrics is not None:
+                self._metrics.urls_discovered.inc()
+            self.queue_next_url(url)
+
+    async def get_next_url(self) -> URL:
+        """
+        Retrieve next url to be processed from the url queue.
+        Suspends the calling task until an item is available on the queue.
+
+        Returns:
+            URL: Next URL to be processed.
+        """
+        return await self._urls_to_visit.get()
+
+    @property
+    def visited_urls(self) -> list[URL]:
+        """
+        Get visited URLs at the time of function call
+
+        Returns:
+            list[URL]: Visited URLs
+        """
+        return list(self._visited_urls)
+
+    def notify_url_processed(self, url: URL | None = None) -> None:
+        """
+        Notify the underlying queue that a URL picked off the queue has been processed.
+
+        Args:
+            url (URL | None): Processed URL, recorded in the state store if any, see
+                `Repository.notify_url_processed`.
+        """
+        if self._state_store is not None and url is not None:
+            self._state_store.record_processed(url)
+        self._urls_to_visit.task_done()
+
+    def requeue_url(self, url: URL) -> None:
+        """
+        Queue again a URL picked off the queue whose crawl was abandoned, without
+        reporting it as processed.
+
+        Args:
+            url (URL): URL to be crawled again.
+        """
+        self.queue_next_url(url)
+        self._urls_to_visit.task_done()
+
+    async def wait_until_all_urls_processed(self) -> None:
+        """
+        Suspend until all URLs that have been picked up from the queue were reported
+        as processed, which indicates that are no further URLs to be crawled.
+        """
+        await self._urls_to_visit.join()
@@ -0,0 +1,232 @@
+"""Persistence layer partitioning the URL frontier per host"""
+
+import time
+from collections import deque
+from threading import Condition
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.repository import Repository
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import VisitedURLSet
+
+
+class _HostFrontier:
+    """URLs waiting to be crawled for a single host, and its politeness state"""
+
+    __slots__ = ("urls", "in_flight", "next_fetch_at")
+
+    def __init__(self) -> None:
+        self.urls = deque()
+        # Number of URLs of this host currently being crawled.
+        self.in_flight = 0
+        # Monotonic time before which no further URL of this host is handed out.
+        self.next_fetch_at = 0.0
+
+
+class HostPartitionedRepository(Repository):
+    """
+    Repository whose frontier is partitioned per host, so that a crawl can span
+    several hosts while staying polite to each one of them. A host is ready when
+    it has URLs waiting, fewer than `per_host_concurrency` of its URLs are being
+    crawled, and at least `per_host_delay` seconds passed since its last URL was
+    handed out. Idle workers are always given a URL from a ready host, so one slow
+    or rate-limited host never idles the whole worker pool.
+
+    Deduplication of discovered URLs is inherited from `Repository`.
+    """
+
+    def __init__(
+        self,
+        per_host_concurrency: int = 1,
+        per_host_delay: float = 0.0,
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ):
+        """
+        Args:
+            per_host_concurrency (int): Maximum number of URLs of a host crawled at once.
+            per_host_delay (float): Minimum number of seconds between handing out
+                two URLs of the same host.
+            visited_urls (VisitedURLSet | None): Dedupe backend, an exact set of URLs
+                is used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits and mutex waits
+                are recorded to, if any.
+        """
+        super().__init__(visited_urls, state_store, metrics)
+        self._per_host_concurrency = per_host_concurrency
+        self._per_host_delay = per_host_delay
+
+        # Condition guarding all the frontier state below, notified whenever
+        # a URL is queued or processed.
+        self._condition = Condition()
+        self._hosts: dict[str, _HostFrontier] = {}
+
+        # Hosts that currently have URLs waiting to be crawled.
+        self._pending_hosts: dict[str, _HostFrontier] = {}
+
+        # URLs without a host (i.e. termination signals), handed out first.
+        self._signals = deque()
+
+        # Number of URLs queued or being crawled.
+        self._unfinished_urls = 0
+
+    def queue_next_url(self, url: URL) -> None:
+        """
+        Add URL to the frontier of its host.
+
+        Args:
+            url (URL): URL to be visited
+        """
+        with self._condition:
+            host = url.subdomain
+            if host is None:
+                self._signals.append(url)
+            else:
+                host_frontier = self._hosts.setdefault(host, _HostFrontier())
+                host_frontier.urls.append(url)
+                self._pending_hosts[host] = host_frontier
+                self._unfinished_urls += 1
+            self._condition.notify_all()
+
+    def queue_next_urls(self, urls: list[URL]) -> None:
+        """
+        Add URLs to the frontiers of their hosts, holding the condition once.
+
+        Args:
+            urls (list[URL]): URLs to be visited
+        """
+        if not urls:
+            return
+        with self._condition:
+            for url in urls:
+                host_frontier = self._hosts.setdefault(url.subdomain, _HostFrontier())
+                host_frontier.urls.append(url)
+                self._pending_hosts[url.subdomain] = host_frontier
+            self._unfinished_urls += len(urls)
+            self._condition.notify_all()
+
+    def _select_ready_host(self, now: float) -> tuple[str | None, float | None]:
+        """
+        Select the host that has been ready for the longest time.
+        Must be called while holding `_condition`.
+
+        Args:
+            now (float): Current monotonic time.
+
+        Returns:
+            tuple[str | None, float | None]: Ready host, or None alongside the number of
+            seconds until a host becomes ready (None if that depends on URLs being processed).
+        """
+        ready_host = None
+        earliest_fetch_at = None
+        for host, host_frontier in self._pending_hosts.items():
+            if host_frontier.in_flight >= self._per_host_concurrency:
+                continue
+            if (
+                earliest_fetch_at is None
+                or host_frontier.next_fetch_at < earliest_fetch_at
+            ):
+                earliest_fetch_at = host_frontier.next_fetch_at
+                ready_host = host
+        if earliest_fetch_at is None:
+            return None, None
+        if earliest_fetch_at > now:
+            return None, earliest_fetch_at - now
+        return ready_host, None
+
+    def get_next_url(self) -> URL:
+        """
+        Retrieve next url to be processed from a ready host.
+        Blocks until a host is ready, or a termination signal is queued.
+
+        Returns:
+            URL: Next URL to be processed.
+        """
+        with self._condition:
+            while True:
+                if self._signals:
+                    return self._signals.popleft()
+                now = time.monotonic()
+                host, wait_seconds = self._select_ready_host(now)
+                if host is not None:
+                    host_frontier = self._hosts[host]
+                    url = host_frontier.urls.popleft()
+                    if not host_frontier.urls:
+                        del self._pending_hosts[host]
+                    host_frontier.in_flight += 1
+                    host_frontier.next_fetch_at = now + self._per_host_delay
+                    return url
+                self._condition.wait(wait_seconds)
+
+    def notify_url_processed(self, url: URL | None = None) -> None:
+        """
+        Notify that a URL handed out by `get_next_url` has been processed,
+        freeing a concurrency slot of its host.
+
+        Args:
+            url (URL): Processed URL, required to identify its host.
+        """
+        if self._state_store is not None:
+            self._state_store.record_processed(url)
+        with self._condition:
+            self._hosts[url.subdomain].in_flight -= 1
+            self._unfinished_urls -= 1
+            self._condition.notify_all()
+
+    def requeue_url(self, url: URL) -> None:
+        """
+        Queue again a URL handed out by `get_next_url` whose crawl was abandoned,
+        freeing the concurrency slot of its host.
+
+        Args:
+            url (URL): URL to be crawled again.
+        """
+        self.queue_next_url(url)
+        with self._condition:
+            self._hosts[url.subdomain].in_flight -= 1
+            self._unfinished_urls -= 1
+            self._condition.notify_all()
+
+    def hold_concurrency_slot(self, url: URL) -> None:
+        """
+        Keep the concurrency slot of the host of a URL whose crawl was abandoned
+        while still running, so that the host is not sent more requests at once
+        than `per_host_concurrency` while the abandoned request is pending.
+
+        Args:
+            url (URL): URL whose crawl is still running.
+        """
+        with self._condition:
+            self._hosts[url.subdomain].in_flight += 1
+
+    def release_concurrency_slot(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): URL whose slot was held by `hold_concurrency_slot`, once its
+                abandoned crawl is over.
+        """
+        with self._condition:
+            self._hosts[url.subdomain].in_flight -= 1
+            self._condition.notify_all()
+
+    def all_urls_processed(self) -> bool:
+        """
+        Returns:
+            bool: Whether all URLs that have been queued were reported as processed,
+            without blocking.
+        """
+        with self._condition:
+            return not self._unfinished_urls
+
+    def wait_until_all_urls_processed(self) -> None:
+        """
+        Block until all URLs that have been queued were reported as processed,
+        which indicates that are no further URLs to be crawled.
+        """
+        with self._condition:
+            while self._unfinished_urls:
+                self._condition.wait()
@@ -0,0 +1,522 @@
+"""Repository owning one hash partition of the URL space of a distributed crawl"""
+
+import time
+from threading import Event, Lock, Thread
+from typing import Iterable
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.repository import Repository
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import (
+    ExactVisitedURLSet,
+    VisitedURLSet,
+    url_fingerprint,
+)
+from service.node_transport import NodeServer, PeerConnection
+
+
+class NodeStats:
+    """Throughput and forwarding volume of a node of a distributed crawl"""
+
+    def __init__(
+        self,
+        node_id: int,
+        processed_urls: int = 0,
+        forwarded_urls: int = 0,
+        forwarded_batches: int = 0,
+        received_urls: int = 0,
+        seconds: float = 0.0,
+    ) -> None:
+        """
+        Args:
+            node_id (int): Index of the node.
+            processed_urls (int): Number of pages crawled by the node.
+            forwarded_urls (int): Number of URLs sent to the nodes owning them.
+            forwarded_batches (int): Number of batches the URLs were sent in.
+            received_urls (int): Number of URLs received from other nodes.
+            seconds (float): Seconds since the node started.
+        """
+        self.node_id = node_id
+        self.processed_urls = processed_urls
+        self.forwarded_urls = forwarded_urls
+        self.forwarded_batches = forwarded_batches
+        self.received_urls = received_urls
+        self.seconds = seconds
+
+    def as_dict(self) -> dict:
+        """JSON-serializable counters, as sent to the coordinator."""
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        pages_per_second = self.processed_urls / self.seconds if self.seconds else 0.0
+        return (
+            f"node {self.node_id}: {self.processed_urls} page(s) crawled"
+            f" ({pages_per_second:.1f} pages/sec), {self.forwarded_urls} URL(s)"
+            f" forwarded in {self.forwarded_batches} batch(es),"
+            f" {self.received_urls} URL(s) received"
+        )
+
+
+class PartitionedRepository(Repository):
+    """
+    Repository of one node of a distributed crawl. Each node owns the URLs whose
+    fingerprint modulo the number of nodes is its index, and crawls them from its own
+    FIFO queue. Discovered URLs owned by another node are buffered, and a background
+    thread forwards them to their owner in batches.
+
+    Node 0 coordinates termination with the four-counter method: it repeatedly polls
+    every node for whether it is idle (no queued or in-flight URL, nothing left to
+    forward) and for its counts of URLs forwarded and received. The crawl is over
+    once two consecutive polls find every node idle, and the same total of URLs
+    forwarded and received, as a URL still in transit between two nodes would show
+    up as a difference between both totals. Node 0 then tells every node to stop.
+    Every batch is numbered by its sender and resent under the same number when
+    its delivery failed, so that a batch received twice is only counted once. A
+    sender delivers its batches to each node in increasing order, so a receiver only
+    remembers the highest batch number of every sender.
+    The other nodes stop on their own if node 0 did not poll them for
+    `coordinator_timeout` seconds, e.g. because it crashed.
+    """
+
+    # Seconds between two polls of the nodes by the coordinator.
+    POLL_INTERVAL_SECONDS = 0.05
+    # Seconds to wait before forwarding again to an unreachable node.
+    RETRY_SECONDS = 0.1
+    # Index of the node coordinating termination.
+    COORDINATOR_NODE_ID = 0
+    # Seconds between two checks of the liveness of the coordinator.
+    LIVENESS_CHECK_SECONDS = 0.5
+
+    class MessageType:
+        """Types of the messages exchanged between nodes"""
+
+        # Batch of URLs owned by the receiving node.
+        URLS = "urls"
+        # Request for the idleness and counters of the receiving node.
+        STATUS = "status"
+        # Notification that the crawl is over.
+        TERMINATE = "terminate"
+
+    def __init__(
+        self,
+        node_id: int,
+        node_addresses: list[tuple[str, int]],
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        forward_batch_size: int = 256,
+        forward_interval: float = 0.05,
+        metrics: CrawlMetrics | None = None,
+        coordinator_timeout: float = 60.0,
+        forwarded_urls: VisitedURLSet | None = None,
+    ) -> None:
+        """
+        Args:
+            node_id (int): Index of this node in `node_addresses`.
+            node_addresses (list[tuple[str, int]]): Host and port of every node,
+                in the same order on all nodes.
+            visited_urls (VisitedURLSet | None): Dedupe backend of the owned URLs.
+            state_store (CrawlStateStore | None): Store recording the owned URLs.
+            forward_batch_size (int): Number of buffered URLs for a node after
+                which they are forwarded without waiting for `forward_interval`.
+            forward_interval (float): Maximum seconds a URL is buffered before
+                being forwarded.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits and mutex waits
+                of the owned URLs are recorded to, if any.
+            coordinator_timeout (float): Seconds without a poll of the coordinator,
+                once this node waits for the crawl to end, after which this node
+                considers the coordinator lost and stops.
+            forwarded_urls (VisitedURLSet | None): Dedupe backend of the URLs
+                forwarded to other nodes, which is never enumerated, an exact set of
+                URLs is used if not provided.
+        """
+        super().__init__(visited_urls, state_store, metrics)
+        self._node_id = node_id
+        self._node_addresses = node_addresses
+        self._node_count = len(node_addresses)
+        self._forward_batch_size = forward_batch_size
+        self._forward_interval = forward_interval
+        self._coordinator_timeout = coordinator_timeout
+        self._started_at = time.monotonic()
+
+        # URLs already forwarded, so that each one is sent to its owner at most once.
+        self._forwarded_urls = (
+            forwarded_urls if forwarded_urls is not None else ExactVisitedURLSet()
+        )
+        # Mutex guarding the outbound batches and the forwarding counters.
+        self._outbound_mutex = Lock()
+        self._outbound_batches: list[list[URL]] = [[] for _ in node_addresses]
+        # Batches whose delivery failed, resent with their number by owner.
+        self._unsent_batches: list[tuple[int, int, list[URL]]] = []
+        self._next_batch_number = 0
+        # URLs buffered or being sent, the node is not idle while any is left.
+        self._pending_forward_count = 0
+        self._forwarded_url_count = 0
+        self._forwarded_batch_count = 0
+        self._received_url_count = 0
+        self._processed_url_count = 0
+
+        self._forward_connections = [
+            PeerConnection(address) for address in node_addresses
+        ]
+        self._forward_event = Event()
+        self._stopped = Event()
+        self._forwarder = Thread(target=self._forward_batches, daemon=True)
+        self._forwarder.start()
+        self._terminated = Event()
+        self._node_stats: list[NodeStats] = []
+        # Mutex guarding the highest number of the batches received, by sender.
+        self._received_mutex = Lock()
+        self._last_received_batches: dict[int, int] = {}
+        self._last_polled_at = time.monotonic()
+        # Whether this node stopped because the coordinator stopped polling it.
+        self.coordinator_lost = False
+        # Server of the other nodes, and thread waiting for the end of the crawl,
+        # both started once this node waits for the crawl to end.
+        self._serving_mutex = Lock()
+        self._server: NodeServer | None = None
+        self._termination_waiter: Thread | None = None
+        # Set once the crawl is over on every node, or the coordinator was lost.
+        self._crawl_over = Event()
+
+    def owner(self, url: URL) -> int:
+        """
+        Args:
+            url (URL): Any URL.
+
+        Returns:
+            int: Index of the node owning the URL, identical on every node.
+        """
+        return url_fingerprint(url) % self._node_count
+
+    def add_url_to_crawl(self, url: URL) -> None:
+        """
+        Add a newly discovered URL to the local queue if this node owns it,
+        or buffer it to be forwarded to its owner otherwise.
+
+        Args:
+            url (URL): Discovered URL.
+        """
+        owner = self.owner(url)
+        if owner == self._node_id:
+            super().add_url_to_crawl(url)
+            return
+        if url in self._forwarded_urls:
+            return
+        with self._outbound_mutex:
+            if url in self._forwarded_urls:
+                return
+            self._forwarded_urls.add(url)
+            batch = self._outbound_batches[owner]
+            batch.append(url)
+            self._pending_forward_count += 1
+            if len(batch) >= self._forward_batch_size:
+                self._forward_event.set()
+
+    def add_urls_to_crawl(self, urls: Iterable[URL]) -> None:
+        """
+        Add the URLs discovered on a page, the URLs this node owns to the local
+        queue at once, and the others to the batches of their owners under a single
+        acquisition of the outbound mutex.
+
+        Args:
+            urls (Iterable[URL]): Discovered URLs, duplicates allowed.
+        """
+        owned_urls = []
+        forwarded_urls = []
+        for url in urls:
+            owner = self.owner(url)
+            if owner == self._node_id:
+                owned_urls.append(url)
+            elif url not in self._forwarded_urls:
+                forwarded_urls.append((owner, url))
+        super().add_urls_to_crawl(owned_urls)
+        if not forwarded_urls:
+            return
+        with self._outbound_mutex:
+            for owner, url in forwarded_urls:
+                if url in self._forwarded_urls:
+                    continue
+                self._forwarded_urls.add(url)
+                batch = self._outbound_batches[owner]
+                batch.append(url)
+                self._pending_forward_count += 1
+                if len(batch) >= self._forward_batch_size:
+                    self._forward_event.set()
+
+    def _forward_batches(self) -> None:
+        """
+        Forward the buffered URLs to their owners every `forward_interval` seconds,
+        or as soon as a batch is full. Batches that could not be delivered are sent
+        again with the same number, until their owner is reachable. Once a batch
+        could not be delivered to a node, the following batches for that node are
+        held back as well, so that every node receives the batches of this node in
+        increasing order.
+        """
+        while not self._stopped.is_set():
+            self._forward_event.wait(self._forward_interval)
+            self._forward_event.clear()
+            with self._outbound_mutex:
+                batches = self._unsent_batches
+                self._unsent_batches = []
+                for node_id, batch in enumerate(self._outbound_batches):
+                    if batch:
+                        batches.append((node_id, self._next_batch_number, batch))
+                        self._next_batch_number += 1
+                self._outbound_batches = [[] for _ in self._outbound_batches]
+            unreachable_node_ids = set()
+            for node_id, batch_number, batch in batches:
+                if node_id in unreachable_node_ids:
+                    with self._outbound_mutex:
+                        self._unsent_batches.append((node_id, batch_number, batch))
+                    continue
+                message = {
+                    "type": PartitionedRepository.MessageType.URLS,
+                    "sender": self._node_id,
+                    "batch": batch_number,
+                    "urls": [[url.address, url.subdomain, url.scheme] for url in batch],
+                }
+                try:
+                    self._forward_connections[node_id].send(message)
+                except OSError:
+                    unreachable_node_ids.add(node_id)
+                    with self._outbound_mutex:
+                        self._unsent_batches.append((node_id, batch_number, batch))
+                    continue
+                with self._outbound_mutex:
+                    self._pending_forward_count -= len(batch)
+                    self._forwarded_url_count += len(batch)
+                    self._forwarded_batch_count += 1
+            if unreachable_node_ids:
+                self._stopped.wait(PartitionedRepository.RETRY_SECONDS)
+
+    def _handle_message(self, message: dict) -> dict:
+        """
+        Handle a message received from another node.
+
+        Args:
+            message (dict): Received message.
+
+        Returns:
+            dict: Reply to the message.
+        """
+        message_type = message["type"]
+        if message_type == PartitionedRepository.MessageType.URLS:
+            # A batch whose reply was lost is sent again, and only counted once.
+            # Batches arrive in increasing order, so a batch numbered at most the
+            # highest one received from its sender was already received.
+            with self._received_mutex:
+                sender = message["sender"]
+                if message["batch"] <= self._last_received_batches.get(sender, -1):
+                    return {}
+                self._last_received_batches[sender] = message["batch"]
+            # Owned URLs are queued before the reply, so that the sending node only
+            # stops counting them as pending once they are queued here.
+            super().add_urls_to_crawl(
+                URL.from_canonical_parts(*parts) for parts in message["urls"]
+            )
+            with self._outbound_mutex:
+                self._received_url_count += len(message["urls"])
+            return {}
+        if message_type == PartitionedRepository.MessageType.STATUS:
+            self._last_polled_at = time.monotonic()
+            return self._status()
+        if message_type == PartitionedRepository.MessageType.TERMINATE:
+            self._terminated.set()
+        return {}
+
+    def _status(self) -> dict:
+        """
+        Returns:
+            dict: Whether this node is idle, and its counters.
+        """
+        with self._urls_to_visit.mutex:
+            unfinished_url_count = self._urls_to_visit.unfinished_tasks
+        with self._outbound_mutex:
+            idle = unfinished_url_count == 0 and self._pending_forward_count == 0
+            stats = self.stats
+        return {"idle": idle, "stats": stats.as_dict()}
+
+    @property
+    def stats(self) -> NodeStats:
+        """Current throughput and forwarding volume of this node."""
+        return NodeStats(
+            node_id=self._node_id,
+            processed_urls=self._processed_url_count,
+            forwarded_urls=self._forwarded_url_count,
+            forwarded_batches=self._forwarded_batch_count,
+            received_urls=self._received_url_count,
+            seconds=time.monotonic() - self._started_at,
+        )
+
+    @property
+    def node_stats(self) -> list[NodeStats]:
+        """
+        Final counters of every node on the coordinator, or of this node only on
+        the other nodes. Empty until the crawl is over.
+        """
+        return self._node_stats
+
+    def notify_url_processed(self, url: URL | None = None) -> None:
+        """
+        Notify that a URL picked off the local queue has been processed.
+
+        Args:
+            url (URL | None): Processed URL.
+        """
+        with self._outbound_mutex:
+            self._processed_url_count += 1
+        super().notify_url_processed(url)
+
+    def _poll_statuses(
+        self, control_connections: list[PeerConnection | None]
+    ) -> list[dict] | None:
+        """
+        Args:
+            control_connections (list[PeerConnection | None]): Connection to every
+                node but the coordinator.
+
+        Returns:
+            list[dict] | None: Status of every node, None if a node is unreachable.
+        """
+        statuses = []
+        for connection in control_connections:
+            if connection is None:
+                statuses.append(self._status())
+                continue
+            try:
+                statuses.append(
+                    connection.send({"type": PartitionedRepository.MessageType.STATUS})
+                )
+            except OSError:
+                return None
+        return statuses
+
+    def _detect_termination(self) -> None:
+        """
+        Poll every node until two consecutive polls find all nodes idle with equal
+        totals of URLs forwarded and received, then tell every node to stop.
+        Polling stops without telling the other nodes if this node is closed.
+        """
+        control_connections = [
+            None if node_id == self._node_id else PeerConnection(address)
+            for node_id, address in enumerate(self._node_addresses)
+        ]
+        previous_counts = None
+        statuses = None
+        while not self._stopped.wait(PartitionedRepository.POLL_INTERVAL_SECONDS):
+            statuses = self._poll_statuses(control_connections)
+            if statuses is None:
+                previous_counts = None
+                continue
+            forwarded = sum(status["stats"]["forwarded_urls"] for status in statuses)
+            received = sum(status["stats"]["received_urls"] for status in statuses)
+            counts = (forwarded, received)
+            if not all(status["idle"] for status in statuses) or forwarded != received:
+                previous_counts = None
+                continue
+            if counts == previous_counts:
+                break
+            previous_counts = counts
+        crawl_over = not self._stopped.is_set()
+        if crawl_over:
+            self._node_stats = [NodeStats(**status["stats"]) for status in statuses]
+        for connection in control_connections:
+            if connection is None:
+                continue
+            if crawl_over:
+                try:
+                    connection.send(
+                        {"type": PartitionedRepository.MessageType.TERMINATE}
+                    )
+                except OSError:
+                    pass
+            connection.close()
+        if crawl_over:
+            self._crawl_over.set()
+
+    def _wait_for_coordinator(self) -> None:
+        """
+        Wait until the coordinator tells this node to stop, or did not poll it for
+        `coordinator_timeout` seconds, setting `coordinator_lost`, unless this node
+        is closed before.
+        """
+        self._last_polled_at = time.monotonic()
+        while not self._terminated.wait(PartitionedRepository.LIVENESS_CHECK_SECONDS):
+            if self._stopped.is_set():
+                return
+            if time.monotonic() - self._last_polled_at > self._coordinator_timeout:
+                self.coordinator_lost = True
+                break
+        self._node_stats = [self.stats]
+        self._crawl_over.set()
+
+    def _serve(self) -> None:
+        """
+        Start serving the other nodes, and waiting for the end of the crawl on a
+        background thread, unless already started. Peers cannot reach this node
+        until it is seeded and its workers are started, so the crawl cannot be
+        detected as over before this node joined it.
+        """
+        with self._serving_mutex:
+            if self._server is not None or self._stopped.is_set():
+                return
+            self._server = NodeServer(
+                self._node_addresses[self._node_id], self._handle_message
+            )
+            self._server.start()
+            self._termination_waiter = Thread(
+                target=(
+                    self._detect_termination
+                    if self._node_id == PartitionedRepository.COORDINATOR_NODE_ID
+                    else self._wait_for_coordinator
+                ),
+                daemon=True,
+            )
+            self._termination_waiter.start()
+
+    def all_urls_processed(self) -> bool:
+        """
+        Start serving the other nodes on the first call, see `_serve`.
+
+        Returns:
+            bool: Whether the coordinator detected that every node is done
+            crawling, or this node stopped as the coordinator was lost, without
+            blocking.
+        """
+        self._serve()
+        return self._crawl_over.is_set()
+
+    def wait_until_all_urls_processed(self) -> None:
+        """
+        Start serving the other nodes, block until every node is done crawling,
+        and close this node. A node other than the coordinator also stops once the
+        coordinator did not poll it for `coordinator_timeout` seconds, setting
+        `coordinator_lost`.
+        """
+        self._serve()
+        self._crawl_over.wait()
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop forwarding URLs, waiting for the end of the crawl, and serving the
+        other nodes. Closing a node before the crawl is over, e.g. once its crawl
+        budget is spent, leaves the other nodes waiting for it until they lose
+        their coordinator.
+        """
+        self._stopped.set()
+        self._forward_event.set()
+        self._forwarder.join()
+        with self._serving_mutex:
+            server, self._server = self._server, None
+            termination_waiter, self._termination_waiter = (
+                self._termination_waiter,
+                None,
+            )
+        if termination_waiter is not None:
+            termination_waiter.join()
+        if server is not None:
+            server.stop()
+        for connection in self._forward_connections:
+            connection.close()
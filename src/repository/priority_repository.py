@@ -0,0 +1,119 @@
+"""Frontier crawling the most valuable URLs first, e.g. before a crawl budget runs out"""
+
+import asyncio
+import itertools
+from queue import PriorityQueue
+from typing import Callable
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.async_repository import AsyncRepository
+from repository.repository import Repository
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import VisitedURLSet
+
+# Function returning the priority of a URL, URLs with lower scores are crawled first.
+URLScorer = Callable[[URL], float]
+
+
+def depth_score(url: URL) -> float:
+    """Breadth-first order, URLs fewer links away from a seed URL first."""
+    return url.depth
+
+
+def path_length_score(url: URL) -> float:
+    """URLs with the fewest path segments first, e.g. `/blog/` before `/blog/2018/`."""
+    return url.address.partition("?")[0].count("/")
+
+
+def query_param_score(url: URL) -> float:
+    """URLs with the fewest query parameters first."""
+    query = url.address.partition("?")[2]
+    return query.count("&") + 1 if query else 0
+
+
+def lastmod_score(url: URL) -> float:
+    """
+    URLs listed in sitemaps first, the most recently modified ones first,
+    then breadth-first order.
+    """
+    return url.depth if url.lastmod is None else -url.lastmod
+
+
+class _ScoredQueueMixin:
+    """
+    Priority queue of URLs ordered by the score of each URL, and in insertion order
+    among equal scores. URLs without a host (i.e. termination signals) come first.
+    """
+
+    def __init__(self, scorer: URLScorer) -> None:
+        self._scorer = scorer
+        # Insertion order, which also avoids comparing URLs of equal scores.
+        self._order = itertools.count()
+        super().__init__()
+
+    def _put(self, url: URL) -> None:
+        score = float("-inf") if url.subdomain is None else self._scorer(url)
+        super()._put((score, next(self._order), url))
+
+    def _get(self) -> URL:
+        return super()._get()[-1]
+
+
+class ScoredQueue(_ScoredQueueMixin, PriorityQueue):
+    """Thread-safe queue of URLs, ordered by their scores"""
+
+
+class AsyncScoredQueue(_ScoredQueueMixin, asyncio.PriorityQueue):
+    """asyncio queue of URLs, ordered by their scores"""
+
+
+class PriorityRepository(Repository):
+    """
+    Repository handing out the queued URL with the lowest score first, rather than
+    the oldest one. Restored URLs of a resumed crawl keep their depth and `lastmod`.
+    """
+
+    def __init__(
+        self,
+        scorer: URLScorer = depth_score,
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            scorer (URLScorer): Priority of every URL, lowest first.
+            visited_urls (VisitedURLSet | None): Dedupe backend, an exact set of URLs
+                is used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits and mutex waits
+                are recorded to, if any.
+        """
+        super().__init__(visited_urls, state_store, metrics)
+        self._urls_to_visit = ScoredQueue(scorer)
+
+
+class AsyncPriorityRepository(AsyncRepository):
+    """asyncio counterpart of `PriorityRepository`"""
+
+    def __init__(
+        self,
+        scorer: URLScorer = depth_score,
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            scorer (URLScorer): Priority of every URL, lowest first.
+            visited_urls (VisitedURLSet | None): Dedupe backend, an exact set of URLs
+                is used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits are recorded to,
+                if any.
+        """
+        super().__init__(visited_urls, state_store, metrics)
+        self._urls_to_visit = AsyncScoredQueue(scorer)
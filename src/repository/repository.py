@@ -1,9 +1,14 @@
 """Persistence layer to keep track of crawled URLs"""
 
+import time
 from queue import Queue
 from threading import Lock
+from typing import Iterable
 
+from metrics.crawl_metrics import CrawlMetrics
 from models.url import URL
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import ExactVisitedURLSet, VisitedURLSet
 
 
 class Repository:
@@ -11,7 +16,21 @@ class Repository:
     Class that persists status of web-crawler.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        visited_urls: VisitedURLSet | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            visited_urls (VisitedURLSet | None): Dedupe backend, an exact set of URLs
+                is used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits and mutex waits
+                are recorded to, if any.
+        """
         # Mutex that is held whenever a new URL is discovered.
         # This is to prevent multiple threads from writing the same url twice
         # to the queue, and that checks to the global visited set are thread safe,
@@ -24,7 +43,12 @@ class Repository:
 
         # A set to keep track of all URLs visited historically by the crawler.
         # Also used to prevent visiting the same URL multiple times.
-        self._visited_urls = set()
+        self._visited_urls = (
+            visited_urls if visited_urls is not None else ExactVisitedURLSet()
+        )
+
+        self._state_store = state_store
+        self._metrics = metrics
 
     def queue_next_url(self, url: URL) -> None:
         """
@@ -34,6 +58,18 @@ class Repository:
         """
         self._urls_to_visit.put(url)
 
+    def queue_next_urls(self, urls: list[URL]) -> None:
+        """
+        Add URLs to the `_urls_to_visit` queue. Called while holding `_mutex`, so
+        that the URLs discovered on a page are queued together, each through the
+        public `put` of the queue so that its bound, if any, is honoured.
+
+        Args:
+            urls (list[URL]): URLs to be visited
+        """
+        for url in urls:
+            self._urls_to_visit.put(url)
+
     def add_url_to_crawl(self, url: URL) -> None:
         """
         Add a newly discovered URL to the queue to be explored (i.e. parse it's HTML page).
@@ -47,11 +83,71 @@ class Repository:
             url (URL): Discovered URL.
         """
 
-        if url not in self._visited_urls:
+        if url in self._visited_urls:
+            if self._metrics is not None:
+                self._metrics.urls_duplicate.inc()
+            return
+        wait_started_at = time.perf_counter()
+        with self._mutex:
+            acquired_at = time.perf_counter()
+            is_new_url = url not in self._visited_urls
+            if is_new_url:
+                self.queue_next_url(url)
+                self._visited_urls.add(url)
+                if self._state_store is not None:
+                    self._state_store.record_discovered(url)
+        if self._metrics is not None:
+            self._metrics.record_url_found(is_new_url, acquired_at - wait_started_at)
+
+    def add_urls_to_crawl(self, urls: Iterable[URL]) -> None:
+        """
+        Add the URLs discovered on a page to be explored, like `add_url_to_crawl`,
+        but taking the mutex once for all of them rather than once per URL. URLs
+        already visited are filtered out before taking the mutex, and the remaining
+        ones are checked again, marked as visited and queued while holding it.
+
+        Args:
+            urls (Iterable[URL]): Discovered URLs, duplicates allowed.
+        """
+        found_url_count = 0
+        candidate_urls = []
+        for url in urls:
+            found_url_count += 1
+            if url not in self._visited_urls:
+                candidate_urls.append(url)
+        new_urls = []
+        mutex_wait = None
+        if candidate_urls:
+            wait_started_at = time.perf_counter()
             with self._mutex:
-                if url not in self._visited_urls:
-                    self.queue_next_url(url)
-                    self._visited_urls.add(url)
+                mutex_wait = time.perf_counter() - wait_started_at
+                for url in candidate_urls:
+                    if url not in self._visited_urls:
+                        self._visited_urls.add(url)
+                        new_urls.append(url)
+                self.queue_next_urls(new_urls)
+                if self._state_store is not None:
+                    self._state_store.record_discovered_urls(new_urls)
+        if self._metrics is not None:
+            self._metrics.record_urls_found(
+                len(new_urls), found_url_count - len(new_urls), mutex_wait
+            )
+
+    def restore_url(self, url: URL, processed: bool) -> None:
+        """
+        Restore a URL discovered by a previous run of the crawl, without recording it
+        again. URLs that were not processed are queued to be crawled.
+
+        Args:
+            url (URL): Previously discovered URL.
+            processed (bool): Whether the URL was processed.
+        """
+        with self._mutex:
+            self._visited_urls.add(url)
+        if not processed:
+            if self._metrics is not None:
+                self._metrics.urls_discovered.inc()
+            self.queue_next_url(url)
 
     def get_next_url(self) -> URL:
         """
@@ -76,14 +172,61 @@ class Repository:
             visited_urls_ = list(self._visited_urls)
         return visited_urls_
 
-    def notify_url_processed(self) -> None:
+    def notify_url_processed(self, url: URL | None = None) -> None:
         """
         Notify the underlying queue that a URL picked off the queue has been processed.
         This is primarily used by the queue to maintain context around which previously
         enqueued items are still being processed.
+
+        Args:
+            url (URL | None): Processed URL, used by frontiers that track per-URL state,
+                and recorded in the state store if any. A URL notified without its
+                address is not checkpointed, and is fetched again on resume.
+        """
+        if self._state_store is not None and url is not None:
+            self._state_store.record_processed(url)
+        self._urls_to_visit.task_done()
+
+    def requeue_url(self, url: URL) -> None:
+        """
+        Queue again a URL handed out by `get_next_url` whose crawl was abandoned,
+        e.g. as its worker crashed, without reporting it as processed. The URL is
+        queued before its previous hand-out is marked as done, so that the queue
+        is never seen as empty in between.
+
+        Args:
+            url (URL): URL to be crawled again.
         """
+        self.queue_next_url(url)
         self._urls_to_visit.task_done()
 
+    def hold_concurrency_slot(self, url: URL) -> None:
+        """
+        Keep counting a URL whose crawl was abandoned while still running, e.g. as
+        its worker is stuck, as being crawled until `release_concurrency_slot`,
+        whether it is queued again or given up on meanwhile. Only frontiers
+        limiting the URLs of a host crawled at once hold slots.
+
+        Args:
+            url (URL): URL whose crawl is still running.
+        """
+
+    def release_concurrency_slot(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): URL whose slot was held by `hold_concurrency_slot`, once its
+                abandoned crawl is over.
+        """
+
+    def all_urls_processed(self) -> bool:
+        """
+        Returns:
+            bool: Whether all URLs that have been queued were reported as processed,
+            without blocking.
+        """
+        with self._urls_to_visit.all_tasks_done:
+            return self._urls_to_visit.unfinished_tasks == 0
+
     def wait_until_all_urls_processed(self) -> None:
         """
         Block until all URLs that have been picked up from the queue were reported as processed,
@@ -0,0 +1,361 @@
+"""Persistence layer with per-worker queues and work stealing"""
+
+import itertools
+import random
+import time
+from collections import deque
+from threading import Condition, Lock, Thread, current_thread, local
+from typing import Iterable
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import URL
+from repository.repository import Repository
+from repository.state_store import CrawlStateStore
+from repository.visited_url_set import ExactVisitedURLSet, VisitedURLSet
+
+
+class ShardedRepository(Repository):
+    """
+    Repository avoiding the single shared queue and mutex of `Repository`,
+    which become a contention point as the number of workers grows.
+    - Every worker thread owns a deque of URLs to crawl, and URLs it discovers
+      are pushed to its own deque. A worker whose deque is empty steals half of
+      the URLs of another worker's deque. Deque operations are atomic, so neither
+      path takes a lock.
+    - The visited set is sharded by URL hash, with one lock per shard.
+    - Termination is detected from per-worker counters of added and processed URLs,
+      each only written by its own worker, instead of a shared counter.
+    """
+
+    # Seconds an idle worker waits before looking for work to steal again.
+    IDLE_POLL_SECONDS = 0.05
+
+    def __init__(
+        self,
+        worker_count: int,
+        visited_url_sets: list[VisitedURLSet] | None = None,
+        state_store: CrawlStateStore | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            worker_count (int): Number of worker threads calling `get_next_url`.
+            visited_url_sets (list[VisitedURLSet] | None): Dedupe backend of every
+                shard, 16 exact sets of URLs are used if not provided.
+            state_store (CrawlStateStore | None): Store recording discovered and
+                processed URLs, so that the crawl can be resumed.
+            metrics (CrawlMetrics | None): Metrics the dedupe hits and mutex waits
+                are recorded to, if any.
+        """
+        super().__init__(state_store=state_store, metrics=metrics)
+        self._worker_count = worker_count
+        if visited_url_sets is None:
+            visited_url_sets = [ExactVisitedURLSet() for _ in range(16)]
+        self._shard_count = len(visited_url_sets)
+        self._shard_visited_urls = visited_url_sets
+        self._shard_mutexes = [Lock() for _ in visited_url_sets]
+        self._deques = [deque() for _ in range(worker_count)]
+
+        # Index of the worker owning the calling thread, assigned on its first
+        # call to `get_next_url`, and thread owning every index. The index of a
+        # thread no longer running is handed over to the thread replacing it.
+        self._local = local()
+        self._worker_threads: list[Thread | None] = [None] * worker_count
+
+        # Per-worker counters of URLs added and processed. URLs added or processed
+        # by other threads (e.g. seeds added by the launcher) are counted in the
+        # last slot, under `_external_mutex`.
+        self._added_counts = [0] * (worker_count + 1)
+        self._processed_counts = [0] * (worker_count + 1)
+        self._external_mutex = Lock()
+        self._external_deque_index = itertools.count()
+
+        # Idle workers wait on this condition for new URLs or termination signals.
+        self._idle_condition = Condition()
+        self._idle_workers = 0
+        self._signals = deque()
+
+    def _worker_index(self) -> int | None:
+        return getattr(self._local, "worker_index", None)
+
+    def queue_next_url(self, url: URL) -> None:
+        """
+        Add URL to the deque of the calling worker, or spread URLs added by other
+        threads over all deques. URLs without a host (i.e. termination signals)
+        are handed out to idle workers.
+
+        Args:
+            url (URL): URL to be visited
+        """
+        if url.subdomain is None:
+            with self._idle_condition:
+                self._signals.append(url)
+                self._idle_condition.notify()
+            return
+
+        worker_index = self._worker_index()
+        if worker_index is None:
+            with self._external_mutex:
+                self._added_counts[self._worker_count] += 1
+                deque_index = next(self._external_deque_index) % self._worker_count
+            self._deques[deque_index].append(url)
+        else:
+            self._added_counts[worker_index] += 1
+            self._deques[worker_index].append(url)
+
+        # Reading the idle count without the lock may miss a worker about to wait,
+        # which is then woken up by its poll timeout.
+        if self._idle_workers:
+            with self._idle_condition:
+                self._idle_condition.notify()
+
+    def queue_next_urls(self, urls: list[URL]) -> None:
+        """
+        Add URLs to the deque of the calling worker at once, or spread them over
+        all deques if added by another thread.
+
+        Args:
+            urls (list[URL]): URLs to be visited
+        """
+        worker_index = self._worker_index()
+        if worker_index is None:
+            for url in urls:
+                self.queue_next_url(url)
+            return
+        self._added_counts[worker_index] += len(urls)
+        self._deques[worker_index].extend(urls)
+        if self._idle_workers:
+            with self._idle_condition:
+                self._idle_condition.notify(len(urls))
+
+    def add_url_to_crawl(self, url: URL) -> None:
+        """
+        Add a newly discovered URL to be explored, once we ensure that it had not been
+        discovered previously. Only the lock of the URL's shard is held while checking
+        and marking it as visited, using the same double-checked locking as `Repository`.
+
+        Args:
+            url (URL): Discovered URL.
+        """
+        shard = hash(url) % self._shard_count
+        visited_urls = self._shard_visited_urls[shard]
+        if url in visited_urls:
+            if self._metrics is not None:
+                self._metrics.urls_duplicate.inc()
+            return
+        shard_mutex = self._shard_mutexes[shard]
+        wait_started_at = time.perf_counter()
+        with shard_mutex:
+            acquired_at = time.perf_counter()
+            is_new_url = url not in visited_urls
+            if is_new_url:
+                visited_urls.add(url)
+                if self._state_store is not None:
+                    self._state_store.record_discovered(url)
+        if self._metrics is not None:
+            self._metrics.record_url_found(is_new_url, acquired_at - wait_started_at)
+        if is_new_url:
+            self.queue_next_url(url)
+
+    def add_urls_to_crawl(self, urls: Iterable[URL]) -> None:
+        """
+        Add the URLs discovered on a page, like `add_url_to_crawl`, but taking the
+        lock of every shard they fall in once rather than once per URL, and queueing
+        the new ones at once.
+
+        Args:
+            urls (Iterable[URL]): Discovered URLs, duplicates allowed.
+        """
+        found_url_count = 0
+        shard_candidate_urls: dict[int, list[URL]] = {}
+        for url in urls:
+            found_url_count += 1
+            shard = hash(url) % self._shard_count
+            if url not in self._shard_visited_urls[shard]:
+                shard_candidate_urls.setdefault(shard, []).append(url)
+        new_urls = []
+        mutex_wait = None
+        for shard, candidate_urls in shard_candidate_urls.items():
+            visited_urls = self._shard_visited_urls[shard]
+            wait_started_at = time.perf_counter()
+            with self._shard_mutexes[shard]:
+                mutex_wait = (mutex_wait or 0.0) + (
+                    time.perf_counter() - wait_started_at
+                )
+                shard_new_url_count = len(new_urls)
+                for url in candidate_urls:
+                    if url not in visited_urls:
+                        visited_urls.add(url)
+                        new_urls.append(url)
+                if self._state_store is not None:
+                    self._state_store.record_discovered_urls(
+                        new_urls[shard_new_url_count:]
+                    )
+        if self._metrics is not None:
+            self._metrics.record_urls_found(
+                len(new_urls), found_url_count - len(new_urls), mutex_wait
+            )
+        self.queue_next_urls(new_urls)
+
+    def restore_url(self, url: URL, processed: bool) -> None:
+        """
+        Restore a URL discovered by a previous run of the crawl, without recording it
+        again. URLs that were not processed are queued to be crawled.
+
+        Args:
+            url (URL): Previously discovered URL.
+            processed (bool): Whether the URL was processed.
+        """
+        shard = hash(url) % self._shard_count
+        with self._shard_mutexes[shard]:
+            self._shard_visited_urls[shard].add(url)
+        if not processed:
+            if self._metrics is not None:
+                self._metrics.urls_discovered.inc()
+            self.queue_next_url(url)
+
+    def _steal(self, worker_index: int) -> URL | None:
+        """
+        Move half of the URLs of the first non-empty deque of another worker
+        to the deque of the calling worker.
+
+        Args:
+            worker_index (int): Index of the calling worker.
+
+        Returns:
+            URL | None: URL to be processed, or None if all deques are empty.
+        """
+        own_deque = self._deques[worker_index]
+        offset = random.randrange(self._worker_count)
+        for victim in range(self._worker_count):
+            victim_deque = self._deques[(offset + victim) % self._worker_count]
+            if victim_deque is own_deque:
+                continue
+            try:
+                url = victim_deque.popleft()
+            except IndexError:
+                continue
+            # The victim may empty its deque meanwhile, the URLs taken so far are
+            # kept rather than lost.
+            for _ in range(len(victim_deque) // 2):
+                try:
+                    own_deque.append(victim_deque.popleft())
+                except IndexError:
+                    break
+            return url
+        return None
+
+    def _claim_worker_index(self) -> int:
+        """
+        Assign the calling thread the index of a worker, one that was never assigned
+        or whose thread is no longer running, e.g. a crashed worker being replaced.
+        Its deque and counters are taken over as they are.
+
+        Returns:
+            int: Index of the worker owning the calling thread.
+        """
+        with self._external_mutex:
+            for worker_index, thread in enumerate(self._worker_threads):
+                if thread is None or not thread.is_alive():
+                    self._worker_threads[worker_index] = current_thread()
+                    self._local.worker_index = worker_index
+                    return worker_index
+        raise RuntimeError(
+            f"More than {self._worker_count} worker threads polling for URLs"
+        )
+
+    def _count_processed(self) -> None:
+        """Count a URL as processed by the calling worker, or by another thread."""
+        worker_index = self._worker_index()
+        if worker_index is None:
+            with self._external_mutex:
+                self._processed_counts[self._worker_count] += 1
+        else:
+            self._processed_counts[worker_index] += 1
+
+    def get_next_url(self) -> URL:
+        """
+        Retrieve next url to be processed from the calling worker's deque,
+        or stolen from another worker's. Blocks until a URL is available.
+
+        Returns:
+            URL: Next URL to be processed.
+        """
+        worker_index = self._worker_index()
+        if worker_index is None:
+            worker_index = self._claim_worker_index()
+
+        own_deque = self._deques[worker_index]
+        while True:
+            try:
+                return own_deque.popleft()
+            except IndexError:
+                pass
+            url = self._steal(worker_index)
+            if url is not None:
+                return url
+            with self._idle_condition:
+                if self._signals:
+                    return self._signals.popleft()
+                self._idle_workers += 1
+                self._idle_condition.wait(ShardedRepository.IDLE_POLL_SECONDS)
+                self._idle_workers -= 1
+
+    @property
+    def visited_urls(self) -> list[URL]:
+        """
+        Get visited URLs at the time of function call
+
+        Returns:
+            list[URL]: Visited URLs of all shards
+        """
+        visited_urls_ = []
+        for shard_mutex, visited_urls in zip(
+            self._shard_mutexes, self._shard_visited_urls
+        ):
+            with shard_mutex:
+                visited_urls_.extend(visited_urls)
+        return visited_urls_
+
+    def notify_url_processed(self, url: URL | None = None) -> None:
+        """
+        Notify that a URL handed out to the calling worker has been processed.
+
+        Args:
+            url (URL | None): Processed URL, recorded in the state store if any, see
+                `Repository.notify_url_processed`.
+        """
+        if self._state_store is not None and url is not None:
+            self._state_store.record_processed(url)
+        self._count_processed()
+
+    def requeue_url(self, url: URL) -> None:
+        """
+        Queue again a URL handed out by `get_next_url` whose crawl was abandoned.
+        Its previous hand-out is counted as processed once the URL was counted
+        again as added.
+
+        Args:
+            url (URL): URL to be crawled again.
+        """
+        self.queue_next_url(url)
+        self._count_processed()
+
+    def all_urls_processed(self) -> bool:
+        """
+        Processed counts are read before added counts: as a URL is always counted
+        as added before it is counted as processed, and counters only grow, equal
+        sums imply that at the time the processed counts were read no URL was queued
+        or being processed.
+
+        Returns:
+            bool: Whether every URL added has been processed, without blocking.
+        """
+        processed = sum(self._processed_counts)
+        added = sum(self._added_counts)
+        return processed == added
+
+    def wait_until_all_urls_processed(self) -> None:
+        """Block until every URL added has been processed."""
+        while not self.all_urls_processed():
+            time.sleep(ShardedRepository.IDLE_POLL_SECONDS / 5)
@@ -0,0 +1,251 @@
+"""Durable store of crawl state, used to checkpoint and resume crawls"""
+
+import os
+import sqlite3
+import time
+from threading import Event, Lock, Thread
+from typing import Iterator
+
+from models.url import URL
+
+
+class CheckpointStats:
+    """
+    Counters measuring the overhead of checkpointing crawl state.
+    Only updated by the thread writing checkpoints.
+    """
+
+    def __init__(self) -> None:
+        self.checkpoints = 0
+        self.urls_written = 0
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.checkpoints} checkpoint(s), {self.urls_written} URL update(s)"
+            f" written in {self.seconds:.3f}s"
+        )
+
+
+class CrawlStateStore:
+    """
+    SQLite store of the URLs discovered by a crawl, their depth and sitemap `lastmod`,
+    and whether each one was processed.
+    The visited set is every URL in the store, and the frontier is every URL not yet
+    processed, so that an interrupted crawl can be resumed without refetching pages.
+
+    Recording a URL only appends it to an in-memory batch. A background thread writes
+    the batch every `checkpoint_interval` seconds in a single transaction, so crawler
+    workers never wait on disk and there is one sync per checkpoint rather than per URL.
+    A crash loses at most the URLs recorded since the last checkpoint: processed pages
+    not yet checkpointed are fetched again on resume, and nothing is skipped.
+    """
+
+    # Name of the database file in the state directory.
+    DATABASE_NAME = "crawl_state.sqlite3"
+
+    class Metadata:
+        """Keys of the crawl settings saved alongside the crawl state"""
+
+        BASE_URL = "base_url"
+        SEED_URLS = "seed_urls"
+
+    def __init__(
+        self, state_dir: str, checkpoint_interval: float = 1.0, clear: bool = False
+    ) -> None:
+        """
+        Args:
+            state_dir (str): Directory holding the crawl state, created if missing.
+            checkpoint_interval (float): Seconds between two checkpoints.
+            clear (bool): Whether to delete the state of a previous crawl, so that
+                a crawl which is not resumed does not inherit its URLs.
+        """
+        os.makedirs(state_dir, exist_ok=True)
+        self._checkpoint_interval = checkpoint_interval
+        self._connection = sqlite3.connect(
+            os.path.join(state_dir, CrawlStateStore.DATABASE_NAME),
+            check_same_thread=False,
+        )
+        # The write-ahead log turns a checkpoint into one sequential append,
+        # and NORMAL synchronous mode only syncs the log at WAL checkpoints.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "address TEXT PRIMARY KEY, processed INTEGER NOT NULL DEFAULT 0,"
+            " depth INTEGER NOT NULL DEFAULT 0, lastmod REAL)"
+        )
+        # States written before depths and lastmods were stored restore them as 0
+        # and None.
+        columns = {
+            row[1] for row in self._connection.execute("PRAGMA table_info(urls)")
+        }
+        if "depth" not in columns:
+            self._connection.execute(
+                "ALTER TABLE urls ADD COLUMN depth INTEGER NOT NULL DEFAULT 0"
+            )
+        if "lastmod" not in columns:
+            self._connection.execute("ALTER TABLE urls ADD COLUMN lastmod REAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        if clear:
+            self._connection.execute("DELETE FROM urls")
+            self._connection.execute("DELETE FROM metadata")
+        self._connection.commit()
+
+        # Mutex guarding the batches of URLs not written yet.
+        self._batch_mutex = Lock()
+        self._discovered_batch: list[tuple[str, int, float | None]] = []
+        self._processed_batch: list[tuple[str]] = []
+
+        # Mutex serializing writes to the database.
+        self._write_mutex = Lock()
+        self.stats = CheckpointStats()
+
+        self._stopped = Event()
+        self._checkpoint_thread = Thread(target=self._run_checkpoints, daemon=True)
+        self._checkpoint_thread.start()
+
+    def record_discovered(self, url: URL) -> None:
+        """
+        Record a newly discovered URL along with its depth and `lastmod`, to be
+        written at the next checkpoint.
+
+        Args:
+            url (URL): Discovered URL.
+        """
+        with self._batch_mutex:
+            self._discovered_batch.append((url.address, url.depth, url.lastmod))
+
+    def record_discovered_urls(self, urls: list[URL]) -> None:
+        """
+        Record newly discovered URLs at once, see `record_discovered`.
+
+        Args:
+            urls (list[URL]): Discovered URLs.
+        """
+        if not urls:
+            return
+        with self._batch_mutex:
+            self._discovered_batch.extend(
+                (url.address, url.depth, url.lastmod) for url in urls
+            )
+
+    def record_processed(self, url: URL) -> None:
+        """
+        Record that a URL was processed, to be written at the next checkpoint.
+
+        Args:
+            url (URL): Processed URL.
+        """
+        with self._batch_mutex:
+            self._processed_batch.append((url.address,))
+
+    def checkpoint(self) -> None:
+        """
+        Write all URLs recorded so far in a single transaction.
+        A URL is always discovered before it is processed, so both of its records
+        are either in the same batch or its discovery is in an earlier one.
+        """
+        with self._write_mutex:
+            with self._batch_mutex:
+                discovered_batch = self._discovered_batch
+                processed_batch = self._processed_batch
+                self._discovered_batch = []
+                self._processed_batch = []
+            if not discovered_batch and not processed_batch:
+                return
+            start = time.perf_counter()
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO urls (address, depth, lastmod)"
+                    " VALUES (?, ?, ?)",
+                    discovered_batch,
+                )
+                self._connection.executemany(
+                    "UPDATE urls SET processed = 1 WHERE address = ?",
+                    processed_batch,
+                )
+            self.stats.checkpoints += 1
+            self.stats.urls_written += len(discovered_batch) + len(processed_batch)
+            self.stats.seconds += time.perf_counter() - start
+
+    def _run_checkpoints(self) -> None:
+        while not self._stopped.wait(self._checkpoint_interval):
+            self.checkpoint()
+
+    def load(self) -> Iterator[tuple[URL, bool]]:
+        """
+        Iterate over the URLs of the last checkpoint.
+
+        Returns:
+            Iterator[tuple[URL, bool]]: Every discovered URL, with its depth and
+            `lastmod`, and whether it was processed.
+        """
+        with self._write_mutex:
+            rows = self._connection.execute(
+                "SELECT address, processed, depth, lastmod FROM urls"
+            ).fetchall()
+        for address, processed, depth, lastmod in rows:
+            url = URL(address)
+            url.depth = depth
+            url.lastmod = lastmod
+            yield url, bool(processed)
+
+    def set_metadata(self, key: str, value: str) -> None:
+        """
+        Save a crawl setting, written immediately.
+
+        Args:
+            key (str): Name of the setting, see `CrawlStateStore.Metadata`.
+            value (str): Value of the setting.
+        """
+        with self._write_mutex, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    def get_metadata(self, key: str) -> str | None:
+        """
+        Args:
+            key (str): Name of the setting, see `CrawlStateStore.Metadata`.
+
+        Returns:
+            str | None: Value of the setting, None if it was never saved.
+        """
+        with self._write_mutex:
+            row = self._connection.execute(
+                "SELECT value FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def read_metadata(state_dir: str) -> dict[str, str]:
+        """
+        Read the crawl settings of a state directory, without opening the store.
+
+        Args:
+            state_dir (str): Directory holding the crawl state.
+
+        Returns:
+            dict[str, str]: Saved crawl settings, empty if there is no crawl state.
+        """
+        path = os.path.join(state_dir, CrawlStateStore.DATABASE_NAME)
+        if not os.path.exists(path):
+            return {}
+        connection = sqlite3.connect(path)
+        try:
+            return dict(connection.execute("SELECT key, value FROM metadata"))
+        except sqlite3.OperationalError:
+            return {}
+        finally:
+            connection.close()
+
+    def close(self) -> None:
+        """Stop the checkpoint thread, write a final checkpoint and close the store."""
+        self._stopped.set()
+        self._checkpoint_thread.join()
+        self.checkpoint()
+        self._connection.close()
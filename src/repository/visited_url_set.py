@@ -0,0 +1,331 @@
+"""Dedupe backends keeping track of URLs already discovered by the crawler"""
+
+import hashlib
+import math
+import os
+import tempfile
+from array import array
+from threading import Lock
+from typing import Iterator
+
+from models.url import URL
+
+
+def url_fingerprint(url: URL, bits: int = 64) -> int:
+    """
+    Compute a stable fingerprint of a URL's address, independent of the
+    per-process randomization of Python's `hash`.
+
+    Args:
+        url (URL): URL to fingerprint.
+        bits (int): Width of the fingerprint, a multiple of 8.
+
+    Returns:
+        int: Fingerprint of the address.
+    """
+    digest = hashlib.blake2b(url.address.encode(), digest_size=bits // 8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class VisitedURLLog:
+    """
+    Append-only log of the URLs added to a compact visited set, which only stores
+    fingerprints and therefore cannot enumerate its URLs. The log is written to a
+    file, so that visited URLs take no memory at all, a temporary one if no path is
+    given. A log file is truncated when opened: a resumed crawl logs again every URL
+    it restores to its visited set.
+    """
+
+    # Number of lines read from the log file at a time when iterating over it.
+    READ_BATCH_LINES = 1024
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Args:
+            path (str | None): File the addresses are written to, truncated if it
+                exists, a temporary file deleted on close if None.
+        """
+        self._mutex = Lock()
+        self._file = (
+            open(path, "w+", encoding="utf-8")
+            if path
+            else tempfile.TemporaryFile("w+", encoding="utf-8")
+        )
+
+    def append(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): URL to append to the log.
+        """
+        with self._mutex:
+            self._file.write(f"{url.address}\n")
+
+    def __iter__(self) -> Iterator[URL]:
+        # The URLs logged when the iteration starts are read back a batch of lines
+        # at a time, so that they never all sit in memory at once, and appending is
+        # only blocked while a batch is read.
+        with self._mutex:
+            end_offset = self._file.tell()
+        offset = 0
+        while offset < end_offset:
+            with self._mutex:
+                self._file.seek(offset)
+                lines = []
+                while (
+                    len(lines) < VisitedURLLog.READ_BATCH_LINES and offset < end_offset
+                ):
+                    line = self._file.readline()
+                    if not line:
+                        # The log file was truncated meanwhile.
+                        end_offset = offset
+                        break
+                    lines.append(line)
+                    offset = self._file.tell()
+                self._file.seek(0, os.SEEK_END)
+            for line in lines:
+                yield URL(line.rstrip("\n"))
+
+    def close(self) -> None:
+        """Close the log file."""
+        with self._mutex:
+            self._file.close()
+
+
+class NullVisitedURLLog(VisitedURLLog):
+    """
+    Log dropping the URLs added to a compact visited set which is only queried, so
+    that the set takes a fixed amount of memory per URL, or none at all for a Bloom
+    filter. Such a set cannot enumerate its URLs.
+    """
+
+    def __init__(self) -> None:  # pylint: disable=super-init-not-called
+        self._mutex = Lock()
+
+    def append(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): URL to drop.
+        """
+
+    def __iter__(self) -> Iterator[URL]:
+        raise TypeError("The URLs of a visited set without a log cannot be enumerated")
+
+    def close(self) -> None:
+        """Nothing to close, no file is written."""
+
+
+class ExactVisitedURLSet:
+    """Visited set storing full `URL` objects, which is exact but memory hungry"""
+
+    def __init__(self) -> None:
+        self._urls = set()
+
+    def __contains__(self, url: URL) -> bool:
+        return url in self._urls
+
+    def add(self, url: URL) -> None:
+        """
+        Args:
+            url (URL): URL to mark as visited.
+        """
+        self._urls.add(url)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __iter__(self) -> Iterator[URL]:
+        return iter(self._urls)
+
+    def close(self) -> None:
+        """Release resources held by the set, nothing to release for an exact set."""
+
+
+class FingerprintVisitedURLSet:
+    """
+    Visited set storing fixed-width 64 or 128-bit fingerprints in an array-backed,
+    linear probing hash table, i.e. 8 or 16 bytes per slot instead of a full `URL`
+    object. Two distinct URLs sharing a fingerprint are wrongly considered duplicates,
+    which for 64-bit fingerprints is expected once in about 4 billion URLs.
+
+    Lookups are safe without holding the writer's lock: the table is never mutated in
+    place when resized, but replaced by a fully populated new one.
+    """
+
+    # Fraction of occupied slots above which the table is doubled.
+    MAX_LOAD_FACTOR = 0.7
+
+    def __init__(
+        self,
+        fingerprint_bits: int = 64,
+        log: VisitedURLLog | None = None,
+        initial_capacity: int = 1024,
+    ) -> None:
+        """
+        Args:
+            fingerprint_bits (int): Width of the fingerprints, either 64 or 128.
+            log (VisitedURLLog | None): Log of the added URLs, temporary if None.
+            initial_capacity (int): Initial number of slots, rounded up to a power of two.
+        """
+        if fingerprint_bits not in (64, 128):
+            raise ValueError(f"Unsupported fingerprint width: {fingerprint_bits}")
+        self._fingerprint_bits = fingerprint_bits
+        # Number of 64-bit words per slot, the first word of an empty slot is 0.
+        self._words = fingerprint_bits // 64
+        self._log = log or VisitedURLLog()
+        self._count = 0
+        capacity = 1 << max(initial_capacity - 1, 1).bit_length()
+        self._table = array("Q", bytes(8 * self._words * capacity))
+
+    def _slot_words(self, url: URL) -> tuple[int, ...]:
+        fingerprint = url_fingerprint(url, self._fingerprint_bits)
+        words = tuple(
+            (fingerprint >> (64 * word)) & 0xFFFFFFFFFFFFFFFF
+            for word in range(self._words)
+        )
+        # Reserve a leading 0 word for empty slots.
+        return (words[0] or 1,) + words[1:]
+
+    def _find_slot(self, table: array, slot_words: tuple[int, ...]) -> tuple[int, bool]:
+        """
+        Probe a table for a fingerprint.
+
+        Returns:
+            tuple[int, bool]: Index of the slot holding the fingerprint, or of the
+            empty slot where it would be inserted, and whether it was found.
+        """
+        words = self._words
+        mask = len(table) // words - 1
+        index = slot_words[0] & mask
+        while True:
+            offset = index * words
+            leading_word = table[offset]
+            if leading_word == 0:
+                return index, False
+            if leading_word == slot_words[0] and (
+                words == 1 or tuple(table[offset : offset + words]) == slot_words
+            ):
+                return index, True
+            index = (index + 1) & mask
+
+    def __contains__(self, url: URL) -> bool:
+        return self._find_slot(self._table, self._slot_words(url))[1]
+
+    def _resize(self) -> None:
+        """Rehash all fingerprints into a table with twice as many slots."""
+        words = self._words
+        old_table = self._table
+        table = array("Q", bytes(2 * 8 * len(old_table)))
+        for offset in range(0, len(old_table), words):
+            if old_table[offset]:
+                slot_words = tuple(old_table[offset : offset + words])
+                index, _ = self._find_slot(table, slot_words)
+                table[index * words : index * words + words] = array("Q", slot_words)
+        self._table = table
+
+    def add(self, url: URL) -> None:
+        """
+        Mark a URL as visited. Must not be called concurrently.
+
+        Args:
+            url (URL): URL to mark as visited.
+        """
+        slot_words = self._slot_words(url)
+        index, found = self._find_slot(self._table, slot_words)
+        if found:
+            return
+        words = self._words
+        self._table[index * words : index * words + words] = array("Q", slot_words)
+        self._count += 1
+        self._log.append(url)
+        if self._count > FingerprintVisitedURLSet.MAX_LOAD_FACTOR * (
+            len(self._table) // words
+        ):
+            self._resize()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[URL]:
+        return iter(self._log)
+
+    def close(self) -> None:
+        """Close the log of added URLs."""
+        self._log.close()
+
+
+class BloomFilterVisitedURLSet:
+    """
+    Visited set backed by a Bloom filter sized for an expected number of URLs and a
+    false positive rate, e.g. about 1.2 bytes per URL for a 1% rate. A false positive
+    means a newly discovered URL is wrongly considered visited, and is not crawled.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10_000_000,
+        false_positive_rate: float = 0.001,
+        log: VisitedURLLog | None = None,
+    ) -> None:
+        """
+        Args:
+            capacity (int): Expected number of URLs, beyond which the false positive
+                rate degrades.
+            false_positive_rate (float): Target false positive rate at capacity.
+            log (VisitedURLLog | None): Log of the added URLs, temporary if None.
+        """
+        bit_count = math.ceil(
+            -capacity * math.log(false_positive_rate) / (math.log(2) ** 2)
+        )
+        self._bit_count = max(bit_count, 8)
+        self._hash_count = max(round(self._bit_count / capacity * math.log(2)), 1)
+        self._bits = bytearray((self._bit_count + 7) // 8)
+        self._log = log or VisitedURLLog()
+        self._count = 0
+
+    def _bit_indexes(self, url: URL) -> list[int]:
+        # Double hashing derives all indexes from a single 128-bit fingerprint.
+        fingerprint = url_fingerprint(url, 128)
+        first_hash = fingerprint & 0xFFFFFFFFFFFFFFFF
+        second_hash = (fingerprint >> 64) | 1
+        return [
+            (first_hash + hash_number * second_hash) % self._bit_count
+            for hash_number in range(self._hash_count)
+        ]
+
+    def __contains__(self, url: URL) -> bool:
+        bits = self._bits
+        return all(
+            bits[index >> 3] & (1 << (index & 7)) for index in self._bit_indexes(url)
+        )
+
+    def add(self, url: URL) -> None:
+        """
+        Mark a URL as visited. Must not be called concurrently.
+
+        Args:
+            url (URL): URL to mark as visited.
+        """
+        bits = self._bits
+        is_new = False
+        for index in self._bit_indexes(url):
+            mask = 1 << (index & 7)
+            if not bits[index >> 3] & mask:
+                bits[index >> 3] |= mask
+                is_new = True
+        if is_new:
+            self._count += 1
+            self._log.append(url)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[URL]:
+        return iter(self._log)
+
+    def close(self) -> None:
+        """Close the log of added URLs."""
+        self._log.close()
+
+
+# Any of the dedupe backends, which all support `in`, `add`, `len` and iteration.
+VisitedURLSet = ExactVisitedURLSet | FingerprintVisitedURLSet | BloomFilterVisitedURLSet
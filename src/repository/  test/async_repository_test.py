@@ -0,0 +1,47 @@
+"""Test the asyncio repository layer of the web-crawler"""
+
+import asyncio
+
+from models.url import URL
+from repository.async_repository import AsyncRepository
+
+
+def test_async_repository_handles_redundancy():
+    """Test that the async repository handles rendunant links being added"""
+
+    async def scenario():
+        repository = AsyncRepository()
+        repository.add_url_to_crawl(URL("test_0"))
+        repository.add_url_to_crawl(URL("test_0"))
+        repository.add_url_to_crawl(URL("test_1"))
+        next_url_0 = await repository.get_next_url()
+        next_url_1 = await repository.get_next_url()
+        return repository, next_url_0, next_url_1
+
+    repository, next_url_0, next_url_1 = asyncio.run(scenario())
+
+    assert set(repository.visited_urls) == {URL("test_0"), URL("test_1")}
+    assert next_url_0 == URL("test_0")
+    assert next_url_1 == URL("test_1")
+
+
+def test_async_repository_unblocks_when_all_links_processed():
+    """
+    Test that the async repository resumes the waiting task when all
+    previously enqueued URLs are reported as processed.
+    """
+
+    async def scenario():
+        repository = AsyncRepository()
+        repository.add_url_to_crawl(URL("test_0"))
+        repository.add_url_to_crawl(URL("test_1"))
+        await repository.get_next_url()
+        repository.notify_url_processed()
+        await repository.get_next_url()
+        repository.notify_url_processed()
+        await asyncio.wait_for(repository.wait_until_all_urls_processed(), 1)
+        return repository
+
+    repository = asyncio.run(scenario())
+
+    assert set(repository.visited_urls) == {URL("test_0"), URL("test_1")}
@@ -0,0 +1,80 @@
+"""Test the per-host partitioned repository of the web-crawler"""
+
+import time
+
+from models.url import URL
+from repository.host_repository import HostPartitionedRepository
+
+
+def test_host_repository_respects_per_host_concurrency():
+    """
+    Test that a host at its concurrency limit is skipped in favour of another
+    host that has URLs ready, and served again once a URL is processed.
+    """
+    repository = HostPartitionedRepository(per_host_concurrency=1)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.add_url_to_crawl(URL("https://a.com/1"))
+    repository.add_url_to_crawl(URL("https://b.com/0"))
+
+    first_url = repository.get_next_url()
+    second_url = repository.get_next_url()
+    repository.notify_url_processed(first_url)
+    third_url = repository.get_next_url()
+
+    assert first_url == URL("https://a.com/0")
+    assert second_url == URL("https://b.com/0")
+    assert third_url == URL("https://a.com/1")
+
+
+def test_host_repository_respects_per_host_delay():
+    """
+    Test that two URLs of the same host are handed out at least
+    the configured delay apart.
+    """
+    repository = HostPartitionedRepository(per_host_concurrency=2, per_host_delay=0.1)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.add_url_to_crawl(URL("https://a.com/1"))
+
+    start = time.monotonic()
+    repository.get_next_url()
+    repository.get_next_url()
+
+    assert time.monotonic() - start >= 0.1
+
+
+def test_host_repository_unblocks_when_all_links_processed():
+    """
+    Test that the repository unblocks the caller when all
+    previously enqueued URLs are reported as processed.
+    """
+    repository = HostPartitionedRepository(per_host_concurrency=2)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.add_url_to_crawl(URL("https://b.com/0"))
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    for _ in range(2):
+        repository.notify_url_processed(repository.get_next_url())
+
+    repository.wait_until_all_urls_processed()
+
+    assert set(repository.visited_urls) == {
+        URL("https://a.com/0"),
+        URL("https://b.com/0"),
+    }
+
+
+def test_host_repository_holds_slot_of_abandoned_crawl():
+    """
+    Test that a URL queued again while its abandoned crawl is still running
+    keeps the concurrency slot of its host until that crawl is over.
+    """
+    repository = HostPartitionedRepository(per_host_concurrency=1)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.add_url_to_crawl(URL("https://b.com/0"))
+    stuck_url = repository.get_next_url()
+
+    repository.hold_concurrency_slot(stuck_url)
+    repository.requeue_url(stuck_url)
+    assert repository.get_next_url() == URL("https://b.com/0")
+    repository.release_concurrency_slot(stuck_url)
+
+    assert repository.get_next_url() == stuck_url
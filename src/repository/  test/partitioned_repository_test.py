@@ -0,0 +1,237 @@
+"""Test the hash-partitioned repository of a distributed crawl"""
+
+import socket
+import time
+from threading import Thread
+
+from models.url import URL
+from repository.partitioned_repository import PartitionedRepository
+from repository.repository import Repository
+from repository.visited_url_set import FingerprintVisitedURLSet, NullVisitedURLLog
+
+
+def free_node_addresses(node_count: int) -> list[tuple[str, int]]:
+    """
+    Args:
+        node_count (int): Number of nodes.
+
+    Returns:
+        list[tuple[str, int]]: Loopback addresses on ports that are currently free.
+    """
+    sockets = [socket.socket() for _ in range(node_count)]
+    for node_socket in sockets:
+        node_socket.bind(("127.0.0.1", 0))
+    addresses = [node_socket.getsockname() for node_socket in sockets]
+    for node_socket in sockets:
+        node_socket.close()
+    return addresses
+
+
+def crawl_binary_tree(repository: PartitionedRepository, page_count: int) -> None:
+    """
+    Crawl a site where page n links to pages 2n+1 and 2n+2 with two worker threads,
+    until the distributed crawl is over.
+
+    Args:
+        repository (PartitionedRepository): Repository of the node.
+        page_count (int): Number of pages of the site.
+    """
+
+    def worker():
+        while (url := repository.get_next_url()).subdomain is not None:
+            page = int(url.address.rsplit("/", 1)[1])
+            for link in (2 * page + 1, 2 * page + 2):
+                if link < page_count:
+                    repository.add_url_to_crawl(URL(f"https://a.com/{link}"))
+            repository.notify_url_processed(url)
+
+    workers = [Thread(target=worker) for _ in range(2)]
+    for thread in workers:
+        thread.start()
+    repository.wait_until_all_urls_processed()
+    for _ in workers:
+        repository.queue_next_url(URL(""))
+    for thread in workers:
+        thread.join()
+
+
+def test_partitioned_repository_owner_is_stable():
+    """
+    Test that every node agrees on the owner of a URL, and that URLs are
+    spread over all nodes.
+    """
+    addresses = free_node_addresses(3)
+    repositories = [PartitionedRepository(node_id, addresses) for node_id in range(3)]
+    urls = [URL(f"https://a.com/{index}") for index in range(100)]
+
+    owners = [[repository.owner(url) for url in urls] for repository in repositories]
+
+    assert owners[0] == owners[1] == owners[2]
+    assert set(owners[0]) == {0, 1, 2}
+
+
+def test_partitioned_repository_crawls_each_url_on_its_owner():
+    """
+    Test that nodes discovering each other's URLs crawl every page exactly once,
+    on the node owning it, and that the coordinator detects the end of the crawl.
+    """
+    addresses = free_node_addresses(3)
+    repositories = [
+        PartitionedRepository(node_id, addresses, forward_batch_size=4)
+        for node_id in range(3)
+    ]
+    for repository in repositories:
+        repository.add_url_to_crawl(URL("https://a.com/0"))
+    nodes = [
+        Thread(target=crawl_binary_tree, args=(repository, 200))
+        for repository in repositories
+    ]
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.join()
+
+    visited_urls = [set(repository.visited_urls) for repository in repositories]
+    assert set.union(*visited_urls) == {
+        URL(f"https://a.com/{page}") for page in range(200)
+    }
+    assert sum(len(urls) for urls in visited_urls) == 200
+    for node_id, urls in enumerate(visited_urls):
+        assert all(repositories[node_id].owner(url) == node_id for url in urls)
+
+    node_stats = repositories[0].node_stats
+    assert [stats.node_id for stats in node_stats] == [0, 1, 2]
+    assert sum(stats.processed_urls for stats in node_stats) == 200
+    assert sum(stats.forwarded_urls for stats in node_stats) == sum(
+        stats.received_urls for stats in node_stats
+    )
+
+
+def test_partitioned_repository_counts_resent_batch_once():
+    """
+    Test that a batch sent again, e.g. after its reply was lost, is only counted
+    once, so that the totals of URLs forwarded and received can still match.
+    """
+    repository = PartitionedRepository(0, free_node_addresses(2))
+    message = {
+        "type": PartitionedRepository.MessageType.URLS,
+        "sender": 1,
+        "batch": 0,
+        "urls": [["https://a.com/0", "a.com", "https"]],
+    }
+
+    repository._handle_message(message)
+    repository._handle_message(message)
+
+    assert repository.stats.received_urls == 1
+    assert len(repository.visited_urls) == 1
+
+    # Batches are delivered in increasing order, so only the highest batch number
+    # of every sender is remembered.
+    repository._handle_message(
+        {**message, "batch": 5, "urls": [["https://a.com/5", "a.com", "https"]]}
+    )
+    repository._handle_message(message)
+
+    assert repository.stats.received_urls == 2
+    assert repository._last_received_batches == {1: 5}
+
+
+def test_partitioned_repository_forwards_with_compact_dedupe():
+    """
+    Test that URLs owned by another node are deduped with the configured compact
+    backend before being forwarded, and only forwarded once.
+    """
+    addresses = free_node_addresses(2)
+    forwarded_urls = FingerprintVisitedURLSet(64, NullVisitedURLLog())
+    repository = PartitionedRepository(0, addresses, forwarded_urls=forwarded_urls)
+    urls = [URL(f"https://a.com/{page}") for page in range(16)]
+    foreign_urls = [url for url in urls if repository.owner(url) == 1]
+
+    repository.add_urls_to_crawl(urls)
+    repository.add_urls_to_crawl(urls)
+
+    assert len(forwarded_urls) == len(foreign_urls)
+    assert all(url in forwarded_urls for url in foreign_urls)
+    repository.close()
+
+
+def test_partitioned_repository_queues_received_batch_at_once(mocker):
+    """
+    Test that the URLs of a received batch are deduped and queued together, through
+    the batch API of the repository rather than one by one.
+    """
+    repository = PartitionedRepository(0, free_node_addresses(2))
+    add_urls_to_crawl = mocker.spy(Repository, "add_urls_to_crawl")
+    add_url_to_crawl = mocker.spy(Repository, "add_url_to_crawl")
+
+    repository._handle_message(
+        {
+            "type": PartitionedRepository.MessageType.URLS,
+            "sender": 1,
+            "batch": 0,
+            "urls": [
+                ["https://a.com/0", "a.com", "https"],
+                ["https://a.com/1", "a.com", "https"],
+                ["https://a.com/0", "a.com", "https"],
+            ],
+        }
+    )
+
+    assert add_urls_to_crawl.call_count == 1
+    assert add_url_to_crawl.call_count == 0
+    assert [repository.get_next_url() for _ in range(2)] == [
+        URL("https://a.com/0"),
+        URL("https://a.com/1"),
+    ]
+    assert len(repository.visited_urls) == 2
+
+
+def test_partitioned_repository_stops_without_coordinator():
+    """
+    Test that a node stops on its own once the coordinator stopped polling it,
+    rather than waiting forever.
+    """
+    repository = PartitionedRepository(
+        1, free_node_addresses(2), coordinator_timeout=0.2
+    )
+
+    repository.wait_until_all_urls_processed()
+
+    assert repository.coordinator_lost
+
+
+def test_partitioned_repository_reports_end_of_crawl_without_blocking():
+    """
+    Test that nodes polled for whether all URLs were processed, as by a crawl
+    budget, serve each other and report the end of the crawl once the coordinator
+    detected it.
+    """
+    addresses = free_node_addresses(2)
+    repositories = [PartitionedRepository(node_id, addresses) for node_id in range(2)]
+    repositories[0].add_urls_to_crawl(
+        [URL(f"https://a.com/{page}") for page in range(20)]
+    )
+
+    def worker(repository):
+        while (url := repository.get_next_url()).subdomain is not None:
+            repository.notify_url_processed(url)
+
+    workers = [
+        Thread(target=worker, args=(repository,), daemon=True)
+        for repository in repositories
+    ]
+    for thread in workers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    # Every node is polled, so that every node starts serving the others.
+    while not all([repository.all_urls_processed() for repository in repositories]):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    for repository in repositories:
+        repository.close()
+        repository.queue_next_url(URL(""))
+    for thread in workers:
+        thread.join()
+
+    assert sum(stats.processed_urls for stats in repositories[0].node_stats) == 20
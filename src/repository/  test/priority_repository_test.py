@@ -0,0 +1,65 @@
+"""Test the priority frontier"""
+
+import asyncio
+
+from crawler.crawler import Crawler
+from models.url import URL
+from repository.priority_repository import (
+    AsyncPriorityRepository,
+    PriorityRepository,
+    path_length_score,
+    query_param_score,
+)
+
+
+def test_priority_repository_hands_out_lowest_depth_first():
+    """Test that URLs are crawled breadth-first, in insertion order within a depth"""
+    repository = PriorityRepository()
+    for address, depth in (("https://a.com/x", 2), ("https://a.com/y", 1)):
+        url = URL(address)
+        url.depth = depth
+        repository.add_url_to_crawl(url)
+    repository.add_url_to_crawl(URL("https://a.com/z"))
+    repository.add_url_to_crawl(URL("https://a.com/w"))
+    repository.queue_next_url(Crawler.TERMINATION_SIGNAL)
+
+    next_urls = [repository.get_next_url() for _ in range(5)]
+
+    assert next_urls == [
+        Crawler.TERMINATION_SIGNAL,
+        URL("https://a.com/z"),
+        URL("https://a.com/w"),
+        URL("https://a.com/y"),
+        URL("https://a.com/x"),
+    ]
+
+
+def test_url_scorers():
+    """Test the path length and query parameter scores"""
+    assert path_length_score(URL("https://a.com/")) < path_length_score(
+        URL("https://a.com/blog/2018/?page=/x")
+    )
+    assert query_param_score(URL("https://a.com/a")) == 0
+    assert query_param_score(URL("https://a.com/a?b=1&c=2")) == 2
+
+
+def test_async_priority_repository_uses_scorer():
+    """Test that the asyncio frontier hands out the URL with the lowest score first"""
+
+    async def crawl_order() -> list[URL]:
+        repository = AsyncPriorityRepository(query_param_score)
+        repository.add_url_to_crawl(URL("https://a.com/?a=1&b=2"))
+        repository.add_url_to_crawl(URL("https://a.com/?a=1"))
+        repository.add_url_to_crawl(URL("https://a.com/"))
+        next_urls = []
+        for _ in range(3):
+            next_urls.append(await repository.get_next_url())
+            repository.notify_url_processed()
+        await repository.wait_until_all_urls_processed()
+        return next_urls
+
+    assert asyncio.run(crawl_order()) == [
+        URL("https://a.com/"),
+        URL("https://a.com/?a=1"),
+        URL("https://a.com/?a=1&b=2"),
+    ]
@@ -38,3 +38,23 @@ def test_repository_unblocks_when_all_links_processed():
     assert set(repository.visited_urls) == {URL("test_0"), URL("test_1")}
     assert next_url_0 == URL("test_0")
     assert next_url_1 == URL("test_1")
+
+
+def test_repository_adds_urls_in_batch():
+    """
+    Test that a batch of URLs is deduped against the visited URLs and itself,
+    and the new URLs are queued in order.
+    """
+    repository = Repository()
+    repository.add_url_to_crawl(URL("test_0"))
+
+    repository.add_urls_to_crawl(
+        [URL("test_1"), URL("test_0"), URL("test_2"), URL("test_1")]
+    )
+    next_urls = [repository.get_next_url() for _ in range(3)]
+    for _ in next_urls:
+        repository.notify_url_processed()
+    repository.wait_until_all_urls_processed()
+
+    assert next_urls == [URL("test_0"), URL("test_1"), URL("test_2")]
+    assert len(repository.visited_urls) == 3
@@ -0,0 +1,130 @@
+"""Test the sharded work-stealing repository of the web-crawler"""
+
+from collections import deque
+from threading import Thread
+
+from models.url import URL
+from repository.sharded_repository import ShardedRepository
+from repository.visited_url_set import ExactVisitedURLSet
+
+
+def test_sharded_repository_dedupes_across_shards():
+    """
+    Test that a URL discovered several times is only queued once,
+    whichever worker discovers it.
+    """
+    repository = ShardedRepository(
+        worker_count=2, visited_url_sets=[ExactVisitedURLSet() for _ in range(4)]
+    )
+    for _ in range(2):
+        repository.add_url_to_crawl(URL("https://a.com/0"))
+        repository.add_url_to_crawl(URL("https://a.com/1"))
+
+    assert set(repository.visited_urls) == {
+        URL("https://a.com/0"),
+        URL("https://a.com/1"),
+    }
+
+
+def test_sharded_repository_steals_from_other_workers():
+    """
+    Test that a worker with an empty deque is handed URLs
+    discovered by another worker.
+    """
+    repository = ShardedRepository(worker_count=2)
+    urls = [URL(f"https://a.com/{index}") for index in range(4)]
+    handed_out = []
+
+    def worker():
+        handed_out.append(repository.get_next_url())
+        for url in urls:
+            repository.add_url_to_crawl(url)
+        repository.notify_url_processed(handed_out[0])
+
+    repository.add_url_to_crawl(URL("https://a.com/seed"))
+    producer = Thread(target=worker)
+    producer.start()
+    producer.join()
+
+    # All URLs were queued on the producer's deque, the main thread is the
+    # second worker and can only get them by stealing.
+    stolen = [repository.get_next_url() for _ in urls]
+
+    assert set(stolen) == set(urls)
+
+
+def test_sharded_repository_unblocks_when_all_links_processed():
+    """
+    Test that the repository unblocks the caller when all previously enqueued
+    URLs, including URLs discovered while processing them, are processed.
+    """
+    repository = ShardedRepository(worker_count=4)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+
+    def worker():
+        while (url := repository.get_next_url()).subdomain is not None:
+            page = int(url.address.rsplit("/", 1)[1])
+            for link in (2 * page + 1, 2 * page + 2):
+                if link < 100:
+                    repository.add_url_to_crawl(URL(f"https://a.com/{link}"))
+            repository.notify_url_processed(url)
+
+    workers = [Thread(target=worker) for _ in range(4)]
+    for thread in workers:
+        thread.start()
+    repository.wait_until_all_urls_processed()
+    for _ in workers:
+        repository.queue_next_url(URL(""))
+    for thread in workers:
+        thread.join()
+
+    assert len(repository.visited_urls) == 100
+
+
+def test_sharded_repository_keeps_url_stolen_from_emptied_deque():
+    """
+    Test that a URL stolen from a deque emptied by its owner while half of it is
+    being moved is still handed out, rather than lost.
+    """
+
+    class EmptiedDeque(deque):
+        """Deque emptied by its owner once two of its URLs were stolen."""
+
+        def popleft(self):
+            url = super().popleft()
+            if url == urls[1]:
+                self.clear()
+            return url
+
+    repository = ShardedRepository(worker_count=2)
+    urls = [URL(f"https://a.com/{index}") for index in range(6)]
+    repository._deques[1] = EmptiedDeque(urls)
+
+    assert repository._steal(0) == urls[0]
+    assert repository.get_next_url() == urls[1]
+
+
+def test_sharded_repository_adds_urls_in_batch():
+    """
+    Test that a batch of URLs spread over several shards is deduped, and queued
+    on the deque of the worker that discovered them.
+    """
+    repository = ShardedRepository(worker_count=2)
+    urls = [URL(f"https://a.com/{index}") for index in range(8)]
+    handed_out = []
+
+    def worker():
+        handed_out.append(repository.get_next_url())
+        repository.add_urls_to_crawl(urls + urls[:4])
+        handed_out.extend(repository.get_next_url() for _ in urls)
+
+    repository.add_url_to_crawl(URL("https://a.com/seed"))
+    discoverer = Thread(target=worker)
+    discoverer.start()
+    discoverer.join()
+
+    # The worker's deque holds the whole batch, each URL once, so no URL needs to be
+    # stolen. URLs are grouped by shard, so their order is not kept.
+    assert handed_out[0] == URL("https://a.com/seed")
+    assert sorted(handed_out[1:], key=str) == sorted(urls, key=str)
+    assert len(repository.visited_urls) == 9
@@ -0,0 +1,122 @@
+"""Test the durable store of crawl state"""
+
+import sqlite3
+
+from models.url import URL
+from repository.repository import Repository
+from repository.state_store import CrawlStateStore
+
+
+def test_state_store_restores_checkpointed_urls(tmp_path):
+    """
+    Test that URLs recorded before a checkpoint are loaded back by a new store,
+    along with whether they were processed.
+    """
+    state_store = CrawlStateStore(str(tmp_path), checkpoint_interval=60)
+    state_store.record_discovered(URL("https://a.com/0"))
+    state_store.record_discovered(URL("https://a.com/1"))
+    state_store.record_processed(URL("https://a.com/0"))
+    state_store.set_metadata(CrawlStateStore.Metadata.BASE_URL, "https://a.com/0")
+    state_store.close()
+
+    reopened_state_store = CrawlStateStore(str(tmp_path))
+    restored_urls = dict(reopened_state_store.load())
+    reopened_state_store.close()
+
+    assert restored_urls == {
+        URL("https://a.com/0"): True,
+        URL("https://a.com/1"): False,
+    }
+    assert CrawlStateStore.read_metadata(str(tmp_path)) == {
+        CrawlStateStore.Metadata.BASE_URL: "https://a.com/0"
+    }
+
+
+def test_state_store_batches_writes(tmp_path):
+    """
+    Test that recorded URLs are only written at checkpoints,
+    in a single transaction per checkpoint.
+    """
+    state_store = CrawlStateStore(str(tmp_path), checkpoint_interval=60)
+    for index in range(100):
+        state_store.record_discovered(URL(f"https://a.com/{index}"))
+
+    assert not list(state_store.load())
+
+    state_store.checkpoint()
+    state_store.close()
+
+    assert state_store.stats.checkpoints == 1
+    assert state_store.stats.urls_written == 100
+
+
+def test_repository_records_crawl_state(tmp_path):
+    """
+    Test that the repository records newly discovered URLs once,
+    and every processed URL notified with its address.
+    """
+    state_store = CrawlStateStore(str(tmp_path), checkpoint_interval=60)
+    repository = Repository(state_store=state_store)
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.add_url_to_crawl(URL("https://a.com/1"))
+    repository.add_url_to_crawl(URL("https://a.com/0"))
+    repository.notify_url_processed(repository.get_next_url())
+    # A URL notified without its address is not recorded.
+    repository.get_next_url()
+    repository.notify_url_processed()
+    state_store.checkpoint()
+
+    assert dict(state_store.load()) == {
+        URL("https://a.com/0"): True,
+        URL("https://a.com/1"): False,
+    }
+    state_store.close()
+
+
+def test_state_store_restores_depth_and_lastmod(tmp_path):
+    """
+    Test that the depth and sitemap `lastmod` of the URLs are restored, and that
+    states written without them restore depth 0 and no `lastmod`.
+    """
+    connection = sqlite3.connect(tmp_path / CrawlStateStore.DATABASE_NAME)
+    connection.execute(
+        "CREATE TABLE urls ("
+        "address TEXT PRIMARY KEY, processed INTEGER NOT NULL DEFAULT 0)"
+    )
+    connection.execute("INSERT INTO urls (address) VALUES ('https://a.com/old')")
+    connection.commit()
+    connection.close()
+    state_store = CrawlStateStore(str(tmp_path), checkpoint_interval=60)
+    deep_url = URL("https://a.com/deep")
+    deep_url.depth = 3
+    listed_url = URL("https://a.com/listed")
+    listed_url.lastmod = 1700000000.0
+    state_store.record_discovered_urls([deep_url, listed_url])
+    state_store.close()
+
+    reopened_state_store = CrawlStateStore(str(tmp_path))
+    restored_urls = {
+        url.address: (url.depth, url.lastmod) for url, _ in reopened_state_store.load()
+    }
+    reopened_state_store.close()
+
+    assert restored_urls == {
+        "https://a.com/old": (0, None),
+        "https://a.com/deep": (3, None),
+        "https://a.com/listed": (0, 1700000000.0),
+    }
+
+
+def test_state_store_clears_previous_crawl(tmp_path):
+    """Test that a cleared store forgets the URLs and settings of a previous crawl"""
+    state_store = CrawlStateStore(str(tmp_path))
+    state_store.record_discovered(URL("https://a.com/stale"))
+    state_store.set_metadata(CrawlStateStore.Metadata.BASE_URL, "https://a.com")
+    state_store.close()
+
+    cleared_state_store = CrawlStateStore(str(tmp_path), clear=True)
+    restored_urls = list(cleared_state_store.load())
+    cleared_state_store.close()
+
+    assert not restored_urls
+    assert not CrawlStateStore.read_metadata(str(tmp_path))
@@ -0,0 +1,110 @@
+"""Test the dedupe backends of the web-crawler repository"""
+
+import pytest
+
+from models.url import URL
+from repository.repository import Repository
+from repository.visited_url_set import (
+    BloomFilterVisitedURLSet,
+    ExactVisitedURLSet,
+    FingerprintVisitedURLSet,
+    VisitedURLLog,
+)
+
+
+@pytest.mark.parametrize(
+    "visited_url_set_factory",
+    [
+        ExactVisitedURLSet,
+        lambda: FingerprintVisitedURLSet(64, initial_capacity=4),
+        lambda: FingerprintVisitedURLSet(128, initial_capacity=4),
+        lambda: BloomFilterVisitedURLSet(capacity=1000, false_positive_rate=0.001),
+    ],
+)
+def test_visited_url_set_dedupes_urls(visited_url_set_factory):
+    """
+    Test that every backend reports added URLs as visited, including across
+    table resizes, and enumerates each added URL exactly once.
+    """
+    visited_url_set = visited_url_set_factory()
+    urls = [URL(f"https://website.com/{index}") for index in range(100)]
+
+    for url in urls + urls:
+        if url not in visited_url_set:
+            visited_url_set.add(url)
+
+    assert all(url in visited_url_set for url in urls)
+    assert URL("https://website.com/other") not in visited_url_set
+    assert len(visited_url_set) == len(urls)
+    assert sorted(visited_url_set, key=lambda url: url.address) == sorted(
+        urls, key=lambda url: url.address
+    )
+    visited_url_set.close()
+
+
+def test_fingerprint_set_rejects_unsupported_width():
+    """Test that only 64 and 128-bit fingerprints are supported"""
+    with pytest.raises(ValueError):
+        FingerprintVisitedURLSet(32)
+
+
+def test_visited_url_log_appends_to_file(tmp_path):
+    """
+    Test that a file-backed log enumerates every URL appended to it,
+    through a repository using a compact dedupe backend.
+    """
+    log = VisitedURLLog(str(tmp_path / "visited.log"))
+    repository = Repository(FingerprintVisitedURLSet(64, log))
+
+    repository.add_url_to_crawl(URL("https://website.com/0"))
+    repository.add_url_to_crawl(URL("https://website.com/0"))
+    repository.add_url_to_crawl(URL("https://website.com/1"))
+
+    assert set(repository.visited_urls) == {
+        URL("https://website.com/0"),
+        URL("https://website.com/1"),
+    }
+    log.close()
+    assert (tmp_path / "visited.log").read_text(encoding="utf-8").splitlines() == [
+        "https://website.com/0",
+        "https://website.com/1",
+    ]
+
+
+def test_visited_url_log_truncates_previous_run(tmp_path):
+    """
+    Test that a log file left by a previous crawl is truncated, rather than
+    enumerating the addresses of both crawls.
+    """
+    path = tmp_path / "visited.log"
+    path.write_text("https://website.com/stale\n", encoding="utf-8")
+    log = VisitedURLLog(str(path))
+
+    log.append(URL("https://website.com/0"))
+
+    assert list(log) == [URL("https://website.com/0")]
+    log.append(URL("https://website.com/1"))
+    assert list(log) == [URL("https://website.com/0"), URL("https://website.com/1")]
+    log.close()
+
+
+def test_visited_url_log_streams_urls(monkeypatch):
+    """
+    Test that a log is read back a batch of lines at a time, and that URLs appended
+    while it is being iterated are written after the URLs logged before, without
+    being enumerated.
+    """
+    monkeypatch.setattr(VisitedURLLog, "READ_BATCH_LINES", 2)
+    log = VisitedURLLog()
+    for page in range(5):
+        log.append(URL(f"https://website.com/{page}"))
+
+    urls = iter(log)
+    first_url = next(urls)
+    log.append(URL("https://website.com/5"))
+
+    assert [first_url, *urls] == [
+        URL(f"https://website.com/{page}") for page in range(5)
+    ]
+    assert len(list(log)) == 6
+    log.close()
@@ -0,0 +1,495 @@
+"""asyncio counterpart of the HTML parsing functionality"""
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import aiohttp
+from aiohttp.compression_utils import HAS_BROTLI, HAS_ZSTD
+from crawler.budget import CrawlBudget
+from crawler.output import PageRecord
+from logger.logger import Logger
+
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import DEFAULT_CANONICALIZER, URL, URLCanonicalizer
+from service.concurrency_limiter import AsyncConcurrencyLimiter, parse_retry_after
+from service.fetch_guard import FetchGuard
+from service.fetch_policy import (
+    RETRYABLE_STATUS_CODES,
+    CircuitOpenError,
+    FetchPolicy,
+)
+from service.http_cache import CachedPage, HTTPCache
+from service.link_extractor import (
+    LinkExtractor,
+    extract_link_parts,
+    get_incremental_decoder,
+)
+from service.parser_service import HTMLParserService
+
+# Content codings aiohttp decompresses while a body is streamed: gzip and deflate,
+# and br and zstd when their packages are installed.
+ACCEPT_ENCODING = ", ".join(
+    ["gzip", "deflate"] + ["br"] * HAS_BROTLI + ["zstd"] * HAS_ZSTD
+)
+
+
+class AsyncHTMLParserService:
+    """
+    Parser class to handle fetching the related urls under a url's web-page
+    from within an asyncio event loop. A single `aiohttp.ClientSession` is shared
+    by all crawler tasks, so many fetches can be in flight on one thread.
+    """
+
+    # Number of bytes read from the network at a time while streaming a page.
+    CHUNK_SIZE = HTMLParserService.CHUNK_SIZE
+
+    def __init__(
+        self,
+        logger: Logger,
+        connection_limit: int = 100,
+        keepalive_timeout: float = 30.0,
+        fetch_guard: FetchGuard | None = None,
+        canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER,
+        http_cache: HTTPCache | None = None,
+        parser_pool: Executor | None = None,
+        metrics: CrawlMetrics | None = None,
+        budget: CrawlBudget | None = None,
+        concurrency_limiter: AsyncConcurrencyLimiter | None = None,
+        fetch_policy: FetchPolicy | None = None,
+        accept_encoding: str = ACCEPT_ENCODING,
+    ) -> None:
+        """
+        Args:
+            logger (Logger): Thread-safe logger.
+            connection_limit (int): Maximum number of simultaneous connections.
+            keepalive_timeout (float): Seconds after which an idle connection is closed.
+            fetch_guard (FetchGuard | None): Guard deciding which response bodies are
+                downloaded, a guard with the default size cap is created if not provided.
+            canonicalizer (URLCanonicalizer): Rewrites applied to extracted addresses.
+            http_cache (HTTPCache | None): Cache of the validators and links of pages
+                downloaded by previous runs, pages are always downloaded if None.
+            parser_pool (Executor | None): Process pool parsing downloaded pages, so
+                that parsing does not block the event loop. Pages are parsed on the
+                event loop while they are being downloaded if None.
+            metrics (CrawlMetrics | None): Metrics the fetch and parse times, sizes
+                and status codes of pages are recorded to, if any.
+            budget (CrawlBudget | None): Crawl budget the downloaded bytes are
+                counted against, if any.
+            concurrency_limiter (AsyncConcurrencyLimiter | None): Adaptive limit on the number
+                of pages fetched at once, fed with the latency and status of every
+                fetch. Fetches are only limited by the number of workers if None.
+            fetch_policy (FetchPolicy | None): Timeouts, retries, circuit breakers
+                and hedging of the fetches, a policy with the default timeouts and
+                retries is created if not provided.
+            accept_encoding (str): `Accept-Encoding` header of every request, e.g.
+                `identity` to receive uncompressed bodies.
+        """
+        self._logger = logger
+        self._connection_limit = connection_limit
+        self._keepalive_timeout = keepalive_timeout
+        self._fetch_guard = fetch_guard or FetchGuard()
+        self._canonicalizer = canonicalizer
+        self._http_cache = http_cache
+        self._parser_pool = parser_pool
+        self._metrics = metrics
+        self._budget = budget
+        self._concurrency_limiter = concurrency_limiter
+        self._fetch_policy = fetch_policy or FetchPolicy()
+        self._accept_encoding = accept_encoding
+        self._session: aiohttp.ClientSession | None = None
+
+    async def open(self) -> None:
+        """
+        Create the underlying HTTP session. Must be called from within the event loop
+        that will be used for crawling.
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self._connection_limit, keepalive_timeout=self._keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, headers={"Accept-Encoding": self._accept_encoding}
+        )
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session and all of its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def fetch_guard(self) -> FetchGuard:
+        """Guard recording the URLs whose body was not downloaded."""
+        return self._fetch_guard
+
+    @property
+    def fetch_policy(self) -> FetchPolicy:
+        """Policy recording the fetches retried, rejected, timed out and hedged."""
+        return self._fetch_policy
+
+    def _skip_url(
+        self, url: URL, reason: str, html_page_response: aiohttp.ClientResponse
+    ) -> None:
+        """
+        Drop the connection of a response whose body should not be downloaded.
+
+        Args:
+            url (URL): Skipped URL.
+            reason (str): One of `FetchGuard.SkipReason`.
+            html_page_response (aiohttp.ClientResponse): Response to abort.
+        """
+        html_page_response.close()
+        self._fetch_guard.record_skip(url, reason)
+        self._logger.log(f"Skipping web-page for {url.address}: [{reason}]")
+
+    async def __aenter__(self) -> "AsyncHTMLParserService":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def _send_request(
+        self,
+        address: str,
+        headers: dict[str, str] | None,
+        timeout: aiohttp.ClientTimeout,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a request, hedged as in `HTMLParserService`: the slower of both
+        requests is cancelled, or closed if it was answered as well.
+
+        Args:
+            address (str): Address to request.
+            headers (dict[str, str] | None): Additional request headers.
+            timeout (aiohttp.ClientTimeout): Timeouts of the request.
+
+        Raises:
+            aiohttp.ClientError | TimeoutError: If all requests sent fail.
+
+        Returns:
+            aiohttp.ClientResponse: First response received.
+        """
+
+        async def send() -> aiohttp.ClientResponse:
+            return await self._session.get(address, headers=headers, timeout=timeout)
+
+        hedge_delay = self._fetch_policy.hedge_delay()
+        if hedge_delay is None:
+            return await send()
+        requests = [asyncio.ensure_future(send())]
+        answered = []
+        try:
+            done, _ = await asyncio.wait(requests, timeout=hedge_delay)
+            if done:
+                return requests[0].result()
+            requests.append(asyncio.ensure_future(send()))
+            pending = set(requests)
+            while pending and not answered:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                answered = [request for request in done if request.exception() is None]
+        finally:
+            for request in requests:
+                request.cancel()
+        for request in answered[1:]:
+            request.result().close()
+        self._fetch_policy.stats.record_hedge(
+            bool(answered) and answered[0] is requests[1]
+        )
+        if not answered:
+            raise done.pop().exception()
+        return answered[0].result()
+
+    async def _get_url_html_response(
+        self, url: URL, cached_page: CachedPage | None, deadline: float
+    ) -> aiohttp.ClientResponse | None:
+        """
+        Attempt to open a response for the HTML page of a certain URL, retrying
+        transient failures as in `HTMLParserService`. The body is left to be read
+        (and the response released) by the caller.
+
+        Args:
+            url (URL): Input URL.
+            cached_page (CachedPage | None): Cached copy of the page, requested
+                conditionally if provided.
+            deadline (float): Monotonic time after which the URL is given up on.
+
+        Raises:
+            CircuitOpenError: If the circuit of the host of the URL is open, and the
+                URL can still be deferred until it is half-open.
+
+        Returns:
+            aiohttp.ClientResponse | None: Response if request is succesful,
+            or None if error occurs.
+        """
+        address = url.address
+        host = url.subdomain
+        fetch_policy = self._fetch_policy
+        headers = cached_page.conditional_headers if cached_page else None
+        retry = 0
+        while True:
+            if not fetch_policy.circuit_breaker.allow_request(host):
+                fetch_policy.stats.record_circuit_rejection()
+                retry_at = fetch_policy.defer(address, host)
+                if retry_at is not None:
+                    raise CircuitOpenError(host, retry_at)
+                self._logger.log(
+                    f"Circuit open for {host}, skipping web-page for {address}",
+                    severity=Logger.Severity.ERROR,
+                )
+                return None
+            fetch_policy.forget_deferral(address)
+            html_page_response = request_exception = retry_after = None
+            connect_timeout, read_timeout = fetch_policy.timeouts(
+                deadline - time.monotonic()
+            )
+            # The total timeout also bounds the download of the body.
+            timeout = aiohttp.ClientTimeout(
+                total=deadline - time.monotonic(),
+                sock_connect=connect_timeout,
+                sock_read=read_timeout,
+            )
+            sent_at = time.perf_counter()
+            try:
+                html_page_response = await self._send_request(address, headers, timeout)
+            except (aiohttp.ClientError, TimeoutError) as exception:
+                request_exception = exception
+                fetch_policy.circuit_breaker.record_failure(host)
+                if self._concurrency_limiter is not None:
+                    self._concurrency_limiter.record_error()
+            else:
+                response_headers = html_page_response.headers
+                if self._concurrency_limiter is not None:
+                    self._concurrency_limiter.record_response(
+                        html_page_response.status, response_headers.get("Retry-After")
+                    )
+                if html_page_response.status not in RETRYABLE_STATUS_CODES:
+                    fetch_policy.circuit_breaker.record_success(host)
+                    fetch_policy.latencies.record(time.perf_counter() - sent_at)
+                    return html_page_response
+                fetch_policy.circuit_breaker.record_failure(host)
+                retry_after = parse_retry_after(response_headers.get("Retry-After"))
+
+            # Retry transient failures, unless the retry would end past the deadline
+            backoff = fetch_policy.backoff_seconds(retry, retry_after)
+            if retry >= fetch_policy.max_retries:
+                break
+            if time.monotonic() + backoff >= deadline:
+                fetch_policy.stats.record_deadline_exceeded()
+                break
+            if html_page_response is not None:
+                html_page_response.close()
+            self._logger.log(
+                f"Retrying web-page for {address} in {backoff:.3f}s",
+                severity=Logger.Severity.DEBUG,
+            )
+            fetch_policy.stats.record_retry()
+            await asyncio.sleep(backoff)
+            retry += 1
+
+        if request_exception is None:
+            return html_page_response
+        self._logger.log(
+            f"Error while fetching web-page for {address}: [\n-----{request_exception}]",
+            severity=Logger.Severity.ERROR,
+        )
+        if self._metrics is not None:
+            self._metrics.fetch_errors.inc()
+        return None
+
+    async def get_links_under_url(
+        self, url: URL, record: PageRecord | None = None
+    ) -> set[URL]:
+        """
+        Returns a set of URL objects found under the HTML page of a source url.
+        As in `HTMLParserService`, the page is tokenized while it is being
+        downloaded, bodies rejected by the fetch guard are not downloaded, and
+        with an HTTP cache the links of unchanged pages are reused.
+        With a parser pool, pages are parsed by a worker process once downloaded.
+        With a concurrency limiter, the calling task waits for a slot before
+        fetching the page.
+
+        Args:
+            url (URL): Source URL for HTML page.
+            record (PageRecord | None): Record of the page its status, timings and
+                size are set on, if any.
+
+        Raises:
+            CircuitOpenError: If the circuit of the host of the URL is open, and the
+                URL can still be deferred until it is half-open.
+
+        Returns:
+            set[URL]: Set of URLs found in the source URL's page.
+        """
+        if self._concurrency_limiter is None:
+            return await self._fetch_links_under_url(url, record)
+        async with self._concurrency_limiter.slot():
+            return await self._fetch_links_under_url(url, record)
+
+    async def _fetch_links_under_url(
+        self, url: URL, record: PageRecord | None = None
+    ) -> set[URL]:
+        """
+        Fetch and parse the HTML page of a source url, see `get_links_under_url`.
+
+        Args:
+            url (URL): Source URL for HTML page.
+            record (PageRecord | None): Record of the page, if any.
+
+        Returns:
+            set[URL]: Set of URLs found in the source URL's page.
+        """
+        address = url.address
+        started_at = time.perf_counter()
+        deadline = time.monotonic() + self._fetch_policy.deadline
+        # The cache is an SQLite database, queried on a thread of the default
+        # executor so that disk reads and writes do not block the event loop.
+        cached_page = (
+            await asyncio.to_thread(self._http_cache.lookup, url)
+            if self._http_cache
+            else None
+        )
+        html_page_response = await self._get_url_html_response(
+            url, cached_page, deadline
+        )
+        if html_page_response is None:
+            return set()
+        try:
+            async with html_page_response:
+                # A not modified page has no body, its cached links are reused
+                http_status_code = html_page_response.status
+                if record is not None:
+                    record.status = http_status_code
+                if self._metrics is not None:
+                    self._metrics.responses.inc(label_value=str(http_status_code))
+                if (
+                    cached_page is not None
+                    and http_status_code == HTTPStatus.NOT_MODIFIED
+                ):
+                    self._http_cache.stats.record_revalidated(cached_page)
+                    fetch_seconds = time.perf_counter() - started_at
+                    if record is not None:
+                        record.fetch_seconds = fetch_seconds
+                    if self._metrics is not None:
+                        self._metrics.fetch_seconds.observe(fetch_seconds)
+                    return cached_page.linked_urls(self._canonicalizer)
+
+                # Fail if HTTP status code is not OK
+                if not html_page_response.ok:
+                    self._logger.log(
+                        f"HTTP status code not OK [{http_status_code}] returned"
+                        f" while fetching web-page for {address}",
+                        severity=Logger.Severity.ERROR,
+                    )
+                    return set()
+
+                # Skip bodies that cannot contain links before downloading them
+                skip_reason = self._fetch_guard.check_headers(
+                    html_page_response.headers.get("Content-Type"),
+                    html_page_response.content_length,
+                )
+                if skip_reason is not None:
+                    self._skip_url(url, skip_reason, html_page_response)
+                    return set()
+
+                # Pages are tokenized while they are downloaded, unless parsing is
+                # left to the parser pool.
+                extractor = decoder = None
+                if self._parser_pool is None:
+                    extractor = LinkExtractor(url, self._canonicalizer)
+                    decoder = get_incremental_decoder(html_page_response.charset)
+                # Chunks of the body when parsing is left to the parser pool.
+                chunks = []
+                # Decompressed bytes, and bytes received over the wire, of the body.
+                bytes_read = 0
+                wire_bytes = 0
+                parse_seconds = 0.0
+                async for chunk in html_page_response.content.iter_chunked(
+                    AsyncHTMLParserService.CHUNK_SIZE
+                ):
+                    bytes_read += len(chunk)
+                    wire_bytes = html_page_response.content.total_raw_bytes
+                    if self._budget is not None:
+                        self._budget.record_bytes(len(chunk))
+                    if self._fetch_guard.exceeds_size(bytes_read):
+                        self._skip_url(
+                            url,
+                            FetchGuard.SkipReason.CONTENT_TOO_LARGE,
+                            html_page_response,
+                        )
+                        return set()
+                    if self._fetch_guard.exceeds_compression_ratio(
+                        wire_bytes, bytes_read
+                    ):
+                        self._skip_url(
+                            url,
+                            FetchGuard.SkipReason.COMPRESSION_BOMB,
+                            html_page_response,
+                        )
+                        return set()
+                    if extractor is not None:
+                        parse_started_at = time.perf_counter()
+                        extractor.feed(decoder.decode(chunk))
+                        parse_seconds += time.perf_counter() - parse_started_at
+                    else:
+                        chunks.append(chunk)
+                if extractor is not None:
+                    extractor.feed(decoder.decode(b"", final=True))
+        except (aiohttp.ClientError, TimeoutError) as request_exception:
+            if time.monotonic() >= deadline:
+                self._fetch_policy.stats.record_deadline_exceeded()
+            self._logger.log(
+                f"Error while reading web-page for {address}: [\n-----{request_exception}]",
+                severity=Logger.Severity.ERROR,
+            )
+            if self._metrics is not None:
+                self._metrics.fetch_errors.inc()
+            if self._concurrency_limiter is not None:
+                self._concurrency_limiter.record_error()
+            return set()
+        downloaded_at = time.perf_counter()
+        if extractor is not None:
+            extractor.close()
+            linked_urls = extractor.linked_urls
+        else:
+            # A parser process dying fails the page, see `HTMLParserService`.
+            try:
+                link_parts = await asyncio.get_running_loop().run_in_executor(
+                    self._parser_pool,
+                    extract_link_parts,
+                    address,
+                    b"".join(chunks),
+                    html_page_response.charset,
+                    self._canonicalizer,
+                )
+            except BrokenProcessPool as broken_pool:
+                self._logger.log(
+                    f"Error while parsing web-page for {address}: [\n-----{broken_pool}]",
+                    severity=Logger.Severity.ERROR,
+                )
+                return set()
+            linked_urls = {URL.from_canonical_parts(*parts) for parts in link_parts}
+        fetch_seconds = downloaded_at - started_at - parse_seconds
+        parse_seconds += time.perf_counter() - downloaded_at
+        if record is not None:
+            record.fetch_seconds = fetch_seconds
+            record.parse_seconds = parse_seconds
+            record.size = bytes_read
+        if self._metrics is not None:
+            self._metrics.record_page(
+                fetch_seconds, parse_seconds, bytes_read, wire_bytes
+            )
+        if self._http_cache is not None:
+            self._http_cache.stats.record_refetched(cached_page is not None)
+            await asyncio.to_thread(
+                self._http_cache.store,
+                url,
+                html_page_response.headers,
+                linked_urls,
+                bytes_read,
+            )
+        return linked_urls
@@ -0,0 +1,356 @@
+"""Adaptive limit on the number of pages fetched at once, driven by server feedback"""
+
+import asyncio
+import contextlib
+import math
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from threading import Condition
+from typing import AsyncIterator, Iterator
+
+from logger.logger import Logger
+from metrics.crawl_metrics import CrawlMetrics
+
+# Status codes of a server asking the crawler to slow down.
+OVERLOAD_STATUS_CODES = frozenset(
+    {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE}
+)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Args:
+        value (str | None): `Retry-After` header, in seconds or as an HTTP date.
+
+    Returns:
+        float | None: Seconds to wait before retrying, None if missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyController:
+    """
+    Controller of the concurrency limit, adjusted after every window of fetches
+    (as many fetches as the limit). Latency is read as in TCP Vegas: with the
+    baseline latency being the lowest window mean of the last `baseline_seconds`,
+    `limit * (1 - baseline / mean latency)` estimates how many fetches are queued
+    (by the servers or by the crawler's own CPU) rather than served. The limit
+    doubles from its minimum until that estimate exceeds `alpha = 3 * max(1,
+    log10(limit))`, then grows by one per window below `alpha` and shrinks by one
+    above `2 * alpha`, which keeps it just past the point where throughput stops
+    growing. Pushback overrides latency: the limit is cut by `backoff_ratio`, at
+    most once per window, when servers answer 429/503 or requests fail, and a
+    `Retry-After` header pauses all new fetches for that many seconds.
+    Not thread-safe, the limiters call it while holding their lock.
+    """
+
+    class Reason:
+        """Reasons of a change of the concurrency limit"""
+
+        SLOW_START = "slow_start"
+        INCREASE = "increase"
+        LATENCY = "latency"
+        OVERLOAD = "overload"
+        RETRY_AFTER = "retry_after"
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        baseline_seconds: float = 10.0,
+        backoff_ratio: float = 0.5,
+        max_retry_after: float = 60.0,
+        logger: Logger | None = None,
+        metrics: CrawlMetrics | None = None,
+    ) -> None:
+        """
+        Args:
+            min_limit (int): Minimum number of pages fetched at once.
+            max_limit (int): Maximum number of pages fetched at once.
+            baseline_seconds (float): Seconds over which the lowest window latency
+                is the baseline, after which a lasting latency change of the servers
+                becomes the new baseline.
+            backoff_ratio (float): Ratio the limit is multiplied by on pushback.
+            max_retry_after (float): Maximum seconds a `Retry-After` pauses fetches.
+            logger (Logger | None): Logger every change of the limit is logged to
+                at debug level, if any.
+            metrics (CrawlMetrics | None): Metrics the limit and its changes are
+                exported to, if any.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self._baseline_seconds = baseline_seconds
+        self._backoff_ratio = backoff_ratio
+        self._max_retry_after = max_retry_after
+        self._logger = logger
+        self.limit = min_limit
+        self._slow_start = True
+        # Increasing window means and their monotonic times, so that the first
+        # one is the lowest mean of the last `baseline_seconds`.
+        self._window_means: deque[tuple[float, float]] = deque()
+        self._window_count = 0
+        self._window_latency = 0.0
+        self._window_decreased = False
+        # Monotonic time before which no new fetch is started.
+        self.paused_until = 0.0
+        self.paused_seconds = 0.0
+        # Number of changes of the limit, by reason.
+        self.adjustments = dict.fromkeys(
+            (
+                ConcurrencyController.Reason.SLOW_START,
+                ConcurrencyController.Reason.INCREASE,
+                ConcurrencyController.Reason.LATENCY,
+                ConcurrencyController.Reason.OVERLOAD,
+                ConcurrencyController.Reason.RETRY_AFTER,
+            ),
+            0,
+        )
+        self._adjustments_counter = None
+        if metrics is not None:
+            metrics.registry.gauge(
+                "crawler_concurrency_limit",
+                "Current limit on the number of pages fetched at once.",
+                lambda: self.limit,
+            )
+            self._adjustments_counter = metrics.registry.counter(
+                "crawler_concurrency_adjustments_total",
+                "Changes of the concurrency limit, by reason.",
+                "reason",
+            )
+
+    def _set_limit(self, limit: int, reason: str, detail: str = "") -> None:
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        self.adjustments[reason] += 1
+        if self._adjustments_counter is not None:
+            self._adjustments_counter.inc(label_value=reason)
+        if self._logger is not None:
+            self._logger.log(
+                f"Concurrency limit {self.limit} -> {limit} ({reason}{detail})",
+                severity=Logger.Severity.DEBUG,
+            )
+        self.limit = limit
+
+    def _decrease(self, ratio: float, reason: str, detail: str = "") -> None:
+        """Decrease the limit, at most once per window."""
+        self._slow_start = False
+        if self._window_decreased:
+            return
+        self._window_decreased = True
+        self._set_limit(int(self.limit * ratio), reason, detail)
+
+    def record_response(self, status_code: int, retry_after: str | None) -> None:
+        """
+        Record the status of a response, backing off if the server pushes back.
+
+        Args:
+            status_code (int): HTTP status code.
+            retry_after (str | None): `Retry-After` header of the response.
+        """
+        if status_code not in OVERLOAD_STATUS_CODES:
+            return
+        retry_after_seconds = parse_retry_after(retry_after)
+        if retry_after_seconds:
+            retry_after_seconds = min(retry_after_seconds, self._max_retry_after)
+            now = time.monotonic()
+            paused_until = now + retry_after_seconds
+            if paused_until > self.paused_until:
+                self.paused_seconds += paused_until - max(self.paused_until, now)
+                self.paused_until = paused_until
+            self._decrease(
+                self._backoff_ratio,
+                ConcurrencyController.Reason.RETRY_AFTER,
+                f", {retry_after_seconds:g}s",
+            )
+        else:
+            self._decrease(
+                self._backoff_ratio,
+                ConcurrencyController.Reason.OVERLOAD,
+                f", status {status_code}",
+            )
+
+    def record_error(self) -> None:
+        """Record a request that failed without a response, e.g. a timeout."""
+        self._decrease(
+            self._backoff_ratio, ConcurrencyController.Reason.OVERLOAD, ", error"
+        )
+
+    def record_latency(self, latency: float) -> None:
+        """
+        Record the latency of a completed fetch, adjusting the limit at the end
+        of every window.
+
+        Args:
+            latency (float): Seconds the fetch took.
+        """
+        self._window_count += 1
+        self._window_latency += latency
+        if self._window_count < self.limit:
+            return
+        mean_latency = self._window_latency / self._window_count
+        self._window_count = 0
+        self._window_latency = 0.0
+        window_decreased = self._window_decreased
+        self._window_decreased = False
+        # Windows with pushback are skipped, their rejected requests are fast.
+        if window_decreased:
+            return
+        baseline_latency = self._baseline_latency(mean_latency)
+        queued = self.limit * (1 - baseline_latency / mean_latency)
+        alpha = 3 * max(math.log10(self.limit), 1)
+        detail = f", {mean_latency * 1000:.1f}ms, {queued:.1f} queued"
+        if self._slow_start and queued >= alpha:
+            self._slow_start = False
+        if queued > 2 * alpha:
+            self._set_limit(
+                self.limit - 1, ConcurrencyController.Reason.LATENCY, detail
+            )
+        elif queued < alpha and self.limit < self.max_limit:
+            if self._slow_start:
+                self._set_limit(
+                    self.limit * 2, ConcurrencyController.Reason.SLOW_START, detail
+                )
+            else:
+                self._set_limit(
+                    self.limit + 1, ConcurrencyController.Reason.INCREASE, detail
+                )
+
+    def _baseline_latency(self, mean_latency: float) -> float:
+        """
+        Args:
+            mean_latency (float): Mean latency of the window that just ended.
+
+        Returns:
+            float: Lowest window mean of the last `baseline_seconds`.
+        """
+        now = time.monotonic()
+        while self._window_means and self._window_means[-1][1] >= mean_latency:
+            self._window_means.pop()
+        self._window_means.append((now, mean_latency))
+        while self._window_means[0][0] < now - self._baseline_seconds:
+            self._window_means.popleft()
+        return self._window_means[0][1]
+
+    def __str__(self) -> str:
+        adjustments = ", ".join(
+            f"{reason}: {count}" for reason, count in self.adjustments.items()
+        )
+        return (
+            f"limit {self.limit} (between {self.min_limit} and {self.max_limit}),"
+            f" adjustments [{adjustments}], paused {self.paused_seconds:.1f}s"
+        )
+
+
+class ConcurrencyLimiter:
+    """
+    Slots for the pages fetched at once by the crawler threads, as many as the
+    limit of a `ConcurrencyController`. Threads beyond the limit, or arriving
+    while a `Retry-After` pause is running, block until a slot is available.
+    """
+
+    def __init__(self, controller: ConcurrencyController) -> None:
+        """
+        Args:
+            controller (ConcurrencyController): Controller of the limit.
+        """
+        self.controller = controller
+        self._condition = Condition()
+        self._in_flight = 0
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot while fetching a page, recording the fetch latency."""
+        with self._condition:
+            while True:
+                paused_seconds = self.controller.paused_until - time.monotonic()
+                if paused_seconds > 0:
+                    self._condition.wait(paused_seconds)
+                elif self._in_flight >= self.controller.limit:
+                    self._condition.wait()
+                else:
+                    break
+            self._in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            latency = time.perf_counter() - started_at
+            with self._condition:
+                self._in_flight -= 1
+                self.controller.record_latency(latency)
+                self._condition.notify_all()
+
+    def record_response(self, status_code: int, retry_after: str | None) -> None:
+        """
+        Args:
+            status_code (int): HTTP status code of a response.
+            retry_after (str | None): `Retry-After` header of the response.
+        """
+        with self._condition:
+            self.controller.record_response(status_code, retry_after)
+
+    def record_error(self) -> None:
+        """Record a request that failed without a response."""
+        with self._condition:
+            self.controller.record_error()
+
+
+class AsyncConcurrencyLimiter:
+    """asyncio counterpart of `ConcurrencyLimiter`, for the crawler tasks"""
+
+    def __init__(self, controller: ConcurrencyController) -> None:
+        """
+        Args:
+            controller (ConcurrencyController): Controller of the limit.
+        """
+        self.controller = controller
+        self._condition: asyncio.Condition | None = None
+        self._in_flight = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot while fetching a page, recording the fetch latency."""
+        # Created lazily so that it is bound to the running event loop.
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        # Tasks only switch on await, the slot count needs no lock.
+        while True:
+            paused_seconds = self.controller.paused_until - time.monotonic()
+            if paused_seconds > 0:
+                await asyncio.sleep(paused_seconds)
+            elif self._in_flight >= self.controller.limit:
+                async with self._condition:
+                    await self._condition.wait()
+            else:
+                break
+        self._in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self.controller.record_latency(time.perf_counter() - started_at)
+            async with self._condition:
+                self._condition.notify_all()
+
+    def record_response(self, status_code: int, retry_after: str | None) -> None:
+        """
+        Args:
+            status_code (int): HTTP status code of a response.
+            retry_after (str | None): `Retry-After` header of the response.
+        """
+        self.controller.record_response(status_code, retry_after)
+
+    def record_error(self) -> None:
+        """Record a request that failed without a response."""
+        self.controller.record_error()
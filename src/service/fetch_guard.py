@@ -0,0 +1,145 @@
+"""Guard against downloading responses that cannot contain links"""
+
+from threading import Lock
+
+from models.url import URL
+
+
+class FetchGuard:
+    """
+    Decides from the response headers, and while the body is being streamed,
+    whether a page is worth downloading, and counts the URLs skipped by reason.
+    Responses with a non-HTML content type, or with a body exceeding `max_page_bytes`,
+    are dropped before (or as soon as) the limit is crossed. The limit applies to the
+    decompressed body of compressed responses, which are also dropped as soon as they
+    decompress to over `max_compression_ratio` times their size on the wire, so that
+    a decompression bomb is caught long before it reaches the size limit.
+    Only the first `max_sampled_urls` skipped URLs are kept, alongside their reason,
+    so that a crawl of many non-HTML resources does not grow the guard without end.
+    """
+
+    class SkipReason:
+        """Reasons for which a response body is not downloaded"""
+
+        NON_HTML_CONTENT_TYPE = "non_html_content_type"
+        CONTENT_TOO_LARGE = "content_too_large"
+        COMPRESSION_BOMB = "compression_bomb"
+
+    # Media types that are parsed for links.
+    HTML_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml"})
+
+    # Decompressed size below which the compression ratio is not checked, as small
+    # pages of repetitive markup legitimately compress very well.
+    MIN_COMPRESSION_CHECK_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        max_page_bytes: int = 5 * 1024 * 1024,
+        max_compression_ratio: float = 100.0,
+        max_sampled_urls: int = 100,
+    ) -> None:
+        """
+        Args:
+            max_page_bytes (int): Maximum size of a page body in bytes, once
+                decompressed.
+            max_compression_ratio (float): Maximum ratio of the decompressed size
+                of a body to its size on the wire.
+            max_sampled_urls (int): Number of skipped URLs kept with their reason.
+        """
+        self.max_page_bytes = max_page_bytes
+        self.max_compression_ratio = max_compression_ratio
+        self.max_sampled_urls = max_sampled_urls
+        self._mutex = Lock()
+        self._skipped_urls: dict[URL, str] = {}
+        self._skip_counts: dict[str, int] = {}
+
+    def check_headers(
+        self, content_type: str | None, content_length: str | int | None
+    ) -> str | None:
+        """
+        Check the headers of a response before its body is downloaded.
+        A missing content type is accepted, as some servers omit it for HTML pages.
+
+        Args:
+            content_type (str | None): Value of the Content-Type header.
+            content_length (str | int | None): Value of the Content-Length header.
+
+        Returns:
+            str | None: Reason for skipping the body, or None if it should be downloaded.
+        """
+        if content_type:
+            media_type = content_type.split(";", 1)[0].strip().lower()
+            if media_type not in FetchGuard.HTML_CONTENT_TYPES:
+                return FetchGuard.SkipReason.NON_HTML_CONTENT_TYPE
+        if content_length is not None:
+            try:
+                if int(content_length) > self.max_page_bytes:
+                    return FetchGuard.SkipReason.CONTENT_TOO_LARGE
+            except ValueError:
+                pass
+        return None
+
+    def exceeds_size(self, bytes_read: int) -> bool:
+        """
+        Args:
+            bytes_read (int): Number of body bytes streamed so far.
+
+        Returns:
+            bool: Whether the body is larger than allowed.
+        """
+        return bytes_read > self.max_page_bytes
+
+    def exceeds_compression_ratio(self, wire_bytes: int, bytes_read: int) -> bool:
+        """
+        Args:
+            wire_bytes (int): Number of body bytes received over the wire so far.
+            bytes_read (int): Number of body bytes streamed so far, once decompressed.
+
+        Returns:
+            bool: Whether the body decompresses suspiciously well.
+        """
+        return (
+            bytes_read > FetchGuard.MIN_COMPRESSION_CHECK_BYTES
+            and bytes_read > self.max_compression_ratio * wire_bytes
+        )
+
+    def record_skip(self, url: URL, reason: str) -> None:
+        """
+        Record that the body of a URL was not downloaded.
+
+        Args:
+            url (URL): Skipped URL.
+            reason (str): One of `FetchGuard.SkipReason`.
+        """
+        with self._mutex:
+            self._skip_counts[reason] = self._skip_counts.get(reason, 0) + 1
+            if len(self._skipped_urls) < self.max_sampled_urls:
+                self._skipped_urls[url] = reason
+
+    @property
+    def skipped_urls(self) -> dict[URL, str]:
+        """
+        Get the first `max_sampled_urls` skipped URLs at the time of function call
+
+        Returns:
+            dict[URL, str]: Reason for skipping, keyed by URL
+        """
+        with self._mutex:
+            return dict(self._skipped_urls)
+
+    @property
+    def skip_counts(self) -> dict[str, int]:
+        """
+        Get the number of skipped URLs at the time of function call
+
+        Returns:
+            dict[str, int]: Number of URLs skipped, keyed by reason
+        """
+        with self._mutex:
+            return dict(self._skip_counts)
+
+    def __str__(self) -> str:
+        skip_counts = self.skip_counts
+        return f"{sum(skip_counts.values())} page(s)" + "".join(
+            f", {count} {reason}" for reason, count in sorted(skip_counts.items())
+        )
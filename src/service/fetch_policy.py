@@ -0,0 +1,462 @@
+"""Timeouts, retries, circuit breaking and hedging of page fetches"""
+
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from threading import BoundedSemaphore, Condition, Lock, Thread
+from typing import Callable
+
+# Status codes of transient failures, worth retrying.
+RETRYABLE_STATUS_CODES = frozenset(
+    {
+        HTTPStatus.REQUEST_TIMEOUT,
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of fetching a page whose host has an open circuit, for the page
+    to be crawled again once the circuit is half-open rather than given up on.
+    """
+
+    def __init__(self, host: str, retry_at: float) -> None:
+        """
+        Args:
+            host (str): Host whose circuit is open.
+            retry_at (float): Monotonic time the page should be fetched again at.
+        """
+        super().__init__(f"Circuit open for {host}")
+        self.host = host
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker. After `failure_threshold` consecutive failures of a
+    host its circuit opens, and requests to it are rejected for `reset_seconds`.
+    A single trial request is then let through (the circuit is half-open): the
+    circuit closes if it succeeds, and opens again if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        """
+        Args:
+            failure_threshold (int): Consecutive failures opening the circuit of a
+                host, circuits never open if 0.
+            reset_seconds (float): Seconds an open circuit rejects requests.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._mutex = Lock()
+        # Consecutive failures, and monotonic time the circuit opened at, by host.
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        # Hosts whose trial request is in flight.
+        self._trial_hosts: set[str] = set()
+
+    def allow_request(self, host: str) -> bool:
+        """
+        Args:
+            host (str): Host of the request.
+
+        Returns:
+            bool: Whether the request can be sent, False while the circuit is open.
+        """
+        with self._mutex:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.reset_seconds:
+                return False
+            if host in self._trial_hosts:
+                return False
+            self._trial_hosts.add(host)
+            return True
+
+    def record_success(self, host: str) -> None:
+        """
+        Args:
+            host (str): Host that answered a request.
+        """
+        with self._mutex:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial_hosts.discard(host)
+
+    def record_failure(self, host: str) -> None:
+        """
+        Args:
+            host (str): Host that failed a request.
+        """
+        if not self.failure_threshold:
+            return
+        with self._mutex:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if host in self._trial_hosts or failures >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+                self._trial_hosts.discard(host)
+
+    def half_open_at(self, host: str) -> float:
+        """
+        Args:
+            host (str): Host of a rejected request.
+
+        Returns:
+            float: Monotonic time the circuit of the host lets a trial request
+            through, `reset_seconds` from now if it is already half-open, as its
+            trial request is in flight.
+        """
+        now = time.monotonic()
+        with self._mutex:
+            opened_at = self._opened_at.get(host, now)
+        half_open_at = opened_at + self.reset_seconds
+        return half_open_at if half_open_at > now else now + self.reset_seconds
+
+    @property
+    def open_hosts(self) -> set[str]:
+        """Hosts whose circuit is open or half-open."""
+        return set(self._opened_at)
+
+
+class LatencyTracker:
+    """
+    Latencies of the most recent fetches, and their percentiles. The percentile
+    is only recomputed every `window // 16` fetches, as sorting the window on every
+    fetch would cost more than the fetch itself on fast servers.
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        """
+        Args:
+            window (int): Number of most recent latencies kept.
+        """
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._refresh_interval = max(window // 16, 1)
+        self._mutex = Lock()
+        self._records_since_refresh = 0
+        self._sorted_latencies: list[float] = []
+
+    def record(self, latency: float) -> None:
+        """
+        Args:
+            latency (float): Seconds a fetch took.
+        """
+        with self._mutex:
+            self._latencies.append(latency)
+            self._records_since_refresh += 1
+            if (
+                self._records_since_refresh >= self._refresh_interval
+                or len(self._sorted_latencies) < self._refresh_interval
+            ):
+                self._sorted_latencies = sorted(self._latencies)
+                self._records_since_refresh = 0
+
+    @property
+    def count(self) -> int:
+        """Number of latencies kept."""
+        return len(self._latencies)
+
+    def percentile(self, quantile: float) -> float | None:
+        """
+        Args:
+            quantile (float): Quantile between 0 and 1, e.g. 0.95 for the p95.
+
+        Returns:
+            float | None: Latency below which this share of fetches completed,
+            None if no latency was recorded.
+        """
+        sorted_latencies = self._sorted_latencies
+        if not sorted_latencies:
+            return None
+        index = min(int(quantile * len(sorted_latencies)), len(sorted_latencies) - 1)
+        return sorted_latencies[index]
+
+
+class DeadlineWatchdog:
+    """
+    Single thread calling functions at their deadlines unless cancelled before,
+    e.g. to abort the download of a body trickling in slower than its deadline,
+    which blocking reads bounded by a read timeout would not. Cancelled functions
+    are only dropped at their deadline, so that cancelling takes no lock.
+    """
+
+    def __init__(self) -> None:
+        self._condition = Condition()
+        # Deadlines, in insertion order among equal deadlines, and their entries:
+        # functions to call, None once cancelled.
+        self._deadlines: list[tuple[float, int, list]] = []
+        self._order = itertools.count()
+        self._thread: Thread | None = None
+
+    def watch(self, deadline: float, on_deadline: Callable[[], None]) -> list:
+        """
+        Args:
+            deadline (float): Monotonic time to call the function at.
+            on_deadline (Callable[[], None]): Function to call, from the watchdog
+                thread.
+
+        Returns:
+            list: Entry of the function, to be passed to `cancel`.
+        """
+        entry = [on_deadline]
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            heapq.heappush(self._deadlines, (deadline, next(self._order), entry))
+            if self._deadlines[0][2] is entry:
+                self._condition.notify()
+        return entry
+
+    def cancel(self, entry: list) -> None:
+        """
+        Args:
+            entry (list): Entry returned by `watch`, whose function is not called.
+        """
+        entry[0] = None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._deadlines or self._deadlines[0][0] > time.monotonic():
+                    self._condition.wait(
+                        self._deadlines[0][0] - time.monotonic()
+                        if self._deadlines
+                        else None
+                    )
+                _, _, entry = heapq.heappop(self._deadlines)
+            on_deadline = entry[0]
+            if on_deadline is None:
+                continue
+            # E.g. shutting down a connection closed in the meantime, which must
+            # not stop the watchdog.
+            try:
+                on_deadline()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+
+class FetchStats:
+    """Thread-safe counters of the fetches retried, rejected, timed out and hedged"""
+
+    def __init__(self) -> None:
+        self._mutex = Lock()
+        self.retries = 0
+        self.deadlines_exceeded = 0
+        self.circuit_rejections = 0
+        self.circuit_deferrals = 0
+        self.hedged_requests = 0
+        self.hedges_won = 0
+
+    def _inc(self, counter: str) -> None:
+        with self._mutex:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_retry(self) -> None:
+        """Record a request sent again after a transient failure."""
+        self._inc("retries")
+
+    def record_deadline_exceeded(self) -> None:
+        """Record a URL given up on at its deadline."""
+        self._inc("deadlines_exceeded")
+
+    def record_circuit_rejection(self) -> None:
+        """Record a request not sent as the circuit of its host is open."""
+        self._inc("circuit_rejections")
+
+    def record_circuit_deferral(self) -> None:
+        """Record a page deferred until the circuit of its host is half-open."""
+        self._inc("circuit_deferrals")
+
+    def record_hedge(self, won: bool) -> None:
+        """
+        Record a duplicate request sent after the hedging delay.
+
+        Args:
+            won (bool): Whether the duplicate answered before the original request.
+        """
+        with self._mutex:
+            self.hedged_requests += 1
+            self.hedges_won += won
+
+    def __repr__(self) -> str:
+        return (
+            f"FetchStats[retries={self.retries}, "
+            f"deadlines_exceeded={self.deadlines_exceeded}, "
+            f"circuit_rejections={self.circuit_rejections}, "
+            f"circuit_deferrals={self.circuit_deferrals}, "
+            f"hedged={self.hedged_requests}, hedges_won={self.hedges_won}]"
+        )
+
+
+class FetchPolicy:
+    """
+    Policy of the page fetches of a crawl, shared by all crawler workers. Every
+    request has connect and read timeouts, and every URL a deadline covering all
+    of its attempts and the download of its body. Connection errors, timeouts and
+    `RETRYABLE_STATUS_CODES` are retried with exponential backoff and full jitter
+    (waiting at least as long as a `Retry-After` header asks), and count as failures
+    of the host towards its circuit breaker. With hedging, a duplicate request is
+    sent once a request has been waiting for its headers for longer than the given
+    percentile of the recent fetch latencies, and the first answer is used.
+    At most `max_hedged_requests` requests are hedged at once, on a thread pool
+    shared by all workers, and further slow requests are simply waited for.
+    Pages rejected by an open circuit are deferred until it is half-open, up to
+    `max_circuit_deferrals` times, see `defer`.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        deadline: float = 120.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 10.0,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_seconds: float = 30.0,
+        hedge_percentile: float | None = None,
+        hedge_min_samples: int = 20,
+        max_hedged_requests: int = 16,
+        max_circuit_deferrals: int = 3,
+    ) -> None:
+        """
+        Args:
+            connect_timeout (float): Seconds to wait for a connection to be established.
+            read_timeout (float): Seconds to wait for the server to send any data.
+            deadline (float): Seconds after which a URL is given up on, including
+                its retries and the download of its body.
+            max_retries (int): Number of times a transient failure is retried.
+            backoff_base (float): Upper bound of the first backoff, in seconds,
+                doubling with every retry.
+            backoff_max (float): Upper bound of any backoff, in seconds.
+            circuit_failure_threshold (int): Consecutive failures of a host after
+                which its requests are rejected, circuits never open if 0.
+            circuit_reset_seconds (float): Seconds an open circuit rejects requests.
+            hedge_percentile (float | None): Percentile of the recent fetch latencies
+                after which a duplicate request is sent, e.g. 0.95, no request is
+                hedged if None.
+            hedge_min_samples (int): Number of fetches measured before any request
+                is hedged.
+            max_hedged_requests (int): Number of requests hedged at once, each
+                taking two threads of the hedging pool until both of its
+                requests completed.
+            max_circuit_deferrals (int): Number of times a page rejected by an
+                open circuit is deferred before it is given up on.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_circuit_deferrals = max_circuit_deferrals
+        self.circuit_breaker = CircuitBreaker(
+            circuit_failure_threshold, circuit_reset_seconds
+        )
+        self.latencies = LatencyTracker()
+        self.watchdog = DeadlineWatchdog()
+        self.stats = FetchStats()
+        # Threads are only started once requests are hedged.
+        self.hedge_executor = ThreadPoolExecutor(
+            2 * max_hedged_requests, thread_name_prefix="hedge"
+        )
+        self._hedge_slots = BoundedSemaphore(max_hedged_requests)
+        # Number of times every page rejected by an open circuit was deferred.
+        self._deferrals: dict[str, int] = {}
+        self._deferrals_mutex = Lock()
+
+    def timeouts(self, remaining_seconds: float) -> tuple[float, float]:
+        """
+        Args:
+            remaining_seconds (float): Seconds left before the deadline of the URL.
+
+        Returns:
+            tuple[float, float]: Connect and read timeouts of the next attempt.
+        """
+        return (
+            min(self.connect_timeout, remaining_seconds),
+            min(self.read_timeout, remaining_seconds),
+        )
+
+    def backoff_seconds(self, retry: int, retry_after: float | None = None) -> float:
+        """
+        Args:
+            retry (int): Number of the retry, from 0.
+            retry_after (float | None): Seconds the server asked to wait, if any.
+
+        Returns:
+            float: Seconds to wait before the retry.
+        """
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**retry))
+        if retry_after is not None:
+            backoff = max(backoff, min(retry_after, self.backoff_max))
+        return backoff
+
+    def hedge_delay(self) -> float | None:
+        """
+        Returns:
+            float | None: Seconds after which a duplicate of a request still
+            waiting for its headers is sent, None if the request is not hedged.
+        """
+        if (
+            self.hedge_percentile is None
+            or self.latencies.count < self.hedge_min_samples
+        ):
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def acquire_hedge_slot(self) -> bool:
+        """
+        Returns:
+            bool: Whether a request can be hedged, in which case
+            `release_hedge_slot` must be called once both of its requests completed.
+        """
+        return self._hedge_slots.acquire(blocking=False)
+
+    def release_hedge_slot(self) -> None:
+        """Release the slot of a hedged request whose requests all completed."""
+        self._hedge_slots.release()
+
+    def defer(self, url_address: str, host: str) -> float | None:
+        """
+        Defer a page rejected by the open circuit of its host.
+
+        Args:
+            url_address (str): Address of the page.
+            host (str): Host of the page.
+
+        Returns:
+            float | None: Monotonic time the page should be fetched again at,
+            None once it was deferred `max_circuit_deferrals` times.
+        """
+        with self._deferrals_mutex:
+            deferral_count = self._deferrals.get(url_address, 0)
+            if deferral_count >= self.max_circuit_deferrals:
+                self._deferrals.pop(url_address, None)
+                return None
+            self._deferrals[url_address] = deferral_count + 1
+        self.stats.record_circuit_deferral()
+        return self.circuit_breaker.half_open_at(host)
+
+    def forget_deferral(self, url_address: str) -> None:
+        """
+        Args:
+            url_address (str): Address of a page whose request was let through.
+        """
+        if self._deferrals:
+            with self._deferrals_mutex:
+                self._deferrals.pop(url_address, None)
@@ -0,0 +1,193 @@
+"""On-disk cache of page validators and links, used for incremental re-crawls"""
+
+import os
+import sqlite3
+from threading import Lock
+from typing import Mapping
+
+from models.url import DEFAULT_CANONICALIZER, URL, URLCanonicalizer
+
+
+class CachedPage:
+    """Validators and links of a page, as of its last full download"""
+
+    __slots__ = ("etag", "last_modified", "link_addresses", "body_bytes")
+
+    def __init__(
+        self,
+        etag: str | None,
+        last_modified: str | None,
+        link_addresses: list[str],
+        body_bytes: int,
+    ) -> None:
+        """
+        Args:
+            etag (str | None): Value of the ETag header.
+            last_modified (str | None): Value of the Last-Modified header.
+            link_addresses (list[str]): Addresses of the links found in the page.
+            body_bytes (int): Size of the downloaded body.
+        """
+        self.etag = etag
+        self.last_modified = last_modified
+        self.link_addresses = link_addresses
+        self.body_bytes = body_bytes
+
+    @property
+    def conditional_headers(self) -> dict[str, str]:
+        """Request headers asking the server to only send the page if it changed."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def linked_urls(
+        self, canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER
+    ) -> set[URL]:
+        """
+        Args:
+            canonicalizer (URLCanonicalizer): Rewrites applied to the addresses.
+
+        Returns:
+            set[URL]: URLs found in the page.
+        """
+        return {URL(address, canonicalizer) for address in self.link_addresses}
+
+
+class HTTPCacheStats:
+    """Thread-safe counters describing how many downloads the cache avoided"""
+
+    def __init__(self) -> None:
+        self._mutex = Lock()
+        self._revalidated = 0
+        self._changed = 0
+        self._uncached = 0
+        self._bytes_saved = 0
+
+    def record_revalidated(self, cached_page: CachedPage) -> None:
+        """Record that a cached page was not modified, and its body not downloaded."""
+        with self._mutex:
+            self._revalidated += 1
+            self._bytes_saved += cached_page.body_bytes
+
+    def record_refetched(self, was_cached: bool) -> None:
+        """Record that a page was downloaded, as it changed or was not cached."""
+        with self._mutex:
+            if was_cached:
+                self._changed += 1
+            else:
+                self._uncached += 1
+
+    @property
+    def revalidated(self) -> int:
+        """Number of pages confirmed unchanged by the server."""
+        return self._revalidated
+
+    @property
+    def refetched(self) -> int:
+        """Number of pages downloaded in full."""
+        return self._changed + self._uncached
+
+    @property
+    def changed(self) -> int:
+        """Number of cached pages downloaded again as they changed."""
+        return self._changed
+
+    @property
+    def bytes_saved(self) -> int:
+        """Size of the bodies that were not downloaded."""
+        return self._bytes_saved
+
+    def __repr__(self) -> str:
+        return (
+            f"HTTPCacheStats[revalidated={self.revalidated}, "
+            f"refetched={self.refetched} ({self.changed} changed), "
+            f"bytes_saved={self.bytes_saved}]"
+        )
+
+
+class HTTPCache:
+    """
+    SQLite cache of the `ETag` and `Last-Modified` validators and the links of every
+    page downloaded, kept across runs. On the next run a page is requested
+    conditionally, and if the server answers `304 Not Modified` its cached links are
+    reused without downloading nor parsing the page.
+    Pages served without any validator cannot be revalidated, and are not cached.
+    """
+
+    # Name of the database file in the cache directory.
+    DATABASE_NAME = "http_cache.sqlite3"
+
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Args:
+            cache_dir (str): Directory holding the cache, created if missing.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self._mutex = Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, HTTPCache.DATABASE_NAME), check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "address TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,"
+            " links TEXT NOT NULL, body_bytes INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+        self.stats = HTTPCacheStats()
+
+    def lookup(self, url: URL) -> CachedPage | None:
+        """
+        Args:
+            url (URL): URL of the page.
+
+        Returns:
+            CachedPage | None: Cached page, None if the page is not cached.
+        """
+        with self._mutex:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, links, body_bytes FROM pages"
+                " WHERE address = ?",
+                (url.address,),
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, links, body_bytes = row
+        return CachedPage(
+            etag, last_modified, links.split("\n") if links else [], body_bytes
+        )
+
+    def store(
+        self,
+        url: URL,
+        headers: Mapping[str, str],
+        linked_urls: set[URL],
+        body_bytes: int,
+    ) -> None:
+        """
+        Cache the validators and links of a downloaded page.
+
+        Args:
+            url (URL): URL of the page.
+            headers (Mapping[str, str]): Case-insensitive response headers.
+            linked_urls (set[URL]): URLs found in the page.
+            body_bytes (int): Size of the downloaded body.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        links = "\n".join(linked_url.address for linked_url in linked_urls)
+        with self._mutex, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url.address, etag, last_modified, links, body_bytes),
+            )
+
+    def close(self) -> None:
+        """Close the cache database."""
+        with self._mutex:
+            self._connection.close()
@@ -0,0 +1,203 @@
+"""Pooled, keep-alive HTTP transport shared by the crawler workers"""
+
+import time
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Content codings urllib3 decompresses while a body is streamed: gzip and deflate,
+# and br and zstd when the brotli and zstandard packages are installed.
+ACCEPT_ENCODING = DEFAULT_ACCEPT_ENCODING
+
+
+class HTTPClientOptions:
+    """
+    A class to control the connection pooling of the HTTP client
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        max_connections_per_host: int = 10,
+        idle_timeout: float = 30.0,
+        accept_encoding: str = ACCEPT_ENCODING,
+    ) -> None:
+        """
+        Args:
+            pool_size (int): Number of per-host connection pools to keep cached.
+            max_connections_per_host (int): Maximum number of connections kept alive
+                per host, which should match the number of crawler workers.
+            idle_timeout (float): Seconds after which an idle connection is closed
+                instead of being reused.
+            accept_encoding (str): `Accept-Encoding` header of every request, e.g.
+                `identity` to receive uncompressed bodies.
+        """
+        self.pool_size = pool_size
+        self.max_connections_per_host = max_connections_per_host
+        self.idle_timeout = idle_timeout
+        self.accept_encoding = accept_encoding
+
+
+class ConnectionPoolStats:
+    """Thread-safe counters describing how well connections are being reused"""
+
+    def __init__(self) -> None:
+        self._mutex = Lock()
+        self._requests = 0
+        self._connections_opened = 0
+
+    def record_request(self) -> None:
+        """Record that a request was sent."""
+        with self._mutex:
+            self._requests += 1
+
+    def record_connection(self) -> None:
+        """Record that a new TCP (and TLS) connection was established."""
+        with self._mutex:
+            self._connections_opened += 1
+
+    @property
+    def requests(self) -> int:
+        """Number of requests sent."""
+        return self._requests
+
+    @property
+    def connections_opened(self) -> int:
+        """Number of connections established."""
+        return self._connections_opened
+
+    @property
+    def connections_reused(self) -> int:
+        """Number of requests served over an already established connection."""
+        return max(self._requests - self._connections_opened, 0)
+
+    def __repr__(self) -> str:
+        return (
+            f"ConnectionPoolStats[requests={self.requests}, "
+            f"opened={self.connections_opened}, reused={self.connections_reused}]"
+        )
+
+
+def _pool_class(
+    pool_class: type[HTTPConnectionPool],
+    connection_class: type[HTTPConnection],
+    idle_timeout: float,
+    stats: ConnectionPoolStats,
+) -> type[HTTPConnectionPool]:
+    """
+    Build a urllib3 connection pool class that counts established connections
+    and closes connections that have been idle in the pool for too long.
+    """
+
+    class _CountingConnection(connection_class):
+        def connect(self) -> None:
+            super().connect()
+            stats.record_connection()
+
+    class _IdleAwareConnectionPool(pool_class):
+        ConnectionCls = _CountingConnection
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            released_at = getattr(conn, "_crawler_released_at", None)
+            if (
+                released_at is not None
+                and time.monotonic() - released_at > idle_timeout
+            ):
+                # The connection is reopened by urllib3 on its next use.
+                conn.close()
+            return conn
+
+        def _put_conn(self, conn) -> None:
+            if conn is not None:
+                conn._crawler_released_at = time.monotonic()
+            super()._put_conn(conn)
+
+    return _IdleAwareConnectionPool
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """Transport adapter installing the idle-aware, counting connection pools."""
+
+    def __init__(
+        self, idle_timeout: float, stats: ConnectionPoolStats, **kwargs
+    ) -> None:
+        # Must be set before HTTPAdapter.__init__, which initializes the pool manager.
+        self._idle_timeout = idle_timeout
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _pool_class(
+                HTTPConnectionPool, HTTPConnection, self._idle_timeout, self._stats
+            ),
+            "https": _pool_class(
+                HTTPSConnectionPool, HTTPSConnection, self._idle_timeout, self._stats
+            ),
+        }
+
+
+class HTTPClient:
+    """
+    HTTP client owning a single keep-alive `requests.Session` shared by all crawler
+    workers, so that pages on the same host are fetched over already established
+    connections rather than paying for a new TCP (and TLS) handshake per URL.
+    """
+
+    def __init__(self, options: HTTPClientOptions | None = None) -> None:
+        self._options = options or HTTPClientOptions()
+        self._stats = ConnectionPoolStats()
+        self._session = requests.Session()
+        self._session.headers["Accept-Encoding"] = self._options.accept_encoding
+        adapter = _PooledHTTPAdapter(
+            self._options.idle_timeout,
+            self._stats,
+            pool_connections=self._options.pool_size,
+            pool_maxsize=self._options.max_connections_per_host,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def get(
+        self,
+        address: str,
+        stream: bool = False,
+        headers: dict[str, str] | None = None,
+        timeout: tuple[float, float] | None = None,
+    ) -> requests.Response:
+        """
+        Send a GET request over a pooled connection.
+
+        Args:
+            address (str): Address to request.
+            stream (bool): Whether to return as soon as headers are received,
+                leaving the body to be consumed (and the response closed) by the caller.
+            headers (dict[str, str] | None): Additional request headers.
+            timeout (tuple[float, float] | None): Connect and read timeouts in
+                seconds, the request may wait forever if None.
+
+        Raises:
+            requests.RequestException: If the request fails.
+
+        Returns:
+            requests.Response: Response for the address.
+        """
+        self._stats.record_request()
+        return self._session.get(
+            address, stream=stream, headers=headers, timeout=timeout
+        )
+
+    @property
+    def stats(self) -> ConnectionPoolStats:
+        """Connection reuse statistics of the client."""
+        return self._stats
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
@@ -0,0 +1,117 @@
+"""Streaming extraction of anchor links from HTML markup"""
+
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from models.url import DEFAULT_CANONICALIZER, URL, URLCanonicalizer
+
+# Encoding assumed when a response does not declare one.
+DEFAULT_ENCODING = "utf-8"
+
+
+def get_incremental_decoder(encoding: str | None) -> codecs.IncrementalDecoder:
+    """
+    Build an incremental decoder for the charset declared by a response, so that
+    multi-byte characters split across network chunks are decoded correctly.
+
+    Args:
+        encoding (str | None): Declared charset of the response.
+
+    Returns:
+        codecs.IncrementalDecoder: Decoder replacing undecodable bytes.
+    """
+    try:
+        decoder_class = codecs.getincrementaldecoder(encoding or DEFAULT_ENCODING)
+    except LookupError:
+        decoder_class = codecs.getincrementaldecoder(DEFAULT_ENCODING)
+    return decoder_class(errors="replace")
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Incremental HTML tokenizer that collects the `href` of every `<a>` tag as it is
+    seen, without materializing a document tree. Markup can be fed in arbitrary chunks,
+    e.g. as they are received from the network.
+
+    The tokenizer is the same one used by BeautifulSoup's "html.parser" builder,
+    so the extracted links are identical to searching a parsed tree for anchors.
+    """
+
+    def __init__(
+        self, url: URL, canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER
+    ) -> None:
+        """
+        Args:
+            url (URL): Source URL of the HTML page, used to resolve relative links.
+            canonicalizer (URLCanonicalizer): Rewrites applied to extracted addresses.
+        """
+        super().__init__(convert_charrefs=True)
+        self._url_address = url.address
+        self._canonicalizer = canonicalizer
+        self._linked_urls = set()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag != "a":
+            return
+        # Anchors without an href resolve to the page itself, and the last
+        # occurrence of a duplicated attribute wins, as in BeautifulSoup.
+        parsed_address = None
+        for name, value in attrs:
+            if name == "href":
+                parsed_address = value
+        # urljoin correctly handles absolute and relative paths.
+        joined_address = urljoin(self._url_address, parsed_address)
+        self._linked_urls.add(URL(joined_address, self._canonicalizer))
+
+    @property
+    def linked_urls(self) -> set[URL]:
+        """Set of URLs found in the markup fed so far."""
+        return self._linked_urls
+
+
+def extract_link_parts(
+    address: str,
+    html_page: bytes,
+    encoding: str | None,
+    canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER,
+) -> list[tuple[str, str | None, str]]:
+    """
+    Extract the links of a downloaded HTML page as plain tuples, so that the page can
+    be parsed in a worker process and only compact link lists are sent back.
+    Defined at module level to be picklable by a `ProcessPoolExecutor`.
+
+    Args:
+        address (str): Address of the HTML page, used to resolve relative links.
+        html_page (bytes): Body of the HTML page.
+        encoding (str | None): Declared charset of the body.
+        canonicalizer (URLCanonicalizer): Rewrites applied to extracted addresses.
+
+    Returns:
+        list[tuple[str, str | None, str]]: Canonical address, hostname and scheme of
+        every link found, to be rebuilt with `URL.from_canonical_parts`.
+    """
+    extractor = LinkExtractor(URL(address), canonicalizer)
+    extractor.feed(get_incremental_decoder(encoding).decode(html_page, final=True))
+    extractor.close()
+    return [(url.address, url.subdomain, url.scheme) for url in extractor.linked_urls]
+
+
+def extract_links_from_html(
+    url: URL, html_page: str, canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER
+) -> set[URL]:
+    """
+    Extract the set of URLs referenced by anchor tags in a complete HTML page.
+
+    Args:
+        url (URL): Source URL of the HTML page, used to resolve relative links.
+        html_page (str): HTML markup of the page.
+        canonicalizer (URLCanonicalizer): Rewrites applied to extracted addresses.
+
+    Returns:
+        set[URL]: Set of URLs found in the page.
+    """
+    extractor = LinkExtractor(url, canonicalizer)
+    extractor.feed(html_page)
+    extractor.close()
+    return extractor.linked_urls
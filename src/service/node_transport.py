@@ -0,0 +1,125 @@
+"""Line-delimited JSON messaging between the nodes of a distributed crawl"""
+
+import json
+import socket
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Lock, Thread
+from typing import Callable
+
+
+def parse_node_address(address: str) -> tuple[str, int]:
+    """
+    Args:
+        address (str): Address of a node, as `host:port`.
+
+    Returns:
+        tuple[str, int]: Host and port of the node.
+    """
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+class _NodeTCPServer(ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # All peers may connect at once when a crawl starts.
+    request_queue_size = 128
+
+
+class NodeServer:
+    """
+    Threaded TCP server receiving the messages of peer nodes. Every message is a JSON
+    object on a single line, and is answered with a single JSON line, so that a peer
+    knows a message was fully handled once it reads the reply.
+    """
+
+    def __init__(
+        self, address: tuple[str, int], handle_message: Callable[[dict], dict]
+    ) -> None:
+        """
+        Args:
+            address (tuple[str, int]): Host and port to listen on.
+            handle_message (Callable[[dict], dict]): Handler of a received message,
+                returning the reply. Called concurrently by one thread per peer.
+        """
+
+        class _Handler(StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    reply = handle_message(json.loads(line))
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        self._server = _NodeTCPServer(address, _Handler)
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> None:
+        """Start serving peers on a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving peers and release the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class PeerConnection:
+    """
+    Persistent connection to a peer node, opened on first use and reopened after
+    an error. Messages sent from several threads are serialized.
+    """
+
+    def __init__(self, address: tuple[str, int], timeout: float = 30.0) -> None:
+        """
+        Args:
+            address (tuple[str, int]): Host and port of the peer.
+            timeout (float): Seconds to wait for the peer to connect or reply.
+        """
+        self._address = address
+        self._timeout = timeout
+        self._mutex = Lock()
+        self._socket: socket.socket | None = None
+        self._reader = None
+
+    def send(self, message: dict) -> dict:
+        """
+        Send a message and wait for its reply.
+
+        Args:
+            message (dict): JSON-serializable message.
+
+        Raises:
+            OSError: If the peer cannot be reached, or closed the connection.
+
+        Returns:
+            dict: Reply of the peer.
+        """
+        with self._mutex:
+            try:
+                if self._socket is None:
+                    self._socket = socket.create_connection(
+                        self._address, self._timeout
+                    )
+                    self._socket.setsockopt(
+                        socket.IPPROTO_TCP, socket.TCP_NODELAY, True
+                    )
+                    self._reader = self._socket.makefile("rb")
+                self._socket.sendall(json.dumps(message).encode() + b"\n")
+                reply = self._reader.readline()
+                if not reply:
+                    raise ConnectionResetError(f"Connection to {self._address} closed")
+                return json.loads(reply)
+            except OSError:
+                self._close()
+                raise
+
+    def _close(self) -> None:
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = None
+            self._reader = None
+
+    def close(self) -> None:
+        """Close the connection, if open."""
+        with self._mutex:
+            self._close()
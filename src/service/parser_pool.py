@@ -0,0 +1,92 @@
+"""Pool of processes parsing downloaded pages"""
+
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Callable
+
+
+class ParserPool(Executor):
+    """
+    Process pool parsing downloaded pages, which restarts itself once broken. A
+    worker process dying abruptly, e.g. killed by the OS when running out of memory,
+    breaks a `ProcessPoolExecutor` for good: the parses it was running fail with
+    `BrokenProcessPool`, and so would every parse submitted afterwards. The broken
+    executor is therefore replaced by a new one as soon as one of its parses fails
+    this way, and parses submitted meanwhile are submitted again to the new one.
+    """
+
+    def __init__(self, process_count: int) -> None:
+        """
+        Args:
+            process_count (int): Number of parser processes.
+        """
+        self._process_count = process_count
+        self._mutex = Lock()
+        self._executor = self._start_executor()
+        # Number of times the executor was replaced after breaking.
+        self.restart_count = 0
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        # Forking a process running crawler threads may copy held locks, spawn
+        # fresh interpreters instead.
+        return ProcessPoolExecutor(
+            max_workers=self._process_count,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _restart(self, broken_executor: ProcessPoolExecutor) -> None:
+        """
+        Replace the executor if it is still the broken one, so that the parses
+        failing together only restart it once.
+
+        Args:
+            broken_executor (ProcessPoolExecutor): Executor a parse failed on.
+        """
+        with self._mutex:
+            if self._executor is not broken_executor:
+                return
+            self._executor = self._start_executor()
+            self.restart_count += 1
+        broken_executor.shutdown(wait=False)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """
+        Args:
+            fn (Callable): Picklable function parsing a page.
+            *args: Positional arguments of the function.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            Future: Result of the function, failing with `BrokenProcessPool` if a
+            worker process died while it was pending.
+        """
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._restart(executor)
+            executor = self._executor
+            future = executor.submit(fn, *args, **kwargs)
+
+        def restart_if_broken(done: Future) -> None:
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self._restart(executor)
+
+        future.add_done_callback(restart_if_broken)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """
+        Args:
+            wait (bool): Whether to wait for the pending parses to complete.
+            cancel_futures (bool): Whether to cancel the parses not started yet.
+        """
+        self._executor.shutdown(wait, cancel_futures=cancel_futures)
+
+    def __str__(self) -> str:
+        return (
+            f"{self._process_count} process(es), restarted {self.restart_count}"
+            " time(s) after a process died"
+        )
@@ -1,43 +1,292 @@
 """Main HTML parsing functionality"""
 
-from urllib.parse import urljoin
+import functools
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from typing import Callable
+
 import requests
-from bs4 import BeautifulSoup
+from crawler.budget import CrawlBudget
+from crawler.output import PageRecord
 from logger.logger import Logger
 
-from models.url import URL
+from metrics.crawl_metrics import CrawlMetrics
+from models.url import DEFAULT_CANONICALIZER, URL, URLCanonicalizer
+from service.concurrency_limiter import ConcurrencyLimiter, parse_retry_after
+from service.fetch_guard import FetchGuard
+from service.fetch_policy import (
+    RETRYABLE_STATUS_CODES,
+    CircuitOpenError,
+    FetchPolicy,
+)
+from service.http_cache import CachedPage, HTTPCache
+from service.http_client import HTTPClient
+from service.link_extractor import (
+    LinkExtractor,
+    extract_link_parts,
+    get_incremental_decoder,
+)
+
+
+def _release_when_done(first: Future, second: Future, release: Callable) -> None:
+    """Call a function once both futures are done, from the thread completing last."""
+    first.add_done_callback(lambda _: second.add_done_callback(lambda _: release()))
+
+
+def _close_response(future: Future) -> None:
+    """Close the response of a request that lost the race to a duplicate."""
+    if future.exception() is None:
+        future.result().close()
 
 
 class HTMLParserService:
     """Parser class to handle fetching the related urls under a url's web-page."""
 
-    def __init__(self, logger: Logger) -> None:
+    # Number of bytes read from the network at a time while streaming a page.
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(
+        self,
+        logger: Logger,
+        http_client: HTTPClient | None = None,
+        fetch_guard: FetchGuard | None = None,
+        canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER,
+        http_cache: HTTPCache | None = None,
+        parser_pool: Executor | None = None,
+        metrics: CrawlMetrics | None = None,
+        budget: CrawlBudget | None = None,
+        concurrency_limiter: ConcurrencyLimiter | None = None,
+        fetch_policy: FetchPolicy | None = None,
+    ) -> None:
+        """
+        Args:
+            logger (Logger): Thread-safe logger.
+            http_client (HTTPClient | None): Pooled HTTP client shared by all workers,
+                a client with default pooling options is created if not provided.
+            fetch_guard (FetchGuard | None): Guard deciding which response bodies are
+                downloaded, a guard with the default size cap is created if not provided.
+            canonicalizer (URLCanonicalizer): Rewrites applied to extracted addresses.
+            http_cache (HTTPCache | None): Cache of the validators and links of pages
+                downloaded by previous runs, pages are always downloaded if None.
+            parser_pool (Executor | None): Process pool parsing downloaded pages,
+                so that parsing is not serialized by the GIL. Pages are parsed by the
+                calling thread while they are being downloaded if None.
+            metrics (CrawlMetrics | None): Metrics the fetch and parse times, sizes
+                and status codes of pages are recorded to, if any.
+            budget (CrawlBudget | None): Crawl budget the downloaded bytes are
+                counted against, if any.
+            concurrency_limiter (ConcurrencyLimiter | None): Adaptive limit on the number
+                of pages fetched at once, fed with the latency and status of every
+                fetch. Fetches are only limited by the number of workers if None.
+            fetch_policy (FetchPolicy | None): Timeouts, retries, circuit breakers
+                and hedging of the fetches, a policy with the default timeouts and
+                retries is created if not provided.
+        """
         self._logger = logger
+        self._http_client = http_client or HTTPClient()
+        self._fetch_guard = fetch_guard or FetchGuard()
+        self._canonicalizer = canonicalizer
+        self._http_cache = http_cache
+        self._parser_pool = parser_pool
+        self._metrics = metrics
+        self._budget = budget
+        self._concurrency_limiter = concurrency_limiter
+        self._fetch_policy = fetch_policy or FetchPolicy()
+
+    @property
+    def fetch_guard(self) -> FetchGuard:
+        """Guard recording the URLs whose body was not downloaded."""
+        return self._fetch_guard
+
+    @property
+    def fetch_policy(self) -> FetchPolicy:
+        """Policy recording the fetches retried, rejected, timed out and hedged."""
+        return self._fetch_policy
 
-    def _get_url_html_page(self, url: URL) -> str | None:
+    def _skip_url(
+        self, url: URL, reason: str, html_page_response: requests.Response
+    ) -> None:
         """
-        Attempt to fetch the HTML page for a certain URL as string of bytes.
+        Drop the connection of a response whose body should not be downloaded.
+
+        Args:
+            url (URL): Skipped URL.
+            reason (str): One of `FetchGuard.SkipReason`.
+            html_page_response (requests.Response): Streamed response to abort.
+        """
+        # Closing an unread streamed response discards its connection
+        # instead of draining the body to return it to the pool.
+        html_page_response.close()
+        self._fetch_guard.record_skip(url, reason)
+        self._logger.log(f"Skipping web-page for {url.address}: [{reason}]")
+
+    def _send_request(
+        self,
+        address: str,
+        headers: dict[str, str] | None,
+        timeout: tuple[float, float],
+    ) -> requests.Response:
+        """
+        Send a streamed request. If hedging is enabled and a hedging slot is free,
+        the request is sent on the hedging pool of the fetch policy, and if no
+        response headers arrived within the hedging delay, a duplicate request is
+        sent and the first response is returned, the other one being closed once it
+        arrives. Otherwise the request is sent by the calling thread.
+
+        Args:
+            address (str): Address to request.
+            headers (dict[str, str] | None): Additional request headers.
+            timeout (tuple[float, float]): Connect and read timeouts in seconds.
+
+        Raises:
+            requests.RequestException: If all requests sent fail.
+
+        Returns:
+            requests.Response: First response received.
+        """
+        send = functools.partial(
+            self._http_client.get,
+            address,
+            stream=True,
+            headers=headers,
+            timeout=timeout,
+        )
+        fetch_policy = self._fetch_policy
+        hedge_delay = fetch_policy.hedge_delay()
+        if hedge_delay is None or not fetch_policy.acquire_hedge_slot():
+            return send()
+        request = fetch_policy.hedge_executor.submit(send)
+        if wait([request], hedge_delay).done:
+            fetch_policy.release_hedge_slot()
+            return request.result()
+        hedge = fetch_policy.hedge_executor.submit(send)
+        _release_when_done(request, hedge, fetch_policy.release_hedge_slot)
+        pending = {request, hedge}
+        answered = []
+        while pending and not answered:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            answered = [future for future in done if future.exception() is None]
+        for future in pending:
+            future.add_done_callback(_close_response)
+        for future in answered[1:]:
+            future.result().close()
+        fetch_policy.stats.record_hedge(bool(answered) and answered[0] is hedge)
+        if not answered:
+            raise done.pop().exception()
+        return answered[0].result()
+
+    def _get_url_html_response(
+        self,
+        url: URL,
+        cached_page: CachedPage | None = None,
+        deadline: float | None = None,
+        record: PageRecord | None = None,
+    ) -> requests.Response | None:
+        """
+        Attempt to open a streamed response for the HTML page of a certain URL.
+        Only the headers have been received once this returns, the body
+        is left to be consumed by the caller. Transient failures are retried
+        as long as the fetch policy allows.
 
         Args:
             url (URL): Input URL.
+            cached_page (CachedPage | None): Cached copy of the page, requested
+                conditionally if provided.
+            deadline (float | None): Monotonic time after which the URL is given
+                up on, the deadline of the fetch policy from now if None.
+            record (PageRecord | None): Record the status of the response is set
+                on, if any.
+
+        Raises:
+            CircuitOpenError: If the circuit of the host of the URL is open, and the
+                URL can still be deferred until it is half-open.
 
         Returns:
-            str | None: HTML markup if request is succesful,
+            requests.Response | None: Streamed response if request is succesful,
             or None if error occurs.
         """
-        html_page_response = None
         address = url.address
-        try:
-            html_page_response = requests.get(address)
-        except requests.RequestException as request_exception:
+        host = url.subdomain
+        fetch_policy = self._fetch_policy
+        if deadline is None:
+            deadline = time.monotonic() + fetch_policy.deadline
+        headers = cached_page.conditional_headers if cached_page else None
+        retry = 0
+        while True:
+            if not fetch_policy.circuit_breaker.allow_request(host):
+                fetch_policy.stats.record_circuit_rejection()
+                retry_at = fetch_policy.defer(address, host)
+                if retry_at is not None:
+                    raise CircuitOpenError(host, retry_at)
+                self._logger.log(
+                    f"Circuit open for {host}, skipping web-page for {address}",
+                    severity=Logger.Severity.ERROR,
+                )
+                return None
+            fetch_policy.forget_deferral(address)
+            html_page_response = request_exception = retry_after = None
+            sent_at = time.perf_counter()
+            try:
+                html_page_response = self._send_request(
+                    address, headers, fetch_policy.timeouts(deadline - time.monotonic())
+                )
+            except requests.RequestException as exception:
+                request_exception = exception
+                fetch_policy.circuit_breaker.record_failure(host)
+                if self._concurrency_limiter is not None:
+                    self._concurrency_limiter.record_error()
+            else:
+                response_headers = html_page_response.headers
+                if self._concurrency_limiter is not None:
+                    self._concurrency_limiter.record_response(
+                        html_page_response.status_code,
+                        response_headers.get("Retry-After"),
+                    )
+                if html_page_response.status_code not in RETRYABLE_STATUS_CODES:
+                    fetch_policy.circuit_breaker.record_success(host)
+                    fetch_policy.latencies.record(time.perf_counter() - sent_at)
+                    break
+                fetch_policy.circuit_breaker.record_failure(host)
+                retry_after = parse_retry_after(response_headers.get("Retry-After"))
+
+            # Retry transient failures, unless the retry would end past the deadline
+            backoff = fetch_policy.backoff_seconds(retry, retry_after)
+            if retry >= fetch_policy.max_retries:
+                break
+            if time.monotonic() + backoff >= deadline:
+                fetch_policy.stats.record_deadline_exceeded()
+                break
+            if html_page_response is not None:
+                html_page_response.close()
+            self._logger.log(
+                f"Retrying web-page for {address} in {backoff:.3f}s",
+                severity=Logger.Severity.DEBUG,
+            )
+            fetch_policy.stats.record_retry()
+            time.sleep(backoff)
+            retry += 1
+
+        if request_exception is not None:
             self._logger.log(
                 f"Error while fetching web-page for {address}: [\n-----{request_exception}]",
                 severity=Logger.Severity.ERROR,
             )
+            if self._metrics is not None:
+                self._metrics.fetch_errors.inc()
             return None
 
-        # Fail if HTTP status code is not OK
+        # A not modified page has no body, its cached links are reused
         http_status_code = html_page_response.status_code
+        if record is not None:
+            record.status = http_status_code
+        if self._metrics is not None:
+            self._metrics.responses.inc(label_value=str(http_status_code))
+        if http_status_code == HTTPStatus.NOT_MODIFIED and cached_page is not None:
+            return html_page_response
+
+        # Fail if HTTP status code is not OK
         http_status_ok = html_page_response.ok
         if not http_status_ok:
             self._logger.log(
@@ -45,32 +294,180 @@ class HTMLParserService:
                 f" while fetching web-page for {address}",
                 severity=Logger.Severity.ERROR,
             )
+            html_page_response.close()
             return None
-        return html_page_response.text
 
-    def get_links_under_url(self, url: URL) -> set[URL]:
+        # Skip bodies that cannot contain links before downloading them
+        skip_reason = self._fetch_guard.check_headers(
+            html_page_response.headers.get("Content-Type"),
+            html_page_response.headers.get("Content-Length"),
+        )
+        if skip_reason is not None:
+            self._skip_url(url, skip_reason, html_page_response)
+            return None
+        return html_page_response
+
+    def get_links_under_url(
+        self, url: URL, record: PageRecord | None = None
+    ) -> set[URL]:
         """
         Returns a set of URL objects found under the HTML page of a source url.
         There are multiple reasons why a URL might be duplicate in a web-page,
         such as it being referenced multiple times, or multiple fragments
         (website.com#this_tab, website.com#that_tab) being referenced for the same address.
+        The page is tokenized while it is being downloaded, so neither the full
+        markup nor a document tree is held in memory. Pages that are not HTML,
+        or that exceed the size cap of the fetch guard, yield no links.
+        With an HTTP cache, pages unchanged since the previous run are not downloaded
+        and the links cached for them are returned.
+        With a parser pool, the calling thread only downloads the page, which is then
+        parsed by a worker process. With a concurrency limiter, the calling thread
+        waits for a slot before fetching the page.
 
         Args:
             url (URL): Source URL for HTML page.
+            record (PageRecord | None): Record of the page its status, timings and
+                size are set on, if any.
+
+        Raises:
+            CircuitOpenError: If the circuit of the host of the URL is open, and the
+                URL can still be deferred until it is half-open.
 
         Returns:
             set[URL]: Set of URLs found in the source URL's page.
         """
-        url_address = url.address
-        html_page = self._get_url_html_page(url)
-        if not html_page:
+        if self._concurrency_limiter is None:
+            return self._fetch_links_under_url(url, record)
+        with self._concurrency_limiter.slot():
+            return self._fetch_links_under_url(url, record)
+
+    def _fetch_links_under_url(
+        self, url: URL, record: PageRecord | None = None
+    ) -> set[URL]:
+        """
+        Fetch and parse the HTML page of a source url, see `get_links_under_url`.
+
+        Args:
+            url (URL): Source URL for HTML page.
+            record (PageRecord | None): Record of the page, if any.
+
+        Returns:
+            set[URL]: Set of URLs found in the source URL's page.
+        """
+        started_at = time.perf_counter()
+        deadline = time.monotonic() + self._fetch_policy.deadline
+        cached_page = self._http_cache.lookup(url) if self._http_cache else None
+        html_page_response = self._get_url_html_response(
+            url, cached_page, deadline, record
+        )
+        if html_page_response is None:
             return set()
+        if (
+            cached_page is not None
+            and html_page_response.status_code == HTTPStatus.NOT_MODIFIED
+        ):
+            html_page_response.close()
+            self._http_cache.stats.record_revalidated(cached_page)
+            fetch_seconds = time.perf_counter() - started_at
+            if record is not None:
+                record.fetch_seconds = fetch_seconds
+            if self._metrics is not None:
+                self._metrics.fetch_seconds.observe(fetch_seconds)
+            return cached_page.linked_urls(self._canonicalizer)
 
-        soup = BeautifulSoup(html_page, "html.parser")
-        linked_urls = set()
-        for address in soup.findAll("a"):
-            parsed_address = address.get("href")
-            # urljoin correctly handles absolute and relative paths.
-            joined_address = urljoin(url_address, parsed_address)
-            linked_urls.add(URL(joined_address))
+        # Blocking reads only time out when no data arrives for the read timeout,
+        # the connection is shut down at the deadline to abort reading the body.
+        deadline_entry = self._fetch_policy.watchdog.watch(
+            deadline, html_page_response.raw.shutdown
+        )
+        # Pages are tokenized while they are downloaded, unless parsing is left to
+        # the parser pool.
+        extractor = decoder = None
+        if self._parser_pool is None:
+            extractor = LinkExtractor(url, self._canonicalizer)
+            decoder = get_incremental_decoder(html_page_response.encoding)
+        # Chunks of the body when parsing is left to the parser pool.
+        chunks = []
+        # Decompressed bytes, and bytes received over the wire, of the body.
+        bytes_read = 0
+        wire_bytes = 0
+        parse_seconds = 0.0
+        try:
+            for chunk in html_page_response.iter_content(HTMLParserService.CHUNK_SIZE):
+                if time.monotonic() > deadline:
+                    self._fetch_policy.stats.record_deadline_exceeded()
+                    self._logger.log(
+                        f"Deadline exceeded while reading web-page for {url.address}",
+                        severity=Logger.Severity.ERROR,
+                    )
+                    return set()
+                bytes_read += len(chunk)
+                wire_bytes = html_page_response.raw.tell()
+                if self._budget is not None:
+                    self._budget.record_bytes(len(chunk))
+                if self._fetch_guard.exceeds_size(bytes_read):
+                    self._skip_url(
+                        url, FetchGuard.SkipReason.CONTENT_TOO_LARGE, html_page_response
+                    )
+                    return set()
+                if self._fetch_guard.exceeds_compression_ratio(wire_bytes, bytes_read):
+                    self._skip_url(
+                        url, FetchGuard.SkipReason.COMPRESSION_BOMB, html_page_response
+                    )
+                    return set()
+                if extractor is not None:
+                    parse_started_at = time.perf_counter()
+                    extractor.feed(decoder.decode(chunk))
+                    parse_seconds += time.perf_counter() - parse_started_at
+                else:
+                    chunks.append(chunk)
+            if extractor is not None:
+                extractor.feed(decoder.decode(b"", final=True))
+        except requests.RequestException as request_exception:
+            if time.monotonic() >= deadline:
+                self._fetch_policy.stats.record_deadline_exceeded()
+            self._logger.log(
+                f"Error while reading web-page for {url.address}: [\n-----{request_exception}]",
+                severity=Logger.Severity.ERROR,
+            )
+            return set()
+        finally:
+            self._fetch_policy.watchdog.cancel(deadline_entry)
+            html_page_response.close()
+        downloaded_at = time.perf_counter()
+        if extractor is not None:
+            extractor.close()
+            linked_urls = extractor.linked_urls
+        else:
+            # A parser process dying fails the page, the pool replaces itself.
+            try:
+                link_parts = self._parser_pool.submit(
+                    extract_link_parts,
+                    url.address,
+                    b"".join(chunks),
+                    html_page_response.encoding,
+                    self._canonicalizer,
+                ).result()
+            except BrokenProcessPool as broken_pool:
+                self._logger.log(
+                    f"Error while parsing web-page for {url.address}: [\n-----{broken_pool}]",
+                    severity=Logger.Severity.ERROR,
+                )
+                return set()
+            linked_urls = {URL.from_canonical_parts(*parts) for parts in link_parts}
+        fetch_seconds = downloaded_at - started_at - parse_seconds
+        parse_seconds += time.perf_counter() - downloaded_at
+        if record is not None:
+            record.fetch_seconds = fetch_seconds
+            record.parse_seconds = parse_seconds
+            record.size = bytes_read
+        if self._metrics is not None:
+            self._metrics.record_page(
+                fetch_seconds, parse_seconds, bytes_read, wire_bytes
+            )
+        if self._http_cache is not None:
+            self._http_cache.stats.record_refetched(cached_page is not None)
+            self._http_cache.store(
+                url, html_page_response.headers, linked_urls, bytes_read
+            )
         return linked_urls
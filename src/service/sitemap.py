@@ -0,0 +1,306 @@
+"""Discovery of the URLs listed in sitemaps, to seed a crawl in bulk"""
+
+import functools
+import itertools
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import requests
+import urllib3
+from logger.logger import Logger
+from models.url import DEFAULT_CANONICALIZER, URL, URLCanonicalizer
+from service.http_client import HTTPClient
+
+# Sitemaps of a host are listed in its robots.txt, or expected at the default path.
+ROBOTS_PATH = "/robots.txt"
+DEFAULT_SITEMAP_PATH = "/sitemap.xml"
+
+# First bytes of a gzip stream, e.g. a `sitemap.xml.gz` served without a
+# `Content-Encoding` header.
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Maximum uncompressed size of a sitemap allowed by the sitemap protocol.
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+
+def parse_robots_sitemaps(robots_txt: str, robots_address: str) -> list[str]:
+    """
+    Args:
+        robots_txt (str): Content of a robots.txt file.
+        robots_address (str): Address of the file, relative sitemap addresses
+            are resolved against.
+
+    Returns:
+        list[str]: Addresses of the sitemaps listed by `Sitemap:` lines, which
+        apply regardless of the user agent groups they appear in.
+    """
+    sitemap_addresses = []
+    for line in robots_txt.splitlines():
+        field, _, value = line.partition("#")[0].partition(":")
+        value = value.strip()
+        if field.strip().lower() == "sitemap" and value:
+            sitemap_addresses.append(urljoin(robots_address, value))
+    return sitemap_addresses
+
+
+def parse_lastmod(value: str | None) -> float | None:
+    """
+    Args:
+        value (str | None): `<lastmod>` of a sitemap entry, a W3C datetime such as
+            `2024`, `2024-05`, `2024-05-01` or `2024-05-01T10:00:00+02:00`.
+
+    Returns:
+        float | None: POSIX timestamp of the date, assumed UTC without a time zone,
+        None if missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    # Reduced precision dates are not accepted by `fromisoformat`.
+    if len(value) == 4:
+        value += "-01-01"
+    elif len(value) == 7:
+        value += "-01"
+    try:
+        modified_at = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if modified_at.tzinfo is None:
+        modified_at = modified_at.replace(tzinfo=timezone.utc)
+    return modified_at.timestamp()
+
+
+def _read_chunks(stream: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    """
+    Args:
+        stream (BinaryIO): Content of a sitemap, possibly gzipped.
+        chunk_size (int): Number of bytes read at a time.
+
+    Yields:
+        bytes: Chunks of the content, gunzipped, of at most `chunk_size` bytes.
+    """
+    chunks = iter(functools.partial(stream.read, chunk_size), b"")
+    first_chunk = next(chunks, b"")
+    chunks = itertools.chain([first_chunk], chunks)
+    if not first_chunk.startswith(GZIP_MAGIC):
+        yield from chunks
+        return
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # Bounding every output chunk keeps a gzip bomb from filling the memory.
+        while chunk and not decompressor.eof:
+            yield decompressor.decompress(chunk, chunk_size)
+            chunk = decompressor.unconsumed_tail
+
+
+def iter_sitemap(
+    stream: BinaryIO, max_bytes: int = MAX_SITEMAP_BYTES, chunk_size: int = 64 * 1024
+) -> Iterator[tuple[str, str, str | None]]:
+    """
+    Stream-parse a sitemap or sitemap index, gunzipping it first if it is gzipped.
+    Every entry is dropped from the parsed tree once yielded, so that memory use does
+    not grow with the size of the sitemap. Entity expansion is bounded by expat,
+    which also never resolves external entities.
+
+    Args:
+        stream (BinaryIO): Content of the sitemap.
+        max_bytes (int): Uncompressed size after which the rest of the sitemap is
+            ignored.
+        chunk_size (int): Number of bytes parsed at a time.
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the sitemap is not well-formed XML.
+
+    Yields:
+        tuple[str, str, str | None]: Kind (`url` or `sitemap`, for sitemaps listed by
+        an index), address and `<lastmod>` of every entry.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    bytes_read = 0
+    # A final None closes the parser once the sitemap is read.
+    for chunk in itertools.chain(_read_chunks(stream, chunk_size), [None]):
+        if chunk is None:
+            parser.close()
+        else:
+            bytes_read += len(chunk)
+            if bytes_read > max_bytes:
+                return
+            parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            if event != "end":
+                continue
+            # Tags are qualified by the sitemap namespace, e.g. `{...}url`.
+            kind = element.tag.rpartition("}")[2]
+            if kind not in ("url", "sitemap"):
+                continue
+            fields = {child.tag.rpartition("}")[2]: child.text for child in element}
+            address = (fields.get("loc") or "").strip()
+            if address:
+                yield kind, address, fields.get("lastmod")
+            root.clear()
+
+
+class SitemapLoader:
+    """
+    Loader of the URLs listed in the sitemaps of the seed hosts, so that a crawl
+    starts with its whole frontier rather than discovering it page by page. The
+    sitemaps of a host are the `Sitemap:` entries of its robots.txt, or its
+    `/sitemap.xml` if there are none. Sitemap indexes are followed breadth-first,
+    and every sitemap is parsed while it is being downloaded.
+    """
+
+    def __init__(
+        self,
+        http_client: HTTPClient,
+        logger: Logger,
+        canonicalizer: URLCanonicalizer = DEFAULT_CANONICALIZER,
+        timeout: tuple[float, float] = (10.0, 30.0),
+        max_sitemaps: int = 1000,
+        max_urls: int | None = None,
+        max_bytes: int = MAX_SITEMAP_BYTES,
+    ) -> None:
+        """
+        Args:
+            http_client (HTTPClient): Client the robots.txt files and sitemaps are
+                fetched with.
+            logger (Logger): Logger the sitemaps that cannot be loaded are logged to.
+            canonicalizer (URLCanonicalizer): Rewrites applied to the listed addresses.
+            timeout (tuple[float, float]): Connect and read timeouts of every request.
+            max_sitemaps (int): Maximum number of sitemaps fetched, including indexes.
+            max_urls (int | None): Maximum number of URLs loaded, unlimited if None.
+            max_bytes (int): Uncompressed size after which the rest of a robots.txt
+                or sitemap is ignored.
+        """
+        self._http_client = http_client
+        self._logger = logger
+        self._canonicalizer = canonicalizer
+        self._timeout = timeout
+        self._max_sitemaps = max_sitemaps
+        self._max_urls = max_urls
+        self._max_bytes = max_bytes
+        self.sitemaps_fetched = 0
+        self.sitemap_errors = 0
+        self.urls_loaded = 0
+
+    def _log_error(self, address: str, error: Exception | str) -> None:
+        self.sitemap_errors += 1
+        self._logger.log(
+            f"Error while loading sitemap {address}: {error}",
+            severity=Logger.Severity.ERROR,
+        )
+
+    def sitemap_addresses(self, seed_url: URL) -> list[str]:
+        """
+        Args:
+            seed_url (URL): URL of a seed host.
+
+        Returns:
+            list[str]: Addresses of the sitemaps listed in the robots.txt of the host,
+            or of its default sitemap if none is listed.
+        """
+        robots_address = urljoin(seed_url.address, ROBOTS_PATH)
+        sitemap_addresses = []
+        try:
+            response = self._http_client.get(
+                robots_address, stream=True, timeout=self._timeout
+            )
+            try:
+                if response.ok:
+                    # Read at most `max_bytes` of the body, so that a huge robots.txt
+                    # does not fill the memory, whatever its `Content-Encoding`.
+                    response.raw.decode_content = True
+                    robots_txt = response.raw.read(self._max_bytes)
+                    sitemap_addresses = parse_robots_sitemaps(
+                        robots_txt.decode("utf-8", errors="replace"), robots_address
+                    )
+            finally:
+                response.close()
+        except (
+            requests.RequestException,
+            urllib3.exceptions.HTTPError,
+            OSError,
+            zlib.error,
+        ):
+            pass
+        return sitemap_addresses or [urljoin(seed_url.address, DEFAULT_SITEMAP_PATH)]
+
+    def _iter_entries(self, address: str) -> Iterator[tuple[str, str, str | None]]:
+        """
+        Args:
+            address (str): Address of a sitemap.
+
+        Yields:
+            tuple[str, str, str | None]: Entries of the sitemap, as of `iter_sitemap`.
+            Failures are logged, keeping the entries yielded before.
+        """
+        try:
+            with self._http_client.get(
+                address, stream=True, timeout=self._timeout
+            ) as response:
+                if not response.ok:
+                    self._log_error(address, f"status {response.status_code}")
+                    return
+                self.sitemaps_fetched += 1
+                # Undo any `Content-Encoding` while streaming the raw body.
+                response.raw.decode_content = True
+                yield from iter_sitemap(response.raw, self._max_bytes)
+        except (
+            requests.RequestException,
+            urllib3.exceptions.HTTPError,
+            ParseError,
+            OSError,
+            zlib.error,
+        ) as error:
+            self._log_error(address, error)
+
+    def load(self, seed_urls: list[URL]) -> Iterator[URL]:
+        """
+        Load the URLs listed in the sitemaps of the hosts of the seed URLs.
+
+        Args:
+            seed_urls (list[URL]): URLs the crawl starts from.
+
+        Yields:
+            URL: Listed URLs at depth 0, with their `lastmod` if listed. URLs listed
+            by several sitemaps are yielded once per sitemap.
+        """
+        if self._max_urls == 0:
+            return
+        # One seed URL per scheme, host and port.
+        seed_hosts = {
+            urljoin(seed_url.address, "/"): seed_url for seed_url in seed_urls
+        }
+        sitemap_addresses = deque(
+            address
+            for seed_url in seed_hosts.values()
+            for address in self.sitemap_addresses(seed_url)
+        )
+        fetched_addresses = set()
+        while sitemap_addresses and len(fetched_addresses) < self._max_sitemaps:
+            address = sitemap_addresses.popleft()
+            if address in fetched_addresses:
+                continue
+            fetched_addresses.add(address)
+            for kind, entry_address, lastmod in self._iter_entries(address):
+                if kind == "sitemap":
+                    sitemap_addresses.append(urljoin(address, entry_address))
+                    continue
+                url = URL(urljoin(address, entry_address), self._canonicalizer)
+                url.lastmod = parse_lastmod(lastmod)
+                self.urls_loaded += 1
+                yield url
+                if self._max_urls is not None and self.urls_loaded >= self._max_urls:
+                    return
+
+    def __str__(self) -> str:
+        return (
+            f"{self.urls_loaded} URL(s) loaded from {self.sitemaps_fetched}"
+            f" sitemap(s), {self.sitemap_errors} error(s)"
+        )
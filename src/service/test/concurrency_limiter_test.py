@@ -0,0 +1,121 @@
+"""Adaptive concurrency limiter tests"""
+
+import asyncio
+import time
+from email.utils import formatdate
+from threading import Thread
+
+from service.concurrency_limiter import (
+    AsyncConcurrencyLimiter,
+    ConcurrencyController,
+    ConcurrencyLimiter,
+    parse_retry_after,
+)
+
+
+def test_parse_retry_after():
+    """Test that `Retry-After` is parsed in seconds and as an HTTP date"""
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+
+def test_controller_grows_while_latency_is_stable():
+    """
+    Test that the limit doubles in slow start, then grows by one per window once
+    latency rises, and shrinks when fetches queue up.
+    """
+    controller = ConcurrencyController(min_limit=1, max_limit=100)
+
+    for _ in range(1 + 2 + 4 + 8):
+        controller.record_latency(0.1)
+    assert controller.limit == 16
+
+    # 16 * (1 - 0.1 / 0.15) > 3 * log10(16): slow start ends, no change.
+    for _ in range(16):
+        controller.record_latency(0.15)
+    assert controller.limit == 16
+    for _ in range(16):
+        controller.record_latency(0.1)
+    assert controller.limit == 17
+    assert controller.adjustments[ConcurrencyController.Reason.INCREASE] == 1
+
+    for _ in range(17):
+        controller.record_latency(0.5)
+    assert controller.limit == 16
+    assert controller.adjustments[ConcurrencyController.Reason.LATENCY] == 1
+
+
+def test_controller_backs_off_on_pushback():
+    """
+    Test that the limit is halved once per window on 429/503 responses, and that
+    `Retry-After` pauses new fetches.
+    """
+    controller = ConcurrencyController(min_limit=2, max_limit=64)
+    controller.limit = 32
+
+    controller.record_response(200, None)
+    assert controller.limit == 32
+    controller.record_response(503, None)
+    controller.record_response(503, None)
+    assert controller.limit == 16
+    assert controller.adjustments[ConcurrencyController.Reason.OVERLOAD] == 1
+
+    # The window of the decrease is skipped, the next one can decrease again.
+    for _ in range(16):
+        controller.record_latency(0.01)
+    controller.record_response(429, "5")
+    assert controller.limit == 8
+    assert controller.adjustments[ConcurrencyController.Reason.RETRY_AFTER] == 1
+    assert 4 < controller.paused_until - time.monotonic() <= 5
+
+
+def test_limiter_bounds_fetches_in_flight():
+    """Test that no more fetches than the limit are in flight at once"""
+    controller = ConcurrencyController(min_limit=2, max_limit=2)
+    limiter = ConcurrencyLimiter(controller)
+    in_flight = []
+    peak_in_flight = []
+
+    def fetch():
+        with limiter.slot():
+            in_flight.append(None)
+            peak_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            in_flight.pop()
+
+    threads = [Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(peak_in_flight) == 8
+    assert max(peak_in_flight) == 2
+
+
+def test_async_limiter_waits_for_retry_after():
+    """Test that asyncio fetches are bounded, and wait for a `Retry-After` pause"""
+    controller = ConcurrencyController(min_limit=2, max_limit=2)
+    limiter = AsyncConcurrencyLimiter(controller)
+    in_flight = []
+    peak_in_flight = []
+
+    async def fetch():
+        async with limiter.slot():
+            in_flight.append(None)
+            peak_in_flight.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+
+    async def crawl():
+        limiter.record_response(429, "0.2")
+        await asyncio.gather(*(fetch() for _ in range(6)))
+
+    started_at = time.monotonic()
+    asyncio.run(crawl())
+
+    assert time.monotonic() - started_at >= 0.2
+    assert max(peak_in_flight) == 2
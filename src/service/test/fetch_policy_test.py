@@ -0,0 +1,253 @@
+"""Fetch timeout, retry, circuit breaker and hedging tests"""
+
+import asyncio
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from unittest.mock import Mock
+
+import pytest
+from models.url import URL
+from service.async_parser_service import AsyncHTMLParserService
+from service.fetch_policy import (
+    CircuitBreaker,
+    CircuitOpenError,
+    FetchPolicy,
+    LatencyTracker,
+)
+from service.parser_service import HTMLParserService
+
+PAGE = b'<html><body><a href="/next">next</a></body></html>'
+
+
+class _FaultyHandler(BaseHTTPRequestHandler):
+    """
+    Handler injecting faults by path: `/stall` stalls before its headers, `/trickle`
+    sends its body a byte at a time, `/flaky` answers 503 to its first two requests,
+    `/down` always answers 500, and `/tail` stalls before the headers of every
+    second request. Other paths answer a page right away.
+    """
+
+    protocol_version = "HTTP/1.1"
+    requests_by_path: Counter = Counter()
+    mutex = Lock()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        with _FaultyHandler.mutex:
+            _FaultyHandler.requests_by_path[self.path] += 1
+            request_count = _FaultyHandler.requests_by_path[self.path]
+        if self.path == "/stall" or (self.path == "/tail" and request_count % 2 == 0):
+            time.sleep(1)
+        if self.path == "/down" or (self.path == "/flaky" and request_count <= 2):
+            self.send_response(500 if self.path == "/down" else 503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        if self.path != "/trickle":
+            self.wfile.write(PAGE)
+            return
+        for byte in PAGE:
+            self.wfile.write(bytes([byte]))
+            self.wfile.flush()
+            time.sleep(0.05)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture(name="server_address")
+def fixture_server_address():
+    """Serve faulty responses from localhost for the duration of a test"""
+    _FaultyHandler.requests_by_path.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FaultyHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stalled_server_times_out(server_address):
+    """Test that a server stalling before its headers does not pin the worker"""
+    fetch_policy = FetchPolicy(read_timeout=0.2, max_retries=0)
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+
+    started_at = time.monotonic()
+    urls = service.get_links_under_url(URL(f"{server_address}/stall"))
+
+    assert urls == set()
+    assert time.monotonic() - started_at < 0.8
+
+
+def test_transient_failures_retried(server_address):
+    """Test that 503 responses are retried with backoff until the page is served"""
+    fetch_policy = FetchPolicy(max_retries=2, backoff_base=0.01)
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+
+    urls = service.get_links_under_url(URL(f"{server_address}/flaky"))
+
+    assert urls == {URL(f"{server_address}/next")}
+    assert _FaultyHandler.requests_by_path["/flaky"] == 3
+    assert fetch_policy.stats.retries == 2
+
+
+def test_deadline_bounds_body_download(server_address):
+    """Test that a body trickling in is given up on at the deadline of the URL"""
+    fetch_policy = FetchPolicy(deadline=0.5)
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+
+    started_at = time.monotonic()
+    urls = service.get_links_under_url(URL(f"{server_address}/trickle"))
+
+    assert urls == set()
+    assert time.monotonic() - started_at < 1.0
+    assert fetch_policy.stats.deadlines_exceeded == 1
+
+
+def test_circuit_opens_for_failing_host(server_address):
+    """
+    Test that requests to a host are rejected once it failed repeatedly,
+    until a trial request is let through after the reset time.
+    """
+    fetch_policy = FetchPolicy(
+        max_retries=0, circuit_failure_threshold=2, circuit_reset_seconds=0.2
+    )
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+
+    for _ in range(2):
+        service.get_links_under_url(URL(f"{server_address}/down"))
+    with pytest.raises(CircuitOpenError) as circuit_open:
+        service.get_links_under_url(URL(f"{server_address}/down"))
+    assert _FaultyHandler.requests_by_path["/down"] == 2
+    assert fetch_policy.stats.circuit_rejections == 1
+    assert fetch_policy.stats.circuit_deferrals == 1
+    assert circuit_open.value.retry_at > time.monotonic()
+
+    time.sleep(0.2)
+    assert service.get_links_under_url(URL(f"{server_address}/page")) == {
+        URL(f"{server_address}/next")
+    }
+    assert not fetch_policy.circuit_breaker.open_hosts
+
+
+def test_slow_request_hedged(server_address):
+    """Test that a request slower than the latency percentile is hedged"""
+    fetch_policy = FetchPolicy(hedge_percentile=0.95, hedge_min_samples=5)
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+    for _ in range(5):
+        service.get_links_under_url(URL(f"{server_address}/page"))
+
+    _FaultyHandler.requests_by_path["/tail"] = 1
+    started_at = time.monotonic()
+    urls = service.get_links_under_url(URL(f"{server_address}/tail"))
+
+    assert urls == {URL(f"{server_address}/next")}
+    assert time.monotonic() - started_at < 0.8
+    assert fetch_policy.stats.hedged_requests == 1
+    assert fetch_policy.stats.hedges_won == 1
+
+
+def test_circuit_deferrals_bounded(server_address):
+    """
+    Test that a page rejected by an open circuit is deferred until the circuit is
+    half-open, and given up on once it was deferred too many times.
+    """
+    fetch_policy = FetchPolicy(
+        max_retries=0,
+        circuit_failure_threshold=1,
+        circuit_reset_seconds=0.2,
+        max_circuit_deferrals=2,
+    )
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+    service.get_links_under_url(URL(f"{server_address}/down"))
+
+    opened_at = time.monotonic()
+    for _ in range(2):
+        with pytest.raises(CircuitOpenError) as circuit_open:
+            service.get_links_under_url(URL(f"{server_address}/page"))
+        assert opened_at < circuit_open.value.retry_at <= opened_at + 0.2
+    assert service.get_links_under_url(URL(f"{server_address}/page")) == set()
+    assert fetch_policy.stats.circuit_deferrals == 2
+    assert _FaultyHandler.requests_by_path["/page"] == 0
+
+
+def test_hedged_requests_bounded(server_address):
+    """
+    Test that requests are only hedged while a hedging slot is free, so that the
+    threads sending them are bounded, and that slots are freed once both requests
+    of a hedged request completed.
+    """
+    fetch_policy = FetchPolicy(
+        hedge_percentile=0.95, hedge_min_samples=5, max_hedged_requests=1
+    )
+    service = HTMLParserService(Mock(), fetch_policy=fetch_policy)
+    for _ in range(5):
+        service.get_links_under_url(URL(f"{server_address}/page"))
+
+    _FaultyHandler.requests_by_path["/tail"] = 1
+    service.get_links_under_url(URL(f"{server_address}/tail"))
+    assert fetch_policy.stats.hedged_requests == 1
+    assert not fetch_policy.acquire_hedge_slot()
+    time.sleep(1)
+    assert fetch_policy.acquire_hedge_slot()
+
+    _FaultyHandler.requests_by_path["/tail"] = 1
+    started_at = time.monotonic()
+    service.get_links_under_url(URL(f"{server_address}/tail"))
+    assert time.monotonic() - started_at >= 1
+    assert fetch_policy.stats.hedged_requests == 1
+    assert fetch_policy.hedge_executor._max_workers == 2
+
+
+def test_async_fetches_retried_and_timed_out(server_address):
+    """Test that the asyncio engine retries transient failures and times out stalls"""
+    fetch_policy = FetchPolicy(read_timeout=0.2, max_retries=2, backoff_base=0.01)
+
+    async def crawl():
+        async with AsyncHTMLParserService(Mock(), fetch_policy=fetch_policy) as service:
+            return await asyncio.gather(
+                service.get_links_under_url(URL(f"{server_address}/flaky")),
+                service.get_links_under_url(URL(f"{server_address}/stall")),
+            )
+
+    started_at = time.monotonic()
+    flaky_urls, stalled_urls = asyncio.run(crawl())
+
+    assert flaky_urls == {URL(f"{server_address}/next")}
+    assert stalled_urls == set()
+    assert time.monotonic() - started_at < 1.5
+
+
+def test_circuit_breaker_half_open():
+    """Test that a single trial request is let through once the circuit resets"""
+    circuit_breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    circuit_breaker.record_failure("host")
+    assert not circuit_breaker.allow_request("host")
+    assert circuit_breaker.allow_request("other")
+
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request("host")
+    assert not circuit_breaker.allow_request("host")
+    circuit_breaker.record_failure("host")
+    assert not circuit_breaker.allow_request("host")
+
+
+def test_backoff_and_latency_percentile():
+    """Test the bounds of the retry backoff, and the latency percentiles"""
+    fetch_policy = FetchPolicy(backoff_base=0.1, backoff_max=1.0)
+    assert all(0 <= fetch_policy.backoff_seconds(2) <= 0.4 for _ in range(100))
+    assert fetch_policy.backoff_seconds(10) <= 1.0
+    assert fetch_policy.backoff_seconds(0, retry_after=0.5) >= 0.5
+
+    latencies = LatencyTracker(window=16)
+    assert latencies.percentile(0.95) is None
+    for latency in range(32):
+        latencies.record(latency)
+    assert latencies.percentile(0.95) == 31
+    assert latencies.percentile(0.5) == 24
@@ -0,0 +1,64 @@
+"""HTTP client connection pooling tests"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from service.http_client import HTTPClient, HTTPClientOptions
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """Handler answering every request with a small keep-alive HTML page"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        body = b"<html></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture(name="server_address")
+def fixture_server_address():
+    """Serve keep-alive responses from localhost for the duration of a test"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_reused_across_requests(server_address):
+    """
+    Test that sequential requests to the same host share a single connection.
+    """
+    client = HTTPClient(HTTPClientOptions(max_connections_per_host=2))
+    for _ in range(5):
+        assert client.get(server_address).ok
+    client.close()
+
+    assert client.stats.requests == 5
+    assert client.stats.connections_opened == 1
+    assert client.stats.connections_reused == 4
+
+
+def test_idle_connection_closed_after_timeout(server_address):
+    """
+    Test that connections idle for longer than the idle timeout are not reused.
+    """
+    client = HTTPClient(HTTPClientOptions(idle_timeout=0))
+    for _ in range(3):
+        assert client.get(server_address).ok
+    client.close()
+
+    assert client.stats.requests == 3
+    assert client.stats.connections_opened == 3
@@ -1,9 +1,25 @@
 """Parser service tests"""
 
+import asyncio
+import gzip
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, get_ident
 from unittest.mock import MagicMock, Mock
+from urllib.parse import urljoin
 import pytest
+from bs4 import BeautifulSoup
 from requests import RequestException
+from metrics.crawl_metrics import CrawlMetrics
 from models.url import URL
+from service.fetch_guard import FetchGuard
+from service.http_cache import HTTPCache
+from service.link_extractor import extract_links_from_html
+from service.async_parser_service import AsyncHTMLParserService
+from service.parser_pool import ParserPool
 from service.parser_service import HTMLParserService
 
 TEST_URL_WITH_REFS = URL("https://website-links.com/faq/index.html")
@@ -50,17 +66,34 @@ HTML_PAGE_WITHOUT_REFS = """
 class MockHTTPResponse(MagicMock):
     """Mocked HTTP response"""
 
-    def __init__(self, status_code, text):
+    def __init__(self, status_code, text, headers=None):
         super().__init__()
         self.status_code = status_code
         self.text = text
+        self.encoding = "utf-8"
+        self.headers = headers if headers is not None else {"Content-Type": "text/html"}
+        # Underlying urllib3 response, shut down at the deadline of the page,
+        # and counting the bytes read from the wire.
+        self.raw = Mock()
+
+    def iter_content(self, chunk_size=1):
+        """Stream the encoded body in chunks, splitting tags across chunk boundaries"""
+        content = self.text.encode(self.encoding)
+        chunk_size = min(chunk_size, 16)
+        for index in range(0, len(content), chunk_size):
+            # Bodies are not compressed, as many bytes are read from the wire.
+            self.raw.tell.return_value = min(index + chunk_size, len(content))
+            yield content[index : index + chunk_size]
+
+    def close(self):
+        """Release the mocked connection"""
 
     @property
     def ok(self):
         return self.status_code < 400
 
 
-def _get_mocked_http_response(test_address):
+def _get_mocked_http_response(test_address, **_):
     mock_html_text = (
         HTML_PAGE_WITH_REFS
         if test_address == TEST_URL_WITH_REFS.address
@@ -95,19 +128,50 @@ def test_links_under_url_returned(mocker, test_url, expected_urls):
     This includes checking for duplicated links (By fragments or duplication),
     and relative links that are resolved to their corresponding absolute links.
     """
-    mocker.patch("requests.get", side_effect=_get_mocked_http_response)
+    mocker.patch("requests.Session.get", side_effect=_get_mocked_http_response)
     service = HTMLParserService(Mock())
     urls = service.get_links_under_url(test_url)
     assert urls == expected_urls
 
 
+def test_links_under_url_parsed_in_process_pool(mocker):
+    """
+    Test that pages parsed by a pool of worker processes yield
+    the same links as pages parsed while they are being downloaded.
+    """
+    mocker.patch("requests.Session.get", side_effect=_get_mocked_http_response)
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as parser_pool:
+        service = HTMLParserService(Mock(), parser_pool=parser_pool)
+        urls = service.get_links_under_url(TEST_URL_WITH_REFS)
+    assert urls == HTMLParserService(Mock()).get_links_under_url(TEST_URL_WITH_REFS)
+    assert all(url.is_valid for url in urls)
+
+
+def test_parser_pool_restarted_once_broken():
+    """
+    Test that the parser pool replaces its processes once one of them died, so that
+    only the parse it was running fails.
+    """
+    parser_pool = ParserPool(1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            parser_pool.submit(os._exit, 1).result()
+
+        assert parser_pool.submit(abs, -1).result() == 1
+        assert parser_pool.restart_count == 1
+    finally:
+        parser_pool.shutdown()
+
+
 def test_links_returned_after_error(mocker):
     """
     Test that the parser service returns no links upon an exception
     being raised when fetching a page for a URL
     """
     mocker.patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=RequestException("Failed to fetch page"),
     )
     service = HTMLParserService(Mock())
@@ -123,9 +187,270 @@ def test_links_returned_after_unsuccesful_html_page(mocker):
     """
     mocked_unsuccesful_response = MockHTTPResponse(403, HTML_PAGE_WITH_REFS)
     mocker.patch(
-        "requests.get",
+        "requests.Session.get",
         return_value=mocked_unsuccesful_response,
     )
     service = HTMLParserService(Mock())
     urls = service.get_links_under_url(TEST_URL_WITH_REFS)
     assert len(urls) == 0
+
+
+@pytest.mark.parametrize("html_page", [HTML_PAGE_WITH_REFS, HTML_PAGE_WITHOUT_REFS])
+def test_link_extractor_matches_beautiful_soup(html_page):
+    """
+    Test that the streaming link extractor returns exactly the links
+    found by searching a BeautifulSoup tree for anchors.
+    """
+    soup_urls = {
+        URL(urljoin(TEST_URL_WITH_REFS.address, anchor.get("href")))
+        for anchor in BeautifulSoup(html_page, "html.parser").find_all("a")
+    }
+    assert extract_links_from_html(TEST_URL_WITH_REFS, html_page) == soup_urls
+
+
+@pytest.mark.parametrize(
+    "headers,expected_reason",
+    [
+        (
+            {"Content-Type": "application/pdf"},
+            FetchGuard.SkipReason.NON_HTML_CONTENT_TYPE,
+        ),
+        (
+            {"Content-Type": "text/html", "Content-Length": "1000000"},
+            FetchGuard.SkipReason.CONTENT_TOO_LARGE,
+        ),
+        ({}, FetchGuard.SkipReason.CONTENT_TOO_LARGE),
+    ],
+)
+def test_links_not_downloaded_when_rejected_by_fetch_guard(
+    mocker, headers, expected_reason
+):
+    """
+    Test that the parser service returns no links and counts the reason when
+    a response is not HTML, or its declared or streamed size exceeds the cap,
+    only keeping a bounded sample of the skipped URLs.
+    """
+    mocker.patch(
+        "requests.Session.get",
+        side_effect=lambda *args, **kwargs: MockHTTPResponse(
+            200, HTML_PAGE_WITH_REFS, headers
+        ),
+    )
+    fetch_guard = FetchGuard(max_page_bytes=64, max_sampled_urls=1)
+    service = HTMLParserService(Mock(), fetch_guard=fetch_guard)
+    urls = service.get_links_under_url(TEST_URL_WITH_REFS)
+    other_urls = service.get_links_under_url(URL("https://website-links.com/other"))
+    assert len(urls) == 0
+    assert len(other_urls) == 0
+    assert fetch_guard.skip_counts == {expected_reason: 2}
+    assert fetch_guard.skipped_urls == {TEST_URL_WITH_REFS: expected_reason}
+    assert str(fetch_guard) == f"2 page(s), 2 {expected_reason}"
+
+
+def test_unchanged_page_revalidated_from_http_cache(mocker, tmp_path):
+    """
+    Test that a page downloaded with an ETag is requested conditionally by the next
+    run, and that its cached links are returned on a 304 without reading a body.
+    """
+    http_cache = HTTPCache(str(tmp_path))
+    downloaded_response = MockHTTPResponse(
+        200, HTML_PAGE_WITH_REFS, {"Content-Type": "text/html", "ETag": '"v1"'}
+    )
+    mocker.patch("requests.Session.get", return_value=downloaded_response)
+    downloaded_urls = HTMLParserService(
+        Mock(), http_cache=http_cache
+    ).get_links_under_url(TEST_URL_WITH_REFS)
+
+    not_modified_response = MockHTTPResponse(304, "", {})
+    not_modified_response.iter_content = Mock()
+    get = mocker.patch("requests.Session.get", return_value=not_modified_response)
+    revalidated_urls = HTMLParserService(
+        Mock(), http_cache=http_cache
+    ).get_links_under_url(TEST_URL_WITH_REFS)
+
+    assert revalidated_urls == downloaded_urls
+    assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    not_modified_response.iter_content.assert_not_called()
+    assert http_cache.stats.revalidated == 1
+    assert http_cache.stats.refetched == 1
+    assert http_cache.stats.bytes_saved == len(HTML_PAGE_WITH_REFS.encode())
+    http_cache.close()
+
+
+def test_page_without_validators_not_cached(mocker, tmp_path):
+    """
+    Test that a page served without ETag nor Last-Modified is not cached,
+    as it could never be revalidated.
+    """
+    http_cache = HTTPCache(str(tmp_path))
+    mocker.patch(
+        "requests.Session.get",
+        return_value=MockHTTPResponse(200, HTML_PAGE_WITH_REFS),
+    )
+    HTMLParserService(Mock(), http_cache=http_cache).get_links_under_url(
+        TEST_URL_WITH_REFS
+    )
+
+    assert http_cache.lookup(TEST_URL_WITH_REFS) is None
+    http_cache.close()
+
+
+def test_page_metrics_recorded(mocker):
+    """
+    Test that the status code, size and fetch and parse times of a page
+    are recorded, as well as failed requests.
+    """
+    mocker.patch("requests.Session.get", side_effect=_get_mocked_http_response)
+    metrics = CrawlMetrics()
+    service = HTMLParserService(Mock(), metrics=metrics)
+    service.get_links_under_url(TEST_URL_WITH_REFS)
+    mocker.patch(
+        "requests.Session.get",
+        side_effect=RequestException("Failed to fetch page"),
+    )
+    service.get_links_under_url(TEST_URL_WITH_REFS)
+
+    assert metrics.responses.values() == {"200": 1}
+    assert metrics.fetch_errors.total == 1
+    assert metrics.downloaded_bytes.total == len(HTML_PAGE_WITH_REFS.encode())
+    assert metrics.fetch_seconds.count == 1
+    assert metrics.parse_seconds.count == 1
+    assert metrics.parse_seconds.sum > 0
+
+
+class _GzipHandler(BaseHTTPRequestHandler):
+    """
+    Handler serving the page with links gzip-compressed to clients accepting it,
+    and under `/bomb` a gzip body of zeros decompressing to 8MiB.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path == "/bomb":
+            body = gzip.compress(bytes(8 * 1024 * 1024))
+        else:
+            body = HTML_PAGE_WITH_REFS.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        if "gzip" in self.headers.get("Accept-Encoding", "") or self.path == "/bomb":
+            body = body if self.path == "/bomb" else gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture(name="gzip_server_address")
+def fixture_gzip_server_address():
+    """Serve gzip-compressed pages from localhost for the duration of a test"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GzipHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_compressed_page_decoded_while_streamed(gzip_server_address, engine):
+    """
+    Test that compressed pages yield the same links, with their sizes on the wire
+    and decompressed both recorded, and that decompression bombs are dropped.
+    """
+    metrics = CrawlMetrics()
+    fetch_guard = FetchGuard(max_page_bytes=16 * 1024 * 1024)
+    page_url = URL(f"{gzip_server_address}/faq/index.html")
+    bomb_url = URL(f"{gzip_server_address}/bomb")
+    if engine == "thread":
+        service = HTMLParserService(Mock(), fetch_guard=fetch_guard, metrics=metrics)
+        urls = service.get_links_under_url(page_url)
+        bomb_urls = service.get_links_under_url(bomb_url)
+    else:
+
+        async def crawl():
+            async with AsyncHTMLParserService(
+                Mock(), fetch_guard=fetch_guard, metrics=metrics
+            ) as service:
+                return (
+                    await service.get_links_under_url(page_url),
+                    await service.get_links_under_url(bomb_url),
+                )
+
+        urls, bomb_urls = asyncio.run(crawl())
+
+    assert URL(f"{gzip_server_address}/faq/relative.html") in urls
+    assert len(urls) == 7
+    assert metrics.downloaded_bytes.total == len(HTML_PAGE_WITH_REFS.encode())
+    assert 0 < metrics.wire_bytes.total < metrics.downloaded_bytes.total
+    assert bomb_urls == set()
+    assert fetch_guard.skip_counts == {FetchGuard.SkipReason.COMPRESSION_BOMB: 1}
+    assert fetch_guard.skipped_urls == {
+        bomb_url: FetchGuard.SkipReason.COMPRESSION_BOMB
+    }
+
+
+def test_async_http_cache_queried_off_event_loop(gzip_server_address, tmp_path):
+    """
+    Test that the asyncio engine looks pages up in the HTTP cache and stores them
+    from executor threads, so that SQLite reads and writes never block the loop.
+    """
+    http_cache = HTTPCache(str(tmp_path))
+    calling_threads = []
+    lookup, store = http_cache.lookup, http_cache.store
+
+    def recorded(method):
+        def call(*args):
+            calling_threads.append(get_ident())
+            return method(*args)
+
+        return call
+
+    http_cache.lookup, http_cache.store = recorded(lookup), recorded(store)
+
+    async def crawl():
+        async with AsyncHTMLParserService(Mock(), http_cache=http_cache) as service:
+            urls = await service.get_links_under_url(
+                URL(f"{gzip_server_address}/faq/index.html")
+            )
+        return urls, get_ident()
+
+    urls, loop_thread = asyncio.run(crawl())
+
+    assert len(urls) == 7
+    assert len(calling_threads) == 2
+    assert loop_thread not in calling_threads
+    http_cache.close()
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_page_failed_when_parser_pool_broken(gzip_server_address, engine):
+    """
+    Test that a page whose parser process died is logged as failed and yields no
+    links, rather than raising to the crawler worker.
+    """
+    page_url = URL(f"{gzip_server_address}/faq/index.html")
+    broken_parse = Future()
+    broken_parse.set_exception(BrokenProcessPool("A parser process died"))
+    parser_pool = Mock(submit=Mock(return_value=broken_parse))
+    logger = Mock()
+
+    if engine == "thread":
+        service = HTMLParserService(logger, parser_pool=parser_pool)
+        urls = service.get_links_under_url(page_url)
+    else:
+
+        async def get_links_under_url():
+            async with AsyncHTMLParserService(
+                logger, parser_pool=parser_pool
+            ) as service:
+                return await service.get_links_under_url(page_url)
+
+        urls = asyncio.run(get_links_under_url())
+
+    assert not urls
+    assert "A parser process died" in logger.log.call_args.args[0]
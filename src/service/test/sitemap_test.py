@@ -0,0 +1,197 @@
+"""Sitemap discovery and parsing tests"""
+
+import gzip
+import io
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest.mock import Mock
+
+import pytest
+from models.url import URL
+from service.http_client import HTTPClient
+from service.sitemap import (
+    SitemapLoader,
+    iter_sitemap,
+    parse_lastmod,
+    parse_robots_sitemaps,
+)
+
+NAMESPACE = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+SITEMAP_INDEX = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex {NAMESPACE}>
+  <sitemap><loc>/sitemap-pages.xml.gz</loc></sitemap>
+  <sitemap><loc>/sitemap-posts.xml</loc></sitemap>
+  <sitemap><loc>/sitemap-broken.xml</loc></sitemap>
+</sitemapindex>""".encode()
+
+PAGES_SITEMAP = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NAMESPACE}>
+  <url><loc>/a</loc><lastmod>2024-05-01</lastmod></url>
+  <url><loc> /b </loc></url>
+</urlset>""".encode()
+
+POSTS_SITEMAP = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NAMESPACE}>
+  <url><loc>/posts/1</loc><lastmod>2024-06-01T12:00:00+00:00</lastmod></url>
+</urlset>""".encode()
+
+BROKEN_SITEMAP = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NAMESPACE}>
+  <url><loc>/c</loc></url>
+  <url><loc>/d""".encode()
+
+
+class _SitemapHandler(BaseHTTPRequestHandler):
+    """
+    Handler serving a robots.txt listing a sitemap index, whose sitemaps are
+    gzipped, compressed with `Content-Encoding: gzip` and truncated.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        headers = {}
+        if self.path == "/robots.txt":
+            body = b"User-agent: *\nDisallow: /private\nSitemap: /sitemap_index.xml\n"
+        elif self.path == "/sitemap_index.xml":
+            body = SITEMAP_INDEX
+        elif self.path == "/sitemap-pages.xml.gz":
+            body = gzip.compress(PAGES_SITEMAP)
+        elif self.path == "/sitemap-posts.xml":
+            body = gzip.compress(POSTS_SITEMAP)
+            headers["Content-Encoding"] = "gzip"
+        elif self.path == "/sitemap-broken.xml":
+            body = BROKEN_SITEMAP
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture(name="server_address")
+def fixture_server_address():
+    """Serve sitemaps from localhost for the duration of a test"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SitemapHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sitemaps_loaded_from_robots_txt(server_address):
+    """
+    Test that the sitemap index listed in robots.txt is followed, its sitemaps
+    loaded whatever their compression, and the entries of a truncated sitemap
+    kept up to the parse error.
+    """
+    logger = Mock()
+    loader = SitemapLoader(HTTPClient(), logger)
+
+    urls = list(loader.load([URL(f"{server_address}/")]))
+
+    assert urls == [
+        URL(f"{server_address}/a"),
+        URL(f"{server_address}/b"),
+        URL(f"{server_address}/posts/1"),
+        URL(f"{server_address}/c"),
+    ]
+    assert [url.lastmod for url in urls] == [
+        parse_lastmod("2024-05-01"),
+        None,
+        parse_lastmod("2024-06-01T12:00:00Z"),
+        None,
+    ]
+    assert loader.sitemaps_fetched == 4
+    assert loader.sitemap_errors == 1
+    assert logger.log.call_count == 1
+
+
+def test_sitemap_loading_limited(server_address):
+    """Test that no URL beyond the maximum is loaded"""
+    loader = SitemapLoader(HTTPClient(), Mock(), max_urls=2)
+
+    urls = list(loader.load([URL(f"{server_address}/")]))
+
+    assert urls == [URL(f"{server_address}/a"), URL(f"{server_address}/b")]
+    assert loader.sitemaps_fetched == 2
+
+
+def test_default_sitemap_without_robots_txt():
+    """Test that the default sitemap of a host is tried if it has no robots.txt"""
+    http_client = Mock()
+    http_client.get.return_value.ok = False
+    loader = SitemapLoader(http_client, Mock())
+
+    assert loader.sitemap_addresses(URL("https://website.com/blog/")) == [
+        "https://website.com/sitemap.xml"
+    ]
+
+
+def test_robots_txt_size_limited():
+    """Test that the rest of a robots.txt beyond the size limit is ignored"""
+    http_client = Mock()
+    http_client.get.return_value.raw = io.BytesIO(
+        b"Sitemap: /first.xml\n" + b"#" * 1000 + b"\nSitemap: /second.xml\n"
+    )
+    loader = SitemapLoader(http_client, Mock(), max_bytes=100)
+
+    assert loader.sitemap_addresses(URL("https://website.com/")) == [
+        "https://website.com/first.xml"
+    ]
+
+
+def test_parse_robots_sitemaps():
+    """Test that sitemaps are read from any group, resolving relative addresses"""
+    robots_txt = """
+        User-agent: crawler
+        Disallow: /
+        SITEMAP: https://cdn.website.com/sitemap.xml  # Hosted elsewhere
+        User-agent: *
+        Sitemap: /news.xml
+        # Sitemap: /commented.xml
+    """
+
+    assert parse_robots_sitemaps(robots_txt, "https://website.com/robots.txt") == [
+        "https://cdn.website.com/sitemap.xml",
+        "https://website.com/news.xml",
+    ]
+
+
+@pytest.mark.parametrize(
+    "value,expected_timestamp",
+    [
+        ("2024", 1704067200.0),
+        ("2024-02", 1706745600.0),
+        ("2024-02-01", 1706745600.0),
+        ("2024-02-01T01:00:00+01:00", 1706745600.0),
+        ("2024-02-01T00:00:00.5Z", 1706745600.5),
+        ("yesterday", None),
+        (None, None),
+    ],
+)
+def test_parse_lastmod(value, expected_timestamp):
+    """Test the W3C datetimes of sitemap entries"""
+    assert parse_lastmod(value) == expected_timestamp
+
+
+def test_gzip_bomb_bounded():
+    """Test that a sitemap decompressing past the size limit is cut off"""
+    entries = b"<url><loc>/page</loc></url>" * 100_000
+    sitemap = gzip.compress(b"<urlset>" + entries + b"</urlset>")
+
+    entry_count = sum(1 for _ in iter_sitemap(io.BytesIO(sitemap), max_bytes=65536))
+
+    assert 0 < entry_count < 65536 // len(b"<url><loc>/page</loc></url>")